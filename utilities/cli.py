@@ -0,0 +1,1249 @@
+#!/usr/bin/env python3
+
+"""
+This script runs the analysis without the notebooks, for example under a batch scheduler. The stages are :
+
+    - load : search and download the raw data of the case
+    - climatology : compute and save the monthly climatologies
+    - aprp : compute and save the APRP outputs of every perturbed experiment
+    - merge : combine the outputs of the shards into the tables of the save folders
+    - regrid : regrid the APRP outputs on the common grid and average them over the year (kept in the artifact cache)
+    - tables : write the table of Zelinka and al. (2023) for the region as a csv file
+
+A stage whose products are up to date is skipped : the load and climatology stages when the saved climatologies hold every variable of the case
+(only the missing variables are added otherwise), the aprp stage for the entries whose input climatologies did not change, the regrid and tables
+stages when the artifact cache holds their output. The heavy libraries are only imported by the stages that need them.
+
+The load, climatology and aprp stages can be split between the tasks of a SLURM job array : every task treats the entries of its shard
+(see shard_manifest.py), the shard index and count being read from the SLURM variables of a contiguous array (ex: --array=0-7). The tasks of
+a stepped or sparse array (ex: --array=0-15:2) are given --shard-index and --shard-count explicitly. A job run after the array, with the shard count
+and without shard index, merges the shards and runs the following stages.
+
+The climatologies are saved with the parameters of their run (case, domain, years and remove_ensembles) : they are computed again when
+they were saved with other parameters.
+
+Ex: cmip6-arctic --case ZELINKA-SW --stages climatology aprp regrid tables --aprp-workers 16 --lat-domain 60 90
+
+Ex: sbatch --array=0-7 --wrap "cmip6-arctic --stages climatology aprp"
+    sbatch --dependency=afterok:<array job id> --wrap "cmip6-arctic --stages merge regrid tables --shard-count 8"
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### COMMAND LINE ###
+
+import argparse  # to read the options of the run
+
+import sys  # to give the exit code
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the products
+
+import json  # to save the parameters of the run
+
+##############################
+### STAGES OF THE PIPELINE ###
+##############################
+
+STAGES = ["load", "climatology", "aprp", "merge", "regrid", "tables"]  # in order
+
+SHARDED_STAGES = ["load", "climatology", "aprp"]  # run by every shard
+
+## Status of the saved climatologies ##
+
+CLIMATOLOGY_MISSING = "missing"  # nothing saved yet
+
+CLIMATOLOGY_PARTIAL = "partial"  # some variables of the case are missing
+
+CLIMATOLOGY_UP_TO_DATE = "up_to_date"  # every variable of the case is saved
+
+CLIMATOLOGY_OUTDATED = "outdated"  # saved with other run parameters
+
+RUN_PARAMETERS_FILE_NAME = (
+    "run_parameters.json"  # next to the table of the climatologies
+)
+
+############################
+### READ THE RUN OPTIONS ###
+############################
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function defines the options of the command line.
+
+    ---
+
+    ### INPUTS ###
+
+    nothing.
+
+    ---
+
+    ### OUTPUTS ###
+
+    PARSER : ARGPARSE ARGUMENTPARSER | the parser of the options
+
+    ---
+
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="cmip6-arctic",
+        description="Run the stages of the CMIP6 Arctic aerosol analysis without the notebooks.",
+    )
+
+    ### WHAT IS RUN ###
+
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=STAGES + ["all"],
+        default=["all"],
+        help="stages to run, always in the order of the pipeline (default: all)",
+    )
+
+    parser.add_argument(
+        "--case",
+        default="ZELINKA-SW",
+        help="case of the search, see set_search_criterias (default: ZELINKA-SW)",
+    )
+
+    parser.add_argument(
+        "--remove-ensembles",
+        action="store_true",
+        help="keep only one variant per model",
+    )
+
+    ### WHERE THE PRODUCTS ARE ###
+
+    parser.add_argument(
+        "--data-path",
+        default=os.path.join(os.path.expanduser("~"), "certainty-data"),
+        help="parent directory of the data folder (default: ~/certainty-data)",
+    )
+
+    parser.add_argument(
+        "--data-folder-name",
+        default="CMIP6-DATA",
+        help="name of the data folder holding the raw files and the products (default: CMIP6-DATA)",
+    )
+
+    parser.add_argument(
+        "--artifact-cache",
+        default=None,
+        help="folder of the artifact cache, shareable between users (default: artifact_cache next to the data folder)",
+    )
+
+    ### WORKERS ###
+
+    parser.add_argument(
+        "--aprp-workers",
+        type=int,
+        default=None,
+        help="number of processes of the APRP stage (default: number of cpus)",
+    )
+
+    ## The tasks of a stepped or sparse job array give their shard explicitly (see main) ##
+
+    try:
+
+        shard_index, shard_count = get_shard_from_environment()
+
+    except ValueError:
+
+        shard_index, shard_count = (None, None)
+
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=shard_index,
+        help="shard of the entries treated by this process (default: the task of the SLURM job array, none outside of an array)",
+    )
+
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=shard_count,
+        help="number of shards (default: the number of tasks of the SLURM job array, 1 outside of an array)",
+    )
+
+    parser.add_argument(
+        "--download-queue",
+        type=int,
+        default=0,
+        help="number of entries downloaded ahead while the climatologies are computed, 0 to download and compute in turn (default: 0)",
+    )
+
+    ### STORAGE AND TRANSFER ###
+
+    parser.add_argument(
+        "--use-reference-index",
+        action="store_true",
+        help="reopen the cached raw files through their saved reference indexes",
+    )
+
+    parser.add_argument(
+        "--use-async-transfer",
+        action="store_true",
+        help="download the raw files with the asynchronous transfer engine",
+    )
+
+    parser.add_argument(
+        "--cache-budget",
+        type=float,
+        default=None,
+        help="size in GB of the raw files kept in the download folder (default: no limit)",
+    )
+
+    ### REGION ###
+
+    parser.add_argument(
+        "--lat-domain",
+        nargs=2,
+        type=float,
+        default=None,
+        metavar=("SOUTH", "NORTH"),
+        help="latitudes kept from the raw data, used as the region of the regridding and the tables (default: every latitude)",
+    )
+
+    parser.add_argument(
+        "--lon-domain",
+        nargs=2,
+        type=float,
+        default=None,
+        metavar=("WEST", "EAST"),
+        help="longitudes kept from the raw data (default: every longitude)",
+    )
+
+    parser.add_argument(
+        "--year-range",
+        nargs=2,
+        type=int,
+        default=None,
+        metavar=("FIRST", "LAST"),
+        help="years of the climatologies (default: every year)",
+    )
+
+    ### APRP AND REGRIDDING ###
+
+    parser.add_argument(
+        "--control-experiment",
+        default="piClim-control",
+        help="experiment used as the control state (default: piClim-control)",
+    )
+
+    parser.add_argument(
+        "--perturbed-experiment",
+        default="piClim-aer",
+        help="experiment whose APRP outputs are regridded and tabulated (default: piClim-aer)",
+    )
+
+    parser.add_argument(
+        "--regridding-tool",
+        default="separable",
+        help="regridding backend, see REGRIDDING_TOOLS (default: separable)",
+    )
+
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="keep the warnings regarding connection failures to esgf servers",
+    )
+
+    return parser
+
+
+def get_shard_from_environment() -> tuple[int | None, int]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the shard of the process from the variables of a SLURM job array, the task ids being counted from the first one.
+    The task ids of a stepped or sparse array (ex: --array=0-15:2 or --array=0,3,7) are not the ranks of the tasks : ValueError is raised.
+
+    ---
+
+    ### INPUTS ###
+
+    nothing.
+
+    ---
+
+    ### OUTPUTS ###
+
+    SHARD_INDEX : INT | the index of the task in the array : none outside of an array
+
+    SHARD_COUNT : INT | the number of tasks of the array : 1 outside of an array
+
+    ---
+
+    """
+
+    if "SLURM_ARRAY_TASK_ID" not in os.environ:
+
+        return (None, 1)
+
+    task_min = int(os.environ.get("SLURM_ARRAY_TASK_MIN", 0))
+
+    shard_count = int(os.environ.get("SLURM_ARRAY_TASK_COUNT", 1))
+
+    task_max = int(os.environ.get("SLURM_ARRAY_TASK_MAX", task_min + shard_count - 1))
+
+    ### ONLY A CONTIGUOUS ARRAY GIVES THE RANK OF THE TASK ###
+
+    if (
+        int(os.environ.get("SLURM_ARRAY_TASK_STEP", 1)) != 1
+        or task_max - task_min + 1 != shard_count
+    ):
+
+        raise ValueError(
+            "{}-{} ({} tasks) -> The job array is not contiguous : give --shard-index and --shard-count".format(
+                task_min, task_max, shard_count
+            )
+        )
+
+    shard_index = int(os.environ["SLURM_ARRAY_TASK_ID"]) - task_min
+
+    return (shard_index, shard_count)
+
+
+def select_stages(requested_stages: list[str]) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the stages to run in the order of the pipeline, whatever the order they were requested in.
+
+    ---
+
+    ### INPUTS ###
+
+    REQUESTED_STAGES : LIST[STR] | the requested stages, "all" for every stage
+
+    ---
+
+    ### OUTPUTS ###
+
+    SELECTED_STAGES : LIST[STR] | the stages to run, in the order of STAGES
+
+    ---
+
+    """
+
+    ### CHECK THE STAGES ###
+
+    for stage in requested_stages:
+
+        if stage not in STAGES + ["all"]:
+
+            raise ValueError("{} -> Unknown stage of the pipeline".format(stage))
+
+    if "all" in requested_stages:
+
+        return list(STAGES)
+
+    selected_stages = [stage for stage in STAGES if stage in requested_stages]
+
+    return selected_stages
+
+
+def select_shard_stages(
+    stages: list[str], shard_index: int | None, shard_count: int
+) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function keeps the stages a process runs when the entries are split between shards : a shard (with an index) runs the stages
+    of SHARDED_STAGES on its entries, the process without index merges the shards and runs the following stages.
+
+    ---
+
+    ### INPUTS ###
+
+    STAGES : LIST[STR] | the selected stages, in the order of STAGES
+
+    SHARD_INDEX : INT | the index of the shard of the process : none for the merging process
+
+    SHARD_COUNT : INT | the number of shards
+
+    ---
+
+    ### OUTPUTS ###
+
+    SHARD_STAGES : LIST[STR] | the stages run by the process
+
+    ---
+
+    """
+
+    if shard_count == 1:
+
+        return [stage for stage in stages if stage != "merge"]
+
+    if shard_index is None:
+
+        shard_stages = [stage for stage in stages if stage not in SHARDED_STAGES]
+
+    else:
+
+        shard_stages = [stage for stage in stages if stage in SHARDED_STAGES]
+
+    left_stages = [stage for stage in stages if stage not in shard_stages]
+
+    if left_stages:
+
+        print(
+            "Stages left to the {} : {}\n".format(
+                "shards" if shard_index is None else "merging job",
+                " -> ".join(left_stages),
+            )
+        )
+
+    return shard_stages
+
+
+def get_product_paths(arguments: argparse.Namespace) -> dict[str, str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the folders of the products, laid out as in the notebooks.
+
+    ---
+
+    ### INPUTS ###
+
+    ARGUMENTS : ARGPARSE NAMESPACE | the options of the run
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_PATHS : DICT | the "data", "climatologies", "aprp", "tables" and "artifact_cache" folders, and "shard_climatologies" where the shard saves its climatologies
+
+    ---
+
+    """
+
+    from utilities.get_cmip6_data.store_data.shard_manifest import (
+        get_shard_path,  # save folder of a shard
+    )
+
+    data_path = os.path.join(arguments.data_path, arguments.data_folder_name)
+
+    dict_paths = {
+        "data": data_path,
+        "climatologies": os.path.join(data_path, "climatologies"),
+        "aprp": os.path.join(data_path, "aprp"),
+        "tables": os.path.join(data_path, "tables"),
+        "artifact_cache": arguments.artifact_cache
+        or os.path.join(arguments.data_path, "artifact_cache"),
+    }
+
+    dict_paths["shard_climatologies"] = get_shard_path(
+        dict_paths["climatologies"],
+        arguments.shard_index or 0,
+        arguments.shard_count,
+    )
+
+    return dict_paths
+
+
+########################################
+### ARE THE CLIMATOLOGIES UP TO DATE ###
+########################################
+
+
+def get_run_parameters(arguments: argparse.Namespace) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the parameters of the run the saved climatologies depend on.
+
+    ---
+
+    ### INPUTS ###
+
+    ARGUMENTS : ARGPARSE NAMESPACE | the options of the run
+
+    ---
+
+    ### OUTPUTS ###
+
+    RUN_PARAMETERS : DICT | the "case", "lat_domain", "lon_domain", "year_range" and "remove_ensembles" of the run, as saved in json
+
+    ---
+
+    """
+
+    run_parameters = json.loads(
+        json.dumps(
+            {
+                "case": arguments.case,
+                "lat_domain": arguments.lat_domain,
+                "lon_domain": arguments.lon_domain,
+                "year_range": arguments.year_range,
+                "remove_ensembles": arguments.remove_ensembles,
+            }
+        )
+    )
+
+    return run_parameters
+
+
+def write_run_parameters(parent_path_clim: str, run_parameters: dict):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function saves the parameters of the run next to the table of the climatologies it saved.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory where the climatologies are saved
+
+    RUN_PARAMETERS : DICT | the parameters of the run (see get_run_parameters)
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    with open(
+        os.path.join(parent_path_clim, "table", RUN_PARAMETERS_FILE_NAME), "w"
+    ) as file:
+
+        json.dump(run_parameters, file, indent=4)
+
+    return
+
+
+def read_run_parameters(parent_path_clim: str) -> dict | None:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the parameters of the run which saved the climatologies.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory where the climatologies are saved
+
+    ---
+
+    ### OUTPUTS ###
+
+    RUN_PARAMETERS : DICT | the parameters of the run, none if they were not saved
+
+    ---
+
+    """
+
+    parameters_path = os.path.join(parent_path_clim, "table", RUN_PARAMETERS_FILE_NAME)
+
+    if not os.path.exists(parameters_path):
+
+        return None
+
+    with open(parameters_path) as file:
+
+        run_parameters = json.load(file)
+
+    return run_parameters
+
+
+def merge_run_parameters(parent_path_clim: str, shard_count: int) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function saves next to the merged climatologies the parameters of the runs of their shards, which must all be the same.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory of the merged climatologies
+
+    SHARD_COUNT : INT | the number of shards
+
+    ---
+
+    ### OUTPUTS ###
+
+    RUN_PARAMETERS : DICT | the parameters of the runs of the shards
+
+    ---
+
+    """
+
+    from utilities.get_cmip6_data.store_data.shard_manifest import (
+        get_shard_path,  # save folder of a shard
+    )
+
+    list_run_parameters = [
+        read_run_parameters(get_shard_path(parent_path_clim, shard_index, shard_count))
+        for shard_index in range(shard_count)
+    ]
+
+    run_parameters = list_run_parameters[0]
+
+    if run_parameters is None or any(
+        other != run_parameters for other in list_run_parameters[1:]
+    ):
+
+        raise ValueError(
+            "{} -> The shards were not all run with the same parameters".format(
+                list_run_parameters
+            )
+        )
+
+    write_run_parameters(parent_path_clim, run_parameters)
+
+    return run_parameters
+
+
+def get_climatology_status(
+    parent_path_clim: str, variable_id: list[str], run_parameters: dict | None = None
+) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function tells whether the climatologies saved at parent_path_clim hold every variable of a case. Only the metadata of the files is read.
+    With run parameters, climatologies saved with other parameters, or without them, are outdated.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory where the climatologies are saved
+
+    VARIABLE_ID : LIST[STR] | the variables of the case
+
+    RUN_PARAMETERS : DICT | the parameters of the run (see get_run_parameters) : default is none (not compared)
+
+    ---
+
+    ### OUTPUTS ###
+
+    STATUS : STR | one of CLIMATOLOGY_MISSING, CLIMATOLOGY_OUTDATED, CLIMATOLOGY_PARTIAL and CLIMATOLOGY_UP_TO_DATE
+
+    ---
+
+    """
+
+    from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+        get_missing_variables,  # variables not saved yet for every entry
+    )
+
+    if not os.path.exists(
+        os.path.join(parent_path_clim, "table", "key_paths_table.pkl")
+    ):
+
+        return CLIMATOLOGY_MISSING
+
+    if (
+        run_parameters is not None
+        and read_run_parameters(parent_path_clim) != run_parameters
+    ):
+
+        return CLIMATOLOGY_OUTDATED
+
+    dict_missing_variables = get_missing_variables(parent_path_clim, variable_id)
+
+    if any(dict_missing_variables.values()):
+
+        return CLIMATOLOGY_PARTIAL
+
+    return CLIMATOLOGY_UP_TO_DATE
+
+
+def get_case_facets(case: str) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the search facets of a case (see set_search_criterias).
+
+    ---
+
+    ### INPUTS ###
+
+    CASE : STR | the case of the search
+
+    ---
+
+    ### OUTPUTS ###
+
+    SEARCH_FACETS : DICT | the facets of the case with the "experiment_id" and "variable_id" keys
+
+    ---
+
+    """
+
+    from utilities.get_cmip6_data.load_raw_data.load_cmip6 import (
+        set_search_criterias,  # criterias of every case
+    )
+
+    search_facets = set_search_criterias(case)["search_facets"]
+
+    return search_facets
+
+
+#########################
+### STAGES OF THE RUN ###
+#########################
+
+
+def run_load(arguments: argparse.Namespace, dict_paths: dict[str, str]):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function searches and downloads the raw data of the case, unless the climatologies already hold every variable of the case.
+
+    ---
+
+    ### INPUTS ###
+
+    ARGUMENTS : ARGPARSE NAMESPACE | the options of the run
+
+    DICT_PATHS : DICT | the folders of the products
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    search_facets = get_case_facets(arguments.case)
+
+    if (
+        get_climatology_status(
+            dict_paths["shard_climatologies"],
+            search_facets["variable_id"],
+            run_parameters=get_run_parameters(arguments),
+        )
+        == CLIMATOLOGY_UP_TO_DATE
+    ):
+
+        print("load : the climatologies are up to date, skipped\n")
+
+        return
+
+    from utilities.get_cmip6_data.load_raw_data.load_cmip6 import (
+        loading_cmip6,  # to download the raw data of the case
+    )
+
+    loading_cmip6(
+        parent_path=arguments.data_path,
+        downloading_folder_name=arguments.data_folder_name,
+        case=arguments.case,
+        remove_ensembles=arguments.remove_ensembles,
+        verbose=arguments.verbose,
+        lat_domain=arguments.lat_domain and tuple(arguments.lat_domain),
+        lon_domain=arguments.lon_domain and tuple(arguments.lon_domain),
+        year_range=arguments.year_range and tuple(arguments.year_range),
+        use_reference_index=arguments.use_reference_index,
+        use_async_transfer=arguments.use_async_transfer,
+        shard_index=arguments.shard_index or 0,
+        shard_count=arguments.shard_count,
+    )
+
+    return
+
+
+def run_climatology(arguments: argparse.Namespace, dict_paths: dict[str, str]):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes and saves the monthly climatologies of the case with the parameters of the run. Only the missing variables are added
+    to climatologies already saved with the same parameters, and nothing is done if they hold every variable of the case. Climatologies saved
+    with other parameters are cleared and computed again.
+
+    ---
+
+    ### INPUTS ###
+
+    ARGUMENTS : ARGPARSE NAMESPACE | the options of the run
+
+    DICT_PATHS : DICT | the folders of the products
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    search_facets = get_case_facets(arguments.case)
+
+    run_parameters = get_run_parameters(arguments)
+
+    status = get_climatology_status(
+        dict_paths["shard_climatologies"],
+        search_facets["variable_id"],
+        run_parameters=run_parameters,
+    )
+
+    if status == CLIMATOLOGY_UP_TO_DATE:
+
+        print("climatology : up to date, skipped\n")
+
+        return
+
+    if status == CLIMATOLOGY_OUTDATED:
+
+        print("climatology : saved with other run parameters, computed again\n")
+
+    from utilities.get_cmip6_data.prepare_data.extract_climatologies import (
+        create_climatology_dict,  # to create the climatology dictionary and save it
+    )
+
+    create_climatology_dict(
+        data_path=arguments.data_path,
+        data_folder_name=arguments.data_folder_name,
+        parent_path_for_save=dict_paths["climatologies"],
+        selected_case=arguments.case,
+        remove_ensembles=arguments.remove_ensembles,
+        verbose=arguments.verbose,
+        lat_domain=arguments.lat_domain and tuple(arguments.lat_domain),
+        lon_domain=arguments.lon_domain and tuple(arguments.lon_domain),
+        year_range=arguments.year_range and tuple(arguments.year_range),
+        use_reference_index=arguments.use_reference_index,
+        pipelined=arguments.download_queue > 0,
+        max_queued_entries=max(arguments.download_queue, 1),
+        use_async_transfer=arguments.use_async_transfer,
+        cache_budget=(
+            None if arguments.cache_budget is None else arguments.cache_budget * 1e9
+        ),
+        do_we_clear=(status == CLIMATOLOGY_OUTDATED),
+        delta=(status == CLIMATOLOGY_PARTIAL),
+        shard_index=arguments.shard_index or 0,
+        shard_count=arguments.shard_count,
+    )
+
+    write_run_parameters(dict_paths["shard_climatologies"], run_parameters)
+
+    return
+
+
+def run_aprp(arguments: argparse.Namespace, dict_paths: dict[str, str]):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the APRP outputs of every perturbed experiment of the case in parallel. The entries whose input climatologies
+    did not change since the last run are reused (see aprp_driver.py). A shard reads the climatologies it saved itself, which hold its entries.
+
+    ---
+
+    ### INPUTS ###
+
+    ARGUMENTS : ARGPARSE NAMESPACE | the options of the run
+
+    DICT_PATHS : DICT | the folders of the products
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    from utilities.tools_for_analysis.aprp_computation.aprp_driver import (
+        run_aprp_driver,  # APRP of every entry and experiment with a cache
+    )
+
+    ### ONE SAVE FOLDER PER PERTURBED EXPERIMENT ###
+
+    perturbed_experiments = [
+        experiment
+        for experiment in get_case_facets(arguments.case)["experiment_id"]
+        if experiment != arguments.control_experiment
+    ]
+
+    run_aprp_driver(
+        parent_path_clim=dict_paths["shard_climatologies"],
+        dict_save_paths={
+            experiment: os.path.join(dict_paths["aprp"], experiment)
+            for experiment in perturbed_experiments
+        },
+        n_workers=arguments.aprp_workers,
+        control_experiment=arguments.control_experiment,
+        shard_index=arguments.shard_index or 0,
+        shard_count=arguments.shard_count,
+    )
+
+    return
+
+
+def run_merge(arguments: argparse.Namespace, dict_paths: dict[str, str]):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function merges the climatologies and the APRP outputs of the shards into the tables read by the following stages.
+    Every shard must have finished (see merge_shard_manifests). The run parameters of the shards are saved with the merged climatologies.
+
+    ---
+
+    ### INPUTS ###
+
+    ARGUMENTS : ARGPARSE NAMESPACE | the options of the run
+
+    DICT_PATHS : DICT | the folders of the products
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    from utilities.get_cmip6_data.store_data.shard_manifest import (
+        merge_shard_manifests,  # to combine the tables of the shards
+        SHARDS_FOLDER_NAME,  # folder of the shards in a save folder
+    )
+
+    ### THE SAVE FOLDERS HOLDING SHARDS ###
+
+    list_save_paths = [dict_paths["climatologies"]]
+
+    if os.path.isdir(dict_paths["aprp"]):
+
+        list_save_paths += [
+            os.path.join(dict_paths["aprp"], experiment)
+            for experiment in sorted(os.listdir(dict_paths["aprp"]))
+        ]
+
+    for save_path in list_save_paths:
+
+        if os.path.isdir(os.path.join(save_path, SHARDS_FOLDER_NAME)):
+
+            merge_shard_manifests(save_path, arguments.shard_count)
+
+    ### THE MERGED CLIMATOLOGIES ARE THE ONES OF THE RUN ###
+
+    if os.path.isdir(os.path.join(dict_paths["climatologies"], SHARDS_FOLDER_NAME)):
+
+        merge_run_parameters(dict_paths["climatologies"], arguments.shard_count)
+
+    return
+
+
+def run_regrid(
+    arguments: argparse.Namespace, dict_paths: dict[str, str]
+) -> tuple[dict, str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function regrids the APRP outputs of the perturbed experiment on the common grid of the region and averages them over the year.
+    Both products are looked up in the artifact cache before being computed.
+
+    ---
+
+    ### INPUTS ###
+
+    ARGUMENTS : ARGPARSE NAMESPACE | the options of the run
+
+    DICT_PATHS : DICT | the folders of the products
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_TIME_MEAN : DICT OF XR DATASETS | the regridded annual maps of every entry
+
+    TIME_MEAN_KEY : STR | their key in the artifact cache
+
+    ---
+
+    """
+
+    from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+        netcdf_to_dict,  # to load the APRP outputs
+    )
+
+    from utilities.get_cmip6_data.store_data.grid_catalog import (
+        read_grid_catalog,  # grids recorded with the climatologies
+    )
+
+    from utilities.get_cmip6_data.store_data.artifact_cache import (
+        get_or_compute,  # to reload or compute the products
+    )
+
+    from utilities.tools_for_analysis.aprp_computation.aprp_vectorized import (
+        APRP_OUTPUT_FIELDS,  # fields produced by the method
+    )
+
+    from utilities.tools_for_analysis.regridding.regridding_methods import (
+        generate_the_common_coarse_grid_from_catalog,  # common grid from the catalog
+        regridding_a_dictionary,  # to regrid the aprp dictionary
+    )
+
+    from utilities.tools_for_analysis.statistical_tools.temporal_average import (
+        weighted_annual_mean_ensemble,  # annual mean of the whole ensemble
+    )
+
+    lat_domain = arguments.lat_domain and tuple(arguments.lat_domain)
+
+    ### THE APRP OUTPUTS AND THE COMMON GRID ###
+
+    dict_aprp = netcdf_to_dict(
+        os.path.join(dict_paths["aprp"], arguments.perturbed_experiment)
+    )
+
+    common_coarse_grid = generate_the_common_coarse_grid_from_catalog(
+        read_grid_catalog(dict_paths["climatologies"]),
+        lat_domain=lat_domain or (-90.0, 90.0),
+    )
+
+    ### REGRID THEN AVERAGE OVER THE YEAR ###
+
+    dict_regridded, _ = get_or_compute(
+        cache_root=dict_paths["artifact_cache"],
+        stage="regridding",
+        function=regridding_a_dictionary,
+        parameters={
+            "dictionary_to_be_regridded": dict_aprp,
+            "fields_to_be_regridded": APRP_OUTPUT_FIELDS,
+            "output_grid": common_coarse_grid,
+            "tool": arguments.regridding_tool,
+            "lat_domain": lat_domain,
+        },
+    )
+
+    dict_time_mean, time_mean_key = get_or_compute(
+        cache_root=dict_paths["artifact_cache"],
+        stage="time_mean",
+        function=weighted_annual_mean_ensemble,
+        parameters={"dict_datasets": dict_regridded, "fields": APRP_OUTPUT_FIELDS},
+    )
+
+    return (dict_time_mean, time_mean_key)
+
+
+def run_tables(
+    arguments: argparse.Namespace,
+    dict_paths: dict[str, str],
+    dict_time_mean: dict,
+    time_mean_key: str,
+) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function writes the table of Zelinka and al. (2023) for the region as a csv file named after the key of the annual maps and the region,
+    unless it was already written.
+
+    ---
+
+    ### INPUTS ###
+
+    ARGUMENTS : ARGPARSE NAMESPACE | the options of the run
+
+    DICT_PATHS : DICT | the folders of the products
+
+    DICT_TIME_MEAN : DICT OF XR DATASETS | the regridded annual maps of every entry
+
+    TIME_MEAN_KEY : STR | their key in the artifact cache
+
+    ---
+
+    ### OUTPUTS ###
+
+    TABLE_PATH : STR | the path of the csv file
+
+    ---
+
+    """
+
+    lat_domain = tuple(arguments.lat_domain or (-90.0, 90.0))
+
+    table_path = os.path.join(
+        dict_paths["tables"],
+        "table_{}_{:g}_{:g}_{}.csv".format(
+            arguments.perturbed_experiment, *lat_domain, time_mean_key[:16]
+        ),
+    )
+
+    if os.path.exists(table_path):
+
+        print("tables : {} is up to date, skipped\n".format(table_path))
+
+        return table_path
+
+    from utilities.representing_data.generate_tables import (
+        make_full_table,  # table of Zelinka and al. (2023)
+    )
+
+    full_table = make_full_table(
+        dataset_dictionary={
+            key: dataset.sel(lat=slice(*lat_domain))
+            for key, dataset in dict_time_mean.items()
+        }
+    )
+
+    os.makedirs(dict_paths["tables"], exist_ok=True)
+
+    full_table.to_csv(table_path)
+
+    print("tables : written at {}\n".format(table_path))
+
+    return table_path
+
+
+###############################
+### RUN THE SELECTED STAGES ###
+###############################
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function runs the selected stages of the pipeline with the options of the command line.
+
+    ---
+
+    ### INPUTS ###
+
+    ARGV : LIST[STR] | the options of the command line : default is none (sys.argv)
+
+    ---
+
+    ### OUTPUTS ###
+
+    EXIT_CODE : INT | 0 if every stage succeeded
+
+    ---
+
+    """
+
+    parser = build_parser()
+
+    arguments = parser.parse_args(argv)
+
+    ## The task of a stepped or sparse job array does not know its shard ##
+
+    if "SLURM_ARRAY_TASK_ID" in os.environ and (
+        arguments.shard_index is None or arguments.shard_count is None
+    ):
+
+        parser.error(
+            "the SLURM job array is not contiguous : give --shard-index and --shard-count"
+        )
+
+    stages = select_shard_stages(
+        select_stages(arguments.stages), arguments.shard_index, arguments.shard_count
+    )
+
+    dict_paths = get_product_paths(arguments)
+
+    print("Stages to run : {}\n".format(" -> ".join(stages)))
+
+    ### THE STAGES PRODUCING FILES ###
+
+    for stage, run_stage in [
+        ("load", run_load),
+        ("climatology", run_climatology),
+        ("aprp", run_aprp),
+        ("merge", run_merge),
+    ]:
+
+        if stage in stages:
+
+            run_stage(arguments, dict_paths)
+
+    ### THE STAGES OF THE ARTIFACT CACHE ###
+
+    if "regrid" in stages or "tables" in stages:
+
+        dict_time_mean, time_mean_key = run_regrid(arguments, dict_paths)
+
+        if "tables" in stages:
+
+            run_tables(arguments, dict_paths, dict_time_mean, time_mean_key)
+
+    return 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
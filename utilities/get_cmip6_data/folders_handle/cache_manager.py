@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+
+"""
+This script keeps the local cache of the raw CMIP6 files under a budget of bytes. Every time raw files are opened their access is written
+in a log saved in the download folder. When the cache is over its budget, the raw files used the longest time ago are removed first,
+except the ones whose climatology is missing or older than them : they are still needed. A removed file is downloaded again by intake-esgf
+or by the transfer engine the next time it is asked for.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the files
+
+import json  # to save the access log
+
+import time  # to date the accesses
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd  # to handle the table of the cached files
+
+###############################
+### PARAMETERS OF THE CACHE ###
+###############################
+
+ACCESS_LOG_FILE_NAME = "cache_access_log.json"  # saved in the download folder
+
+RAW_FILE_EXTENSION = ".nc"  # only the complete netcdf files are counted
+
+## Root of the DRS path of the raw files and tables whose files are never protected (ex: areacella) ##
+
+DRS_ROOT = "CMIP6"
+
+UNPROTECTED_TABLES = ["fx"]
+
+######################
+### THE ACCESS LOG ###
+######################
+
+
+def read_access_log(downloading_path: str) -> dict[str, float]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the access log of the download folder.
+
+    ---
+
+    ### INPUTS ###
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    ---
+
+    ### OUTPUTS ###
+
+    ACCESS_LOG : DICT | the time of the last access of every file, by its path relative to the download folder
+
+    ---
+
+    """
+
+    log_path = os.path.join(downloading_path, ACCESS_LOG_FILE_NAME)
+
+    if not os.path.exists(log_path):
+
+        return {}
+
+    with open(log_path, "r") as file:
+
+        access_log = json.load(file)
+
+    return access_log
+
+
+def write_access_log(access_log: dict[str, float], downloading_path: str):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function saves the access log in the download folder.
+
+    ---
+
+    ### INPUTS ###
+
+    ACCESS_LOG : DICT | the time of the last access of every file, by its path relative to the download folder
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    with open(os.path.join(downloading_path, ACCESS_LOG_FILE_NAME), "w") as file:
+
+        json.dump(access_log, file, indent=1)
+
+    return
+
+
+def record_access(
+    downloading_path: str, paths: list[str], access_time: float | None = None
+):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function writes in the access log that some files of the download folder were just used.
+
+    ---
+
+    ### INPUTS ###
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    PATHS : LIST[STR] | the paths of the files
+
+    ACCESS_TIME : FLOAT | the time of the access : default is none (now)
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    if access_time is None:
+
+        access_time = time.time()
+
+    access_log = read_access_log(downloading_path)
+
+    for path in paths:
+
+        access_log[os.path.relpath(path, downloading_path)] = access_time
+
+    write_access_log(access_log, downloading_path)
+
+    return
+
+
+##############################
+### THE FILES OF THE CACHE ###
+##############################
+
+
+def get_climatology_key(relative_path: str) -> str | None:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the key of the climatology computed from a raw file from its DRS path :
+    CMIP6/activity/institution/source_id/experiment_id/member_id/table_id/variable_id/grid_label/version/file.nc
+
+    ---
+
+    ### INPUTS ###
+
+    RELATIVE_PATH : STR | the path of the raw file relative to the download folder
+
+    ---
+
+    ### OUTPUTS ###
+
+    CLIMATOLOGY_KEY : STR | source_id.member_id.grid_label.experiment_id : none if the path is not a DRS path or the table is never protected
+
+    ---
+
+    """
+
+    parts = relative_path.split(os.sep)
+
+    if DRS_ROOT not in parts or len(parts) - parts.index(DRS_ROOT) != 11:
+
+        return None
+
+    (
+        _,
+        _,
+        _,
+        source_id,
+        experiment_id,
+        member_id,
+        table_id,
+        _,
+        grid_label,
+        _,
+        _,
+    ) = parts[parts.index(DRS_ROOT) :]
+
+    if table_id in UNPROTECTED_TABLES:
+
+        return None
+
+    climatology_key = ".".join([source_id, member_id, grid_label, experiment_id])
+
+    return climatology_key
+
+
+def list_cached_files(
+    downloading_path: str, dict_climatology_paths: dict[str, str] | None = None
+) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function lists the raw files of the download folder with their size and their last access, taken from the access log
+    or from their modification time if they are not in it. A file is protected if its climatology is missing or older than the file.
+
+    ---
+
+    ### INPUTS ###
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    DICT_CLIMATOLOGY_PATHS : DICT | the path of the saved climatology of every key (ex: from the key paths table) : default is none (nothing protected)
+
+    ---
+
+    ### OUTPUTS ###
+
+    CACHED_FILES : PANDAS DATAFRAME | one row per file with the "path", "n_bytes", "last_access", "climatology_key" and "is_protected" columns,
+    from the least recently used
+
+    ---
+
+    """
+
+    access_log = read_access_log(downloading_path)
+
+    rows = []
+
+    ### GO THROUGH THE DOWNLOAD FOLDER ###
+
+    for folder, _, file_names in os.walk(downloading_path):
+
+        for file_name in file_names:
+
+            if not file_name.endswith(RAW_FILE_EXTENSION):
+
+                continue
+
+            path = os.path.join(folder, file_name)
+
+            relative_path = os.path.relpath(path, downloading_path)
+
+            stat = os.stat(path)
+
+            climatology_key = get_climatology_key(relative_path)
+
+            ## Is its climatology missing or older than the file ? ##
+
+            if dict_climatology_paths is None or climatology_key is None:
+
+                is_protected = False
+
+            else:
+
+                climatology_path = dict_climatology_paths.get(climatology_key)
+
+                is_protected = (
+                    climatology_path is None
+                    or not os.path.exists(climatology_path)
+                    or os.stat(climatology_path).st_mtime < stat.st_mtime
+                )
+
+            rows.append(
+                {
+                    "path": path,
+                    "n_bytes": stat.st_size,
+                    "last_access": access_log.get(relative_path, stat.st_mtime),
+                    "climatology_key": climatology_key,
+                    "is_protected": is_protected,
+                }
+            )
+
+    cached_files = (
+        pd.DataFrame(
+            rows,
+            columns=[
+                "path",
+                "n_bytes",
+                "last_access",
+                "climatology_key",
+                "is_protected",
+            ],
+        )
+        .sort_values("last_access", kind="stable")
+        .reset_index(drop=True)
+    )
+
+    return cached_files
+
+
+################################
+### KEEP THE CACHE IN BUDGET ###
+################################
+
+
+def enforce_cache_budget(
+    downloading_path: str,
+    byte_budget: float,
+    dict_climatology_paths: dict[str, str] | None = None,
+) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function removes the least recently used raw files of the download folder until the cache fits in its budget.
+    The protected files are never removed : the cache may stay over budget if they are enough to exceed it.
+
+    ---
+
+    ### INPUTS ###
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    BYTE_BUDGET : FLOAT | the maximum size of the raw files in bytes
+
+    DICT_CLIMATOLOGY_PATHS : DICT | the path of the saved climatology of every key : default is none (nothing protected)
+
+    ---
+
+    ### OUTPUTS ###
+
+    EVICTED_PATHS : LIST[STR] | the paths of the removed files
+
+    ---
+
+    """
+
+    ### CHECK THE BUDGET ###
+
+    if byte_budget < 0:
+
+        raise ValueError(
+            "{} -> The budget of the cache must be positive".format(byte_budget)
+        )
+
+    ### THE FILES FROM THE LEAST RECENTLY USED ###
+
+    cached_files = list_cached_files(downloading_path, dict_climatology_paths)
+
+    n_bytes_cached = cached_files["n_bytes"].sum()
+
+    ### REMOVE THEM UNTIL THE CACHE FITS ###
+
+    evicted_paths = []
+
+    for row in cached_files[~cached_files["is_protected"]].itertuples():
+
+        if n_bytes_cached <= byte_budget:
+
+            break
+
+        os.remove(row.path)
+
+        n_bytes_cached -= row.n_bytes
+
+        evicted_paths.append(row.path)
+
+    ## Forget them in the access log ##
+
+    if evicted_paths:
+
+        access_log = read_access_log(downloading_path)
+
+        for path in evicted_paths:
+
+            access_log.pop(os.path.relpath(path, downloading_path), None)
+
+        write_access_log(access_log, downloading_path)
+
+    print(
+        "{} raw files removed from the cache, {:.2f} GB left for a budget of {:.2f} GB\n".format(
+            len(evicted_paths), n_bytes_cached / 1e9, byte_budget / 1e9
+        )
+    )
+
+    return evicted_paths
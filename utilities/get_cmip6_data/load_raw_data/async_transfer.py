@@ -0,0 +1,1873 @@
+#!/usr/bin/env python3
+
+"""
+This script is an optional transfer engine for the raw CMIP6 files, used instead of the synchronous downloads of intake-esgf.
+The files of an entry are fetched at the same time with asyncio :
+
+- the connections to every data node are kept alive and reused from one file to the next ;
+- the number of simultaneous transfers is limited per data node ;
+- a file is first written with a .part suffix : an interrupted transfer is resumed with an HTTP range request instead of starting over ;
+- the number of bytes, the transfer time, the latency and the errors are counted per data node ;
+- a file may be given several replicas : a transfer slower than a threshold is stopped and resumed from the next replica,
+and the replicas can be raced with a small range request before the transfer ;
+- a chunked answer is decoded, a redirection to another url is followed up to MAX_REDIRECTS times,
+and a file given the checksum of its index record is checked before it gets its final name.
+
+Only the standard library is used : the HTTP/1.1 requests are written on asyncio streams.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### ASYNCHRONOUS TRANSFERS ###
+
+import asyncio  # to run the transfers at the same time
+
+import ssl  # for the https data nodes
+
+import threading  # to run the event loop apart from a jupyter one
+
+import time  # to measure the throughput
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the files
+
+import hashlib  # to check the files against their checksum
+
+from urllib.parse import (
+    urljoin,
+    urlsplit,
+)  # to split the urls and follow the redirections
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.folders_handle.create import (
+    create_dir,  # to create the folders of the files
+)
+
+################################
+### PARAMETERS OF THE ENGINE ###
+################################
+
+PART_SUFFIX = ".part"  # suffix of the files being downloaded
+
+DEFAULT_CHUNK_SIZE = 2**20  # bytes read at once from a connection
+
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 4  # simultaneous transfers per data node
+
+DEFAULT_N_RETRIES = 3  # new attempts after a failed transfer
+
+THROUGHPUT_GRACE_SECONDS = 2.0  # time before the throughput of a transfer is checked
+
+PROBE_SIZE = 2**16  # bytes asked to every replica when they are raced
+
+MAX_REDIRECTS = 5  # redirections followed for a single file
+
+REDIRECT_STATUSES = (
+    301,
+    302,
+    303,
+    307,
+    308,
+)  # HTTP status of a file moved to another url
+
+## Root of the DRS path in the urls of the data nodes ##
+
+DRS_ROOT = "CMIP6"
+
+#############################
+#### DEFINE CUSTOM ERRORS ###
+#############################
+
+
+class SlowTransfer(ConnectionError):
+
+    ### DEFINING THE EXCEPTION PROPERTIES ###
+
+    def __init__(
+        self,
+        url,
+        throughput,
+        n_bytes=0,
+        error_msg="The throughput of the transfer fell under the threshold",
+    ):
+        self.url = url
+        self.throughput = throughput
+        self.n_bytes = n_bytes  # bytes written before the transfer was stopped
+        self.error_msg = error_msg
+        super().__init__(self.error_msg)  # calling the exception parent class
+
+    ### DEFINING THE ERROR MESSAGE ###
+
+    def __str__(self):  # what happens when printing the error
+        return f"{self.url} -> {self.error_msg} ({self.throughput:.0f} B/s)"
+
+
+class Redirection(Exception):
+
+    ### DEFINING THE EXCEPTION PROPERTIES ###
+
+    def __init__(
+        self,
+        url,
+        location,
+        error_msg="The file was moved to another url",
+    ):
+        self.url = url
+        self.location = location  # absolute url given by the data node
+        self.error_msg = error_msg
+        super().__init__(self.error_msg)  # calling the exception parent class
+
+    ### DEFINING THE ERROR MESSAGE ###
+
+    def __str__(self):  # what happens when printing the error
+        return f"{self.url} -> {self.error_msg} ({self.location})"
+
+
+#####################################
+### STATISTICS OF EVERY DATA NODE ###
+#####################################
+
+
+def get_host_key(url: str) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the name of the data node of an url, under the form host:port.
+
+    ---
+
+    ### INPUTS ###
+
+    URL : STR | the url of a file
+
+    ---
+
+    ### OUTPUTS ###
+
+    HOST_KEY : STR | the data node
+
+    ---
+
+    """
+
+    split_url = urlsplit(url)
+
+    port = split_url.port or (443 if split_url.scheme == "https" else 80)
+
+    host_key = "{}:{}".format(split_url.hostname, port)
+
+    return host_key
+
+
+def init_host_statistics() -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function initializes the counters of a data node.
+
+    ---
+
+    ### INPUTS ###
+
+    nothing.
+
+    ---
+
+    ### OUTPUTS ###
+
+    HOST_STATISTICS : DICT | the number of requests, files, bytes, errors and transfers stopped for being too slow,
+    the time spent transferring and waiting for the first answers
+
+    ---
+
+    """
+
+    host_statistics = {
+        "n_requests": 0,
+        "n_files": 0,
+        "n_bytes": 0,
+        "n_errors": 0,
+        "n_slow": 0,
+        "transfer_seconds": 0.0,
+        "latency_seconds": 0.0,
+    }
+
+    return host_statistics
+
+
+def get_throughput(host_statistics: dict) -> float:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the mean throughput of a data node from its counters.
+
+    ---
+
+    ### INPUTS ###
+
+    HOST_STATISTICS : DICT | the counters of the data node
+
+    ---
+
+    ### OUTPUTS ###
+
+    THROUGHPUT : FLOAT | bytes per second, 0 if nothing was transferred
+
+    ---
+
+    """
+
+    if host_statistics["transfer_seconds"] <= 0.0:
+
+        return 0.0
+
+    throughput = host_statistics["n_bytes"] / host_statistics["transfer_seconds"]
+
+    return throughput
+
+
+def get_latency(host_statistics: dict) -> float:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the mean time a data node takes to answer a request.
+
+    ---
+
+    ### INPUTS ###
+
+    HOST_STATISTICS : DICT | the counters of the data node
+
+    ---
+
+    ### OUTPUTS ###
+
+    LATENCY : FLOAT | seconds, 0 if no request was answered
+
+    ---
+
+    """
+
+    if host_statistics["n_requests"] == 0:
+
+        return 0.0
+
+    latency = host_statistics["latency_seconds"] / host_statistics["n_requests"]
+
+    return latency
+
+
+##########################################
+### POOL OF CONNECTIONS TO A DATA NODE ###
+##########################################
+
+
+class HostConnectionPool:
+    """
+    Keep-alive connections to a single data node. At most max_connections transfers use the node at the same time,
+    and the connection of a finished transfer is given to the next one.
+    """
+
+    def __init__(self, url: str, max_connections: int):
+
+        ### CHECK THE NUMBER OF CONNECTIONS ###
+
+        if max_connections < 1:
+
+            raise ValueError(
+                "{} -> At least one connection per data node is needed".format(
+                    max_connections
+                )
+            )
+
+        ### THE DATA NODE ###
+
+        split_url = urlsplit(url)
+
+        self.host = split_url.hostname
+
+        self.use_ssl = split_url.scheme == "https"
+
+        self.port = split_url.port or (443 if self.use_ssl else 80)
+
+        ### THE CONNECTIONS ###
+
+        self.max_connections = max_connections
+
+        self.semaphore = asyncio.Semaphore(max_connections)
+
+        self.idle_connections = []
+
+        self.n_opened_connections = 0
+
+    async def get_connection(self) -> tuple:
+
+        ## Reuse an idle connection if any ##
+
+        if self.idle_connections:
+
+            return self.idle_connections.pop()
+
+        ## Otherwise open a new one ##
+
+        connection = await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=ssl.create_default_context() if self.use_ssl else None,
+        )
+
+        self.n_opened_connections += 1
+
+        return connection
+
+    def release_connection(self, connection: tuple, reusable: bool):
+
+        ## Keep it for the next transfer ##
+
+        if reusable:
+
+            self.idle_connections.append(connection)
+
+        ## Or close it ##
+
+        else:
+
+            connection[1].close()
+
+    async def close(self):
+
+        for _, writer in self.idle_connections:
+
+            writer.close()
+
+            try:
+
+                await writer.wait_closed()
+
+            except OSError:
+
+                pass
+
+        self.idle_connections = []
+
+
+########################################
+### HTTP REQUESTS ON ASYNCIO STREAMS ###
+########################################
+
+
+async def read_response_head(reader: asyncio.StreamReader) -> tuple[int, dict]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the status line and the headers of an HTTP answer.
+
+    ---
+
+    ### INPUTS ###
+
+    READER : ASYNCIO STREAM READER | the reading side of the connection
+
+    ---
+
+    ### OUTPUTS ###
+
+    STATUS : INT | the HTTP status code
+
+    HEADERS : DICT | the headers, with lower case names
+
+    ---
+
+    """
+
+    ### STATUS LINE ###
+
+    status_line = await reader.readline()
+
+    ## A kept-alive connection may have been closed by the data node ##
+
+    if not status_line:
+
+        raise ConnectionError("The connection was closed by the data node")
+
+    status = int(status_line.split()[1])
+
+    ### HEADERS ###
+
+    headers = {}
+
+    while True:
+
+        line = await reader.readline()
+
+        if line in (b"\r\n", b"\n", b""):
+
+            break
+
+        name, _, value = line.decode("latin-1").partition(":")
+
+        headers[name.strip().lower()] = value.strip()
+
+    return status, headers
+
+
+async def send_request(
+    writer: asyncio.StreamWriter,
+    host: str,
+    url: str,
+    byte_range: str | None = None,
+    method: str = "GET",
+):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function sends a request keeping the connection alive, for a range of bytes of the file if one is given.
+
+    ---
+
+    ### INPUTS ###
+
+    WRITER : ASYNCIO STREAM WRITER | the writing side of the connection
+
+    HOST : STR | the data node
+
+    URL : STR | the url of the file
+
+    BYTE_RANGE : STR | the range of bytes under the form "start-" or "start-end" : default is none (the whole file)
+
+    METHOD : STR | the HTTP method, "GET" or "HEAD" : default is "GET"
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    split_url = urlsplit(url)
+
+    request_path = split_url.path + ("?" + split_url.query if split_url.query else "")
+
+    request = "{} {} HTTP/1.1\r\nHost: {}\r\nConnection: keep-alive\r\n".format(
+        method, request_path, host
+    )
+
+    if byte_range is not None:
+
+        request += "Range: bytes={}\r\n".format(byte_range)
+
+    writer.write((request + "\r\n").encode("latin-1"))
+
+    await writer.drain()
+
+    return
+
+
+async def read_chunked_piece(
+    reader: asyncio.StreamReader, chunk_state: dict, chunk_size: int
+) -> bytes:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the next piece of a body sent with "Transfer-Encoding: chunked". Every chunk starts with its size in hexadecimal
+    on its own line and ends with a line break, and the last chunk has a size of zero and is followed by the trailers.
+
+    ---
+
+    ### INPUTS ###
+
+    READER : ASYNCIO STREAM READER | the reading side of the connection
+
+    CHUNK_STATE : DICT | the bytes left in the current chunk ("left") and whether the last chunk was read ("complete"), updated in place
+
+    CHUNK_SIZE : INT | the bytes read at once at most
+
+    ---
+
+    ### OUTPUTS ###
+
+    PIECE : BYTES | the next bytes of the body, empty at the end of the body or of the connection
+
+    ---
+
+    """
+
+    ### START OF A NEW CHUNK ###
+
+    if chunk_state["left"] == 0:
+
+        size_line = await reader.readline()
+
+        if not size_line:
+
+            return b""
+
+        chunk_state["left"] = int(size_line.split(b";")[0].strip(), 16)
+
+        ## The last chunk is followed by the trailers ##
+
+        if chunk_state["left"] == 0:
+
+            while await reader.readline() not in (b"\r\n", b"\n", b""):
+
+                pass
+
+            chunk_state["complete"] = True
+
+            return b""
+
+    ### DATA OF THE CHUNK ###
+
+    piece = await reader.read(min(chunk_size, chunk_state["left"]))
+
+    chunk_state["left"] -= len(piece)
+
+    ## The data of a chunk ends with a line break ##
+
+    if piece and chunk_state["left"] == 0:
+
+        await reader.readline()
+
+    return piece
+
+
+async def copy_body(
+    reader: asyncio.StreamReader,
+    file_path: str,
+    mode: str,
+    content_length: int | None,
+    chunk_size: int,
+    min_throughput: float | None = None,
+    grace_seconds: float = THROUGHPUT_GRACE_SECONDS,
+    chunked: bool = False,
+) -> int:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function writes the body of an HTTP answer to a file, chunk by chunk. The body is read up to its content length if it is given,
+    up to its last chunk if it is chunked (see read_chunked_piece), otherwise until the data node closes the connection.
+    With a minimum throughput, the transfer is stopped if it is slower once grace_seconds have passed.
+
+    ---
+
+    ### INPUTS ###
+
+    READER : ASYNCIO STREAM READER | the reading side of the connection
+
+    FILE_PATH : STR | the file to write
+
+    MODE : STR | "wb" to start the file over, "ab" to append to it
+
+    CONTENT_LENGTH : INT | the size of the body : none if unknown
+
+    CHUNK_SIZE : INT | the bytes read at once
+
+    MIN_THROUGHPUT : FLOAT | bytes per second under which the transfer is stopped : default is none (never stopped)
+
+    GRACE_SECONDS : FLOAT | time before the throughput is checked : default is THROUGHPUT_GRACE_SECONDS
+
+    CHUNKED : BOOL | is the body sent with "Transfer-Encoding: chunked" ? : default is False
+
+    ---
+
+    ### OUTPUTS ###
+
+    N_BYTES : INT | the number of bytes written
+
+    ---
+
+    """
+
+    n_bytes = 0
+
+    chunk_state = {"left": 0, "complete": False}
+
+    start_time = time.perf_counter()
+
+    with open(file_path, mode) as file:
+
+        while content_length is None or n_bytes < content_length:
+
+            size = (
+                chunk_size
+                if content_length is None
+                else min(chunk_size, content_length - n_bytes)
+            )
+
+            ## A data node which stops sending is too slow as well ##
+
+            try:
+
+                chunk = await asyncio.wait_for(
+                    (
+                        read_chunked_piece(reader, chunk_state, chunk_size)
+                        if chunked
+                        else reader.read(size)
+                    ),
+                    timeout=None if min_throughput is None else grace_seconds,
+                )
+
+            except asyncio.TimeoutError:
+
+                raise SlowTransfer(
+                    file_path,
+                    n_bytes / (time.perf_counter() - start_time),
+                    n_bytes=n_bytes,
+                )
+
+            ## End of the connection ##
+
+            if not chunk:
+
+                break
+
+            file.write(chunk)
+
+            n_bytes += len(chunk)
+
+            ## Is the transfer too slow ? ##
+
+            elapsed_seconds = time.perf_counter() - start_time
+
+            if (
+                min_throughput is not None
+                and elapsed_seconds > grace_seconds
+                and n_bytes / elapsed_seconds < min_throughput
+            ):
+
+                raise SlowTransfer(
+                    file_path, n_bytes / elapsed_seconds, n_bytes=n_bytes
+                )
+
+    ## An interrupted body is kept in the file to be resumed ##
+
+    if (content_length is not None and n_bytes < content_length) or (
+        chunked and not chunk_state["complete"]
+    ):
+
+        raise ConnectionError(
+            "{} -> The transfer was interrupted after {} of {} bytes".format(
+                file_path, n_bytes, content_length
+            )
+        )
+
+    return n_bytes
+
+
+#########################
+### TRANSFER ONE FILE ###
+#########################
+
+
+def get_file_checksum(
+    file_path: str, checksum_type: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the checksum of a file, read chunk by chunk.
+
+    ---
+
+    ### INPUTS ###
+
+    FILE_PATH : STR | the file to check
+
+    CHECKSUM_TYPE : STR | the hash algorithm given by the index record (ex: "SHA256", "MD5")
+
+    CHUNK_SIZE : INT | the bytes read at once : default is DEFAULT_CHUNK_SIZE
+
+    ---
+
+    ### OUTPUTS ###
+
+    CHECKSUM : STR | the hexadecimal checksum of the file
+
+    ---
+
+    """
+
+    file_hash = hashlib.new(checksum_type.lower())
+
+    with open(file_path, "rb") as file:
+
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+
+            file_hash.update(chunk)
+
+    checksum = file_hash.hexdigest()
+
+    return checksum
+
+
+def get_range_start(content_range: str) -> int | None:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the first byte of the range answered by a data node in the Content-Range header of a 206 answer.
+
+    ---
+
+    ### INPUTS ###
+
+    CONTENT_RANGE : STR | the Content-Range header (ex: bytes 1000-49999/50000)
+
+    ---
+
+    ### OUTPUTS ###
+
+    RANGE_START : INT | the first byte of the range, none if the header cannot be read
+
+    ---
+
+    """
+
+    unit, _, byte_range = content_range.strip().partition(" ")
+
+    first_byte = byte_range.split("-")[0]
+
+    if unit.lower() != "bytes" or not first_byte.isdigit():
+
+        return None
+
+    range_start = int(first_byte)
+
+    return range_start
+
+
+async def transfer_file(
+    pool: HostConnectionPool,
+    url: str,
+    local_path: str,
+    host_statistics: dict,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    min_throughput: float | None = None,
+    grace_seconds: float = THROUGHPUT_GRACE_SECONDS,
+    checksum: tuple[str, str] | None = None,
+):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function makes one attempt at downloading a file. If a part of the file is already on disk, only the rest is asked with a range request.
+    The answered range is appended to the part file only if it starts where the part file ends : a range starting at the first byte overwrites it,
+    any other range removes it and raises ConnectionError so that the next attempt downloads the whole file.
+    The file gets its final name once it is complete and, with a checksum, once it matches it : a file which does not is removed and ConnectionError is raised.
+    A data node answering with a redirection raises Redirection with the new url, nothing is written.
+
+    ---
+
+    ### INPUTS ###
+
+    POOL : HOSTCONNECTIONPOOL | the connections to the data node of the file
+
+    URL : STR | the url of the file
+
+    LOCAL_PATH : STR | where to save the file
+
+    HOST_STATISTICS : DICT | the counters of the data node, updated in place
+
+    CHUNK_SIZE : INT | the bytes read at once : default is DEFAULT_CHUNK_SIZE
+
+    MIN_THROUGHPUT : FLOAT | bytes per second under which the transfer is stopped : default is none (never stopped)
+
+    GRACE_SECONDS : FLOAT | time before the throughput is checked : default is THROUGHPUT_GRACE_SECONDS
+
+    CHECKSUM : TUPLE[STR, STR] | the type and value of the checksum of the file : default is none (not checked)
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    part_path = local_path + PART_SUFFIX
+
+    redirect_url = None
+
+    async with pool.semaphore:
+
+        ### WHERE TO START FROM ###
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        ### SEND THE REQUEST ###
+
+        reader, writer = await pool.get_connection()
+
+        reusable = False
+
+        n_bytes = 0
+
+        start_time = time.perf_counter()
+
+        try:
+
+            await send_request(
+                writer,
+                pool.host,
+                url,
+                byte_range="{}-".format(offset) if offset > 0 else None,
+            )
+
+            status, headers = await read_response_head(reader)
+
+            host_statistics["n_requests"] += 1
+
+            host_statistics["latency_seconds"] += time.perf_counter() - start_time
+
+            chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+
+            content_length = (
+                int(headers["content-length"])
+                if "content-length" in headers and not chunked
+                else None
+            )
+
+            ### THE WHOLE FILE ###
+
+            if status == 200:
+
+                mode = "wb"
+
+            ## The rest of the file, or the whole file written again ##
+
+            elif status == 206:
+
+                range_start = get_range_start(headers.get("content-range", ""))
+
+                if range_start == offset:
+
+                    mode = "ab"
+
+                elif range_start == 0:
+
+                    mode = "wb"
+
+                else:
+
+                    if os.path.exists(part_path):
+
+                        os.remove(part_path)
+
+                    raise ConnectionError(
+                        "{} -> The range answered does not start at byte {}".format(
+                            url, offset
+                        )
+                    )
+
+            ## Nothing left to download ##
+
+            elif status == 416 and headers.get("content-range", "").endswith(
+                "/{}".format(offset)
+            ):
+
+                mode = None
+
+            ## Moved to another url ##
+
+            elif status in REDIRECT_STATUSES and "location" in headers:
+
+                mode = None
+
+                redirect_url = urljoin(url, headers["location"])
+
+            else:
+
+                raise ConnectionError("{} -> HTTP status {}".format(url, status))
+
+            ### WRITE THE BODY ###
+
+            if mode is not None:
+
+                n_bytes = await copy_body(
+                    reader,
+                    part_path,
+                    mode,
+                    content_length,
+                    chunk_size,
+                    min_throughput=min_throughput,
+                    grace_seconds=grace_seconds,
+                    chunked=chunked,
+                )
+
+            ## A body left unread closes the connection ##
+
+            elif not chunked:
+
+                await reader.readexactly(content_length or 0)
+
+            ## The connection can serve the next file ##
+
+            reusable = (
+                content_length is not None or (chunked and mode is not None)
+            ) and headers.get("connection", "").lower() != "close"
+
+        ## The bytes written before a too slow transfer was stopped are counted ##
+
+        except SlowTransfer as error:
+
+            n_bytes = error.n_bytes
+
+            host_statistics["n_slow"] += 1
+
+            raise error
+
+        ## Update the counters in every case ##
+
+        finally:
+
+            pool.release_connection((reader, writer), reusable)
+
+            host_statistics["transfer_seconds"] += time.perf_counter() - start_time
+
+            host_statistics["n_bytes"] += n_bytes
+
+    ### THE FILE WAS MOVED ###
+
+    if redirect_url is not None:
+
+        raise Redirection(url, redirect_url)
+
+    ### CHECK THE FILE AGAINST ITS INDEX RECORD ###
+
+    if checksum is not None:
+
+        checksum_type, expected_checksum = checksum
+
+        file_checksum = await asyncio.to_thread(
+            get_file_checksum, part_path, checksum_type, chunk_size
+        )
+
+        ## A corrupted file is downloaded again from the start ##
+
+        if file_checksum != expected_checksum.lower():
+
+            os.remove(part_path)
+
+            raise ConnectionError(
+                "{} -> The {} checksum of the file does not match its index record".format(
+                    url, checksum_type
+                )
+            )
+
+    ### THE FILE IS COMPLETE ###
+
+    os.replace(part_path, local_path)
+
+    host_statistics["n_files"] += 1
+
+    return
+
+
+async def follow_redirections(
+    dict_pools: dict[str, HostConnectionPool],
+    url: str,
+    local_path: str,
+    dict_statistics: dict[str, dict],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    min_throughput: float | None = None,
+    grace_seconds: float = THROUGHPUT_GRACE_SECONDS,
+    checksum: tuple[str, str] | None = None,
+    max_redirects: int = MAX_REDIRECTS,
+):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function makes one attempt at downloading a file (see transfer_file), following the redirections of the data nodes up to max_redirects times.
+    A data node reached through a redirection gets its own pool of connections, as large as the one of the first url, and its own counters.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_POOLS : DICT | the pool of connections of every data node, updated in place
+
+    URL : STR | the url of the file
+
+    LOCAL_PATH : STR | where to save the file
+
+    DICT_STATISTICS : DICT | the counters of every data node, updated in place
+
+    CHUNK_SIZE : INT | the bytes read at once : default is DEFAULT_CHUNK_SIZE
+
+    MIN_THROUGHPUT : FLOAT | bytes per second under which the transfer is stopped : default is none (never stopped)
+
+    GRACE_SECONDS : FLOAT | time before the throughput is checked : default is THROUGHPUT_GRACE_SECONDS
+
+    CHECKSUM : TUPLE[STR, STR] | the type and value of the checksum of the file : default is none (not checked)
+
+    MAX_REDIRECTS : INT | redirections followed before giving up : default is MAX_REDIRECTS
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    max_connections = dict_pools[get_host_key(url)].max_connections
+
+    for n_redirects in range(max_redirects + 1):
+
+        host_key = get_host_key(url)
+
+        ## A data node seen for the first time ##
+
+        if host_key not in dict_pools:
+
+            dict_pools[host_key] = HostConnectionPool(url, max_connections)
+
+            dict_statistics[host_key] = init_host_statistics()
+
+        try:
+
+            await transfer_file(
+                dict_pools[host_key],
+                url,
+                local_path,
+                dict_statistics[host_key],
+                chunk_size=chunk_size,
+                min_throughput=min_throughput,
+                grace_seconds=grace_seconds,
+                checksum=checksum,
+            )
+
+            return
+
+        except Redirection as redirection:
+
+            url = redirection.location
+
+    raise ConnectionError(
+        "{} -> More than {} redirections were met".format(url, max_redirects)
+    )
+
+
+async def download_one_file(
+    dict_pools: dict[str, HostConnectionPool],
+    urls: list[str],
+    local_path: str,
+    dict_statistics: dict[str, dict],
+    n_retries: int = DEFAULT_N_RETRIES,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    min_throughput: float | None = None,
+    grace_seconds: float = THROUGHPUT_GRACE_SECONDS,
+    race: bool = False,
+    checksum: tuple[str, str] | None = None,
+):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function downloads a file if it is not already on disk, from its replicas taken in order. A replica gets n_retries new attempts if the transfer fails,
+    every attempt resuming the transfer where the previous one stopped, before the next replica is used. A transfer slower than min_throughput
+    is resumed from the next replica straight away (the last replica is never stopped for being slow). The redirections are followed (see follow_redirections)
+    and a file not matching its checksum counts as a failed attempt.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_POOLS : DICT | the pool of connections of every data node
+
+    URLS : LIST[STR] | the urls of the replicas of the file, the preferred first
+
+    LOCAL_PATH : STR | where to save the file
+
+    DICT_STATISTICS : DICT | the counters of every data node, updated in place
+
+    N_RETRIES : INT | number of new attempts per replica : default is DEFAULT_N_RETRIES
+
+    CHUNK_SIZE : INT | the bytes read at once : default is DEFAULT_CHUNK_SIZE
+
+    MIN_THROUGHPUT : FLOAT | bytes per second under which a replica is left : default is none (never left for being slow)
+
+    GRACE_SECONDS : FLOAT | time before the throughput is checked : default is THROUGHPUT_GRACE_SECONDS
+
+    RACE : BOOL | do we race the replicas first (see race_replicas) ? : default is False
+
+    CHECKSUM : TUPLE[STR, STR] | the type and value of the checksum of the file : default is none (not checked)
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    ### ALREADY DOWNLOADED ###
+
+    if os.path.exists(local_path):
+
+        return
+
+    ### CHECK THE REPLICAS ###
+
+    if len(urls) == 0:
+
+        raise ValueError("{} -> No url was given for this file".format(local_path))
+
+    create_dir(parent_path=os.path.dirname(local_path), name="", clear=False)
+
+    ### RACE THE REPLICAS ###
+
+    if race and len(urls) > 1:
+
+        urls = await race_replicas(dict_pools, urls, dict_statistics)
+
+    ### GO THROUGH THE REPLICAS ###
+
+    for ii, url in enumerate(urls):
+
+        host_key = get_host_key(url)
+
+        is_last_replica = ii == len(urls) - 1
+
+        for attempt in range(n_retries + 1):
+
+            try:
+
+                await follow_redirections(
+                    dict_pools,
+                    url,
+                    local_path,
+                    dict_statistics,
+                    chunk_size=chunk_size,
+                    min_throughput=None if is_last_replica else min_throughput,
+                    grace_seconds=grace_seconds,
+                    checksum=checksum,
+                )
+
+                return
+
+            ## Too slow : resume from the next replica ##
+
+            except SlowTransfer as error:
+
+                last_error = error
+
+                break
+
+            ## Failed : try again ##
+
+            except (OSError, asyncio.IncompleteReadError) as error:
+
+                dict_statistics[host_key]["n_errors"] += 1
+
+                last_error = error
+
+    raise last_error
+
+
+##########################
+### RACE SOME REPLICAS ###
+##########################
+
+
+async def probe_replica(
+    pool: HostConnectionPool, url: str, host_statistics: dict
+) -> float:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function asks the first PROBE_SIZE bytes of a file to a replica and measures how long they take to arrive.
+
+    ---
+
+    ### INPUTS ###
+
+    POOL : HOSTCONNECTIONPOOL | the connections to the data node of the replica
+
+    URL : STR | the url of the replica
+
+    HOST_STATISTICS : DICT | the counters of the data node, updated in place
+
+    ---
+
+    ### OUTPUTS ###
+
+    ELAPSED_SECONDS : FLOAT | the time taken by the answer
+
+    ---
+
+    """
+
+    async with pool.semaphore:
+
+        reader, writer = await pool.get_connection()
+
+        reusable = False
+
+        start_time = time.perf_counter()
+
+        try:
+
+            await send_request(
+                writer, pool.host, url, byte_range="0-{}".format(PROBE_SIZE - 1)
+            )
+
+            status, headers = await read_response_head(reader)
+
+            host_statistics["n_requests"] += 1
+
+            host_statistics["latency_seconds"] += time.perf_counter() - start_time
+
+            if status not in (200, 206) or "content-length" not in headers:
+
+                raise ConnectionError("{} -> HTTP status {}".format(url, status))
+
+            ## A data node ignoring the range sends the whole file : it is not read ##
+
+            if status == 200:
+
+                await reader.read(PROBE_SIZE)
+
+            else:
+
+                await reader.readexactly(int(headers["content-length"]))
+
+                reusable = headers.get("connection", "").lower() != "close"
+
+        finally:
+
+            pool.release_connection((reader, writer), reusable)
+
+    elapsed_seconds = time.perf_counter() - start_time
+
+    return elapsed_seconds
+
+
+async def race_replicas(
+    dict_pools: dict[str, HostConnectionPool],
+    urls: list[str],
+    dict_statistics: dict[str, dict],
+) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function probes every replica of a file at the same time and sorts them from the fastest to answer to the slowest.
+    The replicas which failed to answer come last, in their original order.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_POOLS : DICT | the pool of connections of every data node
+
+    URLS : LIST[STR] | the urls of the replicas
+
+    DICT_STATISTICS : DICT | the counters of every data node, updated in place
+
+    ---
+
+    ### OUTPUTS ###
+
+    SORTED_URLS : LIST[STR] | the urls from the fastest replica to the slowest
+
+    ---
+
+    """
+
+    results = await asyncio.gather(
+        *[
+            probe_replica(
+                dict_pools[get_host_key(url)], url, dict_statistics[get_host_key(url)]
+            )
+            for url in urls
+        ],
+        return_exceptions=True,
+    )
+
+    elapsed_seconds = [
+        float("inf") if isinstance(result, BaseException) else result
+        for result in results
+    ]
+
+    sorted_urls = [
+        urls[ii] for ii in sorted(range(len(urls)), key=elapsed_seconds.__getitem__)
+    ]
+
+    return sorted_urls
+
+
+##########################
+### SIZES OF THE FILES ###
+##########################
+
+
+async def head_file(pool: HostConnectionPool, url: str, host_statistics: dict) -> int:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function asks the size of a file to its data node with a HEAD request, without downloading it.
+
+    ---
+
+    ### INPUTS ###
+
+    POOL : HOSTCONNECTIONPOOL | the connections to the data node of the file
+
+    URL : STR | the url of the file
+
+    HOST_STATISTICS : DICT | the counters of the data node, updated in place
+
+    ---
+
+    ### OUTPUTS ###
+
+    SIZE : INT | the size of the file in bytes
+
+    ---
+
+    """
+
+    async with pool.semaphore:
+
+        reader, writer = await pool.get_connection()
+
+        reusable = False
+
+        start_time = time.perf_counter()
+
+        try:
+
+            await send_request(writer, pool.host, url, method="HEAD")
+
+            status, headers = await read_response_head(reader)
+
+            host_statistics["n_requests"] += 1
+
+            host_statistics["latency_seconds"] += time.perf_counter() - start_time
+
+            if status != 200 or "content-length" not in headers:
+
+                raise ConnectionError("{} -> HTTP status {}".format(url, status))
+
+            ## A HEAD answer has no body ##
+
+            reusable = headers.get("connection", "").lower() != "close"
+
+        finally:
+
+            pool.release_connection((reader, writer), reusable)
+
+    size = int(headers["content-length"])
+
+    return size
+
+
+async def fetch_file_sizes_async(
+    urls: list[str],
+    max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+    n_retries: int = DEFAULT_N_RETRIES,
+) -> dict[str, int]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function asks the sizes of many files at the same time, with a pool of keep-alive connections for every data node.
+    A file whose size could not be asked after the new attempts is left out : the other sizes are still given.
+
+    ---
+
+    ### INPUTS ###
+
+    URLS : LIST[STR] | the urls of the files
+
+    MAX_CONNECTIONS_PER_HOST : INT | simultaneous requests per data node : default is DEFAULT_MAX_CONNECTIONS_PER_HOST
+
+    N_RETRIES : INT | new attempts after a failed request : default is DEFAULT_N_RETRIES
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_SIZES : DICT | the size in bytes of every url answered
+
+    ---
+
+    """
+
+    ### ONE POOL AND ONE SET OF COUNTERS PER DATA NODE ###
+
+    dict_pools = {}
+
+    dict_statistics = {}
+
+    for url in urls:
+
+        host_key = get_host_key(url)
+
+        if host_key not in dict_pools:
+
+            dict_pools[host_key] = HostConnectionPool(url, max_connections_per_host)
+
+            dict_statistics[host_key] = init_host_statistics()
+
+    ### ASK EVERY SIZE WITH SOME NEW ATTEMPTS ###
+
+    async def head_with_retries(url: str) -> int:
+
+        host_key = get_host_key(url)
+
+        for attempt in range(n_retries + 1):
+
+            try:
+
+                return await head_file(
+                    dict_pools[host_key], url, dict_statistics[host_key]
+                )
+
+            except (OSError, asyncio.IncompleteReadError) as error:
+
+                dict_statistics[host_key]["n_errors"] += 1
+
+                if attempt == n_retries:
+
+                    raise error
+
+    try:
+
+        sizes = await asyncio.gather(
+            *[head_with_retries(url) for url in urls], return_exceptions=True
+        )
+
+    finally:
+
+        for pool in dict_pools.values():
+
+            await pool.close()
+
+    ## Leave the urls which did not answer ##
+
+    dict_sizes = {
+        url: size
+        for url, size in zip(urls, sizes)
+        if not isinstance(size, BaseException)
+    }
+
+    return dict_sizes
+
+
+def fetch_file_sizes(
+    urls: list[str],
+    max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+    n_retries: int = DEFAULT_N_RETRIES,
+) -> dict[str, int]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function runs fetch_file_sizes_async from synchronous code.
+
+    ---
+
+    ### INPUTS ###
+
+    See fetch_file_sizes_async.
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_SIZES : DICT | the size in bytes of every url answered
+
+    ---
+
+    """
+
+    dict_sizes = run_transfers(
+        fetch_file_sizes_async(
+            urls, max_connections_per_host=max_connections_per_host, n_retries=n_retries
+        )
+    )
+
+    return dict_sizes
+
+
+###########################
+### DOWNLOAD MANY FILES ###
+###########################
+
+
+async def download_replicas_async(
+    dict_path_urls: dict[str, list[str]],
+    max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+    n_retries: int = DEFAULT_N_RETRIES,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    min_throughput: float | None = None,
+    grace_seconds: float = THROUGHPUT_GRACE_SECONDS,
+    race: bool = False,
+    dict_checksums: dict[str, tuple[str, str]] | None = None,
+) -> dict[str, dict]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function downloads files at the same time, each from its replicas, with a pool of keep-alive connections for every data node.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_PATH_URLS : DICT | the urls of the replicas of every local path, the preferred first
+
+    MAX_CONNECTIONS_PER_HOST : INT | simultaneous transfers per data node : default is DEFAULT_MAX_CONNECTIONS_PER_HOST
+
+    N_RETRIES : INT | new attempts per replica after a failed transfer : default is DEFAULT_N_RETRIES
+
+    CHUNK_SIZE : INT | the bytes read at once : default is DEFAULT_CHUNK_SIZE
+
+    MIN_THROUGHPUT : FLOAT | bytes per second under which a replica is left : default is none (never left for being slow)
+
+    GRACE_SECONDS : FLOAT | time before the throughput of a transfer is checked : default is THROUGHPUT_GRACE_SECONDS
+
+    RACE : BOOL | do we race the replicas of every file before its transfer ? : default is False
+
+    DICT_CHECKSUMS : DICT | the type and value of the checksum of every local path : default is none (not checked)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_STATISTICS : DICT | the counters of every data node
+
+    ---
+
+    """
+
+    ### ONE POOL AND ONE SET OF COUNTERS PER DATA NODE ###
+
+    dict_pools = {}
+
+    dict_statistics = {}
+
+    for urls in dict_path_urls.values():
+
+        for url in urls:
+
+            host_key = get_host_key(url)
+
+            if host_key not in dict_pools:
+
+                dict_pools[host_key] = HostConnectionPool(url, max_connections_per_host)
+
+                dict_statistics[host_key] = init_host_statistics()
+
+    ### RUN THE TRANSFERS ###
+
+    try:
+
+        results = await asyncio.gather(
+            *[
+                download_one_file(
+                    dict_pools,
+                    urls,
+                    local_path,
+                    dict_statistics,
+                    n_retries=n_retries,
+                    chunk_size=chunk_size,
+                    min_throughput=min_throughput,
+                    grace_seconds=grace_seconds,
+                    race=race,
+                    checksum=(dict_checksums or {}).get(local_path),
+                )
+                for local_path, urls in dict_path_urls.items()
+            ],
+            return_exceptions=True,
+        )
+
+    finally:
+
+        for pool in dict_pools.values():
+
+            await pool.close()
+
+    ## Raise the first failure once every transfer is over ##
+
+    for result in results:
+
+        if isinstance(result, BaseException):
+
+            raise result
+
+    return dict_statistics
+
+
+def run_transfers(coroutine):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function runs the transfers of a coroutine from synchronous code. In a jupyter notebook an event loop is already running :
+    the transfers are then run in their own thread.
+
+    ---
+
+    ### INPUTS ###
+
+    COROUTINE : COROUTINE | the transfers (ex: download_replicas_async(...))
+
+    ---
+
+    ### OUTPUTS ###
+
+    RESULT : ANY | what the coroutine returns (ex: the counters of every data node)
+
+    ---
+
+    """
+
+    ### NO EVENT LOOP RUNNING ###
+
+    try:
+
+        asyncio.get_running_loop()
+
+    except RuntimeError:
+
+        return asyncio.run(coroutine)
+
+    ### AN EVENT LOOP IS ALREADY RUNNING ###
+
+    outcome = {}
+
+    def run_apart():
+
+        try:
+
+            outcome["result"] = asyncio.run(coroutine)
+
+        except BaseException as error:
+
+            outcome["error"] = error
+
+    thread = threading.Thread(target=run_apart)
+
+    thread.start()
+
+    thread.join()
+
+    if "error" in outcome:
+
+        raise outcome["error"]
+
+    return outcome["result"]
+
+
+def download_replicas(
+    dict_path_urls: dict[str, list[str]],
+    max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+    n_retries: int = DEFAULT_N_RETRIES,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    min_throughput: float | None = None,
+    grace_seconds: float = THROUGHPUT_GRACE_SECONDS,
+    race: bool = False,
+    dict_checksums: dict[str, tuple[str, str]] | None = None,
+) -> dict[str, dict]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function runs download_replicas_async from synchronous code.
+
+    ---
+
+    ### INPUTS ###
+
+    See download_replicas_async.
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_STATISTICS : DICT | the counters of every data node
+
+    ---
+
+    """
+
+    dict_statistics = run_transfers(
+        download_replicas_async(
+            dict_path_urls,
+            max_connections_per_host=max_connections_per_host,
+            n_retries=n_retries,
+            chunk_size=chunk_size,
+            min_throughput=min_throughput,
+            grace_seconds=grace_seconds,
+            race=race,
+            dict_checksums=dict_checksums,
+        )
+    )
+
+    return dict_statistics
+
+
+def download_files(
+    dict_url_paths: dict[str, str],
+    max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+    n_retries: int = DEFAULT_N_RETRIES,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict[str, dict]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function downloads files at the same time, each from a single url, with a pool of keep-alive connections for every data node.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_URL_PATHS : DICT | the local path where to save every url
+
+    MAX_CONNECTIONS_PER_HOST : INT | simultaneous transfers per data node : default is DEFAULT_MAX_CONNECTIONS_PER_HOST
+
+    N_RETRIES : INT | new attempts after a failed transfer : default is DEFAULT_N_RETRIES
+
+    CHUNK_SIZE : INT | the bytes read at once : default is DEFAULT_CHUNK_SIZE
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_STATISTICS : DICT | the counters of every data node
+
+    ---
+
+    """
+
+    dict_statistics = download_replicas(
+        {local_path: [url] for url, local_path in dict_url_paths.items()},
+        max_connections_per_host=max_connections_per_host,
+        n_retries=n_retries,
+        chunk_size=chunk_size,
+    )
+
+    return dict_statistics
+
+
+############################################
+### FILES OF AN ENTRY IN THE LOCAL CACHE ###
+############################################
+
+
+def get_local_path(url: str, downloading_path: str) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the path of a file in the download folder. The DRS path of the url, starting at DRS_ROOT, is kept so that
+    the files are laid out as intake-esgf does and the replicas of a file on several data nodes share the same local path.
+    Without DRS path the file is put at the root of the download folder.
+
+    ---
+
+    ### INPUTS ###
+
+    URL : STR | the url of the file
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    ---
+
+    ### OUTPUTS ###
+
+    LOCAL_PATH : STR | path of the file in the download folder
+
+    ---
+
+    """
+
+    url_parts = urlsplit(url).path.strip("/").split("/")
+
+    drs_parts = (
+        url_parts[url_parts.index(DRS_ROOT) :]
+        if DRS_ROOT in url_parts
+        else url_parts[-1:]
+    )
+
+    local_path = os.path.join(downloading_path, *drs_parts)
+
+    return local_path
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+"""
+This small script clears the output of the Jupyter cell between the entries of a loading loop. Outside of a notebook (ex: the command-line runner
+of cli.py under a batch scheduler) nothing is done : the logs of every entry are kept and IPython does not need to be installed.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### TO CLEAN THE OUTPUTS OF THE JUPYTER CELL REGULARLY (OPTIONAL) ###
+
+try:
+
+    from IPython import get_ipython  # the running IPython shell, if any
+
+    from IPython.display import clear_output  # to clear the cell output
+
+    HAS_IPYTHON = True
+
+except ImportError:
+
+    HAS_IPYTHON = False
+
+###############################
+### CLEAR THE CELL'S OUTPUT ###
+###############################
+
+
+def is_running_in_notebook() -> bool:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function tells whether the code runs in a Jupyter kernel.
+
+    ---
+
+    ### INPUTS ###
+
+    nothing.
+
+    ---
+
+    ### OUTPUTS ###
+
+    IN_NOTEBOOK : BOOL | whether the code runs in a Jupyter kernel
+
+    ---
+
+    """
+
+    if not HAS_IPYTHON:
+
+        return False
+
+    shell = get_ipython()
+
+    in_notebook = shell is not None and hasattr(shell, "kernel")
+
+    return in_notebook
+
+
+def clear_cell_output():
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function clears the output of the cell when the code runs in a notebook, and does nothing otherwise.
+
+    ---
+
+    ### INPUTS ###
+
+    nothing.
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    if is_running_in_notebook():
+
+        clear_output(wait=True)
+
+    return
@@ -0,0 +1,704 @@
+#!/usr/bin/env python3
+
+"""
+This script plans the loading of a case before running it (see dry_run_cmip6 in load_cmip6.py). The catalog of the case is resolved but nothing is downloaded :
+the size of every file is read from its file record or asked to its data node, and the time length of the files is read from their names. For every entry and variable,
+the table of the plan gives the bytes to download and to store, the size of the fields and the memory needed to compute their climatologies.
+The runtime of every stage is estimated from the benchmarks saved by the previous runs. The plan fails early if a disk or memory quota would be exceeded.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the files
+
+import re  # to read the time range in the names of the files
+
+import json  # to save the benchmarks
+
+import time  # to date the benchmarks
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import pandas as pd  # to build the table of the plan
+
+import xarray as xr  # to read the grid of the cached files
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.load_raw_data.async_transfer import (
+    get_local_path,  # path of a file in the download folder
+)
+
+#############################
+#### DEFINE CUSTOM ERRORS ###
+#############################
+
+
+class QuotaExceeded(Exception):
+
+    ### DEFINING THE EXCEPTION PROPERTIES ###
+
+    def __init__(
+        self,
+        quantity,
+        needed,
+        quota,
+        error_msg="The plan needs more than the quota",
+    ):
+        self.quantity = quantity
+        self.needed = needed
+        self.quota = quota
+        self.error_msg = error_msg
+        super().__init__(self.error_msg)  # calling the exception parent class
+
+    ### DEFINING THE ERROR MESSAGE ###
+
+    def __str__(self):  # what happens when printing the error
+        return f"{self.quantity} -> {self.error_msg} : {self.needed / 1e9:.2f} GB needed for {self.quota / 1e9:.2f} GB"
+
+
+##############################
+### PARAMETERS OF THE PLAN ###
+##############################
+
+BENCHMARK_FILE_NAME = "benchmark_history.json"  # saved in the download folder
+
+STAGES = [
+    "download",  # bytes of the files fetched from the data nodes
+    "climatology",  # bytes of the fields whose climatologies are computed
+]
+
+BYTES_PER_VALUE = 4  # the CMIP6 fields are stored as float32
+
+BYTES_PER_CLIMATOLOGY_VALUE = 8  # the climatologies are computed in float64
+
+## Largest ratio between the decompressed and the compressed size of a raw file ##
+
+# The grid guessed from the size of a file is multiplied by it : the estimate is conservative for the deflated netcdf4 files #
+
+COMPRESSION_FACTOR = 3.0
+
+N_MONTHS = 12  # length of a monthly climatology
+
+## Memory needed to compute a climatology, in number of copies of the field ##
+
+CLIMATOLOGY_MEMORY_FACTOR = (
+    5.0  # the field, its float64 version weighted by the days and the grouped sums
+)
+
+## Memory needed by the stages after the climatologies, in number of float64 copies of the climatologies ##
+
+APRP_MEMORY_FACTOR = 4.0  # the climatologies of an entry, the cloud and clear-sky parameters and the outputs
+
+REGRID_MEMORY_FACTOR = (
+    3.0  # the source climatologies, the regridded ones and the weights of the overlaps
+)
+
+## Time range at the end of the name of a CMIP6 file (ex: _185001-187912.nc) ##
+
+TIME_RANGE_PATTERN = re.compile(r"_(\d{4})(\d{2})\d*-(\d{4})(\d{2})\d*\.nc$")
+
+##########################################
+### TIME LENGTH GIVEN BY THE FILE NAME ###
+##########################################
+
+
+def get_number_of_months(file_name: str) -> int:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the number of months covered by a CMIP6 file from the time range at the end of its name.
+
+    ---
+
+    ### INPUTS ###
+
+    FILE_NAME : STR | the name or the url of the file (ex: rsdt_Amon_CNRM-CM6-1_piClim-aer_r1i1p1f2_gr_185001-187912.nc)
+
+    ---
+
+    ### OUTPUTS ###
+
+    N_MONTHS : INT | the number of months, 0 if the name holds no time range
+
+    ---
+
+    """
+
+    match = TIME_RANGE_PATTERN.search(file_name)
+
+    if match is None:
+
+        return 0
+
+    first_year, first_month, last_year, last_month = map(int, match.groups())
+
+    n_months = 12 * (last_year - first_year) + last_month - first_month + 1
+
+    return n_months
+
+
+####################################
+### SAVE AND READ THE BENCHMARKS ###
+####################################
+
+
+def read_benchmark_history(benchmark_path: str) -> list[dict]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the benchmarks saved by the previous runs.
+
+    ---
+
+    ### INPUTS ###
+
+    BENCHMARK_PATH : STR | path of the json file
+
+    ---
+
+    ### OUTPUTS ###
+
+    BENCHMARK_HISTORY : LIST[DICT] | the "stage", "n_bytes", "seconds" and "date" of every benchmark, empty if nothing was saved
+
+    ---
+
+    """
+
+    if not os.path.exists(benchmark_path):
+
+        return []
+
+    with open(benchmark_path, "r") as file:
+
+        benchmark_history = json.load(file)
+
+    return benchmark_history
+
+
+def record_benchmark(benchmark_path: str, stage: str, n_bytes: float, seconds: float):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function adds the measure of a stage to the benchmarks saved in benchmark_path.
+
+    ---
+
+    ### INPUTS ###
+
+    BENCHMARK_PATH : STR | path of the json file
+
+    STAGE : STR | the stage, one of STAGES
+
+    N_BYTES : FLOAT | the bytes treated by the stage
+
+    SECONDS : FLOAT | the time it took
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    ### CHECK THE STAGE ###
+
+    if stage not in STAGES:
+
+        raise ValueError("{} -> The stage must be one of {}".format(stage, STAGES))
+
+    ### ADD THE MEASURE ###
+
+    benchmark_history = read_benchmark_history(benchmark_path)
+
+    benchmark_history.append(
+        {
+            "stage": stage,
+            "n_bytes": float(n_bytes),
+            "seconds": float(seconds),
+            "date": time.time(),
+        }
+    )
+
+    with open(benchmark_path, "w") as file:
+
+        json.dump(benchmark_history, file, indent=1)
+
+    return
+
+
+def estimate_stage_throughput(benchmark_history: list[dict], stage: str) -> float:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function estimates the throughput of a stage as the median of its benchmarks.
+
+    ---
+
+    ### INPUTS ###
+
+    BENCHMARK_HISTORY : LIST[DICT] | the saved benchmarks
+
+    STAGE : STR | the stage, one of STAGES
+
+    ---
+
+    ### OUTPUTS ###
+
+    THROUGHPUT : FLOAT | bytes per second, nan without benchmark of this stage
+
+    ---
+
+    """
+
+    throughputs = [
+        benchmark["n_bytes"] / benchmark["seconds"]
+        for benchmark in benchmark_history
+        if benchmark["stage"] == stage and benchmark["seconds"] > 0.0
+    ]
+
+    if len(throughputs) == 0:
+
+        return np.nan
+
+    throughput = float(np.median(throughputs))
+
+    return throughput
+
+
+###################################
+### BUILD THE TABLE OF THE PLAN ###
+###################################
+
+
+def build_file_table(
+    dict_http_links: dict[str, list[str]],
+    dict_sizes: dict[str, int],
+    downloading_path: str,
+) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function describes every file of a case : its dataset, size, number of months and whether it is already in the download folder.
+    The replicas of a file are counted once, and a file whose size is unknown for all its replicas is left out.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_HTTP_LINKS : DICT | the urls of the files of every dataset, under the form (source_id.member_id.grid_label.experiment.variable)
+
+    DICT_SIZES : DICT | the size in bytes of every file, given for one of its replicas at least
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    ---
+
+    ### OUTPUTS ###
+
+    FILE_TABLE : PANDAS DATAFRAME | one row per file with the "key", "variable_id", "local_path", "n_bytes", "n_months" and "is_cached" columns
+
+    ---
+
+    """
+
+    rows = []
+
+    for key, urls in dict_http_links.items():
+
+        ## The size of every file, whatever its replica ##
+
+        dict_path_sizes = {}
+
+        for url in urls:
+
+            if url in dict_sizes:
+
+                dict_path_sizes[get_local_path(url, downloading_path)] = dict_sizes[url]
+
+        for local_path in dict.fromkeys(
+            get_local_path(url, downloading_path) for url in urls
+        ):
+
+            if local_path not in dict_path_sizes:
+
+                continue
+
+            rows.append(
+                {
+                    "key": key,
+                    "variable_id": key.split(".")[-1],
+                    "local_path": local_path,
+                    "n_bytes": dict_path_sizes[local_path],
+                    "n_months": get_number_of_months(local_path),
+                    "is_cached": os.path.exists(local_path),
+                }
+            )
+
+    file_table = pd.DataFrame(
+        rows,
+        columns=[
+            "key",
+            "variable_id",
+            "local_path",
+            "n_bytes",
+            "n_months",
+            "is_cached",
+        ],
+    )
+
+    return file_table
+
+
+def get_number_of_cells(key: str, grid_catalog: pd.DataFrame | None) -> int:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the number of cells of the grid of an entry if it is found in a grid catalog (see grid_catalog.py).
+
+    ---
+
+    ### INPUTS ###
+
+    KEY : STR | the key of a dataset (source_id.member_id.grid_label.experiment.variable)
+
+    GRID_CATALOG : PANDAS DATAFRAME | the grid catalog of the climatologies already saved : none if there is none
+
+    ---
+
+    ### OUTPUTS ###
+
+    N_CELLS : INT | the number of cells, 0 if the grid is unknown
+
+    ---
+
+    """
+
+    if grid_catalog is None:
+
+        return 0
+
+    entry_name = ".".join(key.split(".")[:3]) + "."
+
+    rows = grid_catalog[grid_catalog["key"].str.startswith(entry_name)]
+
+    if len(rows) == 0:
+
+        return 0
+
+    n_cells = int(rows["n_lat"].iloc[0] * rows["n_lon"].iloc[0])
+
+    return n_cells
+
+
+def get_number_of_cells_from_file(local_path: str) -> int:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the number of cells of the grid in the header of a raw file of the download folder, without reading its data.
+
+    ---
+
+    ### INPUTS ###
+
+    LOCAL_PATH : STR | path of the file
+
+    ---
+
+    ### OUTPUTS ###
+
+    N_CELLS : INT | the number of cells, 0 if the file cannot be read or has no lat / lon grid
+
+    ---
+
+    """
+
+    try:
+
+        with xr.open_dataset(local_path, decode_times=False) as dataset:
+
+            n_cells = int(dataset.sizes.get("lat", 0) * dataset.sizes.get("lon", 0))
+
+    except (OSError, ValueError):
+
+        return 0
+
+    return n_cells
+
+
+def build_plan_table(
+    file_table: pd.DataFrame,
+    grid_catalog: pd.DataFrame | None = None,
+    benchmark_history: list[dict] | None = None,
+) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function sums the files of every entry and variable and estimates what their treatment needs. The number of cells of the grid is taken
+    from the grid catalog if the entry is known, then from the header of a cached file, otherwise from the size of the files multiplied by COMPRESSION_FACTOR
+    (the compressed files hold fewer bytes than their values : the estimate is conservative). The memory of every stage is estimated for every key :
+
+    - load : the values of the largest file, decoded one file at a time ;
+    - climatology : the field is n_months x n_cells values, its climatology needs CLIMATOLOGY_MEMORY_FACTOR copies of it in memory and N_MONTHS x n_cells values on disk ;
+    - aprp and regrid : APRP_MEMORY_FACTOR and REGRID_MEMORY_FACTOR float64 copies of the climatology, summed over the keys treated together by summarize_plan.
+
+    ---
+
+    ### INPUTS ###
+
+    FILE_TABLE : PANDAS DATAFRAME | the table of the files (see build_file_table)
+
+    GRID_CATALOG : PANDAS DATAFRAME | the grid catalog of the climatologies already saved : default is none
+
+    BENCHMARK_HISTORY : LIST[DICT] | the saved benchmarks : default is none (no runtime estimate)
+
+    ---
+
+    ### OUTPUTS ###
+
+    PLAN_TABLE : PANDAS DATAFRAME | one row per key with the number of files, the bytes to download and to store, the number of months and cells,
+    the bytes of the field, the memory of every stage and the estimated seconds of every stage
+
+    ---
+
+    """
+
+    ### SUM THE FILES OF EVERY KEY ###
+
+    plan_table = file_table.groupby("key", sort=False).agg(
+        variable_id=("variable_id", "first"),
+        n_files=("local_path", "size"),
+        raw_bytes=("n_bytes", "sum"),
+        n_months=("n_months", "sum"),
+        max_file_months=("n_months", "max"),
+    )
+
+    plan_table["download_bytes"] = (
+        file_table[~file_table["is_cached"]].groupby("key")["n_bytes"].sum()
+    ).reindex(plan_table.index, fill_value=0)
+
+    ### SIZE OF THE FIELDS ###
+
+    n_cells_catalog = np.array(
+        [get_number_of_cells(key, grid_catalog) for key in plan_table.index]
+    )
+
+    ## Read in the header of a cached file when the entry is not in the catalog ##
+
+    cached_paths = (
+        file_table[file_table["is_cached"]].groupby("key")["local_path"].first()
+    )
+
+    n_cells_header = np.array(
+        [
+            (
+                get_number_of_cells_from_file(cached_paths[key])
+                if n_cells == 0 and key in cached_paths.index
+                else 0
+            )
+            for key, n_cells in zip(plan_table.index, n_cells_catalog)
+        ]
+    )
+
+    ## Guessed from the compressed size of the files ##
+
+    n_cells_files = (
+        COMPRESSION_FACTOR
+        * plan_table["raw_bytes"]
+        // (BYTES_PER_VALUE * np.maximum(plan_table["n_months"], 1))
+    ).astype(int)
+
+    plan_table["n_cells"] = np.where(
+        n_cells_catalog > 0,
+        n_cells_catalog,
+        np.where(n_cells_header > 0, n_cells_header, n_cells_files),
+    )
+
+    plan_table["field_bytes"] = (
+        plan_table["n_months"] * plan_table["n_cells"] * BYTES_PER_VALUE
+    )
+
+    ### MEMORY OF THE LOAD STAGE ###
+
+    plan_table["load_memory_bytes"] = (
+        plan_table["max_file_months"] * plan_table["n_cells"] * BYTES_PER_VALUE
+    )
+
+    ### MEMORY AND DISK OF THE CLIMATOLOGY STAGE ###
+
+    plan_table["climatology_memory_bytes"] = (
+        CLIMATOLOGY_MEMORY_FACTOR * plan_table["field_bytes"]
+    )
+
+    plan_table["climatology_disk_bytes"] = (
+        N_MONTHS * plan_table["n_cells"] * BYTES_PER_VALUE
+    )
+
+    ### MEMORY OF THE APRP AND REGRID STAGES ###
+
+    climatology_bytes = N_MONTHS * plan_table["n_cells"] * BYTES_PER_CLIMATOLOGY_VALUE
+
+    plan_table["aprp_memory_bytes"] = APRP_MEMORY_FACTOR * climatology_bytes
+
+    plan_table["regrid_memory_bytes"] = REGRID_MEMORY_FACTOR * climatology_bytes
+
+    ### RUNTIME OF EVERY STAGE ###
+
+    if benchmark_history is None:
+
+        benchmark_history = []
+
+    plan_table["download_seconds"] = plan_table[
+        "download_bytes"
+    ] / estimate_stage_throughput(benchmark_history, "download")
+
+    plan_table["climatology_seconds"] = plan_table[
+        "field_bytes"
+    ] / estimate_stage_throughput(benchmark_history, "climatology")
+
+    plan_table = plan_table.reset_index()
+
+    return plan_table
+
+
+def summarize_plan(plan_table: pd.DataFrame) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the totals of a plan. The files are loaded and the climatologies are computed one variable at a time : their peak memory is the largest one.
+    The APRP holds every variable and experiment of an entry (source_id.member_id.grid_label) and the regridding every variable of an entry and experiment :
+    their peak memory is the largest sum over these keys. The peak memory of the plan is the largest one of the stages.
+
+    ---
+
+    ### INPUTS ###
+
+    PLAN_TABLE : PANDAS DATAFRAME | the table of the plan (see build_plan_table)
+
+    ---
+
+    ### OUTPUTS ###
+
+    SUMMARY : DICT | the bytes to download, the disk needed (new raw files and climatologies), the peak memory of every stage and of the plan,
+    and the seconds of every stage
+
+    ---
+
+    """
+
+    ### PEAK MEMORY OF EVERY STAGE ###
+
+    split_keys = plan_table["key"].str.split(".")
+
+    dict_stage_memory = {
+        "load_memory_bytes": float(plan_table["load_memory_bytes"].max()),
+        "climatology_memory_bytes": float(plan_table["climatology_memory_bytes"].max()),
+        "aprp_memory_bytes": float(
+            plan_table.groupby(split_keys.str[:3].str.join("."))["aprp_memory_bytes"]
+            .sum()
+            .max()
+        ),
+        "regrid_memory_bytes": float(
+            plan_table.groupby(split_keys.str[:4].str.join("."))["regrid_memory_bytes"]
+            .sum()
+            .max()
+        ),
+    }
+
+    summary = {
+        "download_bytes": int(plan_table["download_bytes"].sum()),
+        "disk_bytes": int(
+            plan_table["download_bytes"].sum()
+            + plan_table["climatology_disk_bytes"].sum()
+        ),
+        **dict_stage_memory,
+        "peak_memory_bytes": max(dict_stage_memory.values()),
+        "download_seconds": float(plan_table["download_seconds"].sum(min_count=1)),
+        "climatology_seconds": float(
+            plan_table["climatology_seconds"].sum(min_count=1)
+        ),
+    }
+
+    return summary
+
+
+def check_quotas(
+    summary: dict, disk_quota: float | None = None, memory_quota: float | None = None
+):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function checks that a plan fits in the quotas.
+
+    ---
+
+    ### INPUTS ###
+
+    SUMMARY : DICT | the totals of the plan (see summarize_plan)
+
+    DISK_QUOTA : FLOAT | bytes of disk available : default is none (not checked)
+
+    MEMORY_QUOTA : FLOAT | bytes of memory available : default is none (not checked)
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    if disk_quota is not None and summary["disk_bytes"] > disk_quota:
+
+        raise QuotaExceeded("disk", summary["disk_bytes"], disk_quota)
+
+    if memory_quota is not None and summary["peak_memory_bytes"] > memory_quota:
+
+        raise QuotaExceeded("memory", summary["peak_memory_bytes"], memory_quota)
+
+    return
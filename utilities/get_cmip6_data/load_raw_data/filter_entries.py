@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+This small script builds the filtering function given to intake-esgf to remove the incomplete entries of a search. The criterias of the case
+(see set_search_criterias in load_cmip6.py) are held by the function itself instead of module-level variables : several cases can be searched
+at the same time in one process, from several threads, without sharing their filters.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd  # to manage the groups of the search
+
+### TYPE HINTS FOR FUNCTIONS ###
+
+from typing import Callable
+
+####################################
+### BUILD THE FILTERING FUNCTION ###
+####################################
+
+
+def make_filtering_function(
+    search_criterias: dict,
+) -> Callable[[pd.DataFrame], bool]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function builds the function allowing the intake-esgf catalog to be cleaned of the entries that are not complete,
+    meaning the entries that do not meet the expected number of files. If the case gives its required experiments, the expected number of files
+    is the one of every experiment : the required experiments must be found and complete, the other ones are optional but must be complete if found.
+    If the case filters the entries by name, only the model and variant couples of its keep_only_dataframe are kept : they are stored once as a set
+    so that every group is tested with a single lookup.
+
+    ---
+
+    ### INPUTS ###
+
+    SEARCH_CRITERIAS : DICT | the criterias of the case with the "expected_number_of_files", "filtering_by_name" and "keep_only_dataframe" keys,
+                              and optionally the "required_experiments" key
+
+    ---
+
+    ### OUTPUTS ###
+
+    FILTERING_FUNCTION : CALLABLE | function of the sub dataframe of a (source_id, member_id, grid_label) group telling whether it is kept
+
+    ---
+
+    """
+
+    ### THE CRITERIAS OF THE CASE ###
+
+    expected_number_of_files = search_criterias["expected_number_of_files"]
+
+    ## The experiments every entry must have, none if the whole group is counted ##
+
+    required_experiments = search_criterias.get("required_experiments")
+
+    ## The (source_id, member_id) couples to keep, none if every couple is kept ##
+
+    if search_criterias["filtering_by_name"]:
+
+        keep_only_dataframe = search_criterias["keep_only_dataframe"]
+
+        keep_only_couples = set(
+            zip(keep_only_dataframe["source_id"], keep_only_dataframe["member_id"])
+        )
+
+    else:
+
+        keep_only_couples = None
+
+    ### THE FILTERING FUNCTION ###
+
+    def filtering_function(grouped_model_entry: pd.DataFrame) -> bool:
+        """
+
+        ---
+
+        ### DEFINITION ###
+
+        This function tells whether a group of the search is complete and, if the case filters by name, whether its model and variant are kept.
+
+        ---
+
+        ### INPUTS ###
+
+        GROUPED_MODEL_ENTRY : Pandas DataFrame | sub dataframe containing all the variables of a given source_id, member_id and grid tuple.
+
+        ---
+
+        ### OUTPUTS ###
+
+        OUTPUT : BOOL | whether we keep this model group or not
+
+        ---
+
+        """
+
+        ### TEST THE NUMBER OF VARIABLES ###
+
+        if required_experiments is None:
+
+            if len(grouped_model_entry) != expected_number_of_files:
+
+                return False
+
+        else:
+
+            ## Number of files of every experiment found ##
+
+            number_of_files = grouped_model_entry["experiment_id"].value_counts()
+
+            if not set(required_experiments).issubset(number_of_files.index):
+
+                return False
+
+            if (number_of_files != expected_number_of_files).any():
+
+                return False
+
+        ### KEEPING ONLY THE COUPLES PRESENT IN KEEP_ONLY_DATAFRAME ###
+
+        if keep_only_couples is None:
+
+            return True
+
+        couple = (
+            grouped_model_entry["source_id"].iloc[0],
+            grouped_model_entry["member_id"].iloc[0],
+        )
+
+        return couple in keep_only_couples
+
+    return filtering_function
@@ -31,16 +31,55 @@ import xarray as xr  # to manages xarray datasets
 
 import warnings
 
-### TO CLEAN THE OUTPUTS OF THE JUPYTER CELL REGULARLY ###
-
-from IPython.display import clear_output
-
 ### HOMEMADE LIBRARIES ###
 
+from utilities.get_cmip6_data.load_raw_data.cell_output import (
+    clear_cell_output,  # to clean the outputs of the Jupyter cell regularly, only in a notebook
+)
+
 from utilities.get_cmip6_data.folders_handle.create import (
     create_dir,  # function to create a cleaned downloading directory
 )
 
+from utilities.get_cmip6_data.load_raw_data.filter_entries import (
+    make_filtering_function,  # to remove the incomplete entries of a case
+)
+
+from utilities.get_cmip6_data.load_raw_data.multi_case import (
+    merge_search_facets,  # facets of the union search of several cases
+    select_case_entries,  # entries of a case in the union search
+    build_union_entries,  # every entry once with what the cases need
+    split_case_views,  # one dictionary per case
+    ENTRY_FACETS,  # facets of an entry
+)
+
+from utilities.get_cmip6_data.load_raw_data.replica_selection import (
+    fetch_replica_sizes,  # sizes of the files, from the next replica if one does not answer
+)
+
+from utilities.get_cmip6_data.load_raw_data.open_datasets import (
+    open_single_model_dictionary,  # to download and open the datasets of a single model search
+    get_catalog_http_links,  # urls of the files from the file records of the catalog
+    REFERENCE_INDEX_FOLDER_NAME,  # folder of the reference indexes
+)
+
+from utilities.get_cmip6_data.load_raw_data.dry_run import (
+    build_file_table,  # the files of a case
+    build_plan_table,  # what every entry and variable needs
+    summarize_plan,  # totals of the plan
+    check_quotas,  # to fail before running anything
+    read_benchmark_history,  # the benchmarks of the previous runs
+    BENCHMARK_FILE_NAME,  # file of the benchmarks in the download folder
+)
+
+from utilities.get_cmip6_data.load_raw_data.subset_raw_data import (
+    subset_raw_dictionary,  # to restrict the lazy datasets to a domain and some years
+)
+
+from utilities.get_cmip6_data.store_data.shard_manifest import (
+    select_shard_entries,  # entries of a shard
+)
+
 #############################
 #### DEFINE CUSTOM ERRORS ###
 #############################
@@ -67,6 +106,50 @@ class InvalidCase(Exception):
 #### DEFINE GLOBALLY THE SEARCH CRITERIAS ###
 #############################################
 
+## Table of the fixed fields, without time dimension ##
+
+FIXED_TABLE_ID = "fx"
+
+## Variables published in another table than the monthly one of the cases ##
+
+DICT_VARIABLE_TABLE_IDS = {
+    "areacella": FIXED_TABLE_ID,
+    "sftlf": FIXED_TABLE_ID,
+    "orog": FIXED_TABLE_ID,
+}
+
+
+def get_variable_table_id(variable: str, case_table_id: str) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the table of a variable : the one of DICT_VARIABLE_TABLE_IDS if it is listed, the table of the case otherwise.
+
+    ---
+
+    ### INPUTS ###
+
+    VARIABLE : STR | the variable_id of the variable
+
+    CASE_TABLE_ID : STR | the table_id of the search facets of the case (ex: Amon)
+
+    ---
+
+    ### OUTPUTS ###
+
+    TABLE_ID : STR | the table_id to search the variable with
+
+    ---
+
+    """
+
+    table_id = DICT_VARIABLE_TABLE_IDS.get(variable, case_table_id)
+
+    return table_id
+
 
 def set_search_criterias(case: str) -> dict:
     """
@@ -85,6 +168,7 @@ def set_search_criterias(case: str) -> dict:
 
         - SW (short-wave variables for the APRP method)
         - ZELINKA-SW (short-wave variables for the APRP method by keeping only the models and variants present in Zelinka and al. (2023))
+        - SW-AER-COMPONENTS (short-wave variables for the APRP method with the piClim-BC, piClim-SO2 and piClim-OC experiments, when available, in addition to piClim-aer)
 
     ---
 
@@ -94,6 +178,8 @@ def set_search_criterias(case: str) -> dict:
 
     EXPECTED_NUMBER_OF_FILES : INT | expected number of files such that on model_id and source_id couples corresponds to (number_of_variables) * (number_of_experiments)
 
+    REQUIRED_EXPERIMENTS : LIST OF STR | if given, the experiments every entry must have : the expected number of files is then the one of every experiment
+
     ---
 
     ### REFERENCES ###
@@ -265,6 +351,63 @@ def set_search_criterias(case: str) -> dict:
             "keep_only_dataframe": zelinka_2023_model_variant_table,
         }
 
+    ### SHORT-WAVE CASE WITH THE AEROSOL COMPONENTS EXPERIMENTS ###
+
+    elif case == "SW-AER-COMPONENTS":
+
+        # ================ SEARCH CRITERIAS FOR OUR ANALYSIS ================ #
+
+        ### EXPERIMENTS ###
+
+        experiment_id = [
+            "piClim-control",
+            "piClim-aer",
+            "piClim-BC",
+            "piClim-SO2",
+            "piClim-OC",
+        ]
+
+        ### VARIABLES ###
+
+        variable_id = [
+            "clt",
+            "rsdt",
+            "rsut",
+            "rsutcs",
+            "rsds",
+            "rsus",
+            "rsdscs",
+            "rsuscs",
+        ]
+
+        ### TABLE ###
+
+        table_id = "Amon"
+
+        ### DEFINE SEARCH CRITERIAS DICTIONARY ###
+
+        search_facets = {
+            "experiment_id": experiment_id,
+            "variable_id": variable_id,
+            "table_id": table_id,
+        }
+
+        # ================ EXPECTED NUMBER OF FILES ================ #
+
+        expected_number_of_files = 8  # 8 variables for every experiment found
+
+        ## Only the control and the full aerosol experiments are required, the components are optional ##
+
+        required_experiments = ["piClim-control", "piClim-aer"]
+
+        return {
+            "search_facets": search_facets,
+            "expected_number_of_files": expected_number_of_files,
+            "filtering_by_name": False,
+            "keep_only_dataframe": None,
+            "required_experiments": required_experiments,
+        }
+
     ### THE INPUT CASE IS NOT COVERED ###
 
     else:
@@ -304,7 +447,7 @@ def set_downloading_folder(
 
     ### OUTPUTS ###
 
-    nothing.
+    DOWNLOADING_PATH : STR | path of the download folder
 
     ---
     """
@@ -325,97 +468,7 @@ def set_downloading_folder(
         )
     )
 
-    return
-
-
-########################################################################################
-#### FILTERING FUNCTION REMOVING INCOMPLETE ENTRIES AND KEEPING ONLY PROVIDED MODELS ###
-########################################################################################
-
-
-# ================ DEFINE THE FILTERING FUNCTION ================ #
-
-
-def filtering_function(grouped_model_entry: pd.DataFrame) -> bool:
-    """
-    ---
-
-    ### DEFINITION ###
-
-    This function allows the intake-esgf catalog to be cleaned of the entries that are not complete.
-    In the default case it means entries that do not meet the expected number of files.
-
-    The user can also set a condition that only the model and variant couples present in a provided pandas dataframe are kept.
-    Since the nature of this function is to be an input for the intake-esgf package, we define the optional arguments outside
-    of the function.
-
-    ---
-
-    ### INPUTS
-
-    GROUPED_MODEL_ENTRY : Pandas DataFrame | sub dataframe containing all the variables of a given source_id, member_id and grid tuple.
-
-    ---
-
-    ### OPTIONAL ARGUMENTS (DEFINED GLOBALLY)
-
-    FILTERING_BY_NAME : BOOL | defines if we filter the entry by source_id and member_id or not
-
-    KEEP_ONLY_DATAFRAME : Pandas DataFrame | associated dataframe holding the source_id and member_id to conserve
-
-    ---
-
-    ### OUTPUTS
-
-    OUTPUT : BOOL | whether we keep this model group or not
-
-    ---
-    """
-
-    ### INITIALISATION ###
-
-    ### TEST THE NUMBER OF VARIBALES ###
-
-    if len(grouped_model_entry) == expected_number_of_files:
-
-        ### NUMBER OF VARIABLES' TEST SUCCEEDED ###
-
-        ## Do we keep only the keep_only_dataframe model and variant couples ? ##
-
-        # NO : We keep everything that matched the variable number's test #
-
-        if not (filtering_by_name):
-
-            return True
-
-        ### YES : KEEPING ONLY THE COUPLES PRESENT IN KEEP_ONLY_DATAFRAME ###
-
-        else:
-
-            ## Doing the test on the grouped_model_entry's source_id and member_id ##
-
-            # Extract the grouped_model_entry data #
-
-            grouped_model_entry_source_id = grouped_model_entry.source_id.unique()[0]
-
-            grouped_model_entry_member_id = grouped_model_entry.member_id.unique()[0]
-
-            # Can we find the grouped_model_entry's source_id and member_id in one row of is_in_keep_only_dataframe ? #
-
-            is_in_keep_only_dataframe = (
-                (keep_only_dataframe["source_id"] == grouped_model_entry_source_id)
-                & (keep_only_dataframe["member_id"] == grouped_model_entry_member_id)
-            ).any()
-
-            # Return the result of the test #
-
-            return is_in_keep_only_dataframe
-
-    ### NUMBER OF VARIABLES' TEST FAILED ###
-
-    else:
-
-        return False
+    return downloading_path
 
 
 #########################################
@@ -423,13 +476,16 @@ def filtering_function(grouped_model_entry: pd.DataFrame) -> bool:
 #########################################
 
 
-def get_areacella_apart(catalog, grouped_models: pd.Series) -> dict[str, xr.Dataset]:
+def get_areacella_apart(
+    catalog, grouped_models: pd.Series, dict_areacella_per_grid: dict | None = None
+) -> dict[str, xr.Dataset]:
     """
     ---
 
     ### DEFINITION ###
 
     This function loads an areacella dictionary for every single entry of the catalog.
+    The members of a model share the same grid : the areacella is only downloaded once per (source_id, grid_label) couple.
 
     ---
 
@@ -439,6 +495,8 @@ def get_areacella_apart(catalog, grouped_models: pd.Series) -> dict[str, xr.Data
 
     GROUPED_MODELS : Pandas Series object | the entries grouped by (SOURCE_ID | MEMBER_ID | GRID_LABEL)
 
+    DICT_AREACELLA_PER_GRID : DICT | the areacella already downloaded for every (source_id, grid_label), shared between calls : default is none (a new one)
+
     ---
 
     ### OUTPUTS ###
@@ -455,6 +513,12 @@ def get_areacella_apart(catalog, grouped_models: pd.Series) -> dict[str, xr.Data
 
     dict_areacella = {}
 
+    ## Areacella already downloaded for a grid ##
+
+    if dict_areacella_per_grid is None:
+
+        dict_areacella_per_grid = {}
+
     ## Number of rows ##
 
     n_rows = grouped_models.size
@@ -465,7 +529,7 @@ def get_areacella_apart(catalog, grouped_models: pd.Series) -> dict[str, xr.Data
 
         ## Clear the cell output ##
 
-        clear_output(wait=True)
+        clear_cell_output()
 
         ## Get the SOURCE_ID | MEMBER_ID | GRID_LABEL of the row ##
 
@@ -487,6 +551,14 @@ def get_areacella_apart(catalog, grouped_models: pd.Series) -> dict[str, xr.Data
 
             source_id = "IPSL-CM6A-LR"
 
+        ## Reuse the areacella of another member on the same grid ##
+
+        if (source_id, grid_label) in dict_areacella_per_grid:
+
+            dict_areacella[full_key] = dict_areacella_per_grid[(source_id, grid_label)]
+
+            continue
+
         ## Do the full search ##
 
         areacella_search_full = catalog.search(
@@ -525,6 +597,8 @@ def get_areacella_apart(catalog, grouped_models: pd.Series) -> dict[str, xr.Data
 
         dict_areacella[full_key] = areacella_ii["areacella"]
 
+        dict_areacella_per_grid[(source_id, grid_label)] = dict_areacella[full_key]
+
     return dict_areacella
 
 
@@ -675,67 +749,53 @@ def update_single_entry_keys(
     return single_model_dictionary
 
 
-###########################
-#### LOADING CMIP6 DATA ###
-###########################
+########################################################
+#### SEARCH THE ENTRIES AND DOWNLOAD THEM ONE BY ONE ###
+########################################################
 
 
-def loading_cmip6(
-    parent_path: str,
-    downloading_folder_name: str,
+def search_cmip6_entries(
     case: str,
-    do_we_clear: bool = False,
     remove_ensembles: bool = False,
-    verbose: bool = False,
-) -> tuple[dict[str, xr.Dataset], dict[str, xr.Dataset]]:
+    search_criterias: dict | None = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> tuple[dict, pd.DataFrame, pd.Series]:
     """
     ---
 
     ### DEFINITION ###
 
-
-    This function loads the CMIP6 data ensemble under the form of a dictionary structure.
+    This function searches the ESGF catalog with the criterias of the chosen case and removes the incomplete entries.
+    It returns what is needed to download the entries one at a time. With several shards, only the entries of the shard are kept (see shard_manifest.py).
 
     ---
 
     ### INPUTS ###
 
-    PARENT_PATH : STR | path of the parent directory of the download folder
-
-    DOWNLOADING_FOLDER_NAME : STR | name to be given to the download folder
-
-    CASE : STR | defines the case for the search :
+    CASE : STR | defines the case for the search (see loading_cmip6)
 
-    - SW (short-wave variables for the APRP method)
-    - ZELINKA-SW (short-wave variables for the APRP method by keeping only the models and variants present in Zelinka and al. (2023))
+    REMOVE_ENSEMBLES : BOOL | option to keep only one variant per model
 
-    DO_WE_CLEAR : BOOL | option to clear the downloading folder if it already exists
+    SEARCH_CRITERIAS : DICT | criterias used instead of the ones of the case (ex: only the new variables of a case) : default is none (the ones of the case)
 
-    REMOVE_ENSEMBLES : BOOL | option to keep only one variant per model
+    SHARD_INDEX : INT | the index of the shard run by this process (ex: the SLURM array task id) : default is 0
 
-    VERBOSE : BOOL | option to keep the warnings regarding connection failures to esgf servers
+    SHARD_COUNT : INT | the number of shards : default is 1 (no sharding)
 
     ---
 
     ### OUTPUTS ###
 
-    FULL_CMIP6_DICT : dictionary | hold a xarray data array for every variable of every single entry in the catalog
+    SEARCH_FACETS : DICT | the search facets of the case
 
-    SEARCH_DATAFRAME : pandas dataframe | hold all the information about the found entries
+    GROUPED_MODELS_DATAFRAME : PANDAS DATAFRAME | one (source_id, member_id, grid_label) row per entry to download
 
-    AREACELLA_DICT : dictionary | hold an areacella xarray data array for every entry in the catalog
+    SERIES_GROUPED_MODELS : PANDAS SERIES | the entries grouped by (source_id, member_id, grid_label) for areacella downloading
 
     ---
     """
 
-    ### SET THE DOWNLOADING FOLDER ###
-
-    set_downloading_folder(
-        parent_path=parent_path,
-        downloading_folder_name=downloading_folder_name,
-        do_we_clear=do_we_clear,
-    )
-
     ### INITIALIZE THE CATALOG ###
 
     ## Define it ##
@@ -750,39 +810,25 @@ def loading_cmip6(
 
         ### SET THE CHOSEN CASE ###
 
-        ## Defining some variables model wide ##
-
-        # The criterias #
-
-        global expected_number_of_files, filtering_by_name, keep_only_dataframe
-
         ## Get the criterias ##
 
-        search_criterias = set_search_criterias(
-            case
-        )  # it's a dictionary with all the needed global search criterias to set
+        if search_criterias is None:
+
+            search_criterias = set_search_criterias(
+                case
+            )  # it's a dictionary with all the needed search criterias to set
 
         ## Get the search facets ##
 
         search_facets = search_criterias["search_facets"]
 
-        ## Get the expected number of files ##
+        ## The filter of the incomplete entries holds the other criterias ##
 
-        expected_number_of_files = search_criterias["expected_number_of_files"]
-
-        ## Do we filter the models we keep by source_id and member_id ? ##
-
-        # Boolean #
-
-        filtering_by_name = search_criterias["filtering_by_name"]
-
-        # The associated dataframe #
-
-        keep_only_dataframe = search_criterias["keep_only_dataframe"]
+        filtering_function = make_filtering_function(search_criterias)
 
         print("The search criterias are : {}\n".format(search_facets))
 
-        ### SET THE SEARCH CRITERIAS (defined globally in this script) ###
+        ### SET THE SEARCH CRITERIAS ###
 
         print("Filling the catalog with the search criterias...\n")
 
@@ -830,70 +876,112 @@ def loading_cmip6(
             .reset_index(drop=True)
         )
 
-        ### DOWNLOAD EVERY SINGLE ENTRY AND COMBINE THEM INTO A DICTIONARY ###
+    ### KEEP THE ENTRIES OF THE SHARD ###
+
+    if shard_count > 1:
+
+        shard_entries = set(
+            select_shard_entries(
+                [".".join(entry) for entry in series_grouped_models.index],
+                shard_index,
+                shard_count,
+            )
+        )
+
+        series_grouped_models = series_grouped_models[
+            [".".join(entry) in shard_entries for entry in series_grouped_models.index]
+        ]
 
-        ## Initialize the full dictionary ##
+        grouped_models_dataframe = grouped_models_dataframe[
+            [
+                ".".join(entry) in shard_entries
+                for entry in grouped_models_dataframe.itertuples(index=False)
+            ]
+        ].reset_index(drop=True)
 
-        full_cmip6_dict = {}
+        print(
+            "Shard {} of {} : {} entries\n".format(
+                shard_index, shard_count, len(grouped_models_dataframe)
+            )
+        )
 
-        ## Downloading all the models one entry at a time ##
+    return (search_facets, grouped_models_dataframe, series_grouped_models)
 
-        print("Downloading and/or loading the data one entry at a time...\n")
 
-        for index in grouped_models_dataframe.index:
+def download_single_entry(
+    search_facets: dict,
+    grouped_models_dataframe: pd.DataFrame,
+    index: int,
+    verbose: bool = False,
+    index_folder: str | None = None,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+    transfer_path: str | None = None,
+) -> dict[str, xr.Dataset]:
+    """
+    ---
 
-            ## Clear the cell output ##
+    ### DEFINITION ###
 
-            clear_output(wait=True)
+    This function downloads (if needed) and opens the data of a single (source_id, member_id, grid_label) entry, restricted to the domain and the range of years.
 
-            ## Reset the catalog ##
+    ---
 
-            catalog = intake_esgf.ESGFCatalog()
+    ### INPUTS ###
 
-            ## Generate the associated search criterias ##
+    SEARCH_FACETS : DICT | the search facets of the case
 
-            search_criterias_given_row, single_model_name = (
-                generate_single_model_search_criterias(
-                    search_facets=search_facets,
-                    grouped_models_dataframe=grouped_models_dataframe,
-                    index=index,
-                )
-            )
+    GROUPED_MODELS_DATAFRAME : PANDAS DATAFRAME | one (source_id, member_id, grid_label) row per entry to download
+
+    INDEX : INT | the index of the entry in grouped_models_dataframe
 
-            ## Generate the single model's output name ##
+    VERBOSE : BOOL | option to keep the warnings regarding connection failures to esgf servers
+
+    INDEX_FOLDER : STR | path of the folder of the reference indexes : default is none (no index)
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain to keep : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain to keep : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years to keep : default is none (every year)
+
+    TRANSFER_PATH : STR | path of the download folder of the asynchronous engine : default is none (downloaded by intake-esgf)
+
+    ---
 
-            print("\nDownloading {} ...\n".format(single_model_name))
+    ### OUTPUTS ###
+
+    SINGLE_MODEL_DICTIONARY : DICT | hold a xarray dataset for every variable and experiment of the entry
+
+    ---
+    """
+
+    with intake_esgf.conf.set(all_indices=True):
 
-            ## Display or not warnings for servers' connections ##
+        ## Reset the catalog ##
 
-            if not verbose:
+        catalog = intake_esgf.ESGFCatalog()
 
-                with warnings.catch_warnings(action="ignore", category=UserWarning):
+        ## Generate the associated search criterias ##
 
-                    ## Apply the search criterias ##
+        search_criterias_given_row, single_model_name = (
+            generate_single_model_search_criterias(
+                search_facets=search_facets,
+                grouped_models_dataframe=grouped_models_dataframe,
+                index=index,
+            )
+        )
 
-                    catalog.search(
-                        **search_criterias_given_row,
-                    )
+        ## Generate the single model's output name ##
 
-                    ## Downloading the output... ##
+        print("\nDownloading {} ...\n".format(single_model_name))
 
-                    single_model_dictionary = catalog.to_dataset_dict(
-                        add_measures=False,
-                        ignore_facets=[
-                            "project",
-                            "mip_era",
-                            "activtity_drs",
-                            "institution_id, table_id",
-                            "grid_label",
-                            "version",
-                        ],
-                        quiet=True,
-                    )
+        ## Display or not warnings for servers' connections ##
 
-            ## We keep the warnings ##
+        if not verbose:
 
-            else:
+            with warnings.catch_warnings(action="ignore", category=UserWarning):
 
                 ## Apply the search criterias ##
 
@@ -903,38 +991,579 @@ def loading_cmip6(
 
                 ## Downloading the output... ##
 
-                single_model_dictionary = catalog.to_dataset_dict(
-                    add_measures=False,
-                    ignore_facets=[
-                        "project",
-                        "mip_era",
-                        "activtity_drs",
-                        "institution_id, table_id",
-                        "grid_label",
-                        "version",
-                    ],
-                    quiet=True,
+                single_model_dictionary = open_single_model_dictionary(
+                    catalog, index_folder=index_folder, transfer_path=transfer_path
                 )
 
-            ## Updating its keys ##
+        ## We keep the warnings ##
 
-            single_model_dictionary = update_single_entry_keys(
-                single_model_dictionary, single_model_name
+        else:
+
+            ## Apply the search criterias ##
+
+            catalog.search(
+                **search_criterias_given_row,
             )
 
-            ## Updating the full dictionary ##
+            ## Downloading the output... ##
+
+            single_model_dictionary = open_single_model_dictionary(
+                catalog,
+                index_folder=index_folder,
+                transfer_path=transfer_path,
+                verbose=True,
+            )
 
-            full_cmip6_dict = full_cmip6_dict | single_model_dictionary
+        ## Restrict it to the domain and the years before reading anything ##
 
-        ### LOAD THE AREACELLA DICTIONARY APART THANKS TO THE CATALOG ###
+        single_model_dictionary = subset_raw_dictionary(
+            single_model_dictionary,
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+            year_range=year_range,
+        )
 
-        print("Downloading and/or loading the areacella dictionary...\n")
+        ## Updating its keys ##
 
-        areacella_dict = get_areacella_apart(
-            catalog, grouped_models=series_grouped_models
+        single_model_dictionary = update_single_entry_keys(
+            single_model_dictionary, single_model_name
         )
 
-    return (full_cmip6_dict, areacella_dict)
+    return single_model_dictionary
+
+
+def get_areacella_single_entry(
+    grouped_models_dataframe: pd.DataFrame,
+    index: int,
+    dict_areacella_per_grid: dict | None = None,
+) -> dict[str, xr.Dataset]:
+    """
+    ---
+
+    ### DEFINITION ###
+
+    This function downloads (if needed) and loads the areacella of a single (source_id, member_id, grid_label) entry.
+
+    ---
+
+    ### INPUTS ###
+
+    GROUPED_MODELS_DATAFRAME : PANDAS DATAFRAME | one (source_id, member_id, grid_label) row per entry to download
+
+    INDEX : INT | the index of the entry in grouped_models_dataframe
+
+    DICT_AREACELLA_PER_GRID : DICT | the areacella already downloaded for every (source_id, grid_label), shared between calls : default is none
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_AREACELLA : DICT | hold the areacella of the entry
+
+    ---
+    """
+
+    ### THE ENTRY AS A GROUPED MODELS SERIES ###
+
+    row = tuple(
+        grouped_models_dataframe.loc[index, ["source_id", "member_id", "grid_label"]]
+    )
+
+    grouped_models = pd.Series([1], index=pd.MultiIndex.from_tuples([row]))
+
+    ### DOWNLOAD ITS AREACELLA ###
+
+    with intake_esgf.conf.set(all_indices=True):
+
+        dict_areacella = get_areacella_apart(
+            intake_esgf.ESGFCatalog(),
+            grouped_models=grouped_models,
+            dict_areacella_per_grid=dict_areacella_per_grid,
+        )
+
+    return dict_areacella
+
+
+###########################
+#### LOADING CMIP6 DATA ###
+###########################
+
+
+def loading_cmip6(
+    parent_path: str,
+    downloading_folder_name: str,
+    case: str,
+    do_we_clear: bool = False,
+    remove_ensembles: bool = False,
+    verbose: bool = False,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+    use_reference_index: bool = False,
+    use_async_transfer: bool = False,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> tuple[dict[str, xr.Dataset], dict[str, xr.Dataset]]:
+    """
+    ---
+
+    ### DEFINITION ###
+
+
+    This function loads the CMIP6 data ensemble under the form of a dictionary structure.
+    Every entry can be restricted to a latitude / longitude domain and a range of years as soon as it is opened : the data is then only read there.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH : STR | path of the parent directory of the download folder
+
+    DOWNLOADING_FOLDER_NAME : STR | name to be given to the download folder
+
+    CASE : STR | defines the case for the search :
+
+    - SW (short-wave variables for the APRP method)
+    - ZELINKA-SW (short-wave variables for the APRP method by keeping only the models and variants present in Zelinka and al. (2023))
+    - SW-AER-COMPONENTS (short-wave variables for the APRP method with the piClim-BC, piClim-SO2 and piClim-OC experiments, when available, in addition to piClim-aer)
+
+    DO_WE_CLEAR : BOOL | option to clear the downloading folder if it already exists
+
+    REMOVE_ENSEMBLES : BOOL | option to keep only one variant per model
+
+    VERBOSE : BOOL | option to keep the warnings regarding connection failures to esgf servers
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain to keep : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain to keep : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years to keep : default is none (every year)
+
+    USE_REFERENCE_INDEX : BOOL | do we reopen the cached files through the reference indexes saved with them (see reference_index.py) ? : default is False
+
+    USE_ASYNC_TRANSFER : BOOL | do we download the files with the asynchronous engine of async_transfer.py instead of intake-esgf ? : default is False
+
+    SHARD_INDEX : INT | the index of the shard run by this process, only its entries are loaded : default is 0
+
+    SHARD_COUNT : INT | the number of shards : default is 1 (no sharding)
+
+    ---
+
+    ### OUTPUTS ###
+
+    FULL_CMIP6_DICT : dictionary | hold a xarray data array for every variable of every single entry in the catalog
+
+    SEARCH_DATAFRAME : pandas dataframe | hold all the information about the found entries
+
+    AREACELLA_DICT : dictionary | hold an areacella xarray data array for every entry in the catalog
+
+    ---
+    """
+
+    ### SET THE DOWNLOADING FOLDER ###
+
+    downloading_path = set_downloading_folder(
+        parent_path=parent_path,
+        downloading_folder_name=downloading_folder_name,
+        do_we_clear=do_we_clear,
+    )
+
+    ## The reference indexes are saved with the data ##
+
+    index_folder = (
+        downloading_path + "/" + REFERENCE_INDEX_FOLDER_NAME
+        if use_reference_index
+        else None
+    )
+
+    ### SEARCH THE ENTRIES OF THE CASE ###
+
+    search_facets, grouped_models_dataframe, series_grouped_models = (
+        search_cmip6_entries(
+            case=case,
+            remove_ensembles=remove_ensembles,
+            shard_index=shard_index,
+            shard_count=shard_count,
+        )
+    )
+
+    ### DOWNLOAD EVERY SINGLE ENTRY AND COMBINE THEM INTO A DICTIONARY ###
+
+    ## Initialize the full dictionary ##
+
+    full_cmip6_dict = {}
+
+    ## Downloading all the models one entry at a time ##
+
+    print("Downloading and/or loading the data one entry at a time...\n")
+
+    for index in grouped_models_dataframe.index:
+
+        ## Clear the cell output ##
+
+        clear_cell_output()
+
+        ## Download and open the entry ##
+
+        single_model_dictionary = download_single_entry(
+            search_facets=search_facets,
+            grouped_models_dataframe=grouped_models_dataframe,
+            index=index,
+            verbose=verbose,
+            index_folder=index_folder,
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+            year_range=year_range,
+            transfer_path=downloading_path if use_async_transfer else None,
+        )
+
+        ## Updating the full dictionary ##
+
+        full_cmip6_dict = full_cmip6_dict | single_model_dictionary
+
+    ### LOAD THE AREACELLA DICTIONARY APART THANKS TO THE CATALOG ###
+
+    print("Downloading and/or loading the areacella dictionary...\n")
+
+    with intake_esgf.conf.set(all_indices=True):
+
+        areacella_dict = get_areacella_apart(
+            intake_esgf.ESGFCatalog(), grouped_models=series_grouped_models
+        )
+
+    return (full_cmip6_dict, areacella_dict)
+
+
+###############################################
+#### LOADING SEVERAL CASES AT THE SAME TIME ###
+###############################################
+
+
+def loading_cmip6_multi_cases(
+    parent_path: str,
+    downloading_folder_name: str,
+    cases: list[str],
+    do_we_clear: bool = False,
+    remove_ensembles: bool = False,
+    verbose: bool = False,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+    use_reference_index: bool = False,
+    use_async_transfer: bool = False,
+) -> dict[str, tuple[dict[str, xr.Dataset], dict[str, xr.Dataset]]]:
+    """
+    ---
+
+    ### DEFINITION ###
+
+    This function loads several cases (ex: SW and ZELINKA-SW) with a single search and a single pass over the cache (see multi_case.py).
+    The entries of every case are selected from the union search with the criterias of the case, and every entry is downloaded once with
+    the union of the experiments and variables the cases need from it. The loaded datasets are then shared between the views of the cases.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH : STR | path of the parent directory of the download folder
+
+    DOWNLOADING_FOLDER_NAME : STR | name to be given to the download folder
+
+    CASES : LIST[STR] | the cases for the search (see loading_cmip6)
+
+    DO_WE_CLEAR : BOOL | option to clear the downloading folder if it already exists
+
+    REMOVE_ENSEMBLES : BOOL | option to keep only one variant per model
+
+    VERBOSE : BOOL | option to keep the warnings regarding connection failures to esgf servers
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain to keep : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain to keep : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years to keep : default is none (every year)
+
+    USE_REFERENCE_INDEX : BOOL | do we reopen the cached files through the reference indexes saved with them (see reference_index.py) ? : default is False
+
+    USE_ASYNC_TRANSFER : BOOL | do we download the files with the asynchronous engine of async_transfer.py instead of intake-esgf ? : default is False
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_CASES : DICT | the (full_cmip6_dict, areacella_dict) of every case, as given by loading_cmip6 for this case alone
+
+    ---
+    """
+
+    ### SET THE DOWNLOADING FOLDER ###
+
+    downloading_path = set_downloading_folder(
+        parent_path=parent_path,
+        downloading_folder_name=downloading_folder_name,
+        do_we_clear=do_we_clear,
+    )
+
+    index_folder = (
+        downloading_path + "/" + REFERENCE_INDEX_FOLDER_NAME
+        if use_reference_index
+        else None
+    )
+
+    ### ONE SEARCH FOR ALL THE CASES ###
+
+    dict_case_criterias = {case: set_search_criterias(case) for case in cases}
+
+    dict_case_facets = {
+        case: search_criterias["search_facets"]
+        for case, search_criterias in dict_case_criterias.items()
+    }
+
+    union_facets = merge_search_facets(list(dict_case_facets.values()))
+
+    print("The union of the search criterias is : {}\n".format(union_facets))
+
+    with intake_esgf.conf.set(all_indices=True):
+
+        search_dataframe = intake_esgf.ESGFCatalog().search(**union_facets).df
+
+    ## The entries of every case, as if it was searched alone ##
+
+    dict_case_entries = {
+        case: select_case_entries(
+            search_dataframe, search_criterias, remove_ensembles=remove_ensembles
+        )
+        for case, search_criterias in dict_case_criterias.items()
+    }
+
+    for case, case_entries in dict_case_entries.items():
+
+        print("{} : {} entries\n".format(case, len(case_entries)))
+
+    ## Every entry once, with the experiments and variables of all its cases ##
+
+    union_entries = build_union_entries(dict_case_entries, dict_case_facets)
+
+    print("{} entries to download and/or load\n".format(len(union_entries)))
+
+    ### DOWNLOAD EVERY ENTRY OF THE UNION ONCE ###
+
+    full_cmip6_dict = {}
+
+    for index in union_entries.index:
+
+        clear_cell_output()
+
+        full_cmip6_dict = full_cmip6_dict | download_single_entry(
+            search_facets=union_facets
+            | {
+                "experiment_id": union_entries.loc[index, "experiment_id"],
+                "variable_id": union_entries.loc[index, "variable_id"],
+            },
+            grouped_models_dataframe=union_entries,
+            index=index,
+            verbose=verbose,
+            index_folder=index_folder,
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+            year_range=year_range,
+            transfer_path=downloading_path if use_async_transfer else None,
+        )
+
+    ## The areacella of every entry of the union ##
+
+    print("Downloading and/or loading the areacella dictionary...\n")
+
+    with intake_esgf.conf.set(all_indices=True):
+
+        areacella_dict = get_areacella_apart(
+            intake_esgf.ESGFCatalog(),
+            grouped_models=pd.Series(
+                1, index=pd.MultiIndex.from_frame(union_entries[ENTRY_FACETS])
+            ),
+        )
+
+    ### ONE VIEW PER CASE ###
+
+    dict_case_views = split_case_views(
+        full_cmip6_dict, dict_case_entries, dict_case_facets
+    )
+
+    dict_cases = {
+        case: (
+            dict_case_views[case],
+            {
+                key: areacella_dict[key]
+                for key in (
+                    ".".join(entry)
+                    for entry in dict_case_entries[case].itertuples(index=False)
+                )
+            },
+        )
+        for case in cases
+    }
+
+    return dict_cases
+
+
+##########################
+#### DRY RUN OF A CASE ###
+##########################
+
+
+def get_case_http_links(
+    search_facets: dict, grouped_models_dataframe: pd.DataFrame
+) -> tuple[dict[str, list[str]], dict[str, int]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function asks intake-esgf the urls of the files of every entry of a case, and their sizes when the file records give them, without downloading them.
+
+    ---
+
+    ### INPUTS ###
+
+    SEARCH_FACETS : DICT | the search facets of the case
+
+    GROUPED_MODELS_DATAFRAME : PANDAS DATAFRAME | one (source_id, member_id, grid_label) row per entry
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_HTTP_LINKS : DICT | the urls of the files of every dataset, under the form (source_id.member_id.grid_label.experiment.variable)
+
+    DICT_SIZES : DICT | the size in bytes of the urls whose file record gives it
+
+    ---
+
+    """
+
+    dict_http_links = {}
+
+    dict_sizes = {}
+
+    with intake_esgf.conf.set(all_indices=True):
+
+        for index in grouped_models_dataframe.index:
+
+            search_criterias_given_row, single_model_name = (
+                generate_single_model_search_criterias(
+                    search_facets=search_facets,
+                    grouped_models_dataframe=grouped_models_dataframe,
+                    index=index,
+                )
+            )
+
+            catalog = intake_esgf.ESGFCatalog()
+
+            catalog.search(**search_criterias_given_row)
+
+            dict_http_links_model, _, dict_sizes_model = get_catalog_http_links(catalog)
+
+            for key, urls in dict_http_links_model.items():
+
+                dict_http_links[single_model_name + "." + key] = urls
+
+            dict_sizes.update(dict_sizes_model)
+
+    return dict_http_links, dict_sizes
+
+
+def dry_run_cmip6(
+    parent_path: str,
+    downloading_folder_name: str,
+    case: str,
+    remove_ensembles: bool = False,
+    disk_quota: float | None = None,
+    memory_quota: float | None = None,
+    grid_catalog: pd.DataFrame | None = None,
+) -> tuple[pd.DataFrame, dict]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function plans the loading of a case (see loading_cmip6) and of its climatologies without downloading anything.
+    It prints the table of the plan and its totals, and raises QuotaExceeded before anything is run if a quota would be exceeded.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH : STR | path of the parent directory of the download folder
+
+    DOWNLOADING_FOLDER_NAME : STR | name of the download folder (the files already there are not counted as downloads)
+
+    CASE : STR | defines the case for the search (see set_search_criterias)
+
+    REMOVE_ENSEMBLES : BOOL | option to keep only one variant per model
+
+    DISK_QUOTA : FLOAT | bytes of disk available : default is none (not checked)
+
+    MEMORY_QUOTA : FLOAT | bytes of memory available : default is none (not checked)
+
+    GRID_CATALOG : PANDAS DATAFRAME | the grid catalog of climatologies already saved, for the exact grid shapes : default is none
+
+    ---
+
+    ### OUTPUTS ###
+
+    PLAN_TABLE : PANDAS DATAFRAME | the table of the plan (see build_plan_table)
+
+    SUMMARY : DICT | the totals of the plan (see summarize_plan)
+
+    ---
+
+    """
+
+    ### RESOLVE THE CATALOG OF THE CASE ###
+
+    downloading_path = set_downloading_folder(
+        parent_path=parent_path,
+        downloading_folder_name=downloading_folder_name,
+        do_we_clear=False,
+    )
+
+    search_facets, grouped_models_dataframe, _ = search_cmip6_entries(
+        case=case, remove_ensembles=remove_ensembles
+    )
+
+    dict_http_links, dict_sizes = get_case_http_links(
+        search_facets, grouped_models_dataframe
+    )
+
+    ### SIZES OF THE FILES WITHOUT DOWNLOADING THEM ###
+
+    ## The sizes missing from the file records are asked to the data nodes, one replica after the other ##
+
+    dict_sizes = fetch_replica_sizes(dict_http_links, downloading_path, dict_sizes)
+
+    ### BUILD THE PLAN ###
+
+    plan_table = build_plan_table(
+        build_file_table(dict_http_links, dict_sizes, downloading_path),
+        grid_catalog=grid_catalog,
+        benchmark_history=read_benchmark_history(
+            downloading_path + "/" + BENCHMARK_FILE_NAME
+        ),
+    )
+
+    summary = summarize_plan(plan_table)
+
+    print("{}\n".format(plan_table.to_string()))
+
+    print("Totals of the plan : {}\n".format(summary))
+
+    ## Fail before anything is run ##
+
+    check_quotas(summary, disk_quota=disk_quota, memory_quota=memory_quota)
+
+    return (plan_table, summary)
 
 
 ######################
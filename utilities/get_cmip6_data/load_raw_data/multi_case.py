@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+
+"""
+This script plans the loading of several cases at once (ex: SW and ZELINKA-SW). The cases are searched together with the union of their facets,
+then the entries of every case are selected from this single search with the criterias of the case. Every entry is downloaded once with the union
+of the experiments and variables the cases need from it, and the loaded dictionary is finally split into one view per case.
+A new case of set_search_criterias (ex: long-wave variables) is handled the same way.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd  # to manage the product of the search
+
+import re  # to read the variant labels
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.load_raw_data.filter_entries import (
+    make_filtering_function,  # to remove the incomplete entries of a case
+)
+
+#################################
+### PARAMETERS OF THE ENTRIES ###
+#################################
+
+ENTRY_FACETS = ["source_id", "member_id", "grid_label"]  # facets of an entry
+
+VARIANT_PATTERN = re.compile(r"r(\d+)i(\d+)p(\d+)f(\d+)")  # ex: r1i1p1f2
+
+#############################
+### UNION OF THE SEARCHES ###
+#############################
+
+
+def as_list(value) -> list:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the value of a search facet as a list.
+
+    ---
+
+    ### INPUTS ###
+
+    VALUE : STR OR LIST[STR] | the value of the facet
+
+    ---
+
+    ### OUTPUTS ###
+
+    LIST_VALUES : LIST[STR] | the values of the facet
+
+    ---
+
+    """
+
+    if isinstance(value, (list, tuple)):
+
+        return list(value)
+
+    return [value]
+
+
+def merge_search_facets(list_search_facets: list[dict]) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function merges the search facets of several cases into the facets of a single search finding the entries of all of them.
+    The values of every facet are the union of the values of the cases, in their order of appearance. A facet missing from a case
+    does not restrict its search : it is left out of the union search, and the rows of every case are selected afterwards (see select_case_rows).
+
+    ---
+
+    ### INPUTS ###
+
+    LIST_SEARCH_FACETS : LIST[DICT] | the search facets of every case
+
+    ---
+
+    ### OUTPUTS ###
+
+    UNION_FACETS : DICT | the facets of the union search, a single value being kept as a string
+
+    ---
+
+    """
+
+    union_facets = {}
+
+    for search_facets in list_search_facets:
+
+        for facet, value in search_facets.items():
+
+            union_facets[facet] = list(
+                dict.fromkeys(union_facets.get(facet, []) + as_list(value))
+            )
+
+    ## A facet missing from a case is a wildcard ##
+
+    union_facets = {
+        facet: values[0] if len(values) == 1 else values
+        for facet, values in union_facets.items()
+        if all(facet in search_facets for search_facets in list_search_facets)
+    }
+
+    return union_facets
+
+
+def select_case_rows(
+    search_dataframe: pd.DataFrame, search_facets: dict
+) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function keeps the datasets of the union search matching the search facets of one case, including the facets left out of the union search.
+
+    ---
+
+    ### INPUTS ###
+
+    SEARCH_DATAFRAME : PANDAS DATAFRAME | one row per dataset found by the union search (ex: catalog.df of intake-esgf)
+
+    SEARCH_FACETS : DICT | the search facets of the case
+
+    ---
+
+    ### OUTPUTS ###
+
+    CASE_DATAFRAME : PANDAS DATAFRAME | the datasets of the case
+
+    ---
+
+    """
+
+    is_in_case = pd.Series(True, index=search_dataframe.index)
+
+    for facet, value in search_facets.items():
+
+        if facet in search_dataframe.columns:
+
+            is_in_case &= search_dataframe[facet].isin(as_list(value))
+
+    case_dataframe = search_dataframe[is_in_case]
+
+    return case_dataframe
+
+
+#############################
+### THE ENTRIES OF A CASE ###
+#############################
+
+
+def get_variant_order(member_id: str) -> tuple:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the numbers of a variant label so that the variants are sorted as r1i1p1f1 < r1i1p1f2 < r2i1p1f1 < r10i1p1f1,
+    as intake-esgf does to keep one variant per model.
+
+    ---
+
+    ### INPUTS ###
+
+    MEMBER_ID : STR | the variant label
+
+    ---
+
+    ### OUTPUTS ###
+
+    VARIANT_ORDER : TUPLE | the (realization, initialization, physics, forcing) numbers, the label itself after them if it is not a variant label
+
+    ---
+
+    """
+
+    match = VARIANT_PATTERN.fullmatch(member_id)
+
+    if match is None:
+
+        return (float("inf"), member_id)
+
+    variant_order = tuple(int(number) for number in match.groups())
+
+    return variant_order
+
+
+def select_case_entries(
+    search_dataframe: pd.DataFrame,
+    search_criterias: dict,
+    remove_ensembles: bool = False,
+) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function selects the complete entries of a case from the union search, as the search of the case alone would (see search_cmip6_entries).
+    With remove_ensembles, the first variant of every (source_id, grid_label) couple in the numerical order of the variants is kept (see get_variant_order).
+
+    ---
+
+    ### INPUTS ###
+
+    SEARCH_DATAFRAME : PANDAS DATAFRAME | one row per dataset found by the union search
+
+    SEARCH_CRITERIAS : DICT | the search criterias of the case (see set_search_criterias)
+
+    REMOVE_ENSEMBLES : BOOL | option to keep only one variant per model : default is False
+
+    ---
+
+    ### OUTPUTS ###
+
+    CASE_ENTRIES : PANDAS DATAFRAME | one (source_id, member_id, grid_label) row per entry of the case
+
+    ---
+
+    """
+
+    ### THE DATASETS OF THE CASE ###
+
+    case_dataframe = select_case_rows(
+        search_dataframe, search_criterias["search_facets"]
+    )
+
+    ### REMOVE THE INCOMPLETE ENTRIES ###
+
+    filtering_function = make_filtering_function(search_criterias)
+
+    case_entries = pd.DataFrame(
+        [
+            entry
+            for entry, grouped_model_entry in case_dataframe.groupby(
+                ENTRY_FACETS, sort=True
+            )
+            if filtering_function(grouped_model_entry)
+        ],
+        columns=ENTRY_FACETS,
+    )
+
+    ### DO WE KEEP ONLY ONE VARIANT PER MODEL ? ###
+
+    if remove_ensembles:
+
+        kept_indexes = [
+            min(
+                grouped_entries.index,
+                key=lambda index: get_variant_order(
+                    case_entries.loc[index, "member_id"]
+                ),
+            )
+            for _, grouped_entries in case_entries.groupby(
+                ["source_id", "grid_label"], sort=False
+            )
+        ]
+
+        case_entries = case_entries.loc[sorted(kept_indexes)]
+
+    case_entries = case_entries.reset_index(drop=True)
+
+    return case_entries
+
+
+#########################
+### THE UNION TO LOAD ###
+#########################
+
+
+def build_union_entries(
+    dict_case_entries: dict[str, pd.DataFrame],
+    dict_case_facets: dict[str, dict],
+) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gathers the entries of every case and the union of the experiments and variables the cases need from each of them :
+    an entry shared by several cases is downloaded once.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_CASE_ENTRIES : DICT | the (source_id, member_id, grid_label) entries of every case
+
+    DICT_CASE_FACETS : DICT | the search facets of every case
+
+    ---
+
+    ### OUTPUTS ###
+
+    UNION_ENTRIES : PANDAS DATAFRAME | one row per entry with the "source_id", "member_id", "grid_label", "experiment_id" (list),
+    "variable_id" (list) and "cases" (list) columns
+
+    ---
+
+    """
+
+    dict_union = {}
+
+    for case, case_entries in dict_case_entries.items():
+
+        search_facets = dict_case_facets[case]
+
+        for entry in case_entries[ENTRY_FACETS].itertuples(index=False, name=None):
+
+            needed = dict_union.setdefault(
+                entry, {"experiment_id": [], "variable_id": [], "cases": []}
+            )
+
+            for facet in ["experiment_id", "variable_id"]:
+
+                needed[facet] = list(
+                    dict.fromkeys(needed[facet] + as_list(search_facets[facet]))
+                )
+
+            needed["cases"].append(case)
+
+    union_entries = pd.DataFrame(
+        [list(entry) + list(needed.values()) for entry, needed in dict_union.items()],
+        columns=ENTRY_FACETS + ["experiment_id", "variable_id", "cases"],
+    )
+
+    return union_entries
+
+
+def split_case_views(
+    full_cmip6_dict: dict,
+    dict_case_entries: dict[str, pd.DataFrame],
+    dict_case_facets: dict[str, dict],
+) -> dict[str, dict]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function splits the dictionary loaded for the union of the cases into one dictionary per case. The datasets are shared, not copied.
+
+    ---
+
+    ### INPUTS ###
+
+    FULL_CMIP6_DICT : DICT | the datasets of the union, under the form (source_id.member_id.grid_label.experiment.variable)
+
+    DICT_CASE_ENTRIES : DICT | the (source_id, member_id, grid_label) entries of every case
+
+    DICT_CASE_FACETS : DICT | the search facets of every case
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_CASE_VIEWS : DICT | the dictionary of every case, with the keys it would have if it was loaded alone
+
+    ---
+
+    """
+
+    dict_case_views = {}
+
+    for case, case_entries in dict_case_entries.items():
+
+        entry_names = set(
+            ".".join(entry)
+            for entry in case_entries[ENTRY_FACETS].itertuples(index=False)
+        )
+
+        experiments = as_list(dict_case_facets[case]["experiment_id"])
+
+        variables = as_list(dict_case_facets[case]["variable_id"])
+
+        dict_case_views[case] = {
+            key: dataset
+            for key, dataset in full_cmip6_dict.items()
+            if ".".join(key.split(".")[:3]) in entry_names
+            and key.split(".")[3] in experiments
+            and key.split(".")[4] in variables
+        }
+
+    return dict_case_views
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+"""
+This script opens the datasets found by the search of a single model, with intake-esgf, through the reference indexes of reference_index.py
+or after their download by the asynchronous engine of async_transfer.py. For the asynchronous engine, the urls and checksums of the files
+are read from the file records of the indexes of the catalog, and the datasets get the keys intake-esgf would give them.
+Only the catalog object is used here : intake-esgf itself is imported by load_cmip6.py.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import pandas as pd  # to manage the product of the search
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.folders_handle.cache_manager import (
+    record_access,  # to date the use of the raw files for the eviction
+)
+
+from utilities.get_cmip6_data.load_raw_data.reference_index import (
+    open_with_reference_index,  # to reopen the cached files through a saved index
+    TIME_CODER,  # time decoding of the opened files
+)
+
+from utilities.get_cmip6_data.load_raw_data.replica_selection import (
+    download_http_links,  # optional asynchronous transfer engine, best replicas first
+)
+
+###################################
+### KEYS OF THE OPENED DATASETS ###
+###################################
+
+## Facets not used in the keys of the dictionaries ##
+
+IGNORED_FACETS = [
+    "project",
+    "mip_era",
+    "activtity_drs",
+    "institution_id, table_id",
+    "grid_label",
+    "version",
+]
+
+## Facets of a dataset, in the order of the CMIP6 DRS ##
+
+KEY_FACETS = [
+    "mip_era",
+    "activity_drs",
+    "institution_id",
+    "source_id",
+    "experiment_id",
+    "member_id",
+    "table_id",
+    "variable_id",
+    "grid_label",
+]
+
+## Type of the links of the file records downloaded by the asynchronous engine ##
+
+HTTP_LINK_TYPE = "HTTPServer"
+
+## Name of the folder of the reference indexes in the download folder ##
+
+REFERENCE_INDEX_FOLDER_NAME = "reference_index"
+
+
+def get_catalog_keys(
+    search_dataframe: pd.DataFrame, ignore_facets: list[str] = IGNORED_FACETS
+) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the key of every dataset of a search as intake-esgf builds them : the facets of the DRS which vary in the search,
+    without the ignored ones, joined by dots (ex: piClim-aer.rsdt for the search of a single model).
+
+    ---
+
+    ### INPUTS ###
+
+    SEARCH_DATAFRAME : PANDAS DATAFRAME | the datasets of the search, one row per dataset (catalog.df)
+
+    IGNORE_FACETS : LIST[STR] | the facets left out of the keys : default is IGNORED_FACETS
+
+    ---
+
+    ### OUTPUTS ###
+
+    LIST_KEYS : LIST[STR] | the key of every row
+
+    ---
+
+    """
+
+    ### FACETS OF THE KEYS ###
+
+    known_facets = [
+        facet
+        for facet in KEY_FACETS
+        if facet in search_dataframe.columns and facet not in ignore_facets
+    ]
+
+    key_facets = [
+        facet for facet in known_facets if search_dataframe[facet].nunique() > 1
+    ]
+
+    ## A search of a single dataset keeps all its facets ##
+
+    if not key_facets:
+
+        key_facets = known_facets
+
+    list_keys = [
+        ".".join(str(value) for value in row)
+        for row in search_dataframe[key_facets].itertuples(index=False)
+    ]
+
+    return list_keys
+
+
+def get_catalog_http_links(
+    catalog, ignore_facets: list[str] = IGNORED_FACETS
+) -> tuple[dict[str, list[str]], dict[str, tuple[str, str]], dict[str, int]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the urls, the checksums and the sizes of the files of every dataset of a search, from the file records of the indexes of the catalog.
+    The urls of every replica found by the indexes are kept (see replica_selection.py). An index which does not answer is left,
+    and ValueError is raised if no url was found for a dataset.
+
+    ---
+
+    ### INPUTS ###
+
+    CATALOG : intake-esgf object | catalog holding the search, with its datasets (catalog.df) and its indexes (catalog.indices)
+
+    IGNORE_FACETS : LIST[STR] | the facets left out of the keys : default is IGNORED_FACETS
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_HTTP_LINKS : DICT | the urls of the files of every dataset, keyed as intake-esgf does (see get_catalog_keys)
+
+    DICT_CHECKSUMS : DICT | the type and value of the checksum of every url, when the index record gives one
+
+    DICT_SIZES : DICT | the size in bytes of every url, when the index record gives one
+
+    ---
+
+    """
+
+    ### KEY OF EVERY DATASET ###
+
+    # The ids of the search are followed by the data node (id|data_node) #
+
+    dict_dataset_keys = {}
+
+    for key, dataset_ids in zip(
+        get_catalog_keys(catalog.df, ignore_facets), catalog.df["id"]
+    ):
+
+        for dataset_id in dataset_ids:
+
+            dict_dataset_keys[dataset_id.split("|")[0]] = key
+
+    dataset_ids = [
+        dataset_id for dataset_ids in catalog.df["id"] for dataset_id in dataset_ids
+    ]
+
+    ### FILE RECORDS OF EVERY INDEX ###
+
+    dict_http_links = {key: [] for key in dict_dataset_keys.values()}
+
+    dict_checksums = {}
+
+    dict_sizes = {}
+
+    for index in catalog.indices:
+
+        ## An index which does not answer is left : the others may hold the same files ##
+
+        try:
+
+            file_infos = index.get_file_info(dataset_ids)
+
+        except OSError:
+
+            continue
+
+        for file_info in file_infos:
+
+            key = dict_dataset_keys.get(file_info["dataset_id"].split("|")[0])
+
+            if key is None:
+
+                continue
+
+            urls = file_info.get(HTTP_LINK_TYPE, [])
+
+            dict_http_links[key].extend(urls)
+
+            ## The replicas of a file share the checksum of its record ##
+
+            if file_info.get("checksum"):
+
+                for url in urls:
+
+                    dict_checksums[url] = (
+                        file_info["checksum_type"],
+                        file_info["checksum"],
+                    )
+
+            ## And its size ##
+
+            if file_info.get("size"):
+
+                for url in urls:
+
+                    dict_sizes[url] = int(file_info["size"])
+
+    ### EVERY DATASET HAS FILES ###
+
+    for key, urls in dict_http_links.items():
+
+        if not urls:
+
+            raise ValueError(
+                "{} -> No HTTP link was found for this dataset".format(key)
+            )
+
+        # The same replica may be given by several indexes #
+
+        dict_http_links[key] = list(dict.fromkeys(urls))
+
+    return dict_http_links, dict_checksums, dict_sizes
+
+
+########################################################
+### OPEN THE DATASETS FOUND BY A SINGLE MODEL SEARCH ###
+########################################################
+
+
+def open_single_model_dictionary(
+    catalog,
+    index_folder: str | None = None,
+    transfer_path: str | None = None,
+    verbose: bool = False,
+) -> dict[str, xr.Dataset]:
+    """
+    ---
+
+    ### DEFINITION ###
+
+    This function downloads (if needed) and opens the datasets found by the search of a single model. Without index folder they are opened by intake-esgf.
+    Otherwise only the paths of the files are asked to intake-esgf and every time series is opened through its reference index.
+    With a transfer path, the urls and checksums of the files are read from the file records of the catalog (see get_catalog_http_links) :
+    they are downloaded by the asynchronous engine of async_transfer.py.
+    When the paths of the files are known, their access is written in the access log of the download folder (see cache_manager.py).
+    A file removed from the cache is downloaded again by intake-esgf or by the asynchronous engine.
+
+    ---
+
+    ### INPUTS ###
+
+    CATALOG : intake-esgf object | catalog holding the search of a single model
+
+    INDEX_FOLDER : STR | path of the folder of the reference indexes : default is none (no index)
+
+    TRANSFER_PATH : STR | path of the download folder of the asynchronous engine : default is none (downloaded by intake-esgf)
+
+    VERBOSE : BOOL | do we print the throughput of every data node with the asynchronous engine ? : default is False
+
+    ---
+
+    ### OUTPUTS ###
+
+    SINGLE_MODEL_DICTIONARY : DICT | hold a xarray dataset for every variable and experiment of the model
+
+    ---
+    """
+
+    ### DOWNLOADED BY THE ASYNCHRONOUS ENGINE ###
+
+    if transfer_path is not None:
+
+        dict_http_links, dict_checksums, _ = get_catalog_http_links(
+            catalog, ignore_facets=IGNORED_FACETS
+        )
+
+        dict_paths = download_http_links(
+            dict_http_links,
+            downloading_path=transfer_path,
+            verbose=verbose,
+            dict_checksums=dict_checksums,
+        )
+
+        record_access(
+            transfer_path, [path for paths in dict_paths.values() for path in paths]
+        )
+
+        single_model_dictionary = {
+            key: (
+                open_with_reference_index(
+                    paths=paths, index_folder=index_folder, name=key
+                )
+                if index_folder is not None
+                else xr.open_mfdataset(paths, decode_times=TIME_CODER)
+            )
+            for key, paths in dict_paths.items()
+        }
+
+    ### OPENED BY INTAKE-ESGF ###
+
+    elif index_folder is None:
+
+        single_model_dictionary = catalog.to_dataset_dict(
+            add_measures=False,
+            ignore_facets=IGNORED_FACETS,
+            quiet=True,
+        )
+
+    ### OPENED THROUGH THE REFERENCE INDEXES ###
+
+    else:
+
+        dict_paths = catalog.to_path_dict(ignore_facets=IGNORED_FACETS, quiet=True)
+
+        ## The reference indexes are saved in the download folder ##
+
+        record_access(
+            index_folder.rsplit("/", 1)[0],
+            [str(path) for paths in dict_paths.values() for path in paths],
+        )
+
+        single_model_dictionary = {
+            key: open_with_reference_index(
+                paths=[str(path) for path in paths], index_folder=index_folder, name=key
+            )
+            for key, paths in dict_paths.items()
+        }
+
+    return single_model_dictionary
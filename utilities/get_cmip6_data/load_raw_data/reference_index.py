@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+
+"""
+This script is used to reopen the raw data of the local cache without decoding again the metadata of every file of a multi-file time series.
+For every entry and variable, a reference index is built once and saved as a json file next to the data :
+
+- if kerchunk is installed, the index maps every chunk of the variables to a byte range of the cached netcdf files, and the time series is opened
+as a single zarr store with one metadata read ;
+- otherwise, the index holds the files sorted along the time axis and their combined time coordinate, which allows to concatenate them
+without decoding and comparing their time axes.
+
+The index is associated to the paths, sizes and modification times of the files : it is rebuilt if one of them changes.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the files
+
+import json  # to save the reference index
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to combine the time axes of the files
+
+### VIRTUAL REFERENCES (OPTIONAL) ###
+
+try:
+
+    from kerchunk.hdf import SingleHdf5ToZarr  # references of one netcdf4 file
+
+    from kerchunk.combine import MultiZarrToZarr  # to combine them along time
+
+    HAS_KERCHUNK = True
+
+except ImportError:
+
+    HAS_KERCHUNK = False
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.store_data.hash_files import (
+    hash_files,  # to identify the files an index was built from
+)
+
+from utilities.get_cmip6_data.folders_handle.create import (
+    create_dir,  # to create the folder of the indexes
+)
+
+############################
+### FORMATS OF THE INDEX ###
+############################
+
+INDEX_FORMATS = [
+    "kerchunk",  # chunks mapped to byte ranges of the files
+    "file_list",  # files sorted along the time axis
+]
+
+## Time decoding shared by every opening ##
+
+TIME_CODER = xr.coders.CFDatetimeCoder(use_cftime=True)
+
+###################################
+### TIME COORDINATE OF A SERIES ###
+###################################
+
+
+def encode_time_coordinate(list_datasets: list[xr.Dataset]) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function combines the decoded time axes of the files of a time series, in their order, and encodes them with the units
+    and calendar of the first file, with the time bounds if the files have some.
+
+    ---
+
+    ### INPUTS ###
+
+    LIST_DATASETS : LIST[XR DATASET] | the files of the time series, sorted along the time axis, opened with their times decoded
+
+    ---
+
+    ### OUTPUTS ###
+
+    TIME_INDEX : DICT | the "units", "calendar" and encoded "values" of the time axis, and the "bounds_name", "bounds_dims" and encoded "bounds"
+    of its bounds (none without bounds)
+
+    ---
+
+    """
+
+    first_time = list_datasets[0]["time"]
+
+    units = first_time.encoding["units"]
+
+    calendar = first_time.encoding.get("calendar", "standard")
+
+    ## The values of every file in the units of the first one ##
+
+    values, _, _ = xr.coding.times.encode_cf_datetime(
+        np.concatenate([dataset["time"].values for dataset in list_datasets]),
+        units=units,
+        calendar=calendar,
+    )
+
+    time_index = {
+        "units": units,
+        "calendar": calendar,
+        "values": values.tolist(),
+        "bounds_name": None,
+        "bounds_dims": None,
+        "bounds": None,
+    }
+
+    ### THE BOUNDS OF THE TIME STEPS ###
+
+    bounds_name = first_time.attrs.get("bounds", first_time.encoding.get("bounds"))
+
+    if bounds_name in list_datasets[0].variables:
+
+        bounds = np.concatenate(
+            [dataset[bounds_name].values for dataset in list_datasets]
+        )
+
+        encoded_bounds, _, _ = xr.coding.times.encode_cf_datetime(
+            bounds.ravel(), units=units, calendar=calendar
+        )
+
+        time_index |= {
+            "bounds_name": bounds_name,
+            "bounds_dims": list(list_datasets[0][bounds_name].dims),
+            "bounds": encoded_bounds.reshape(bounds.shape).tolist(),
+        }
+
+    return time_index
+
+
+def assign_time_coordinate(dataset: xr.Dataset, time_index: dict) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function decodes once the combined time coordinate saved in a reference index and assigns it to the time series opened
+    without decoding its times, in place of the raw time axes of its files.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the time series opened without decoding its times
+
+    TIME_INDEX : DICT | the time coordinate of the reference index (see encode_time_coordinate)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET : XR DATASET | the time series with its decoded time coordinate
+
+    ---
+
+    """
+
+    ### CHECK THE NUMBER OF TIME STEPS ###
+
+    if len(time_index["values"]) != dataset.sizes["time"]:
+
+        raise ValueError(
+            "{} -> The time coordinate of the reference index does not have the {} time steps of the files".format(
+                len(time_index["values"]), dataset.sizes["time"]
+            )
+        )
+
+    ### DECODE IT ONCE ###
+
+    time_attrs = {"units": time_index["units"], "calendar": time_index["calendar"]}
+
+    encoded_time = xr.Dataset(
+        coords={"time": ("time", time_index["values"], time_attrs)}
+    )
+
+    if time_index["bounds_name"] is not None:
+
+        encoded_time[time_index["bounds_name"]] = (
+            time_index["bounds_dims"],
+            time_index["bounds"],
+            time_attrs,
+        )
+
+    decoded_time = xr.decode_cf(encoded_time, decode_times=TIME_CODER)
+
+    ### REPLACE THE RAW TIME AXES ###
+
+    dataset = dataset.assign_coords(time=decoded_time["time"])
+
+    if time_index["bounds_name"] is not None:
+
+        dataset[time_index["bounds_name"]] = decoded_time[time_index["bounds_name"]]
+
+    return dataset
+
+
+###########################################
+### IDENTIFY THE FILES OF A TIME SERIES ###
+###########################################
+
+
+def get_files_signature(paths: list[str]) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes a hash of the paths, sizes and modification times of some files. It changes as soon as a file is added, removed
+    or rewritten, without reading the content of the files.
+
+    ---
+
+    ### INPUTS ###
+
+    PATHS : LIST[STR] | the paths of the files
+
+    ---
+
+    ### OUTPUTS ###
+
+    SIGNATURE : STR | the hexadecimal hash
+
+    ---
+
+    """
+
+    extra_strings = []
+
+    for path in sorted(paths):
+
+        stat = os.stat(path)
+
+        extra_strings += [
+            os.path.abspath(path),
+            str(stat.st_size),
+            str(stat.st_mtime_ns),
+        ]
+
+    signature = hash_files([], extra_strings=extra_strings)
+
+    return signature
+
+
+#################################
+### BUILD THE REFERENCE INDEX ###
+#################################
+
+
+def build_reference_index(paths: list[str], use_kerchunk: bool = HAS_KERCHUNK) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function builds the reference index of a multi-file time series. With kerchunk, the references of every file are combined along
+    the time axis. Otherwise the files are sorted by their first time step and their combined time coordinate is saved with them.
+
+    ---
+
+    ### INPUTS ###
+
+    PATHS : LIST[STR] | the paths of the netcdf files of the time series
+
+    USE_KERCHUNK : BOOL | do we build byte-range references ? : default is True if kerchunk is installed
+
+    ---
+
+    ### OUTPUTS ###
+
+    REFERENCE_INDEX : DICT | the index with its "format", the "signature" of the files and the "references" or the sorted "paths" and their "time"
+
+    ---
+
+    """
+
+    ### BYTE-RANGE REFERENCES ###
+
+    if use_kerchunk:
+
+        ## References of every file ##
+
+        list_references = []
+
+        for path in paths:
+
+            with open(path, "rb") as file:
+
+                list_references.append(
+                    SingleHdf5ToZarr(file, os.path.abspath(path)).translate()
+                )
+
+        ## Combine them along the time axis ##
+
+        references = MultiZarrToZarr(
+            list_references,
+            concat_dims=["time"],
+            coo_map={"time": "cf:time"},
+        ).translate()
+
+        reference_index = {"format": "kerchunk", "references": references}
+
+    ### FILES SORTED ALONG THE TIME AXIS ###
+
+    else:
+
+        ## The units of time may differ from one file to another : they are decoded ##
+
+        list_datasets = [
+            xr.open_dataset(path, decode_times=TIME_CODER) for path in paths
+        ]
+
+        order = sorted(
+            range(len(paths)), key=lambda ii: list_datasets[ii]["time"].values[0]
+        )
+
+        ## The combined time coordinate is decoded once when the series is opened ##
+
+        time_index = encode_time_coordinate([list_datasets[ii] for ii in order])
+
+        for dataset in list_datasets:
+
+            dataset.close()
+
+        reference_index = {
+            "format": "file_list",
+            "paths": [os.path.abspath(paths[ii]) for ii in order],
+            "time": time_index,
+        }
+
+    reference_index["signature"] = get_files_signature(paths)
+
+    return reference_index
+
+
+#################################
+### SAVE AND READ THE INDEXES ###
+#################################
+
+
+def write_reference_index(reference_index: dict, index_path: str):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function saves a reference index as a json file.
+
+    ---
+
+    ### INPUTS ###
+
+    REFERENCE_INDEX : DICT | the reference index
+
+    INDEX_PATH : STR | path of the json file
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    with open(index_path, "w") as file:
+
+        json.dump(reference_index, file)
+
+    return
+
+
+def read_reference_index(index_path: str) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads a reference index saved as a json file.
+
+    ---
+
+    ### INPUTS ###
+
+    INDEX_PATH : STR | path of the json file
+
+    ---
+
+    ### OUTPUTS ###
+
+    REFERENCE_INDEX : DICT | the reference index
+
+    ---
+
+    """
+
+    with open(index_path, "r") as file:
+
+        reference_index = json.load(file)
+
+    return reference_index
+
+
+##############################################
+### OPEN A TIME SERIES WITH ITS REFERENCES ###
+##############################################
+
+
+def open_reference_index(reference_index: dict) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function opens lazily the time series described by a reference index.
+
+    ---
+
+    ### INPUTS ###
+
+    REFERENCE_INDEX : DICT | the reference index
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET : XR DATASET | the lazy dataset of the whole time series
+
+    ---
+
+    """
+
+    ### CHECK THE FORMAT ###
+
+    if reference_index["format"] not in INDEX_FORMATS:
+
+        raise ValueError(
+            "{} -> The format of the reference index must be one of {}".format(
+                reference_index["format"], INDEX_FORMATS
+            )
+        )
+
+    ### ONE ZARR STORE MADE OF THE REFERENCES ###
+
+    if reference_index["format"] == "kerchunk":
+
+        dataset = xr.open_dataset(
+            "reference://",
+            engine="zarr",
+            decode_times=TIME_CODER,
+            backend_kwargs={
+                "consolidated": False,
+                "storage_options": {"fo": reference_index["references"]},
+            },
+        )
+
+    ### THE SORTED FILES CONCATENATED WITHOUT COMPARING THEIR COORDINATES ###
+
+    else:
+
+        ## The time axes of the files are not decoded when the index holds their combination ##
+
+        has_time = "time" in reference_index
+
+        dataset = xr.open_mfdataset(
+            reference_index["paths"],
+            combine="nested",
+            concat_dim="time",
+            data_vars="minimal",
+            coords="minimal",
+            compat="override",
+            join="override",
+            decode_times=False if has_time else TIME_CODER,
+        )
+
+        if has_time:
+
+            dataset = assign_time_coordinate(dataset, reference_index["time"])
+
+    return dataset
+
+
+def open_with_reference_index(
+    paths: list[str], index_folder: str, name: str
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function opens a multi-file time series through its reference index saved in index_folder. The index is built and saved
+    the first time, and rebuilt only if the files changed since then.
+
+    ---
+
+    ### INPUTS ###
+
+    PATHS : LIST[STR] | the paths of the netcdf files of the time series
+
+    INDEX_FOLDER : STR | path of the folder holding the indexes
+
+    NAME : STR | name of the index (ex: the key of the entry and variable)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET : XR DATASET | the lazy dataset of the whole time series
+
+    ---
+
+    """
+
+    index_path = os.path.join(index_folder, name + ".json")
+
+    ### REUSE THE SAVED INDEX IF THE FILES DID NOT CHANGE ###
+
+    reference_index = None
+
+    if os.path.exists(index_path):
+
+        reference_index = read_reference_index(index_path)
+
+        if reference_index["signature"] != get_files_signature(paths):
+
+            reference_index = None
+
+    ### OTHERWISE BUILD AND SAVE IT ###
+
+    if reference_index is None:
+
+        reference_index = build_reference_index(paths)
+
+        create_dir(parent_path=index_folder, name="", clear=False)
+
+        write_reference_index(reference_index, index_path)
+
+    dataset = open_reference_index(reference_index)
+
+    return dataset
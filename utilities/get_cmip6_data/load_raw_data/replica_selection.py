@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+
+"""
+This script chooses from which data node the raw CMIP6 files are downloaded when several replicas of them exist.
+The throughput, latency and errors of every data node seen by the transfer engine of async_transfer.py are kept from one run to the next
+in a json file next to the local cache. The replicas of a file are then taken from the best data node to the worst one, and
+a transfer slower than a threshold is resumed from the next replica. The replicas can also be raced with a small request before the transfer.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the files
+
+import json  # to save the statistics of the data nodes
+
+import time  # to measure the duration of the downloads
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.load_raw_data.async_transfer import (
+    download_replicas,  # to download the files from their replicas
+    fetch_file_sizes,  # sizes of the files without downloading them
+    get_host_key,  # data node of an url
+    get_local_path,  # path of a file in the download folder
+    get_throughput,  # throughput of a data node
+    init_host_statistics,  # counters of a data node
+    DEFAULT_MAX_CONNECTIONS_PER_HOST,  # simultaneous transfers per data node
+)
+
+from utilities.get_cmip6_data.load_raw_data.dry_run import (
+    record_benchmark,  # to save the duration of the downloads for the dry runs
+    BENCHMARK_FILE_NAME,  # file of the benchmarks in the download folder
+)
+
+################################################
+### PARAMETERS OF THE CHOICE OF THE REPLICAS ###
+################################################
+
+HOST_STATISTICS_FILE_NAME = "host_statistics.json"  # saved in the download folder
+
+HISTORY_WEIGHT = 0.5  # weight of the previous runs when the statistics are updated
+
+DEFAULT_MIN_THROUGHPUT = 1e5  # bytes per second under which a replica is left
+
+####################################
+### SAVE AND READ THE STATISTICS ###
+####################################
+
+
+def read_host_statistics(statistics_path: str) -> dict[str, dict]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the statistics of the data nodes saved by the previous runs.
+
+    ---
+
+    ### INPUTS ###
+
+    STATISTICS_PATH : STR | path of the json file
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_STATISTICS : DICT | the counters of every data node, empty if nothing was saved
+
+    ---
+
+    """
+
+    if not os.path.exists(statistics_path):
+
+        return {}
+
+    with open(statistics_path, "r") as file:
+
+        dict_statistics = json.load(file)
+
+    return dict_statistics
+
+
+def write_host_statistics(dict_statistics: dict[str, dict], statistics_path: str):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function saves the statistics of the data nodes as a json file.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_STATISTICS : DICT | the counters of every data node
+
+    STATISTICS_PATH : STR | path of the json file
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    with open(statistics_path, "w") as file:
+
+        json.dump(dict_statistics, file, indent=1)
+
+    return
+
+
+def merge_host_statistics(
+    history: dict[str, dict],
+    dict_statistics: dict[str, dict],
+    history_weight: float = HISTORY_WEIGHT,
+) -> dict[str, dict]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function adds the counters of a run to the ones of the previous runs. The previous counters are multiplied by history_weight first :
+    the state of a data node is mostly given by the last runs.
+
+    ---
+
+    ### INPUTS ###
+
+    HISTORY : DICT | the counters of every data node over the previous runs
+
+    DICT_STATISTICS : DICT | the counters of every data node during the last run
+
+    HISTORY_WEIGHT : FLOAT | weight of the previous runs, between 0 and 1 : default is HISTORY_WEIGHT
+
+    ---
+
+    ### OUTPUTS ###
+
+    MERGED_STATISTICS : DICT | the updated counters of every data node
+
+    ---
+
+    """
+
+    ### CHECK THE WEIGHT ###
+
+    if not 0.0 <= history_weight <= 1.0:
+
+        raise ValueError(
+            "{} -> The weight of the previous runs must be between 0 and 1".format(
+                history_weight
+            )
+        )
+
+    ### MERGE THE COUNTERS OF EVERY DATA NODE ###
+
+    merged_statistics = {}
+
+    for host_key in set(history) | set(dict_statistics):
+
+        old_statistics = init_host_statistics() | history.get(host_key, {})
+
+        new_statistics = init_host_statistics() | dict_statistics.get(host_key, {})
+
+        merged_statistics[host_key] = {
+            name: history_weight * old_statistics[name] + new_statistics[name]
+            for name in old_statistics
+        }
+
+    return merged_statistics
+
+
+#########################
+### RANK THE REPLICAS ###
+#########################
+
+
+def get_host_score(host_statistics: dict) -> float:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function scores a data node by its throughput, reduced by the share of its transfers that failed or were too slow.
+
+    ---
+
+    ### INPUTS ###
+
+    HOST_STATISTICS : DICT | the counters of the data node
+
+    ---
+
+    ### OUTPUTS ###
+
+    SCORE : FLOAT | the higher the better
+
+    ---
+
+    """
+
+    host_statistics = init_host_statistics() | host_statistics
+
+    n_attempts = (
+        host_statistics["n_files"]
+        + host_statistics["n_errors"]
+        + host_statistics["n_slow"]
+    )
+
+    if n_attempts == 0:
+
+        return get_throughput(host_statistics)
+
+    score = get_throughput(host_statistics) * host_statistics["n_files"] / n_attempts
+
+    return score
+
+
+def rank_replicas(urls: list[str], dict_statistics: dict[str, dict]) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function sorts the replicas of a file from the best data node to the worst one. A data node never used before
+    gets the median score of the known ones : it is tried before the slow nodes but after the fast ones. Equal scores keep their original order.
+
+    ---
+
+    ### INPUTS ###
+
+    URLS : LIST[STR] | the urls of the replicas
+
+    DICT_STATISTICS : DICT | the counters of every known data node
+
+    ---
+
+    ### OUTPUTS ###
+
+    SORTED_URLS : LIST[STR] | the urls from the best data node to the worst one
+
+    ---
+
+    """
+
+    ### SCORES OF THE KNOWN DATA NODES ###
+
+    dict_scores = {
+        host_key: get_host_score(host_statistics)
+        for host_key, host_statistics in dict_statistics.items()
+        if host_statistics.get("n_requests", 0) > 0
+    }
+
+    default_score = float(np.median(list(dict_scores.values()))) if dict_scores else 0.0
+
+    ### SORT THE REPLICAS ###
+
+    scores = [dict_scores.get(get_host_key(url), default_score) for url in urls]
+
+    sorted_urls = [
+        urls[ii] for ii in sorted(range(len(urls)), key=lambda ii: -scores[ii])
+    ]
+
+    return sorted_urls
+
+
+def group_replicas(urls: list[str], downloading_path: str) -> dict[str, list[str]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function groups the urls sharing the same DRS path, which are the replicas of one file on several data nodes.
+
+    ---
+
+    ### INPUTS ###
+
+    URLS : LIST[STR] | the urls of the files
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_PATH_URLS : DICT | the urls of the replicas of every local path, in the order they were given
+
+    ---
+
+    """
+
+    dict_path_urls = {}
+
+    for url in urls:
+
+        dict_path_urls.setdefault(get_local_path(url, downloading_path), []).append(url)
+
+    return dict_path_urls
+
+
+def fetch_replica_sizes(
+    dict_http_links: dict[str, list[str]],
+    downloading_path: str,
+    dict_sizes: dict[str, int] | None = None,
+) -> dict[str, int]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the size of every file of the datasets, without downloading them. The sizes already known (ex: given by the file records,
+    see get_catalog_http_links in open_datasets.py) are kept, and the other ones are asked to the data node of the first replica of the file.
+    If it does not answer, the next replica is asked, and so on : a file whose replicas never answer is left out.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_HTTP_LINKS : DICT | the urls of the files of every dataset, replicas included
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    DICT_SIZES : DICT | the size in bytes of the urls already known : default is none
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_SIZES : DICT | the size in bytes of every file, given for one of its replicas
+
+    ---
+
+    """
+
+    dict_sizes = dict(dict_sizes or {})
+
+    ## The replicas of the files whose size is unknown ##
+
+    pending_replicas = [
+        replica_urls
+        for urls in dict_http_links.values()
+        for replica_urls in group_replicas(urls, downloading_path).values()
+        if not any(url in dict_sizes for url in replica_urls)
+    ]
+
+    ### ASK THE NEXT REPLICA OF EVERY FILE LEFT ###
+
+    while len(pending_replicas) > 0:
+
+        dict_sizes.update(
+            fetch_file_sizes([replica_urls[0] for replica_urls in pending_replicas])
+        )
+
+        pending_replicas = [
+            replica_urls[1:]
+            for replica_urls in pending_replicas
+            if replica_urls[0] not in dict_sizes and len(replica_urls) > 1
+        ]
+
+    return dict_sizes
+
+
+######################################
+### DOWNLOAD THE FILES OF AN ENTRY ###
+######################################
+
+
+def download_http_links(
+    dict_http_links: dict[str, list[str]],
+    downloading_path: str,
+    max_connections_per_host: int = DEFAULT_MAX_CONNECTIONS_PER_HOST,
+    verbose: bool = False,
+    min_throughput: float | None = DEFAULT_MIN_THROUGHPUT,
+    race: bool = False,
+    statistics_path: str | None = None,
+    dict_checksums: dict[str, tuple[str, str]] | None = None,
+) -> dict[str, list[str]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function downloads the files of every dataset of an entry, given by their urls, into the download folder. The urls of the replicas of a file
+    are ranked with the statistics of the data nodes saved by the previous runs, which are then updated with the ones of this run.
+    The duration of the downloads is added to the benchmarks of the download folder (see dry_run.py). A file given a checksum is checked before it gets its final name.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_HTTP_LINKS : DICT | the urls of the files of every dataset, replicas included (ex: as given by get_catalog_http_links in open_datasets.py)
+
+    DOWNLOADING_PATH : STR | path of the download folder
+
+    MAX_CONNECTIONS_PER_HOST : INT | simultaneous transfers per data node : default is DEFAULT_MAX_CONNECTIONS_PER_HOST
+
+    VERBOSE : BOOL | do we print the throughput of every data node ? : default is False
+
+    MIN_THROUGHPUT : FLOAT | bytes per second under which a replica is left for the next one : default is DEFAULT_MIN_THROUGHPUT
+
+    RACE : BOOL | do we race the replicas of every file instead of trusting the saved statistics only ? : default is False
+
+    STATISTICS_PATH : STR | path of the json file of the statistics : default is none (HOST_STATISTICS_FILE_NAME in the download folder)
+
+    DICT_CHECKSUMS : DICT | the type and value of the checksum of every url : default is none (not checked)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_PATHS : DICT | the local paths of the files of every dataset
+
+    ---
+
+    """
+
+    ### INITIALIZATION ###
+
+    if statistics_path is None:
+
+        statistics_path = os.path.join(downloading_path, HOST_STATISTICS_FILE_NAME)
+
+    history = read_host_statistics(statistics_path)
+
+    ### THE REPLICAS OF EVERY FILE, BEST DATA NODE FIRST ###
+
+    dict_paths = {}
+
+    dict_path_urls = {}
+
+    dict_path_checksums = {}
+
+    for key, urls in dict_http_links.items():
+
+        dict_path_urls_key = group_replicas(urls, downloading_path)
+
+        dict_paths[key] = list(dict_path_urls_key.keys())
+
+        for local_path, replica_urls in dict_path_urls_key.items():
+
+            dict_path_urls[local_path] = rank_replicas(replica_urls, history)
+
+            ## The replicas of a file share its checksum ##
+
+            for url in replica_urls:
+
+                if url in (dict_checksums or {}):
+
+                    dict_path_checksums[local_path] = dict_checksums[url]
+
+    ### DOWNLOAD THEM ###
+
+    start_time = time.perf_counter()
+
+    dict_statistics = download_replicas(
+        dict_path_urls,
+        max_connections_per_host=max_connections_per_host,
+        min_throughput=min_throughput,
+        race=race,
+        dict_checksums=dict_path_checksums,
+    )
+
+    ## Benchmark of the download stage, if anything was downloaded ##
+
+    n_bytes = sum(
+        host_statistics["n_bytes"] for host_statistics in dict_statistics.values()
+    )
+
+    if n_bytes > 0:
+
+        record_benchmark(
+            os.path.join(downloading_path, BENCHMARK_FILE_NAME),
+            stage="download",
+            n_bytes=n_bytes,
+            seconds=time.perf_counter() - start_time,
+        )
+
+    ## Keep the statistics for the next runs ##
+
+    write_host_statistics(
+        merge_host_statistics(history, dict_statistics), statistics_path
+    )
+
+    ## Throughput of every data node ##
+
+    if verbose:
+
+        for host_key, host_statistics in dict_statistics.items():
+
+            print(
+                "{} : {} files, {:.1f} MB/s\n".format(
+                    host_key,
+                    host_statistics["n_files"],
+                    get_throughput(host_statistics) / 1e6,
+                )
+            )
+
+    return dict_paths
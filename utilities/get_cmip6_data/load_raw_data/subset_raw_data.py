@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""
+This small script is used to restrict the raw CMIP6 data to the part we analyse (ex: the Arctic cap over a given range of years) as soon as it is opened.
+The datasets returned by intake-esgf are lazy : selecting the cells and time steps before the climatologies are computed means that only this part of the
+files is ever read and decoded. The areacella variable is then taken at the cells kept in the data so that both stay aligned.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.tools_for_analysis.regridding.domain import (
+    subset_to_domain,  # to keep only the cells overlapping the domain
+)
+
+###############################
+### SELECT A RANGE OF YEARS ###
+###############################
+
+
+def select_year_range(
+    dataset: xr.Dataset, year_range: tuple[int, int] | None = None
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function keeps the time steps of a dataset falling within a range of years (both included). Only the time coordinate is read.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset with a time dimension
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years to keep : default is none (every year)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET_SELECTED : XR DATASET | the dataset restricted to the range of years
+
+    ---
+
+    """
+
+    ### NOTHING TO DO WITHOUT RANGE ###
+
+    if year_range is None:
+
+        return dataset
+
+    ### CHECK THE RANGE ###
+
+    if year_range[0] > year_range[1]:
+
+        raise ValueError(
+            "{} -> The first year of the range must not be after the last one".format(
+                year_range
+            )
+        )
+
+    ### SELECT THE TIME STEPS ###
+
+    years = dataset["time"].dt.year
+
+    dataset_selected = dataset.isel(
+        time=((years >= year_range[0]) & (years <= year_range[1])).values
+    )
+
+    return dataset_selected
+
+
+#######################################
+### SUBSET A DICTIONARY OF RAW DATA ###
+#######################################
+
+
+def subset_raw_dictionary(
+    dict_datasets: dict[str, xr.Dataset],
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+) -> dict[str, xr.Dataset]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function restricts every dataset of a dictionary of raw data to a latitude / longitude domain and to a range of years.
+    The selections are lazy : they are applied before the data of the variables is read.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_DATASETS : DICT OF XR DATASETS | the raw datasets as opened by intake-esgf
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years to keep : default is none (every year)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_SUBSET : DICT OF XR DATASETS | the restricted datasets
+
+    ---
+
+    """
+
+    dict_subset = {}
+
+    for key, dataset in dict_datasets.items():
+
+        ## Spatial domain ##
+
+        dataset = subset_to_domain(
+            dataset, lat_domain=lat_domain, lon_domain=lon_domain
+        )
+
+        ## Range of years ##
+
+        dataset = select_year_range(dataset, year_range=year_range)
+
+        dict_subset[key] = dataset
+
+    return dict_subset
+
+
+####################################################
+### TAKE AREACELLA AT THE CELLS KEPT IN THE DATA ###
+####################################################
+
+
+def align_areacella_to_dataset(
+    areacella: xr.Dataset, dataset: xr.Dataset
+) -> xr.DataArray:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function selects the areacella values at the cells of a dataset which may have been restricted to a domain. Both share the grid of the model
+    so the nearest cell is the same one : the selection does not depend on how the bounds of the cells were obtained.
+
+    ---
+
+    ### INPUTS ###
+
+    AREACELLA : XR DATASET | the areacella dataset of the full grid
+
+    DATASET : XR DATASET | the dataset, possibly restricted to a domain
+
+    ---
+
+    ### OUTPUTS ###
+
+    AREACELLA_ALIGNED : XR DATA ARRAY | the areacella variable on the cells of the dataset
+
+    ---
+
+    """
+
+    ## The nearest cell of the full grid, in the (lat, lon) order of the data ##
+
+    areacella_aligned = (
+        areacella["areacella"]
+        .sel(lat=dataset["lat"].values, lon=dataset["lon"].values, method="nearest")
+        .transpose("lat", "lon")
+    )
+
+    return areacella_aligned
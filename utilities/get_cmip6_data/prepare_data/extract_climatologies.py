@@ -21,12 +21,16 @@ import numpy as np  # to handle numpy arrays and the associated tools
 
 import xarray as xr  # to manage the data
 
-import xcdat as xc  # to handle climate model outputs with xarray
+import pandas as pd  # to create the table of the keys and paths
 
 ### PROGRESS BAR ###
 
 from tqdm import tqdm
 
+### BENCHMARKS ###
+
+import time  # to measure the duration of the climatologies
+
 ### TYPE HINTS FOR FUNCTIONS ###
 
 from numpy.typing import NDArray
@@ -36,10 +40,60 @@ from numpy.typing import NDArray
 from utilities.get_cmip6_data.load_raw_data.load_cmip6 import (
     loading_cmip6,  # to load the raw data and areacella
     set_search_criterias,  # to access the chosen search criteria
+    set_downloading_folder,  # to set the folder of the raw data
+    search_cmip6_entries,  # to search the entries of the case
+    download_single_entry,  # to download one entry
+    get_variable_table_id,  # table of a variable
+    FIXED_TABLE_ID,  # table of the fixed fields
+    get_areacella_single_entry,  # to download the areacella of one entry
+    REFERENCE_INDEX_FOLDER_NAME,  # folder of the reference indexes
 )  # function to load the raw data
 
+from utilities.get_cmip6_data.load_raw_data.dry_run import (
+    record_benchmark,  # to save the duration of the climatologies for the dry runs
+    BENCHMARK_FILE_NAME,  # file of the benchmarks in the download folder
+)
+
+from utilities.get_cmip6_data.load_raw_data.subset_raw_data import (
+    align_areacella_to_dataset,  # areacella at the cells kept in the data
+)
+
+from utilities.get_cmip6_data.folders_handle.cache_manager import (
+    enforce_cache_budget,  # to remove the least recently used raw files
+)
+
 from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
     dict_to_netcdf,  # function to save the generated climatology
+    read_key_paths_table,  # to know which climatologies are saved
+    get_missing_variables,  # variables not saved yet for every entry
+    append_variables_to_netcdf,  # to add the new variables to the saved files
+    save_one_entry_to_netcdf,  # to save the climatologies of one entry
+    write_key_paths_table,  # to save the table of the keys and paths
+)
+
+from utilities.get_cmip6_data.store_data.grid_catalog import (
+    keep_only_grid,  # the grid of a dataset without its data
+    write_grid_catalog,  # to record the grid of every entry
+)
+
+from utilities.get_cmip6_data.store_data.shard_manifest import (
+    get_shard_path,  # save folder of a shard
+    remove_shard_manifest,  # to tell that a shard restarted
+    write_shard_manifest,  # to tell that a shard finished
+)
+
+from utilities.get_cmip6_data.prepare_data.producer_consumer import (
+    run_producer_consumer,  # to download the next entry while treating the current one
+    report_overlap,  # to report the time saved by the overlap of the stages
+)
+
+from utilities.get_cmip6_data.prepare_data.normalize_units import (
+    EXPECTED_UNITS,  # units expected for the loaded variables
+    normalize_variable_units,  # to express the variables in the expected units lazily
+)
+
+from utilities.tools_for_analysis.statistical_tools.temporal_average import (
+    monthly_climatology,  # monthly climatology weighted with the calendar tables
 )
 
 #######################################################
@@ -161,13 +215,19 @@ def add_one_variable_to_dataset(
 
     ### PREPARE THE VARIABLE TO ADD ###
 
+    ## Express it in the expected units (ex: the cloud fractions as fractions) without computing anything ##
+
+    if variable_name in EXPECTED_UNITS:
+
+        var_datarray = normalize_variable_units(var_datarray, variable_name)
+
     ## Produce the climatology if needed ##
 
     if do_clim:
 
-        var_to_add = var_datarray.temporal.climatology(
-            variable_name, "month", weighted=True
-        )  # we generate a monthly climatology
+        var_to_add = monthly_climatology(
+            var_datarray, variable_name
+        )  # we generate a monthly climatology weighted by the days of every month
 
     ## Otherwise we just add the variable ##
 
@@ -186,108 +246,64 @@ def add_one_variable_to_dataset(
     else:
 
         dataset[variable_name] = (
-            ("time", "lat", "lon"),
-            var_datarray[variable_name].values,
+            var_to_add[
+                variable_name
+            ].dims,  # ("time", "lat", "lon") or ("lat", "lon") for time averages
+            var_to_add[variable_name].values,
         )
 
-    ### DIFFERENT CORRECTIONS ###
-
-    ## Test that the cloud fractions are expressed as fraction and modify it ##
-
-    if variable_name == "clt":
-
-        # If not a fraction turn it into a fraction #
-
-        if (
-            np.mean(dataset["clt"]) > 1.0
-        ):  # mean to consider the whole variable and not odd points
-            dataset["clt"] = dataset["clt"] / 100.0
-
     return dataset
 
 
-##########################################
-### CREATE THE CLIMATOLOGY DICTIONARY ###
-##########################################
+######################################################
+### GENERATE THE CLIMATOLOGIES OF SOME RAW ENTRIES ###
+######################################################
 
 
-def create_climatology_dict(
-    data_path: str,
-    data_folder_name: str,
-    parent_path_for_save: str,
-    selected_case: str,
-    remove_ensembles: bool = False,
-    do_we_clear: bool = False,
-    verbose: bool = False,
-):
+def generate_climatologies_dictionary(
+    full_cmip6_dict: dict[str, xr.Dataset],
+    dict_areacella: dict[str, xr.Dataset],
+    variable_id: list[str],
+    benchmark_path: str | None = None,
+) -> dict[str, xr.Dataset]:
     """
     ---
 
     ### DEFINITION
 
-    This function generates the dictionary of the xarray datasets holding every monthly climatology of the loaded raw variables.
-    It then saves it as netcdf files for the provided save_path within the folder named save_folder_name.
+    This function groups the monthly climatologies of the raw variables of every model.variant.grid and experiment into a single dataset
+    holding also the areacella variable. The climatologies are computed as soon as they are added to their dataset.
+    The duration of the computation and the bytes of the raw variables read can be added to the benchmarks used by the dry runs (see dry_run.py).
 
     ---
 
     ### INPUTS
 
-    DATA_PATH : STR | path of the parent directory of the raw data folder
+    FULL_CMIP6_DICT : DICT OF XR DATASETS | the raw datasets of every variable of the entries
 
-    DATA_FOLDER_NAME : STR | name of the raw data folder
+    DICT_AREACELLA : DICT OF XR DATASETS | the areacella of every model.variant.grid
 
-    PARENT_PATH_FOR_SAVE : STR | path of the directory of the save folder
+    VARIABLE_ID : LIST[STR] | the variables of the case
 
-    SELECTED_CASE : STR | case selected for the loading of the raw data
-
-    REMOVE_ENSEMBLE : BOOL | option to keep only one variant per model
-
-    DO_WE_CLEAR : BOOL | option to clear the save folder if it already exists : default is True
-
-    VERBOSE : BOOL | option to keep the warnings regarding connection failures to esgf servers
+    BENCHMARK_PATH : STR | path of the benchmarks file : default is none (no benchmark)
 
     ---
 
     ### OUTPUTS
 
-    nothing.
+    FULL_CMIP6_DICT_CLIM : DICT OF XR DATASETS | the climatologies of every model.variant.grid and experiment
 
     ---
     """
 
-    ### INITIALIZATION ###
-
-    ## Load the raw data ##
-
-    full_cmip6_dict, dict_areacella = loading_cmip6(
-        parent_path=data_path,
-        downloading_folder_name=data_folder_name,
-        case=selected_case,
-        remove_ensembles=remove_ensembles,
-        do_we_clear=do_we_clear,
-        verbose=verbose,
-    )
-
-    print("Data dictionary loaded\n")
-
-    ## Retrieve the given search criterias to know the variables we have loaded ##
-
-    search_criterias = set_search_criterias(
-        case=selected_case,
-    )  # it's a dictionary with all the needed global search criterias to set
-
-    # Get the search facets #
-
-    search_facets = search_criterias["search_facets"]
-
-    # Get the variables we are looking for #
-
-    variable_id = search_facets["variable_id"]
-
     ## Create the dictionary ##
 
     full_cmip6_dict_clim = {}
 
+    n_bytes = 0
+
+    start_time = time.perf_counter()
+
     ## Generate the general key associated to each model.variant and experiment ##
 
     keys_without_variable_unique = generate_per_model_dict_key(full_cmip6_dict)
@@ -343,6 +359,12 @@ def create_climatology_dict(
             do_clim=True,
         )
 
+        # Compute it as the next variables are : the benchmark times the data it counts #
+
+        dataset_given_exp = dataset_given_exp.load()
+
+        n_bytes += var_datarray[var].nbytes
+
         # Set that now the dataset already exists #
 
         modify_data = True
@@ -377,6 +399,8 @@ def create_climatology_dict(
                 do_clim=True,
             )
 
+            n_bytes += var_datarray[var].nbytes
+
         ## Generate the key for full_cmip6_dict_clim ##
 
         # Retrieving the key information #
@@ -407,17 +431,280 @@ def create_climatology_dict(
 
         areacella_datarray = dict_areacella[key_areacella]
 
-        # Update the dataset of the given model.variant and experiment with the associated areacella #
+        # Update the dataset of the given model.variant and experiment with the associated areacella on the same cells #
 
         dataset_given_exp["areacella"] = (
             ("lat", "lon"),
-            areacella_datarray["areacella"].values,
+            align_areacella_to_dataset(areacella_datarray, dataset_given_exp).values,
         )
 
         ## Add the dataset to the output dictionnary ##
 
         full_cmip6_dict_clim[new_simpler_key_given_exp] = dataset_given_exp
 
+    ### BENCHMARK OF THE CLIMATOLOGY STAGE ###
+
+    if benchmark_path is not None:
+
+        record_benchmark(
+            benchmark_path,
+            stage="climatology",
+            n_bytes=n_bytes,
+            seconds=time.perf_counter() - start_time,
+        )
+
+    return full_cmip6_dict_clim
+
+
+#########################################
+### CREATE THE CLIMATOLOGY DICTIONARY ###
+#########################################
+
+
+def create_climatology_dict(
+    data_path: str,
+    data_folder_name: str,
+    parent_path_for_save: str,
+    selected_case: str,
+    remove_ensembles: bool = False,
+    do_we_clear: bool = False,
+    verbose: bool = False,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+    use_reference_index: bool = False,
+    pipelined: bool = False,
+    max_queued_entries: int = 1,
+    use_async_transfer: bool = False,
+    cache_budget: float | None = None,
+    delta: bool = False,
+    shard_index: int = 0,
+    shard_count: int = 1,
+):
+    """
+    ---
+
+    ### DEFINITION
+
+    This function generates the dictionary of the xarray datasets holding every monthly climatology of the loaded raw variables.
+    It then saves it as netcdf files for the provided save_path within the folder named save_folder_name.
+    The raw data can be restricted to a domain (ex: lat_domain = (60, 90) for the Arctic) and to a range of years when it is opened,
+    so that the rest of the fields is never read. In the pipelined mode, the next entries are downloaded while the climatologies of the current one
+    are computed and saved (see create_climatology_dict_pipelined). In the delta mode, only the variables of the case missing from the saved climatologies
+    are downloaded and appended to them (see create_climatology_dict_delta). With several shards (ex: a SLURM job array), the process only treats
+    the entries of its shard, saves them in the folder of the shard (or appends the new variables to them) and writes its manifest :
+    merge_shard_manifests then builds the table of the save folder.
+
+    ---
+
+    ### INPUTS
+
+    DATA_PATH : STR | path of the parent directory of the raw data folder
+
+    DATA_FOLDER_NAME : STR | name of the raw data folder
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory of the save folder
+
+    SELECTED_CASE : STR | case selected for the loading of the raw data
+
+    REMOVE_ENSEMBLE : BOOL | option to keep only one variant per model
+
+    DO_WE_CLEAR : BOOL | option to clear the save folder if it already exists : default is True
+
+    VERBOSE : BOOL | option to keep the warnings regarding connection failures to esgf servers
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain to keep : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain to keep : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years of the climatologies : default is none (every year)
+
+    USE_REFERENCE_INDEX : BOOL | do we reopen the cached raw files through their reference indexes ? : default is False
+
+    PIPELINED : BOOL | do we download the next entries while treating the current one ? : default is False
+
+    MAX_QUEUED_ENTRIES : INT | in the pipelined mode, maximum number of downloaded entries waiting to be treated : default is 1
+
+    USE_ASYNC_TRANSFER : BOOL | do we download the raw files with the asynchronous engine of async_transfer.py ? : default is False
+
+    CACHE_BUDGET : FLOAT | size in bytes above which the least recently used raw files are removed (see cache_manager.py) : default is none (no limit)
+
+    DELTA : BOOL | do we only add the new variables of the case to the climatologies already saved ? : default is False
+
+    SHARD_INDEX : INT | the index of the shard run by this process (ex: the SLURM array task id) : default is 0
+
+    SHARD_COUNT : INT | the number of shards : default is 1 (no sharding)
+
+    ---
+
+    ### OUTPUTS
+
+    nothing.
+
+    ---
+    """
+
+    ### SAVE FOLDER OF THE SHARD ###
+
+    shard_path = get_shard_path(parent_path_for_save, shard_index, shard_count)
+
+    ## The manifest of a previous run must not be merged with this one ##
+
+    if shard_count > 1:
+
+        remove_shard_manifest(parent_path_for_save, shard_index, shard_count)
+
+    ### DELTA MODE ON THE CLIMATOLOGIES OF THE SHARD ###
+
+    if delta:
+
+        create_climatology_dict_delta(
+            data_path=data_path,
+            data_folder_name=data_folder_name,
+            parent_path_for_save=shard_path,
+            selected_case=selected_case,
+            verbose=verbose,
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+            year_range=year_range,
+            use_reference_index=use_reference_index,
+            use_async_transfer=use_async_transfer,
+        )
+
+    ### PIPELINED MODE ###
+
+    elif pipelined:
+
+        create_climatology_dict_pipelined(
+            data_path=data_path,
+            data_folder_name=data_folder_name,
+            parent_path_for_save=shard_path,
+            selected_case=selected_case,
+            remove_ensembles=remove_ensembles,
+            do_we_clear=do_we_clear,
+            verbose=verbose,
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+            year_range=year_range,
+            use_reference_index=use_reference_index,
+            max_queued_entries=max_queued_entries,
+            use_async_transfer=use_async_transfer,
+            cache_budget=cache_budget,
+            shard_index=shard_index,
+            shard_count=shard_count,
+        )
+
+    else:
+
+        create_climatology_dict_in_memory(
+            data_path=data_path,
+            data_folder_name=data_folder_name,
+            parent_path_for_save=shard_path,
+            selected_case=selected_case,
+            remove_ensembles=remove_ensembles,
+            do_we_clear=do_we_clear,
+            verbose=verbose,
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+            year_range=year_range,
+            use_reference_index=use_reference_index,
+            use_async_transfer=use_async_transfer,
+            cache_budget=cache_budget,
+            shard_index=shard_index,
+            shard_count=shard_count,
+        )
+
+    ### THE SHARD TELLS IT FINISHED ###
+
+    if shard_count > 1:
+
+        write_shard_manifest(parent_path_for_save, shard_index, shard_count)
+
+    return
+
+
+def create_climatology_dict_in_memory(
+    data_path: str,
+    data_folder_name: str,
+    parent_path_for_save: str,
+    selected_case: str,
+    remove_ensembles: bool = False,
+    do_we_clear: bool = False,
+    verbose: bool = False,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+    use_reference_index: bool = False,
+    use_async_transfer: bool = False,
+    cache_budget: float | None = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+):
+    """
+    ---
+
+    ### DEFINITION
+
+    This function loads every raw entry of the case at once, computes their climatologies and saves them in parent_path_for_save (see create_climatology_dict).
+
+    ---
+
+    ### INPUTS
+
+    see create_climatology_dict, PARENT_PATH_FOR_SAVE being the save folder of the shard.
+
+    ---
+
+    ### OUTPUTS
+
+    nothing.
+
+    ---
+    """
+
+    ### INITIALIZATION ###
+
+    ## Load the raw data ##
+
+    full_cmip6_dict, dict_areacella = loading_cmip6(
+        parent_path=data_path,
+        downloading_folder_name=data_folder_name,
+        case=selected_case,
+        remove_ensembles=remove_ensembles,
+        do_we_clear=do_we_clear,
+        verbose=verbose,
+        lat_domain=lat_domain,
+        lon_domain=lon_domain,
+        year_range=year_range,
+        use_reference_index=use_reference_index,
+        use_async_transfer=use_async_transfer,
+        shard_index=shard_index,
+        shard_count=shard_count,
+    )
+
+    print("Data dictionary loaded\n")
+
+    ## Retrieve the given search criterias to know the variables we have loaded ##
+
+    search_criterias = set_search_criterias(
+        case=selected_case,
+    )  # it's a dictionary with all the needed global search criterias to set
+
+    # Get the search facets #
+
+    search_facets = search_criterias["search_facets"]
+
+    # Get the variables we are looking for #
+
+    variable_id = search_facets["variable_id"]
+
+    full_cmip6_dict_clim = generate_climatologies_dictionary(
+        full_cmip6_dict=full_cmip6_dict,
+        dict_areacella=dict_areacella,
+        variable_id=variable_id,
+        benchmark_path=data_path + "/" + data_folder_name + "/" + BENCHMARK_FILE_NAME,
+    )
+
     ### SAVE THE GENERATED DICTIONARY ###
 
     print("\nSaving the climatologies' dictionary...\n")
@@ -427,6 +714,424 @@ def create_climatology_dict(
         parent_path_for_save=parent_path_for_save,
         do_we_clear=do_we_clear,
     )
+
+    ### KEEP THE RAW FILES WITHIN THE BUDGET ###
+
+    if cache_budget is not None:
+
+        key_paths_table = read_key_paths_table(parent_path_for_save)
+
+        enforce_cache_budget(
+            downloading_path=data_path + "/" + data_folder_name,
+            byte_budget=cache_budget,
+            dict_climatology_paths=dict(
+                zip(key_paths_table["key"], key_paths_table["path"])
+            ),
+        )
+
+    return
+
+
+def create_climatology_dict_pipelined(
+    data_path: str,
+    data_folder_name: str,
+    parent_path_for_save: str,
+    selected_case: str,
+    remove_ensembles: bool = False,
+    do_we_clear: bool = False,
+    verbose: bool = False,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+    use_reference_index: bool = False,
+    max_queued_entries: int = 1,
+    use_async_transfer: bool = False,
+    cache_budget: float | None = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+):
+    """
+    ---
+
+    ### DEFINITION
+
+    This function produces the same climatologies as create_climatology_dict, one (source_id, member_id, grid_label) entry at a time.
+    A thread downloads the raw data and the areacella of the next entries while the climatologies of the current one are computed and saved.
+    At most max_queued_entries downloaded entries wait to be treated, and only the climatologies of the entries already treated are kept on disk :
+    the memory holds a few entries instead of the whole ensemble. The time saved by the overlap of the two stages is reported.
+
+    ---
+
+    ### INPUTS
+
+    DATA_PATH : STR | path of the parent directory of the raw data folder
+
+    DATA_FOLDER_NAME : STR | name of the raw data folder
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory of the save folder
+
+    SELECTED_CASE : STR | case selected for the loading of the raw data
+
+    REMOVE_ENSEMBLE : BOOL | option to keep only one variant per model
+
+    DO_WE_CLEAR : BOOL | option to clear the download and save folders if they already exist : default is False
+
+    VERBOSE : BOOL | option to keep the warnings regarding connection failures to esgf servers
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain to keep : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain to keep : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years of the climatologies : default is none (every year)
+
+    USE_REFERENCE_INDEX : BOOL | do we reopen the cached raw files through their reference indexes ? : default is False
+
+    MAX_QUEUED_ENTRIES : INT | maximum number of downloaded entries waiting to be treated : default is 1
+
+    USE_ASYNC_TRANSFER : BOOL | do we download the raw files with the asynchronous engine of async_transfer.py ? : default is False
+
+    CACHE_BUDGET : FLOAT | size in bytes above which the least recently used raw files are removed (see cache_manager.py) : default is none (no limit)
+
+    SHARD_INDEX : INT | the index of the shard run by this process, only its entries are treated : default is 0
+
+    SHARD_COUNT : INT | the number of shards : default is 1 (no sharding)
+
+    ---
+
+    ### OUTPUTS
+
+    nothing.
+
+    ---
+    """
+
+    ### INITIALIZATION ###
+
+    ## Set the download folder ##
+
+    downloading_path = set_downloading_folder(
+        parent_path=data_path,
+        downloading_folder_name=data_folder_name,
+        do_we_clear=do_we_clear,
+    )
+
+    index_folder = (
+        downloading_path + "/" + REFERENCE_INDEX_FOLDER_NAME
+        if use_reference_index
+        else None
+    )
+
+    ## Search the entries of the case ##
+
+    search_facets, grouped_models_dataframe, _ = search_cmip6_entries(
+        case=selected_case,
+        remove_ensembles=remove_ensembles,
+        shard_index=shard_index,
+        shard_count=shard_count,
+    )
+
+    variable_id = search_facets["variable_id"]
+
+    ## The areacella already downloaded for every grid ##
+
+    dict_areacella_per_grid = {}
+
+    ## The climatologies already saved, which release their raw files ##
+
+    dict_climatology_paths = {}
+
+    ## The time spent by every stage, for the overlap ##
+
+    dict_busy_seconds = {"download": 0.0, "climatology": 0.0}
+
+    ### PRODUCER : DOWNLOAD THE RAW DATA AND AREACELLA OF AN ENTRY ###
+
+    def download_entry(index: int) -> tuple[dict, dict]:
+
+        start_time = time.perf_counter()
+
+        single_model_dictionary = download_single_entry(
+            search_facets=search_facets,
+            grouped_models_dataframe=grouped_models_dataframe,
+            index=index,
+            verbose=verbose,
+            index_folder=index_folder,
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+            year_range=year_range,
+            transfer_path=downloading_path if use_async_transfer else None,
+        )
+
+        dict_areacella = get_areacella_single_entry(
+            grouped_models_dataframe=grouped_models_dataframe,
+            index=index,
+            dict_areacella_per_grid=dict_areacella_per_grid,
+        )
+
+        dict_busy_seconds["download"] += time.perf_counter() - start_time
+
+        return (single_model_dictionary, dict_areacella)
+
+    ### CONSUMER : COMPUTE AND SAVE ITS CLIMATOLOGIES ###
+
+    def treat_entry(index: int, downloaded: tuple[dict, dict]) -> dict:
+
+        start_time = time.perf_counter()
+
+        single_model_dictionary, dict_areacella = downloaded
+
+        dict_clim = generate_climatologies_dictionary(
+            full_cmip6_dict=single_model_dictionary,
+            dict_areacella=dict_areacella,
+            variable_id=variable_id,
+            benchmark_path=downloading_path + "/" + BENCHMARK_FILE_NAME,
+        )
+
+        ## Keep the paths and the grids only ##
+
+        saved_entry = {
+            key: (
+                save_one_entry_to_netcdf(
+                    dataset=dataset,
+                    key=key,
+                    parent_path_for_save=parent_path_for_save,
+                    do_we_clear=do_we_clear,
+                ),
+                keep_only_grid(dataset),
+            )
+            for key, dataset in dict_clim.items()
+        }
+
+        ## Keep the raw files within the budget, the entries still queued are protected ##
+
+        if cache_budget is not None:
+
+            dict_climatology_paths.update(
+                {key: path for key, (path, _) in saved_entry.items()}
+            )
+
+            enforce_cache_budget(
+                downloading_path=downloading_path,
+                byte_budget=cache_budget,
+                dict_climatology_paths=dict_climatology_paths,
+            )
+
+        dict_busy_seconds["climatology"] += time.perf_counter() - start_time
+
+        return saved_entry
+
+    ### THE ENTRIES IN THE ORDER OF THE CATALOG ###
+
+    items = list(grouped_models_dataframe.index)
+
+    ### RUN THE TWO STAGES AT THE SAME TIME ###
+
+    start_time = time.perf_counter()
+
+    list_saved = run_producer_consumer(
+        items=items,
+        produce=download_entry,
+        consume=treat_entry,
+        max_queued_items=max_queued_entries,
+    )
+
+    report_overlap(
+        dict_busy_seconds=dict_busy_seconds,
+        elapsed=time.perf_counter() - start_time,
+    )
+
+    dict_saved = {
+        key: saved for saved_entry in list_saved for key, saved in saved_entry.items()
+    }
+
+    ### SAVE THE TABLE OF THE KEYS AND PATHS AND THE GRID CATALOG ###
+
+    print("\nSaving the climatologies' table...\n")
+
+    write_key_paths_table(
+        key_paths_table=pd.DataFrame(
+            {
+                "key": list(dict_saved.keys()),
+                "path": [path for path, _ in dict_saved.values()],
+            }
+        ),
+        parent_path_for_save=parent_path_for_save,
+        do_we_clear=do_we_clear,
+    )
+
+    write_grid_catalog(
+        dataset_dict={key: grid for key, (_, grid) in dict_saved.items()},
+        parent_path_for_save=parent_path_for_save,
+        do_we_clear=False,
+    )
+
+    return
+
+
+def create_climatology_dict_delta(
+    data_path: str,
+    data_folder_name: str,
+    parent_path_for_save: str,
+    selected_case: str,
+    verbose: bool = False,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+    use_reference_index: bool = False,
+    use_async_transfer: bool = False,
+):
+    """
+    ---
+
+    ### DEFINITION
+
+    This function adds to the climatologies saved at parent_path_for_save the variables of the case they do not hold yet (ex: rlut added to variable_id).
+    Every missing (entry, variable) pair is searched and downloaded alone, in the table of the variable (ex: fx for sftlf, see get_variable_table_id),
+    for the experiments missing it only. Its climatology, or the field itself for a fixed variable, is appended to the existing netcdf files :
+    the variables already saved are not written again.
+
+    ---
+
+    ### INPUTS
+
+    DATA_PATH : STR | path of the parent directory of the raw data folder
+
+    DATA_FOLDER_NAME : STR | name of the raw data folder
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory of the saved climatologies
+
+    SELECTED_CASE : STR | case selected for the loading of the raw data, holding the new variables
+
+    VERBOSE : BOOL | option to keep the warnings regarding connection failures to esgf servers
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain kept for the saved climatologies : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain kept for the saved climatologies : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years of the saved climatologies : default is none (every year)
+
+    USE_REFERENCE_INDEX : BOOL | do we reopen the cached raw files through their reference indexes ? : default is False
+
+    USE_ASYNC_TRANSFER : BOOL | do we download the raw files with the asynchronous engine of async_transfer.py ? : default is False
+
+    ---
+
+    ### OUTPUTS
+
+    nothing.
+
+    ---
+    """
+
+    ### FIND THE MISSING (ENTRY, VARIABLE) PAIRS ###
+
+    search_facets = set_search_criterias(case=selected_case)["search_facets"]
+
+    dict_missing_variables = get_missing_variables(
+        parent_path_for_save, search_facets["variable_id"]
+    )
+
+    ## The experiments missing every (entry, variable) pair ##
+
+    dict_missing_pairs = {}
+
+    for key, missing_variables in dict_missing_variables.items():
+
+        entry, experiment = key.rsplit(".", 1)
+
+        for variable in missing_variables:
+
+            dict_missing_pairs.setdefault((entry, variable), []).append(experiment)
+
+    if not dict_missing_pairs:
+
+        print("The saved climatologies already hold every variable of the case\n")
+
+        return
+
+    print(
+        "New (entry, variable) pairs to add : {}\n".format(
+            sorted(dict_missing_pairs.keys())
+        )
+    )
+
+    dict_key_path = read_key_paths_table(parent_path_for_save).set_index("key")["path"]
+
+    ### SEARCH AND DOWNLOAD EVERY PAIR ALONE ###
+
+    downloading_path = set_downloading_folder(
+        parent_path=data_path,
+        downloading_folder_name=data_folder_name,
+        do_we_clear=False,
+    )
+
+    index_folder = (
+        downloading_path + "/" + REFERENCE_INDEX_FOLDER_NAME
+        if use_reference_index
+        else None
+    )
+
+    for (entry, variable), list_experiments in dict_missing_pairs.items():
+
+        ## The variable is searched in its own table (ex: fx for sftlf) ##
+
+        table_id = get_variable_table_id(variable, search_facets["table_id"])
+
+        is_fixed = table_id == FIXED_TABLE_ID
+
+        pair_facets = search_facets | {
+            "experiment_id": list_experiments,
+            "variable_id": variable,
+            "table_id": table_id,
+        }
+
+        single_model_dictionary = download_single_entry(
+            search_facets=pair_facets,
+            grouped_models_dataframe=pd.DataFrame(
+                [entry.split(".")], columns=["source_id", "member_id", "grid_label"]
+            ),
+            index=0,
+            verbose=verbose,
+            index_folder=index_folder,
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+            year_range=None if is_fixed else year_range,
+            transfer_path=downloading_path if use_async_transfer else None,
+        )
+
+        ## The keys of the search depend on its facets : the experiment is read from the files ##
+
+        dict_raw_per_experiment = {
+            dataset.attrs.get("experiment_id"): dataset
+            for dataset in single_model_dictionary.values()
+        }
+
+        ### COMPUTE AND APPEND IT TO THE FILE OF EVERY EXPERIMENT ###
+
+        for experiment in list_experiments:
+
+            key = entry + "." + experiment
+
+            if experiment not in dict_raw_per_experiment:
+
+                print("{} : {} not found\n".format(key, variable))
+
+                continue
+
+            ## A fixed field has no climatology to compute ##
+
+            dataset = add_one_variable_to_dataset(
+                variable_name=variable,
+                var_datarray=dict_raw_per_experiment[experiment],
+                do_clim=not is_fixed,
+            )
+
+            appended_variables = append_variables_to_netcdf(
+                dataset[[variable]], dict_key_path[key]
+            )
+
+            print("{} : {} added\n".format(key, appended_variables))
+
     return
 
 
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+"""
+This small script is used to express every loaded variable in the units expected by the analysis : the cloud fraction clt as a fraction
+and the short-wave fluxes in W m-2. The scale factor of a variable is decided from its units attribute. If the attribute is missing or not understood,
+the values of a small sample of the variable (one time step, a few grid points) are looked at instead of the whole field.
+The scaling itself is a lazy multiplication : nothing is computed when the datasets are assembled.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+###############################################
+### UNITS EXPECTED FOR THE LOADED VARIABLES ###
+###############################################
+
+EXPECTED_UNITS = {
+    "clt": "1",  # cloud fraction
+    "rsdt": "W m-2",  # incoming short-wave flux at the top of the atmosphere
+    "rsut": "W m-2",  # outgoing short-wave flux at the top of the atmosphere
+    "rsutcs": "W m-2",  # same in clear-sky conditions
+    "rsds": "W m-2",  # downwelling short-wave flux at the surface
+    "rsus": "W m-2",  # upwelling short-wave flux at the surface
+    "rsdscs": "W m-2",  # same in clear-sky conditions
+    "rsuscs": "W m-2",  # same in clear-sky conditions
+}
+
+## Scale factor to go from the units found in the files to the expected ones ##
+
+SCALE_FACTORS = {
+    "1": {
+        "1": 1.0,
+        "": 1.0,
+        "fraction": 1.0,
+        "0-1": 1.0,
+        "%": 0.01,
+        "percent": 0.01,
+    },
+    "W m-2": {
+        "w m-2": 1.0,
+        "w m^-2": 1.0,
+        "w/m2": 1.0,
+        "w/m^2": 1.0,
+        "w.m-2": 1.0,
+        "mw m-2": 1e-3,
+    },
+}
+
+## Number of sampled points along every spatial dimension for the fallback ##
+
+N_SAMPLES_PER_DIM = 8
+
+####################################
+### FIND THE SCALE OF A VARIABLE ###
+####################################
+
+
+def sample_variable(variable: xr.DataArray) -> np.ndarray:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads a small sample of a variable : its first time step on N_SAMPLES_PER_DIM points along the other dimensions.
+    Only this sample is computed if the data is lazy.
+
+    ---
+
+    ### INPUTS ###
+
+    VARIABLE : XR DATA ARRAY | the variable to sample
+
+    ---
+
+    ### OUTPUTS ###
+
+    SAMPLE : NUMPY ARRAY | the sampled values
+
+    ---
+
+    """
+
+    indexers = {
+        dim: (
+            0
+            if dim == "time"
+            else slice(None, None, max(1, variable.sizes[dim] // N_SAMPLES_PER_DIM))
+        )
+        for dim in variable.dims
+    }
+
+    sample = np.asarray(variable.isel(indexers).values, dtype=np.float64)
+
+    return sample
+
+
+def get_scale_factor(variable: xr.DataArray, variable_name: str) -> float:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function finds the factor expressing a variable in the units given by EXPECTED_UNITS. It is read from the units attribute.
+    Without a known attribute, a cloud fraction is found to be in percent if a sampled value exceeds 1 and the fluxes are assumed to be in W m-2.
+
+    ---
+
+    ### INPUTS ###
+
+    VARIABLE : XR DATA ARRAY | the variable
+
+    VARIABLE_NAME : STR | its name, one of the keys of EXPECTED_UNITS
+
+    ---
+
+    ### OUTPUTS ###
+
+    SCALE_FACTOR : FLOAT | the factor by which to multiply the variable
+
+    ---
+
+    """
+
+    ### CHECK THE VARIABLE ###
+
+    if variable_name not in EXPECTED_UNITS:
+
+        raise ValueError(
+            "{} -> The expected units of this variable are unknown, it must be one of {}".format(
+                variable_name, list(EXPECTED_UNITS.keys())
+            )
+        )
+
+    ### READ THE UNITS ATTRIBUTE ###
+
+    dict_factors = SCALE_FACTORS[EXPECTED_UNITS[variable_name]]
+
+    units = variable.attrs.get("units")
+
+    if units is not None and units.strip().lower() in dict_factors:
+
+        return dict_factors[units.strip().lower()]
+
+    ### FALLBACK ON A SAMPLE FOR THE CLOUD FRACTION ###
+
+    if EXPECTED_UNITS[variable_name] == "1":
+
+        scale_factor = 0.01 if np.nanmax(sample_variable(variable)) > 1.0 else 1.0
+
+    ## The fluxes are always given in W m-2 in CMIP6 ##
+
+    else:
+
+        scale_factor = 1.0
+
+    return scale_factor
+
+
+######################################
+### NORMALIZE THE LOADED VARIABLES ###
+######################################
+
+
+def normalize_variable_units(dataset: xr.Dataset, variable_name: str) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function expresses one variable of a dataset in the units given by EXPECTED_UNITS and updates its units attribute.
+    The multiplication is lazy if the data is.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset holding the variable
+
+    VARIABLE_NAME : STR | the name of the variable
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET : XR DATASET | the dataset with the normalized variable
+
+    ---
+
+    """
+
+    variable = dataset[variable_name].copy(deep=False)
+
+    scale_factor = get_scale_factor(variable, variable_name)
+
+    ## Only multiply when needed ##
+
+    if scale_factor != 1.0:
+
+        variable = variable * scale_factor
+
+    variable.attrs = dataset[variable_name].attrs | {
+        "units": EXPECTED_UNITS[variable_name]
+    }
+
+    dataset = dataset.assign({variable_name: variable})
+
+    return dataset
@@ -0,0 +1,738 @@
+#!/usr/bin/env python3
+
+"""
+This script computes monthly climatologies without holding the whole time series of a variable in memory. The raw files are read a few time steps
+at a time and an accumulator keeps, for every month of the year, the running sum of the values weighted by the days of the month and the running sum
+of these weights. The days are read from the calendar tables of tools_for_analysis/statistical_tools/temporal_average.py.
+
+The accumulators of different files (or workers) are merged by adding their sums. An accumulator remembers the full paths of the files it has read
+and the domain and range of years they were restricted to, and can be saved : when new years of data are downloaded only the new files are read
+to update the climatology, while a state saved with another domain or range of years is computed again.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the files
+
+import json  # to save the parameters of an accumulator as an attribute
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.tools_for_analysis.statistical_tools.temporal_average import (
+    get_days_per_month,  # days of every month read in the calendar tables
+)
+
+from utilities.get_cmip6_data.load_raw_data.subset_raw_data import (
+    select_year_range,  # to read only a range of years
+)
+
+from utilities.get_cmip6_data.prepare_data.normalize_units import (
+    EXPECTED_UNITS,  # units expected for the loaded variables
+    normalize_variable_units,  # to express the variables in the expected units lazily
+)
+
+from utilities.tools_for_analysis.regridding.domain import (
+    subset_to_domain,  # to read only the cells overlapping a domain
+)
+
+########################################
+### SEPARATOR OF THE PROCESSED FILES ###
+########################################
+
+FILES_SEPARATOR = "\n"  # the list of the processed files is saved as a single attribute
+
+
+def get_accumulator_parameters(
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the parameters the files of an accumulator are restricted with, as a string saved in its attributes.
+    Two accumulators can only be updated or merged together with the same parameters.
+
+    ---
+
+    ### INPUTS ###
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain to keep : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain to keep : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years to keep : default is none (every year)
+
+    ---
+
+    ### OUTPUTS ###
+
+    PARAMETERS : STR | the parameters as a json string
+
+    ---
+
+    """
+
+    parameters = json.dumps(
+        {
+            "lat_domain": None if lat_domain is None else list(lat_domain),
+            "lon_domain": None if lon_domain is None else list(lon_domain),
+            "year_range": None if year_range is None else list(year_range),
+        },
+        sort_keys=True,
+    )
+
+    return parameters
+
+
+#################################
+### INITIALIZE AN ACCUMULATOR ###
+#################################
+
+
+def init_climatology_accumulator(
+    template: xr.DataArray,
+    variable_name: str,
+    calendar: str,
+    parameters: str | None = None,
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function creates an empty accumulator for the monthly climatology of a variable. It holds the weighted sum and the sum of the weights
+    of every month on the spatial dimensions of the template, the calendar, the parameters of the files and the list of the files already read.
+
+    ---
+
+    ### INPUTS ###
+
+    TEMPLATE : XR DATA ARRAY | a time step (or more) of the variable giving its spatial dimensions and attributes
+
+    VARIABLE_NAME : STR | the name of the variable
+
+    CALENDAR : STR | the calendar of the time axis of the variable
+
+    PARAMETERS : STR | the parameters of the files (see get_accumulator_parameters) : default is none (no restriction)
+
+    ---
+
+    ### OUTPUTS ###
+
+    ACCUMULATOR : XR DATASET | the empty accumulator
+
+    ---
+
+    """
+
+    ### SPATIAL DIMENSIONS OF THE VARIABLE ###
+
+    if "time" in template.dims:
+
+        template = template.isel(time=0)
+
+    template = template.drop_vars("time", errors="ignore")
+
+    dims = ("month",) + template.dims
+
+    shape = (12,) + template.shape
+
+    coords = {"month": np.arange(1, 13)} | {
+        dim: template[dim] for dim in template.dims if dim in template.coords
+    }
+
+    ### EMPTY SUMS ###
+
+    accumulator = xr.Dataset(
+        {
+            "weighted_sum": (dims, np.zeros(shape)),
+            "weight_total": (dims, np.zeros(shape)),
+        },
+        coords=coords,
+        attrs={
+            "variable_name": variable_name,
+            "calendar": calendar,
+            "parameters": (
+                get_accumulator_parameters() if parameters is None else parameters
+            ),
+            "processed_files": "",
+        },
+    )
+
+    ## Keep the attributes of the variable for the final climatology ##
+
+    accumulator["weighted_sum"].attrs = template.attrs
+
+    return accumulator
+
+
+#################################
+### ADD SOME TIME STEPS TO IT ###
+#################################
+
+
+def update_climatology_accumulator(
+    accumulator: xr.Dataset, dataset_chunk: xr.Dataset
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function adds some monthly time steps of the variable to the accumulator. Every time step is weighted by the days of its month and
+    the missing values do not contribute to the weights.
+
+    ---
+
+    ### INPUTS ###
+
+    ACCUMULATOR : XR DATASET | the accumulator to update
+
+    DATASET_CHUNK : XR DATASET | dataset holding some time steps of the variable
+
+    ---
+
+    ### OUTPUTS ###
+
+    ACCUMULATOR : XR DATASET | the updated accumulator
+
+    ---
+
+    """
+
+    ### CHECK THE CALENDAR ###
+
+    if dataset_chunk.time.dt.calendar != accumulator.attrs["calendar"]:
+
+        raise ValueError(
+            "{} -> The calendar of the data differs from the one of the accumulator ({})".format(
+                dataset_chunk.time.dt.calendar, accumulator.attrs["calendar"]
+            )
+        )
+
+    ### WEIGHTS OF EVERY TIME STEP ###
+
+    variable = dataset_chunk[accumulator.attrs["variable_name"]].transpose(
+        "time", *accumulator["weighted_sum"].dims[1:]
+    )
+
+    values = variable.values.astype(np.float64)
+
+    valid = np.isfinite(values)
+
+    weights = np.where(
+        valid,
+        get_days_per_month(dataset_chunk.time).reshape(
+            (-1,) + (1,) * (values.ndim - 1)
+        ),
+        0.0,
+    )
+
+    ### ADD THEM TO THE MONTHS ###
+
+    months = dataset_chunk.time.dt.month.values - 1
+
+    weighted_sum = accumulator["weighted_sum"].values
+
+    weight_total = accumulator["weight_total"].values
+
+    np.add.at(weighted_sum, months, np.where(valid, values, 0.0) * weights)
+
+    np.add.at(weight_total, months, weights)
+
+    return accumulator
+
+
+#############################################
+### READ A RAW FILE A FEW STEPS AT A TIME ###
+#############################################
+
+
+def accumulate_file(
+    accumulator: xr.Dataset | None,
+    path: str,
+    variable_name: str,
+    time_chunk: int = 12,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads a raw file time_chunk time steps at a time and adds them to the accumulator, so that the memory only holds one chunk.
+    The file is restricted lazily to the domain and the range of years and its units are normalized before being read.
+    A file already read by the accumulator, from its full path, is skipped.
+
+    ---
+
+    ### INPUTS ###
+
+    ACCUMULATOR : XR DATASET | the accumulator to update, or none to create it from the file
+
+    PATH : STR | path of the raw netcdf file
+
+    VARIABLE_NAME : STR | the name of the variable
+
+    TIME_CHUNK : INT | number of time steps read at once : default is 12
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain to keep : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain to keep : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years to keep : default is none (every year)
+
+    ---
+
+    ### OUTPUTS ###
+
+    ACCUMULATOR : XR DATASET | the updated accumulator
+
+    ---
+
+    """
+
+    ### CHECK THE PARAMETERS OF THE ACCUMULATOR ###
+
+    parameters = get_accumulator_parameters(
+        lat_domain=lat_domain, lon_domain=lon_domain, year_range=year_range
+    )
+
+    if accumulator is not None and accumulator.attrs.get("parameters") != parameters:
+
+        raise ValueError(
+            "{} -> The accumulator was built with other parameters than {}".format(
+                accumulator.attrs.get("parameters"), parameters
+            )
+        )
+
+    ### SKIP THE FILES ALREADY READ ###
+
+    file_path = os.path.abspath(path)
+
+    if accumulator is not None and file_path in get_processed_files(accumulator):
+
+        return accumulator
+
+    ### OPEN THE FILE LAZILY AND RESTRICT IT ###
+
+    with xr.open_dataset(
+        path, decode_times=xr.coders.CFDatetimeCoder(use_cftime=True)
+    ) as dataset:
+
+        dataset = subset_to_domain(
+            dataset, lat_domain=lat_domain, lon_domain=lon_domain
+        )
+
+        ## Express the variable in the expected units, lazily ##
+
+        if variable_name in EXPECTED_UNITS:
+
+            dataset = normalize_variable_units(dataset, variable_name)
+
+        ## Create the accumulator from the first file ##
+
+        if accumulator is None:
+
+            accumulator = init_climatology_accumulator(
+                template=dataset[variable_name].isel(time=0),
+                variable_name=variable_name,
+                calendar=dataset.time.dt.calendar,
+                parameters=parameters,
+            )
+
+        ## Keep the range of years ##
+
+        dataset = select_year_range(dataset[[variable_name]], year_range=year_range)
+
+        ### READ THE TIME STEPS CHUNK BY CHUNK ###
+
+        for start in range(0, dataset.sizes["time"], time_chunk):
+
+            dataset_chunk = dataset.isel(time=slice(start, start + time_chunk)).load()
+
+            accumulator = update_climatology_accumulator(accumulator, dataset_chunk)
+
+    ### REMEMBER THE FILE ###
+
+    accumulator.attrs["processed_files"] = FILES_SEPARATOR.join(
+        get_processed_files(accumulator) + [file_path]
+    )
+
+    return accumulator
+
+
+def get_processed_files(accumulator: xr.Dataset) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function returns the full paths of the files already read by an accumulator.
+
+    ---
+
+    ### INPUTS ###
+
+    ACCUMULATOR : XR DATASET | the accumulator
+
+    ---
+
+    ### OUTPUTS ###
+
+    PROCESSED_FILES : LIST[STR] | the full paths of the files
+
+    ---
+
+    """
+
+    processed_files = [
+        name
+        for name in accumulator.attrs["processed_files"].split(FILES_SEPARATOR)
+        if name
+    ]
+
+    return processed_files
+
+
+##############################################
+### MERGE THE ACCUMULATORS OF SEVERAL RUNS ###
+##############################################
+
+
+def merge_climatology_accumulators(list_accumulators: list[xr.Dataset]) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function merges the accumulators built on different files (ex: by different workers) by adding their sums. The accumulators must share
+    the variable, the calendar, the parameters and the grid, and a file must not have been read by two of them.
+
+    ---
+
+    ### INPUTS ###
+
+    LIST_ACCUMULATORS : LIST OF XR DATASETS | the accumulators to merge
+
+    ---
+
+    ### OUTPUTS ###
+
+    ACCUMULATOR : XR DATASET | the merged accumulator
+
+    ---
+
+    """
+
+    ### START FROM A COPY OF THE FIRST ONE ###
+
+    accumulator = list_accumulators[0].copy(deep=True)
+
+    processed_files = get_processed_files(accumulator)
+
+    ### ADD THE OTHERS ###
+
+    for other in list_accumulators[1:]:
+
+        ## Check that they can be merged ##
+
+        for attribute in ["variable_name", "calendar", "parameters"]:
+
+            if other.attrs.get(attribute) != accumulator.attrs.get(attribute):
+
+                raise ValueError(
+                    "{} -> The accumulators do not share the same {}".format(
+                        other.attrs.get(attribute), attribute
+                    )
+                )
+
+        if other["weighted_sum"].shape != accumulator["weighted_sum"].shape:
+
+            raise ValueError(
+                "{} -> The accumulators are not defined on the same grid".format(
+                    other["weighted_sum"].shape
+                )
+            )
+
+        common_files = set(processed_files) & set(get_processed_files(other))
+
+        if common_files:
+
+            raise ValueError(
+                "{} -> These files were read by several accumulators".format(
+                    sorted(common_files)
+                )
+            )
+
+        ## Add the sums ##
+
+        accumulator["weighted_sum"].values += other["weighted_sum"].values
+
+        accumulator["weight_total"].values += other["weight_total"].values
+
+        processed_files = processed_files + get_processed_files(other)
+
+    accumulator.attrs["processed_files"] = FILES_SEPARATOR.join(processed_files)
+
+    return accumulator
+
+
+#####################################
+### GET THE CLIMATOLOGY OUT OF IT ###
+#####################################
+
+
+def finalize_climatology_accumulator(accumulator: xr.Dataset) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function divides the weighted sums by the weights to get the monthly climatology. The output has the same form as the one of
+    monthly_climatology : the time axis holds the 12 months of the year 1 of the calendar of the data.
+
+    ---
+
+    ### INPUTS ###
+
+    ACCUMULATOR : XR DATASET | the accumulator
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET_CLIM : XR DATASET | dataset holding the monthly climatology of the variable
+
+    ---
+
+    """
+
+    ### WEIGHTED MEAN OF EVERY MONTH ###
+
+    weight_total = accumulator["weight_total"]
+
+    climatology = accumulator["weighted_sum"] / weight_total.where(weight_total > 0)
+
+    ### PUT THE MONTHS ON A TIME AXIS ###
+
+    climatology = climatology.rename({"month": "time"}).assign_coords(
+        time=xr.date_range(
+            "0001-01-01",
+            periods=12,
+            freq="MS",
+            calendar=accumulator.attrs["calendar"],
+            use_cftime=True,
+        )
+    )
+
+    climatology.attrs = accumulator["weighted_sum"].attrs
+
+    dataset_clim = climatology.to_dataset(name=accumulator.attrs["variable_name"])
+
+    return dataset_clim
+
+
+###############################
+### SAVE AND LOAD THE STATE ###
+###############################
+
+
+def save_climatology_accumulator(accumulator: xr.Dataset, path: str):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function saves an accumulator as a netcdf file so that it can be updated later with new files.
+
+    ---
+
+    ### INPUTS ###
+
+    ACCUMULATOR : XR DATASET | the accumulator
+
+    PATH : STR | path of the netcdf file
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    accumulator.to_netcdf(path=path)
+
+    return
+
+
+def load_climatology_accumulator(path: str) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function loads in memory an accumulator saved as a netcdf file.
+
+    ---
+
+    ### INPUTS ###
+
+    PATH : STR | path of the netcdf file
+
+    ---
+
+    ### OUTPUTS ###
+
+    ACCUMULATOR : XR DATASET | the accumulator
+
+    ---
+
+    """
+
+    with xr.open_dataset(path) as accumulator:
+
+        accumulator = accumulator.load()
+
+    return accumulator
+
+
+##############################################
+### CLIMATOLOGY OF SOME FILES WITH A STATE ###
+##############################################
+
+
+def streaming_climatology(
+    paths: list[str],
+    variable_name: str,
+    accumulator_path: str | None = None,
+    time_chunk: int = 12,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+    year_range: tuple[int, int] | None = None,
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the monthly climatology of a variable spread over several raw files, one chunk of time steps at a time.
+    If an accumulator was saved at accumulator_path, it is updated with the files it has not read yet and saved back.
+    A saved accumulator built with another domain or range of years (or before they were saved) is discarded and computed again.
+    ValueError is raised if no path is given.
+
+    ---
+
+    ### INPUTS ###
+
+    PATHS : LIST[STR] | the paths of the raw netcdf files
+
+    VARIABLE_NAME : STR | the name of the variable
+
+    ACCUMULATOR_PATH : STR | path of the saved accumulator : default is none (nothing is saved)
+
+    TIME_CHUNK : INT | number of time steps read at once : default is 12
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain to keep : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain to keep : default is none (every longitude)
+
+    YEAR_RANGE : TUPLE[INT, INT] | the (first, last) years to keep : default is none (every year)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET_CLIM : XR DATASET | dataset holding the monthly climatology of the variable
+
+    ---
+
+    """
+
+    ### A CLIMATOLOGY NEEDS AT LEAST ONE FILE ###
+
+    if len(paths) == 0:
+
+        raise ValueError(
+            "{} -> No raw file was given to compute the climatology of this variable".format(
+                variable_name
+            )
+        )
+
+    ### RESUME FROM THE SAVED STATE ###
+
+    accumulator = None
+
+    if accumulator_path is not None and os.path.exists(accumulator_path):
+
+        accumulator = load_climatology_accumulator(accumulator_path)
+
+        ## A state of other parameters holds other time steps or cells ##
+
+        if accumulator.attrs.get("parameters") != get_accumulator_parameters(
+            lat_domain=lat_domain, lon_domain=lon_domain, year_range=year_range
+        ):
+
+            print(
+                "{} : saved with other parameters, computed again\n".format(
+                    accumulator_path
+                )
+            )
+
+            accumulator = None
+
+    ### READ THE NEW FILES ###
+
+    for path in paths:
+
+        accumulator = accumulate_file(
+            accumulator,
+            path,
+            variable_name,
+            time_chunk=time_chunk,
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+            year_range=year_range,
+        )
+
+    ### SAVE THE STATE ###
+
+    if accumulator_path is not None:
+
+        save_climatology_accumulator(accumulator, accumulator_path)
+
+    dataset_clim = finalize_climatology_accumulator(accumulator)
+
+    return dataset_clim
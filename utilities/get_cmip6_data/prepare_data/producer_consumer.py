@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+"""
+This small script runs two stages of a treatment at the same time : a producer thread prepares the next items (ex: downloads the next entry)
+while the current thread consumes the ones already produced (ex: computes and saves their climatologies). The items are passed through a bounded queue
+so that the producer never gets more than a few items ahead : the disk and the memory used by the items waiting to be consumed stay capped.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### THREADS AND QUEUES ###
+
+import threading  # to run the producer apart
+
+import queue  # bounded queue between the two stages
+
+### TYPE HINTS FOR FUNCTIONS ###
+
+from typing import Any, Callable, Iterable
+
+######################################
+### MARKER OF THE END OF THE ITEMS ###
+######################################
+
+END_OF_ITEMS = object()  # put in the queue once every item has been produced
+
+#########################################
+### RUN THE PRODUCER AND THE CONSUMER ###
+#########################################
+
+
+def run_producer_consumer(
+    items: Iterable,
+    produce: Callable[[Any], Any],
+    consume: Callable[[Any, Any], Any],
+    max_queued_items: int = 1,
+) -> list:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function calls produce on every item in a producer thread and consume on every product in the current thread, in the order of the items.
+    While an item is consumed the next ones are produced, within the limit of max_queued_items products waiting in the queue.
+    An error raised by the producer stops it and is raised again in the current thread.
+
+    ---
+
+    ### INPUTS ###
+
+    ITEMS : ITERABLE | the items to treat
+
+    PRODUCE : CALLABLE | function of an item returning its product (ex: the downloaded data)
+
+    CONSUME : CALLABLE | function of an item and its product returning the result (ex: the path of the saved climatology)
+
+    MAX_QUEUED_ITEMS : INT | maximum number of products waiting to be consumed : default is 1
+
+    ---
+
+    ### OUTPUTS ###
+
+    RESULTS : LIST | the results of consume for every item
+
+    ---
+
+    """
+
+    ### CHECK THE SIZE OF THE QUEUE ###
+
+    if max_queued_items < 1:
+
+        raise ValueError(
+            "{} -> At least one product must be allowed in the queue".format(
+                max_queued_items
+            )
+        )
+
+    ### INITIALIZATION ###
+
+    products_queue = queue.Queue(maxsize=max_queued_items)
+
+    stop_event = threading.Event()  # set if the consumer fails
+
+    ### THE PRODUCER ###
+
+    def put_unless_stopped(product) -> bool:
+
+        ## Wait for some room in the queue unless the consumer stopped ##
+
+        while not stop_event.is_set():
+
+            try:
+
+                products_queue.put(product, timeout=0.1)
+
+                return True
+
+            except queue.Full:
+
+                continue
+
+        return False
+
+    def producer():
+
+        try:
+
+            for item in items:
+
+                if not put_unless_stopped((item, produce(item))):
+
+                    return
+
+            put_unless_stopped(END_OF_ITEMS)
+
+        ## Pass the error to the consumer ##
+
+        except BaseException as error:
+
+            put_unless_stopped(error)
+
+    producer_thread = threading.Thread(target=producer, daemon=True)
+
+    producer_thread.start()
+
+    ### THE CONSUMER ###
+
+    results = []
+
+    try:
+
+        while True:
+
+            product = products_queue.get()
+
+            if product is END_OF_ITEMS:
+
+                break
+
+            if isinstance(product, BaseException):
+
+                raise product
+
+            item, produced = product
+
+            results.append(consume(item, produced))
+
+    ## Stop the producer if anything went wrong ##
+
+    finally:
+
+        stop_event.set()
+
+        producer_thread.join()
+
+    return results
+
+
+##########################
+### REPORT THE OVERLAP ###
+##########################
+
+
+def report_overlap(
+    dict_busy_seconds: dict[str, float], elapsed: float, verbose: bool = True
+) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reports how much the two stages overlapped : the time saved compared with running them in turn.
+    The elapsed time can not be shorter than the longest stage.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_BUSY_SECONDS : DICT | the time spent working by every stage (ex: "download" and "climatology")
+
+    ELAPSED : FLOAT | the measured duration of the whole treatment
+
+    VERBOSE : BOOL | do we print the report ? : default is True
+
+    ---
+
+    ### OUTPUTS ###
+
+    REPORT : DICT | the "elapsed" time, the "serial" time of the stages run in turn, the "lower_bound" (longest stage) and the "saved_fraction" of the serial time
+
+    ---
+
+    """
+
+    serial_seconds = sum(dict_busy_seconds.values())
+
+    report = {
+        "elapsed": elapsed,
+        "serial": serial_seconds,
+        "lower_bound": max(dict_busy_seconds.values(), default=0.0),
+        "saved_fraction": (
+            max(serial_seconds - elapsed, 0.0) / serial_seconds
+            if serial_seconds > 0
+            else 0.0
+        ),
+    }
+
+    if verbose:
+
+        print(
+            "{:.1f} s instead of {:.1f} s in turn ({}), {:.0%} saved by the overlap\n".format(
+                elapsed,
+                serial_seconds,
+                ", ".join(
+                    "{} {:.1f} s".format(stage, seconds)
+                    for stage, seconds in dict_busy_seconds.items()
+                ),
+                report["saved_fraction"],
+            )
+        )
+
+    return report
@@ -0,0 +1,1054 @@
+#!/usr/bin/env python3
+
+"""
+This script is a content-addressed cache for the derived products (climatologies, APRP outputs, regridded dictionaries, time means...).
+The output of a stage is a dictionary of datasets saved with dict_to_netcdf in a folder named after a key : the hash of the content of its inputs,
+of its parameters (ex: the case, fields_to_be_regridded, the target grid) and of the source code of the stage. Before computing, the key is looked for
+in the cache, so that a product already computed with the same inputs, parameters and code, by any user of the same filesystem, is reloaded instead.
+An entry is written in a temporary folder and published with a single rename, and the entries not used for a long time are garbage-collected.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the entries
+
+import shutil  # to remove the entries
+
+import json  # to save the manifest of the entries
+
+import time  # to date the uses of the entries
+
+import uuid  # to name the temporary folders
+
+import inspect  # to find the source code of a stage
+
+import sys  # to find the modules used by a stage
+
+import hashlib  # to hash the content of the datasets
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+import pandas as pd  # to handle the table of the entries
+
+### TYPE HINTS FOR FUNCTIONS ###
+
+from typing import Callable
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.store_data.hash_files import (
+    hash_files,  # to hash the inputs, parameters and code of a stage
+)
+
+from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+    dict_to_netcdf,  # to save the output of a stage
+    netcdf_to_dict,  # to reload a saved output
+    read_key_paths_table,  # to read the table of a saved output
+    write_key_paths_table,  # to save it with relative paths
+)
+
+###############################
+### PARAMETERS OF THE CACHE ###
+###############################
+
+MANIFEST_FILE_NAME = "artifact.json"  # what the entry was computed from
+
+LAST_USED_FILE_NAME = "last_used"  # touched every time the entry is reloaded
+
+TEMPORARY_PREFIX = ".tmp-"  # folders being written or removed
+
+## Permissions letting the users of the same group share the entries ##
+
+SHARED_FOLDER_MODE = 0o2775
+
+SHARED_FILE_MODE = 0o664
+
+## Age after which a temporary folder is considered left by a stopped run ##
+
+STALE_TEMPORARY_SECONDS = 24 * 3600
+
+###################################
+### HASH THE CONTENT OF A STAGE ###
+###################################
+
+
+def get_lazy_variable_signature(
+    variable: xr.Variable, source: str | None
+) -> str | None:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function describes a variable still lazily read from a file without loading it : the signature of the file (path, size and modification time),
+    its encoding and, for a dask array, the name of its graph (which tells the selection done on the file).
+
+    ---
+
+    ### INPUTS ###
+
+    VARIABLE : XR VARIABLE | the variable of the dataset
+
+    SOURCE : STR | the file the dataset was opened from : none if it was not opened from a file
+
+    ---
+
+    ### OUTPUTS ###
+
+    SIGNATURE : STR | the json description of the variable : none if its values are in memory and must be hashed
+
+    ---
+
+    """
+
+    if variable._in_memory or source is None or not os.path.isfile(source):
+
+        return None
+
+    file_status = os.stat(source)
+
+    signature = json.dumps(
+        {
+            "source": os.path.abspath(source),
+            "size": file_status.st_size,
+            "mtime_ns": file_status.st_mtime_ns,
+            "encoding": variable.encoding,
+            "graph": getattr(variable.data, "name", None) if variable.chunks else None,
+        },
+        sort_keys=True,
+        default=str,
+    )
+
+    return signature
+
+
+def hash_dataset(dataset: xr.Dataset | xr.DataArray) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes a sha256 hash of the content of a dataset : the names, dimensions, types and values of its variables and coordinates,
+    and its attributes. Two datasets with the same content have the same hash, wherever they were loaded from. The variables still lazily read
+    from a file are described by the signature of the file instead of their values, so that computing a key does not read the data.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET OR DATAARRAY | the dataset to hash
+
+    ---
+
+    ### OUTPUTS ###
+
+    HEX_DIGEST : STR | the hexadecimal representation of the hash
+
+    ---
+
+    """
+
+    if isinstance(dataset, xr.DataArray):
+
+        dataset = dataset.to_dataset(name=dataset.name or "__dataarray__")
+
+    sha = hashlib.sha256()
+
+    source = dataset.encoding.get("source")
+
+    ### ADD EVERY VARIABLE AND COORDINATE ###
+
+    for name in sorted(dataset.variables, key=str):
+
+        variable = dataset.variables[name]
+
+        ## The variables left in the file ##
+
+        signature = get_lazy_variable_signature(variable, source)
+
+        if signature is not None:
+
+            sha.update(
+                json.dumps(
+                    [
+                        str(name),
+                        list(variable.dims),
+                        str(variable.dtype),
+                        variable.shape,
+                    ]
+                ).encode()
+            )
+
+            sha.update(signature.encode())
+
+            continue
+
+        ## The variables in memory ##
+
+        values = np.ascontiguousarray(variable.values)
+
+        sha.update(
+            json.dumps(
+                [str(name), list(variable.dims), str(values.dtype), values.shape]
+            ).encode()
+        )
+
+        sha.update(
+            values.tobytes() if values.dtype != object else repr(values).encode()
+        )
+
+    ### ADD THE ATTRIBUTES ###
+
+    sha.update(json.dumps(dataset.attrs, sort_keys=True, default=str).encode())
+
+    return sha.hexdigest()
+
+
+def describe_parameter(value):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives a description of a parameter of a stage that can be saved as json : the datasets (ex: the target grid or a dictionary
+    of input datasets) are replaced by the hash of their content.
+
+    ---
+
+    ### INPUTS ###
+
+    VALUE : | the parameter
+
+    ---
+
+    ### OUTPUTS ###
+
+    DESCRIPTION : | the description of the parameter, made of dictionaries, lists, strings, numbers and none
+
+    ---
+
+    """
+
+    if isinstance(value, (xr.Dataset, xr.DataArray)):
+
+        return {"dataset_sha256": hash_dataset(value)}
+
+    if isinstance(value, dict):
+
+        return {str(key): describe_parameter(item) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+
+        return [describe_parameter(item) for item in value]
+
+    if isinstance(value, np.generic):
+
+        return value.item()
+
+    if value is None or isinstance(value, (str, int, float, bool)):
+
+        return value
+
+    return repr(value)
+
+
+def get_code_version(functions: list[Callable]) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function identifies the version of the code of a stage as the hash of the source files defining its functions and of every module
+    of the same package they use, directly or through the modules they import (see get_package_source_files) : any change of these files
+    gives new keys to the stage.
+
+    ---
+
+    ### INPUTS ###
+
+    FUNCTIONS : LIST[CALLABLE] | the functions of the stage
+
+    ---
+
+    ### OUTPUTS ###
+
+    CODE_VERSION : STR | the hash of the source files
+
+    ---
+
+    """
+
+    source_paths = sorted(
+        set().union(*[get_package_source_files(function) for function in functions])
+    )
+
+    code_version = hash_files(source_paths)
+
+    return code_version
+
+
+def get_package_source_files(function: Callable) -> set[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the source files of the module defining a function and of every module of the same package (ex: utilities) reachable
+    from it : the modules, functions and classes imported by a module lead to their own module.
+
+    ---
+
+    ### INPUTS ###
+
+    FUNCTION : CALLABLE | the function of the stage
+
+    ---
+
+    ### OUTPUTS ###
+
+    SOURCE_PATHS : SET[STR] | the paths of the source files
+
+    ---
+
+    """
+
+    package = function.__module__.split(".")[0]
+
+    module_names_to_visit = [function.__module__]
+
+    visited_module_names = set()
+
+    source_paths = set()
+
+    ### GO THROUGH THE MODULES OF THE PACKAGE ###
+
+    while module_names_to_visit:
+
+        module_name = module_names_to_visit.pop()
+
+        if module_name in visited_module_names or module_name not in sys.modules:
+
+            continue
+
+        visited_module_names.add(module_name)
+
+        module = sys.modules[module_name]
+
+        source_path = getattr(module, "__file__", None)
+
+        if source_path is not None and source_path.endswith(".py"):
+
+            source_paths.add(source_path)
+
+        ## The modules it imports ##
+
+        for value in vars(module).values():
+
+            imported_name = (
+                value.__name__
+                if inspect.ismodule(value)
+                else getattr(value, "__module__", None)
+            )
+
+            if isinstance(imported_name, str) and (
+                imported_name == package or imported_name.startswith(package + ".")
+            ):
+
+                module_names_to_visit.append(imported_name)
+
+    return source_paths
+
+
+def compute_artifact_key(
+    stage: str,
+    parameters: dict,
+    code_version: str,
+    input_paths: list[str] | None = None,
+) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the key of the output of a stage from its inputs, its parameters and its code.
+
+    ---
+
+    ### INPUTS ###
+
+    STAGE : STR | the name of the stage (ex: "regridding")
+
+    PARAMETERS : DICT | the parameters of the stage, the input datasets included
+
+    CODE_VERSION : STR | the version of the code of the stage (see get_code_version)
+
+    INPUT_PATHS : LIST[STR] | input files of the stage that are not given in the parameters : default is none
+
+    ---
+
+    ### OUTPUTS ###
+
+    ARTIFACT_KEY : STR | the hexadecimal key of the output
+
+    ---
+
+    """
+
+    artifact_key = hash_files(
+        input_paths or [],
+        extra_strings=[
+            stage,
+            json.dumps(describe_parameter(parameters), sort_keys=True),
+            code_version,
+        ],
+    )
+
+    return artifact_key
+
+
+#########################
+### SHARE THE FOLDERS ###
+#########################
+
+
+def make_shared_dir(path: str) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function creates a folder of the cache, writable by the group of its users, if it does not exist yet.
+
+    ---
+
+    ### INPUTS ###
+
+    PATH : STR | path of the folder
+
+    ---
+
+    ### OUTPUTS ###
+
+    PATH : STR | path of the folder
+
+    ---
+
+    """
+
+    if not os.path.isdir(path):
+
+        os.makedirs(path, exist_ok=True)
+
+        ## Another user may have created it at the same time ##
+
+        try:
+
+            os.chmod(path, SHARED_FOLDER_MODE)
+
+        except PermissionError:
+
+            pass
+
+    return path
+
+
+def share_folder_content(path: str):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives to the group of the users of the cache the right to read and update every file and folder of an entry.
+
+    ---
+
+    ### INPUTS ###
+
+    PATH : STR | path of the folder of the entry
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    os.chmod(path, SHARED_FOLDER_MODE)
+
+    for folder, folder_names, file_names in os.walk(path):
+
+        for folder_name in folder_names:
+
+            os.chmod(os.path.join(folder, folder_name), SHARED_FOLDER_MODE)
+
+        for file_name in file_names:
+
+            os.chmod(os.path.join(folder, file_name), SHARED_FILE_MODE)
+
+    return
+
+
+#################################
+### LOOK UP AND STORE ENTRIES ###
+#################################
+
+
+def get_artifact_path(cache_root: str, stage: str, artifact_key: str) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the path of the folder of an entry of the cache.
+
+    ---
+
+    ### INPUTS ###
+
+    CACHE_ROOT : STR | path of the cache
+
+    STAGE : STR | the name of the stage
+
+    ARTIFACT_KEY : STR | the key of the output
+
+    ---
+
+    ### OUTPUTS ###
+
+    ARTIFACT_PATH : STR | path of the folder of the entry
+
+    ---
+
+    """
+
+    artifact_path = os.path.join(cache_root, stage, artifact_key)
+
+    return artifact_path
+
+
+def lookup_artifact(cache_root: str, stage: str, artifact_key: str) -> dict | None:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reloads the output of a stage from the cache and records that the entry was used.
+
+    ---
+
+    ### INPUTS ###
+
+    CACHE_ROOT : STR | path of the cache
+
+    STAGE : STR | the name of the stage
+
+    ARTIFACT_KEY : STR | the key of the output
+
+    ---
+
+    ### OUTPUTS ###
+
+    ARTIFACT_DICT : DICT | the saved dictionary of datasets : none if the entry is not in the cache
+
+    ---
+
+    """
+
+    artifact_path = get_artifact_path(cache_root, stage, artifact_key)
+
+    if not os.path.exists(os.path.join(artifact_path, MANIFEST_FILE_NAME)):
+
+        return None
+
+    ### RELOAD IT ###
+
+    ## The entry may be removed by the garbage collection of another user in the meantime ##
+
+    try:
+
+        artifact_dict = netcdf_to_dict(parent_path_for_save=artifact_path)
+
+        os.utime(os.path.join(artifact_path, LAST_USED_FILE_NAME), None)
+
+    except FileNotFoundError:
+
+        return None
+
+    return artifact_dict
+
+
+def store_artifact(
+    cache_root: str,
+    stage: str,
+    artifact_key: str,
+    artifact_dict: dict[str, xr.Dataset],
+    manifest: dict,
+) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function saves the output of a stage in the cache. It is written in a temporary folder, with the paths of its table relative to it,
+    and published with a single rename : the other users never see an entry partially written. If the same entry was published
+    by another user in the meantime, it is kept and ours is removed.
+
+    ---
+
+    ### INPUTS ###
+
+    CACHE_ROOT : STR | path of the cache
+
+    STAGE : STR | the name of the stage
+
+    ARTIFACT_KEY : STR | the key of the output
+
+    ARTIFACT_DICT : DICT OF XR DATASETS | the output of the stage
+
+    MANIFEST : DICT | what the output was computed from, saved as json next to it
+
+    ---
+
+    ### OUTPUTS ###
+
+    ARTIFACT_PATH : STR | path of the folder of the entry
+
+    ---
+
+    """
+
+    ### WRITE THE ENTRY IN A TEMPORARY FOLDER ###
+
+    stage_path = make_shared_dir(os.path.join(make_shared_dir(cache_root), stage))
+
+    temporary_path = os.path.join(
+        stage_path, TEMPORARY_PREFIX + artifact_key + "-" + uuid.uuid4().hex
+    )
+
+    dict_to_netcdf(artifact_dict, temporary_path, do_we_clear=True)
+
+    ## The paths are made relative so that the folder can be renamed ##
+
+    key_paths_table = read_key_paths_table(temporary_path)
+
+    key_paths_table["path"] = [
+        os.path.relpath(path, temporary_path) for path in key_paths_table["path"]
+    ]
+
+    write_key_paths_table(key_paths_table, temporary_path, do_we_clear=False)
+
+    ## Save the manifest and the date of use ##
+
+    with open(os.path.join(temporary_path, MANIFEST_FILE_NAME), "w") as file:
+
+        json.dump(manifest | {"created": time.time()}, file, indent=1)
+
+    open(os.path.join(temporary_path, LAST_USED_FILE_NAME), "w").close()
+
+    share_folder_content(temporary_path)
+
+    ### PUBLISH IT ###
+
+    artifact_path = get_artifact_path(cache_root, stage, artifact_key)
+
+    try:
+
+        os.rename(temporary_path, artifact_path)
+
+    except OSError:
+
+        ## Another user published the same entry first ##
+
+        shutil.rmtree(temporary_path, ignore_errors=True)
+
+    return artifact_path
+
+
+def get_or_compute(
+    cache_root: str,
+    stage: str,
+    function: Callable[..., dict],
+    parameters: dict,
+    input_paths: list[str] | None = None,
+    code_version: str | None = None,
+    verbose: bool = True,
+) -> tuple[dict, str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the output of a stage, reloaded from the cache if it was already computed with the same inputs, parameters and code,
+    and computed then stored in the cache otherwise. A computed output is returned reloaded from the cache too : the next stages hash it
+    the same way in every run.
+    Ex: get_or_compute(cache_root, "regridding", regridding_a_dictionary, {"dictionary_to_be_regridded": dict_aprp,
+    "fields_to_be_regridded": fields_to_be_regridded, "output_grid": common_coarse_grid})
+
+    ---
+
+    ### INPUTS ###
+
+    CACHE_ROOT : STR | path of the cache
+
+    STAGE : STR | the name of the stage
+
+    FUNCTION : CALLABLE | the stage, called with the parameters as keyword arguments and returning a dictionary of datasets
+
+    PARAMETERS : DICT | the keyword arguments of the stage, the input datasets included
+
+    INPUT_PATHS : LIST[STR] | input files of the stage that are not given in the parameters : default is none
+
+    CODE_VERSION : STR | the version of the code of the stage : default is none (hash of the source file of the function)
+
+    VERBOSE : BOOL | do we print whether the output was reloaded ? : default is True
+
+    ---
+
+    ### OUTPUTS ###
+
+    ARTIFACT_DICT : DICT OF XR DATASETS | the output of the stage
+
+    ARTIFACT_KEY : STR | its key in the cache
+
+    ---
+
+    """
+
+    ### THE KEY OF THE OUTPUT ###
+
+    if code_version is None:
+
+        code_version = get_code_version([function])
+
+    artifact_key = compute_artifact_key(stage, parameters, code_version, input_paths)
+
+    ### LOOK FOR IT IN THE CACHE ###
+
+    artifact_dict = lookup_artifact(cache_root, stage, artifact_key)
+
+    if artifact_dict is not None:
+
+        if verbose:
+
+            print("{} : reloaded {} from the cache\n".format(stage, artifact_key[:16]))
+
+        return (artifact_dict, artifact_key)
+
+    ### COMPUTE AND STORE IT ###
+
+    artifact_dict = function(**parameters)
+
+    store_artifact(
+        cache_root,
+        stage,
+        artifact_key,
+        artifact_dict,
+        manifest={
+            "stage": stage,
+            "key": artifact_key,
+            "parameters": describe_parameter(parameters),
+            "input_paths": list(input_paths or []),
+            "code_version": code_version,
+        },
+    )
+
+    if verbose:
+
+        print("{} : computed and stored {}\n".format(stage, artifact_key[:16]))
+
+    ## The stored entry is returned as it is reloaded by the next runs, so that the keys of the next stages do not change ##
+
+    stored_dict = lookup_artifact(cache_root, stage, artifact_key)
+
+    if stored_dict is not None:
+
+        artifact_dict = stored_dict
+
+    return (artifact_dict, artifact_key)
+
+
+###############################
+### GARBAGE COLLECT ENTRIES ###
+###############################
+
+
+def get_folder_size(path: str) -> int:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the size of the files of a folder.
+
+    ---
+
+    ### INPUTS ###
+
+    PATH : STR | path of the folder
+
+    ---
+
+    ### OUTPUTS ###
+
+    N_BYTES : INT | the size of its files in bytes
+
+    ---
+
+    """
+
+    n_bytes = sum(
+        os.path.getsize(os.path.join(folder, file_name))
+        for folder, _, file_names in os.walk(path)
+        for file_name in file_names
+    )
+
+    return n_bytes
+
+
+def list_artifacts(cache_root: str) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function lists the entries of the cache with their size and their last use.
+
+    ---
+
+    ### INPUTS ###
+
+    CACHE_ROOT : STR | path of the cache
+
+    ---
+
+    ### OUTPUTS ###
+
+    ARTIFACTS : PANDAS DATAFRAME | one row per entry with the "stage", "key", "path", "n_bytes" and "last_used" columns, from the least recently used
+
+    ---
+
+    """
+
+    rows = []
+
+    if os.path.isdir(cache_root):
+
+        for stage in sorted(os.listdir(cache_root)):
+
+            stage_path = os.path.join(cache_root, stage)
+
+            if not os.path.isdir(stage_path):
+
+                continue
+
+            for artifact_key in sorted(os.listdir(stage_path)):
+
+                artifact_path = os.path.join(stage_path, artifact_key)
+
+                last_used_path = os.path.join(artifact_path, LAST_USED_FILE_NAME)
+
+                if artifact_key.startswith(TEMPORARY_PREFIX) or not os.path.exists(
+                    last_used_path
+                ):
+
+                    continue
+
+                rows.append(
+                    {
+                        "stage": stage,
+                        "key": artifact_key,
+                        "path": artifact_path,
+                        "n_bytes": get_folder_size(artifact_path),
+                        "last_used": os.stat(last_used_path).st_mtime,
+                    }
+                )
+
+    artifacts = (
+        pd.DataFrame(rows, columns=["stage", "key", "path", "n_bytes", "last_used"])
+        .sort_values("last_used", kind="stable")
+        .reset_index(drop=True)
+    )
+
+    return artifacts
+
+
+def remove_folder(path: str):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function removes a folder of the cache : it is first renamed as a temporary folder so that it disappears at once for the other users.
+
+    ---
+
+    ### INPUTS ###
+
+    PATH : STR | path of the folder
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    trash_path = os.path.join(
+        os.path.dirname(path),
+        TEMPORARY_PREFIX + os.path.basename(path) + "-" + uuid.uuid4().hex,
+    )
+
+    os.rename(path, trash_path)
+
+    shutil.rmtree(trash_path, ignore_errors=True)
+
+    return
+
+
+def collect_garbage(
+    cache_root: str,
+    max_unused_days: float | None = None,
+    byte_budget: float | None = None,
+    now: float | None = None,
+) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function removes the entries of the cache not used for more than max_unused_days, then the least recently used ones
+    until the cache fits in its budget. The temporary folders left by stopped runs are removed too.
+
+    ---
+
+    ### INPUTS ###
+
+    CACHE_ROOT : STR | path of the cache
+
+    MAX_UNUSED_DAYS : FLOAT | the entries unused for longer are removed : default is none (no limit of age)
+
+    BYTE_BUDGET : FLOAT | the maximum size of the cache in bytes : default is none (no limit of size)
+
+    NOW : FLOAT | the current time : default is none (time.time())
+
+    ---
+
+    ### OUTPUTS ###
+
+    REMOVED_PATHS : LIST[STR] | the paths of the removed entries
+
+    ---
+
+    """
+
+    ### CHECK THE BUDGET ###
+
+    if byte_budget is not None and byte_budget < 0:
+
+        raise ValueError(
+            "{} -> The budget of the cache must be positive".format(byte_budget)
+        )
+
+    if now is None:
+
+        now = time.time()
+
+    ### REMOVE THE STALE TEMPORARY FOLDERS ###
+
+    if os.path.isdir(cache_root):
+
+        for stage in os.listdir(cache_root):
+
+            stage_path = os.path.join(cache_root, stage)
+
+            if not os.path.isdir(stage_path):
+
+                continue
+
+            for folder_name in os.listdir(stage_path):
+
+                folder_path = os.path.join(stage_path, folder_name)
+
+                if (
+                    folder_name.startswith(TEMPORARY_PREFIX)
+                    and now - os.stat(folder_path).st_mtime > STALE_TEMPORARY_SECONDS
+                ):
+
+                    shutil.rmtree(folder_path, ignore_errors=True)
+
+    ### THE ENTRIES FROM THE LEAST RECENTLY USED ###
+
+    artifacts = list_artifacts(cache_root)
+
+    n_bytes_cached = artifacts["n_bytes"].sum()
+
+    removed_paths = []
+
+    for row in artifacts.itertuples():
+
+        is_too_old = (
+            max_unused_days is not None
+            and now - row.last_used > max_unused_days * 24 * 3600
+        )
+
+        is_over_budget = byte_budget is not None and n_bytes_cached > byte_budget
+
+        if not (is_too_old or is_over_budget):
+
+            continue
+
+        ## It may have been removed by another user ##
+
+        try:
+
+            remove_folder(row.path)
+
+        except FileNotFoundError:
+
+            continue
+
+        n_bytes_cached -= row.n_bytes
+
+        removed_paths.append(row.path)
+
+    print(
+        "{} entries removed from the artifact cache, {:.2f} GB left\n".format(
+            len(removed_paths), n_bytes_cached / 1e9
+        )
+    )
+
+    return removed_paths
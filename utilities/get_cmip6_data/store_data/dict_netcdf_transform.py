@@ -15,6 +15,10 @@ Feel free to copy, adapt and modify it under the provided license on github.
 ### IMPORTATION OF THE MODULES ###
 ##################################
 
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the saved files
+
 ### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
 
 import numpy as np  # to handle numpy arrays and the associated tools
@@ -29,6 +33,182 @@ from utilities.get_cmip6_data.folders_handle.create import (
     create_dir,  # function to create a cleaned downloading directory
 )
 
+from utilities.get_cmip6_data.store_data.grid_catalog import (
+    write_grid_catalog,  # to record the grid of every entry
+    has_horizontal_grid,  # are the entries on a lat/lon grid ?
+)
+
+#####################################################
+### SAVE ONE DATASET OF THE DICTIONNARY AS NETCDF ###
+#####################################################
+
+
+def save_one_entry_to_netcdf(
+    dataset: xr.Dataset,
+    key: str,
+    parent_path_for_save: str,
+    do_we_clear: bool = True,
+    folder_suffix: str = "",
+) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function saves the dataset of one entry of the dictionnary as a netcdf file in its own folder. The name of the folder and of the file
+    is generated from the key of the entry.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset of the entry
+
+    KEY : STR | the key of the entry in the dictionnary
+
+    PARENT_PATH_FOR_SAVE : STR | path of the parent directory of the save folder
+
+    DO_WE_CLEAR : BOOL | option to clear the folder of the entry if it already exists : default is True
+
+    FOLDER_SUFFIX : STR | optional suffix added to the folder's name (ex: a hash of the inputs) : default is no suffix
+
+    ---
+
+    ### OUTPUTS ###
+
+    PATH_TO_NC : STR | the path of the saved netcdf file
+
+    ---
+
+    """
+
+    ### GENERATE A FILENAME WITH THE KEY ###
+
+    ## Split the key into a list of keywords ##
+
+    splitted_key = key.split(".")
+
+    ## Connect them with a "_" to make a filename that is not broken ##
+
+    full_name = "_".join(splitted_key)
+
+    ## Define the filename ##
+
+    filename = full_name + ".nc"
+
+    ### CREATE THE DIRECTORY ASSOCIATED TO THE ENTRY AND KEEP ITS PATH ###
+
+    saving_path_given_entry = create_dir(
+        parent_path=parent_path_for_save,
+        name=full_name + folder_suffix,
+        clear=do_we_clear,
+    )
+
+    ### SAVE THE ENTRY'S DATASET ###
+
+    path_to_nc = saving_path_given_entry + "/" + filename
+
+    dataset.to_netcdf(path=path_to_nc)
+
+    return path_to_nc
+
+
+#####################################################
+### SAVE THE TABLE ASSOCIATING THE KEYS AND PATHS ###
+#####################################################
+
+
+def write_key_paths_table(
+    key_paths_table: pd.DataFrame, parent_path_for_save: str, do_we_clear: bool = True
+):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function saves the pandas dataframe associating every key of the dictionnary to the path of its netcdf file as a pickle file.
+    Other columns (ex: the hash of the inputs of the entry) can be stored in the dataframe.
+
+    ---
+
+    ### INPUTS ###
+
+    KEY_PATHS_TABLE : PANDAS DATAFRAME | the table with at least the "key" and "path" columns
+
+    PARENT_PATH_FOR_SAVE : STR | path of the parent directory of the save folder
+
+    DO_WE_CLEAR : BOOL | option to clear the table folder if it already exists : default is True
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    ### CREATE THE TABLE FOLDER TO HOLD IT ###
+
+    saving_path_table = create_dir(
+        parent_path=parent_path_for_save, name="table", clear=do_we_clear
+    )
+
+    ### SAVE IT ###
+
+    key_paths_table.to_pickle(saving_path_table + "/key_paths_table.pkl")
+
+    return
+
+
+#####################################################
+### LOAD THE TABLE ASSOCIATING THE KEYS AND PATHS ###
+#####################################################
+
+
+def read_key_paths_table(parent_path_for_save: str) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function loads the pandas dataframe associating every key of the dictionnary to the path of its netcdf file.
+    The paths saved relative to the save folder (ex: in the artifact cache, see artifact_cache.py) are given from parent_path_for_save.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory where the data was saved
+
+    ---
+
+    ### OUTPUTS ###
+
+    KEY_PATHS_TABLE : PANDAS DATAFRAME | the table with at least the "key" and "path" columns
+
+    ---
+
+    """
+
+    key_paths_table = pd.read_pickle(
+        parent_path_for_save + "/table/" + "key_paths_table.pkl"
+    )
+
+    ### THE RELATIVE PATHS ARE GIVEN FROM THE SAVE FOLDER ###
+
+    key_paths_table["path"] = [
+        path if os.path.isabs(path) else os.path.join(parent_path_for_save, path)
+        for path in key_paths_table["path"]
+    ]
+
+    return key_paths_table
+
+
 #############################################################
 ### SAVE EVERY DATASET OF THE DICTIONNARY AS NETCDF FILES ###
 #############################################################
@@ -45,6 +225,7 @@ def dict_to_netcdf(
 
     This function save every dataset entry of the dictionnary and save them as netcdf files. It also generates a pandas dataframe associating every single key
     of the dictionnary with the path of the corresponding saved netcdf file. This dataframe is saved as a pickle file.
+    The grid of every entry is recorded in the grid catalog saved next to it, if the entries have lat and lon coordinates.
 
     ---
 
@@ -87,40 +268,15 @@ def dict_to_netcdf(
 
     for ii, key in enumerate(list_keys):
 
-        ## Generate a filename with the key ##
-
-        # Split the key into a list of keywords #
-
-        splitted_key = key.split(".")
-
-        # Connect them with a "_" to make a filename that is not broken #
-
-        full_name = "_".join(splitted_key)
-
-        # Define the filename #
-
-        filename = full_name + ".nc"
+        ## Save the entry's dataset and conserve the path at which we saved it in the array ##
 
-        ## Create the directory associated to the entry and keep its path ##
-
-        saving_path_given_entry = create_dir(
-            parent_path=parent_path_for_save, name=full_name, clear=do_we_clear
+        paths[ii] = save_one_entry_to_netcdf(
+            dataset=dataset_dict[key],
+            key=key,
+            parent_path_for_save=parent_path_for_save,
+            do_we_clear=do_we_clear,
         )
 
-        ## Generate the full path with the filename ##
-
-        path_to_nc = saving_path_given_entry + "/" + filename
-
-        ## Save the entry's dataset ##
-
-        # Save it #
-
-        dataset_dict[key].to_netcdf(path=path_to_nc)
-
-        # Conserve the path at which we saved it in the array #
-
-        paths[ii] = path_to_nc
-
     ### GENERATE THE PANDAS DATAFRAME ASSOCIATING KEYS WITH PATHS ###
 
     ## Create the pandas dataframe from a dictionnary ##
@@ -135,15 +291,29 @@ def dict_to_netcdf(
 
     ## Save the pandas dataframe ##
 
-    # Create the table folder to hold it #
-
-    saving_path_table = create_dir(
-        parent_path=parent_path_for_save, name="table", clear=do_we_clear
+    write_key_paths_table(
+        key_paths_table=key_paths_table,
+        parent_path_for_save=parent_path_for_save,
+        do_we_clear=do_we_clear,
     )
 
-    # Save it #
+    ### RECORD THE GRID OF EVERY ENTRY ###
 
-    key_paths_table.to_pickle(saving_path_table + "/key_paths_table.pkl")
+    ## Only the entries on a lat/lon grid (ex: not the global time series) ##
+
+    dict_gridded = {
+        key: dataset
+        for key, dataset in dataset_dict.items()
+        if has_horizontal_grid(dataset)
+    }
+
+    if dict_gridded:
+
+        write_grid_catalog(
+            dataset_dict=dict_gridded,
+            parent_path_for_save=parent_path_for_save,
+            do_we_clear=False,
+        )
 
     return
 
@@ -187,9 +357,7 @@ def netcdf_to_dict(parent_path_for_save: str):
 
     # Load the dataframe #
 
-    key_paths_table = pd.read_pickle(
-        parent_path_for_save + "/table/" + "key_paths_table.pkl"
-    )
+    key_paths_table = read_key_paths_table(parent_path_for_save)
 
     # Extract the keys #
 
@@ -214,6 +382,172 @@ def netcdf_to_dict(parent_path_for_save: str):
     return generated_data_dict
 
 
+###################################################
+### ADD NEW VARIABLES TO THE SAVED NETCDF FILES ###
+###################################################
+
+
+def get_missing_variables(
+    parent_path_for_save: str, variable_id: list[str]
+) -> dict[str, list[str]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the variables held by every netcdf file saved at parent_path_for_save and gives the ones of variable_id it misses.
+    Only the metadata of the files is read.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory where the data was saved
+
+    VARIABLE_ID : LIST[STR] | the variables every entry should hold
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_MISSING_VARIABLES : DICT | the variables missing from every key, in the order of variable_id (empty list if none is missing)
+
+    ---
+
+    """
+
+    key_paths_table = read_key_paths_table(parent_path_for_save)
+
+    dict_missing_variables = {}
+
+    for key, path in zip(key_paths_table["key"], key_paths_table["path"]):
+
+        with xr.open_dataset(path) as dataset:
+
+            dict_missing_variables[key] = [
+                variable
+                for variable in variable_id
+                if variable not in dataset.variables
+            ]
+
+    return dict_missing_variables
+
+
+def append_variables_to_netcdf(dataset: xr.Dataset, path_to_nc: str) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function adds to a saved netcdf file the data variables of a dataset it does not hold yet. The file is opened in append mode :
+    the variables already saved, the coordinates and the global attributes are not written again.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset holding the new variables, on the same grid and months as the saved file
+
+    PATH_TO_NC : STR | the path of the saved netcdf file
+
+    ---
+
+    ### OUTPUTS ###
+
+    APPENDED_VARIABLES : LIST[STR] | the names of the variables added to the file
+
+    ---
+
+    """
+
+    ### THE VARIABLES AND DIMENSIONS OF THE SAVED FILE ###
+
+    with xr.open_dataset(path_to_nc) as saved_dataset:
+
+        saved_variables = set(saved_dataset.variables)
+
+        saved_sizes = dict(saved_dataset.sizes)
+
+        saved_coordinates = {
+            coordinate: saved_dataset[coordinate].values
+            for coordinate in saved_dataset.coords
+        }
+
+    appended_variables = [
+        variable for variable in dataset.data_vars if variable not in saved_variables
+    ]
+
+    if not appended_variables:
+
+        return []
+
+    ### CHECK THAT THE NEW VARIABLES FIT IN THE FILE ###
+
+    new_dataset = dataset[appended_variables]
+
+    for dimension, size in new_dataset.sizes.items():
+
+        if dimension in saved_sizes and saved_sizes[dimension] != size:
+
+            raise ValueError(
+                "{} -> The dimension has {} elements in the file and {} in the new variables".format(
+                    dimension, saved_sizes[dimension], size
+                )
+            )
+
+    ## The values of the coordinates are not written : they must be the saved ones ##
+
+    for coordinate in new_dataset.coords:
+
+        if coordinate not in saved_coordinates:
+
+            continue
+
+        saved_values = saved_coordinates[coordinate]
+
+        new_values = new_dataset[coordinate].values
+
+        if saved_values.shape != new_values.shape:
+
+            is_same = False
+
+        elif np.issubdtype(saved_values.dtype, np.number) and np.issubdtype(
+            new_values.dtype, np.number
+        ):
+
+            is_same = np.allclose(saved_values, new_values)
+
+        else:
+
+            is_same = np.array_equal(saved_values, new_values)
+
+        if not is_same:
+
+            raise ValueError(
+                "{} -> The coordinate of the new variables differs from the one of the file".format(
+                    coordinate
+                )
+            )
+
+    ### APPEND THEM ###
+
+    new_dataset = new_dataset.drop_vars(
+        [
+            coordinate
+            for coordinate in new_dataset.coords
+            if coordinate in saved_variables
+        ]
+    )
+
+    new_dataset.attrs = {}
+
+    new_dataset.to_netcdf(path=path_to_nc, mode="a")
+
+    return appended_variables
+
+
 ######################
 ### USED FOR TESTS ###
 ######################
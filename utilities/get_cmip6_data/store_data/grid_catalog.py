@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+
+"""
+This small script is used to record the horizontal grid of every entry we save. For every entry the catalog holds its latitudes, longitudes,
+their bounds, the shape of the grid and a hash identifying it. The catalog is saved next to the table of the keys and paths as a pickle file.
+
+It allows to know the grids of the ensemble (ex: to build the common grid) without opening the data, and to treat once the entries sharing the same grid.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### HASH THE GRIDS ###
+
+import hashlib  # to compute the hashes
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+import pandas as pd  # to create and handle tables in python
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.folders_handle.create import (
+    create_dir,  # function to create the table directory
+)
+
+from utilities.tools_for_analysis.regridding.separable_conservative import (
+    get_coordinate_bounds,  # bounds of the lat and lon coordinates
+)
+
+#####################################
+### DESCRIBE THE GRID OF AN ENTRY ###
+#####################################
+
+
+def has_horizontal_grid(dataset: xr.Dataset) -> bool:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function tells whether a dataset is on a horizontal grid, i.e. holds lat and lon coordinates (ex: not a global time series).
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset
+
+    ---
+
+    ### OUTPUTS ###
+
+    HAS_GRID : BOOL | whether the dataset has lat and lon coordinates
+
+    ---
+
+    """
+
+    has_grid = "lat" in dataset.coords and "lon" in dataset.coords
+
+    return has_grid
+
+
+def compute_grid_hash(dataset: xr.Dataset) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes a hash identifying the horizontal grid of a dataset from the values of its lat and lon coordinates and of their bounds
+    (built from the middle points if the dataset has none).
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset on the grid
+
+    ---
+
+    ### OUTPUTS ###
+
+    GRID_HASH : STR | the hexadecimal sha256 hash of the grid
+
+    ---
+
+    """
+
+    sha = hashlib.sha256()
+
+    for coordinate in ["lat", "lon"]:
+
+        sha.update(dataset[coordinate].values.astype(np.float64).tobytes())
+
+        sha.update(b"\0")
+
+        sha.update(get_coordinate_bounds(dataset, coordinate).tobytes())
+
+        sha.update(b"\0")
+
+    return sha.hexdigest()
+
+
+def describe_grid(dataset: xr.Dataset) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gathers the description of the horizontal grid of a dataset as it is stored in the grid catalog.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset on the grid
+
+    ---
+
+    ### OUTPUTS ###
+
+    GRID_DESCRIPTION : DICT | the grid_hash, n_lat, n_lon, lat, lon, lat_bnds and lon_bnds of the grid
+
+    ---
+
+    """
+
+    grid_description = {
+        "grid_hash": compute_grid_hash(dataset),
+        "n_lat": dataset["lat"].size,
+        "n_lon": dataset["lon"].size,
+        "lat": dataset["lat"].values.astype(np.float64),
+        "lon": dataset["lon"].values.astype(np.float64),
+        "lat_bnds": get_coordinate_bounds(dataset, "lat"),
+        "lon_bnds": get_coordinate_bounds(dataset, "lon"),
+    }
+
+    return grid_description
+
+
+def keep_only_grid(dataset: xr.Dataset) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function keeps only the lat and lon coordinates of a dataset and their bounds. The result has the same description in the catalog
+    as the full dataset and can be kept in memory once the data is saved.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset on the grid
+
+    ---
+
+    ### OUTPUTS ###
+
+    GRID : XR DATASET | the dataset without data
+
+    ---
+
+    """
+
+    grid = xr.Dataset(
+        {
+            bounds: dataset[bounds]
+            for bounds in ["lat_bnds", "lon_bnds"]
+            if bounds in dataset.variables
+        },
+        coords={"lat": dataset["lat"], "lon": dataset["lon"]},
+    )
+
+    return grid
+
+
+##################################
+### WRITE AND READ THE CATALOG ###
+##################################
+
+
+def write_grid_catalog(
+    dataset_dict: dict[str, xr.Dataset],
+    parent_path_for_save: str,
+    do_we_clear: bool = False,
+):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function records the grid of every dataset of the dictionnary in a pandas dataframe saved as a pickle file in the table folder.
+    Only the coordinates are read : the data of the datasets is not loaded.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET_DICT : DICTIONNARY OF XARRAY DATASETS | dictionnary of the saved datasets
+
+    PARENT_PATH_FOR_SAVE : STR | path of the parent directory of the save folder
+
+    DO_WE_CLEAR : BOOL | option to clear the table folder if it already exists : default is False (the key paths table lives there)
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    ### DESCRIBE EVERY GRID ###
+
+    grid_catalog = pd.DataFrame(
+        [{"key": key} | describe_grid(dataset) for key, dataset in dataset_dict.items()]
+    )
+
+    ### SAVE THE CATALOG ###
+
+    saving_path_table = create_dir(
+        parent_path=parent_path_for_save, name="table", clear=do_we_clear
+    )
+
+    grid_catalog.to_pickle(saving_path_table + "/grid_catalog.pkl")
+
+    return
+
+
+def read_grid_catalog(parent_path_for_save: str) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function loads the grid catalog of the entries saved at parent_path_for_save.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory where the data was saved
+
+    ---
+
+    ### OUTPUTS ###
+
+    GRID_CATALOG : PANDAS DATAFRAME | the table with the "key", "grid_hash", "n_lat", "n_lon", "lat", "lon", "lat_bnds" and "lon_bnds" columns
+
+    ---
+
+    """
+
+    grid_catalog = pd.read_pickle(parent_path_for_save + "/table/grid_catalog.pkl")
+
+    return grid_catalog
+
+
+#######################################
+### GROUP THE ENTRIES BY THEIR GRID ###
+#######################################
+
+
+def get_unique_grids(grid_catalog: pd.DataFrame) -> dict[str, xr.Dataset]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function builds one light dataset holding only the coordinates and bounds of every distinct grid of the catalog.
+
+    ---
+
+    ### INPUTS ###
+
+    GRID_CATALOG : PANDAS DATAFRAME | the grid catalog
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_GRIDS : DICT OF XR DATASETS | one dataset without data per grid hash
+
+    ---
+
+    """
+
+    dict_grids = {}
+
+    for row in grid_catalog.drop_duplicates("grid_hash").itertuples():
+
+        grid = xr.Dataset(
+            {
+                "lat_bnds": (("lat", "bnds"), row.lat_bnds),
+                "lon_bnds": (("lon", "bnds"), row.lon_bnds),
+            },
+            coords={"lat": row.lat, "lon": row.lon},
+        )
+
+        grid["lat"].attrs["bounds"] = "lat_bnds"
+
+        grid["lon"].attrs["bounds"] = "lon_bnds"
+
+        dict_grids[row.grid_hash] = grid
+
+    return dict_grids
+
+
+def group_keys_by_grid(grid_catalog: pd.DataFrame) -> dict[str, list[str]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function associates every distinct grid of the catalog to the keys of the entries defined on it.
+
+    ---
+
+    ### INPUTS ###
+
+    GRID_CATALOG : PANDAS DATAFRAME | the grid catalog
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_KEYS_PER_GRID : DICT OF LIST[STR] | the keys of the entries of every grid hash
+
+    ---
+
+    """
+
+    dict_keys_per_grid = {
+        grid_hash: list(keys)
+        for grid_hash, keys in grid_catalog.groupby("grid_hash", sort=False)["key"]
+    }
+
+    return dict_keys_per_grid
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""
+This small script is used to identify the content of the files we have saved. We compute a hash of the bytes of a list of files
+so that a derived product can be associated to the exact inputs it was computed from.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+import hashlib  # to compute the hashes
+
+###########################
+### SIZE OF READ BLOCKS ###
+###########################
+
+BLOCK_SIZE = 2**20  # 1 MiB
+
+######################################
+### HASH THE CONTENT OF SOME FILES ###
+######################################
+
+
+def hash_files(paths: list[str], extra_strings: list[str] | None = None) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes a sha256 hash of the content of the given files, read block by block so that the memory stays low.
+    Some extra strings (ex: the names of the experiments or parameters of the computation) can be added to the hash.
+
+    ---
+
+    ### INPUTS ###
+
+    PATHS : LIST[STR] | the paths of the files to hash (the order matters)
+
+    EXTRA_STRINGS : LIST[STR] | strings added to the hash : default is none
+
+    ---
+
+    ### OUTPUTS ###
+
+    HEX_DIGEST : STR | the hexadecimal representation of the hash
+
+    ---
+
+    """
+
+    ### INITIALIZE THE HASH ###
+
+    sha = hashlib.sha256()
+
+    ### ADD THE CONTENT OF EVERY FILE ###
+
+    for path in paths:
+
+        with open(path, "rb") as file:
+
+            for block in iter(lambda: file.read(BLOCK_SIZE), b""):
+
+                sha.update(block)
+
+        ## Separate the files so that their boundaries matter ##
+
+        sha.update(b"\0")
+
+    ### ADD THE EXTRA STRINGS ###
+
+    for string in extra_strings or []:
+
+        sha.update(string.encode())
+
+        sha.update(b"\0")
+
+    return sha.hexdigest()
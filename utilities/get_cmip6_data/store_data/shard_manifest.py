@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+
+"""
+This script splits the entries of the ensemble between several shards (ex: the tasks of a SLURM job array) and merges their outputs afterwards.
+An entry (source_id.member_id.grid_label) is given to a shard from a hash of its name only : every shard finds its own entries without knowing
+the others, even if the searches of the nodes do not return the entries in the same order. Every shard saves its outputs in its own folder
+with its own table of the keys and paths, then writes a manifest of what it produced. The manifest of a previous run is removed when a shard starts.
+The merge step checks that every shard wrote its manifest and that its table holds the keys of its manifest, and combines their tables into the single
+table read by netcdf_to_dict and the other stages.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the shards
+
+import json  # to save the manifests
+
+import time  # to date the manifests
+
+import hashlib  # to give the entries to the shards
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd  # to handle the tables of the shards
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.folders_handle.create import (
+    create_dir,  # to create the table folder of the merged outputs
+)
+
+from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+    read_key_paths_table,  # to read the table of a shard
+    write_key_paths_table,  # to write the merged table
+)
+
+from utilities.get_cmip6_data.store_data.grid_catalog import (
+    read_grid_catalog,  # to read the grid catalog of a shard
+)
+
+from utilities.tools_for_analysis.handle_entries.extract_entries_names import (
+    get_entries_only_from_clim_dict,  # entry of a climatology key
+)
+
+################################
+### PARAMETERS OF THE SHARDS ###
+################################
+
+SHARDS_FOLDER_NAME = "shards"  # in the save folder
+
+SHARD_MANIFEST_FILE_NAME = "shard_manifest.json"  # written last by every shard
+
+######################################
+### GIVE THE ENTRIES TO THE SHARDS ###
+######################################
+
+
+def check_shard(shard_index: int, shard_count: int):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function checks that a shard index and count are consistent.
+
+    ---
+
+    ### INPUTS ###
+
+    SHARD_INDEX : INT | the index of the shard, from 0 to shard_count - 1
+
+    SHARD_COUNT : INT | the number of shards
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    if shard_count < 1:
+
+        raise ValueError("{} -> There must be at least one shard".format(shard_count))
+
+    if not 0 <= shard_index < shard_count:
+
+        raise ValueError(
+            "{} -> The shard index must be between 0 and {}".format(
+                shard_index, shard_count - 1
+            )
+        )
+
+    return
+
+
+def get_shard_of_entry(entry: str, shard_count: int) -> int:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the shard in charge of an entry, from a sha256 hash of its name : it is the same in every process and on every node.
+
+    ---
+
+    ### INPUTS ###
+
+    ENTRY : STR | the name of the entry (source_id.member_id.grid_label)
+
+    SHARD_COUNT : INT | the number of shards
+
+    ---
+
+    ### OUTPUTS ###
+
+    SHARD_INDEX : INT | the index of the shard in charge of the entry
+
+    ---
+
+    """
+
+    shard_index = int(hashlib.sha256(entry.encode()).hexdigest(), 16) % shard_count
+
+    return shard_index
+
+
+def select_shard_entries(
+    entries: list[str], shard_index: int, shard_count: int
+) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function keeps the entries a shard is in charge of, in their original order.
+
+    ---
+
+    ### INPUTS ###
+
+    ENTRIES : LIST[STR] | the names of the entries (source_id.member_id.grid_label)
+
+    SHARD_INDEX : INT | the index of the shard
+
+    SHARD_COUNT : INT | the number of shards
+
+    ---
+
+    ### OUTPUTS ###
+
+    SHARD_ENTRIES : LIST[STR] | the entries of the shard
+
+    ---
+
+    """
+
+    check_shard(shard_index, shard_count)
+
+    shard_entries = [
+        entry
+        for entry in entries
+        if get_shard_of_entry(entry, shard_count) == shard_index
+    ]
+
+    return shard_entries
+
+
+def get_shard_path(
+    parent_path_for_save: str, shard_index: int, shard_count: int
+) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the folder where a shard saves its outputs. Without sharding it is the save folder itself.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_FOR_SAVE : STR | path of the save folder of the merged outputs
+
+    SHARD_INDEX : INT | the index of the shard
+
+    SHARD_COUNT : INT | the number of shards
+
+    ---
+
+    ### OUTPUTS ###
+
+    SHARD_PATH : STR | path of the save folder of the shard
+
+    ---
+
+    """
+
+    check_shard(shard_index, shard_count)
+
+    if shard_count == 1:
+
+        return parent_path_for_save
+
+    shard_path = os.path.join(
+        parent_path_for_save,
+        SHARDS_FOLDER_NAME,
+        "shard_{:04d}_of_{:04d}".format(shard_index, shard_count),
+    )
+
+    return shard_path
+
+
+###########################
+### MANIFESTS OF SHARDS ###
+###########################
+
+
+def write_shard_manifest(
+    parent_path_for_save: str,
+    shard_index: int,
+    shard_count: int,
+    entries: list[str] | None = None,
+) -> str:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function writes the manifest of a shard once its outputs and their table are saved : the entries it was in charge of and the keys it produced.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_FOR_SAVE : STR | path of the save folder of the merged outputs
+
+    SHARD_INDEX : INT | the index of the shard
+
+    SHARD_COUNT : INT | the number of shards
+
+    ENTRIES : LIST[STR] | the entries the shard was in charge of : default is none (the entries of the saved climatology keys)
+
+    ---
+
+    ### OUTPUTS ###
+
+    MANIFEST_PATH : STR | path of the manifest
+
+    ---
+
+    """
+
+    shard_path = get_shard_path(parent_path_for_save, shard_index, shard_count)
+
+    list_keys = sorted(read_key_paths_table(shard_path)["key"])
+
+    if entries is None:
+
+        entries = {get_entries_only_from_clim_dict(key) for key in list_keys}
+
+    manifest = {
+        "shard_index": shard_index,
+        "shard_count": shard_count,
+        "entries": sorted(entries),
+        "keys": list_keys,
+        "created": time.time(),
+    }
+
+    manifest_path = os.path.join(shard_path, SHARD_MANIFEST_FILE_NAME)
+
+    with open(manifest_path, "w") as file:
+
+        json.dump(manifest, file, indent=1)
+
+    return manifest_path
+
+
+def remove_shard_manifest(
+    parent_path_for_save: str, shard_index: int, shard_count: int
+):
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function removes the manifest written by a previous run of a shard. It is called when the shard starts :
+    until it finishes again, the merge step sees it as unfinished instead of merging the outputs of the previous run.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_FOR_SAVE : STR | path of the save folder of the merged outputs
+
+    SHARD_INDEX : INT | the index of the shard
+
+    SHARD_COUNT : INT | the number of shards
+
+    ---
+
+    ### OUTPUTS ###
+
+    nothing.
+
+    ---
+
+    """
+
+    manifest_path = os.path.join(
+        get_shard_path(parent_path_for_save, shard_index, shard_count),
+        SHARD_MANIFEST_FILE_NAME,
+    )
+
+    if os.path.exists(manifest_path):
+
+        os.remove(manifest_path)
+
+    return
+
+
+def read_shard_manifest(shard_path: str) -> dict | None:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the manifest of a shard.
+
+    ---
+
+    ### INPUTS ###
+
+    SHARD_PATH : STR | path of the save folder of the shard
+
+    ---
+
+    ### OUTPUTS ###
+
+    MANIFEST : DICT | the manifest of the shard : none if the shard did not finish
+
+    ---
+
+    """
+
+    manifest_path = os.path.join(shard_path, SHARD_MANIFEST_FILE_NAME)
+
+    if not os.path.exists(manifest_path):
+
+        return None
+
+    with open(manifest_path, "r") as file:
+
+        manifest = json.load(file)
+
+    return manifest
+
+
+###########################
+### MERGE THE MANIFESTS ###
+###########################
+
+
+def merge_shard_manifests(parent_path_for_save: str, shard_count: int) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function combines the tables of every shard into the table of the keys and paths of the save folder, with the paths relative to it,
+    and their grid catalogs into its grid catalog. Every shard must have written its manifest, its table and its grid catalog must hold
+    the keys of its manifest only, and a key must be produced by a single shard. A shard without grid catalog has no gridded output (see dict_to_netcdf) :
+    the merged catalog holds the grids of the other shards, and is removed when no shard has one.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_FOR_SAVE : STR | path of the save folder of the merged outputs
+
+    SHARD_COUNT : INT | the number of shards
+
+    ---
+
+    ### OUTPUTS ###
+
+    MERGED_TABLE : PANDAS DATAFRAME | the merged table of the keys and paths
+
+    ---
+
+    """
+
+    ### CHECK THAT EVERY SHARD FINISHED ###
+
+    list_shard_paths = [
+        get_shard_path(parent_path_for_save, shard_index, shard_count)
+        for shard_index in range(shard_count)
+    ]
+
+    missing_shards = [
+        shard_index
+        for shard_index, shard_path in enumerate(list_shard_paths)
+        if read_shard_manifest(shard_path) is None
+    ]
+
+    if missing_shards:
+
+        raise ValueError(
+            "{} -> These shards did not write their manifest".format(missing_shards)
+        )
+
+    ### COMBINE THE TABLES OF THE SHARDS ###
+
+    list_tables = []
+
+    for shard_index, shard_path in enumerate(list_shard_paths):
+
+        shard_table = read_key_paths_table(shard_path)
+
+        ## The table is the one the manifest was written for ##
+
+        manifest = read_shard_manifest(shard_path)
+
+        if (
+            manifest["shard_index"],
+            manifest["shard_count"],
+        ) != (shard_index, shard_count):
+
+            raise ValueError(
+                "{} -> The manifest of this shard was written for shard {} of {}".format(
+                    shard_path, manifest["shard_index"], manifest["shard_count"]
+                )
+            )
+
+        if sorted(shard_table["key"]) != manifest["keys"]:
+
+            raise ValueError(
+                "{} -> The table of this shard does not hold the keys of its manifest".format(
+                    shard_path
+                )
+            )
+
+        ## The keys are entries (APRP) or entries with their experiment (climatologies) ##
+
+        unknown_entries = sorted(
+            {
+                get_entries_only_from_clim_dict(key)
+                for key in manifest["keys"]
+                if key not in manifest["entries"]
+            }
+            - set(manifest["entries"])
+        )
+
+        if unknown_entries:
+
+            raise ValueError(
+                "{} -> These entries of {} are not in its manifest".format(
+                    unknown_entries, shard_path
+                )
+            )
+
+        shard_table["path"] = [
+            os.path.relpath(path, parent_path_for_save) for path in shard_table["path"]
+        ]
+
+        list_tables.append(shard_table)
+
+    merged_table = pd.concat(list_tables, ignore_index=True)
+
+    ## A key must come from a single shard ##
+
+    duplicated_keys = merged_table["key"][merged_table["key"].duplicated()].to_list()
+
+    if duplicated_keys:
+
+        raise ValueError(
+            "{} -> These keys were produced by several shards".format(duplicated_keys)
+        )
+
+    merged_table = merged_table.sort_values("key").reset_index(drop=True)
+
+    write_key_paths_table(merged_table, parent_path_for_save, do_we_clear=False)
+
+    ### COMBINE THEIR GRID CATALOGS ###
+
+    list_catalogs = []
+
+    for shard_path in list_shard_paths:
+
+        if not os.path.exists(os.path.join(shard_path, "table", "grid_catalog.pkl")):
+
+            continue
+
+        shard_catalog = read_grid_catalog(shard_path)
+
+        ## A catalog left by a previous run holds other keys ##
+
+        if not set(shard_catalog["key"]) <= set(
+            read_shard_manifest(shard_path)["keys"]
+        ):
+
+            raise ValueError(
+                "{} -> The grid catalog of this shard holds keys outside of its manifest".format(
+                    shard_path
+                )
+            )
+
+        list_catalogs.append(shard_catalog)
+
+    merged_catalog_path = os.path.join(
+        parent_path_for_save, "table", "grid_catalog.pkl"
+    )
+
+    if list_catalogs:
+
+        create_dir(parent_path=parent_path_for_save, name="table", clear=False)
+
+        pd.concat(list_catalogs, ignore_index=True).to_pickle(merged_catalog_path)
+
+    ## The catalog of a previous merge would describe other outputs ##
+
+    elif os.path.exists(merged_catalog_path):
+
+        os.remove(merged_catalog_path)
+
+    print(
+        "{} keys of {} shards merged at {}\n".format(
+            len(merged_table), shard_count, parent_path_for_save
+        )
+    )
+
+    return merged_table
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Test library for aprp_driver.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.tools_for_analysis.aprp_computation.aprp_driver import (
+    compute_aprp_for_all_entries,  # APRP for all the saved entries with a cache
+    compute_aprp_for_all_experiments,  # APRP for several perturbed experiments
+    estimate_aprp_costs,  # cost of every entry to compute
+    run_aprp_driver,  # APRP of every entry and experiment, possibly of a shard
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import os  # to check the modification times of the saved files
+
+from concurrent.futures import ProcessPoolExecutor  # to run the shards as processes
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+    dict_to_netcdf,  # to save the made up climatologies
+    read_key_paths_table,  # to read the table of the APRP outputs
+    netcdf_to_dict,  # to reload the merged APRP outputs
+)
+
+from utilities.get_cmip6_data.store_data.shard_manifest import (
+    merge_shard_manifests,  # to combine the outputs of the shards
+)
+
+from utilities.tools_for_analysis.aprp_computation.aprp_vectorized import (
+    aprp_single_entry,  # reference APRP computation
+)
+
+from utilities.tests.aprp_computation.test_aprp_vectorized import (
+    make_fluxes,  # forward single-layer model
+    to_dataset,  # to put the fluxes on a grid
+    STATE,  # made up control state
+)
+
+##############################################
+### TESTS FOR COMPUTE_APRP_FOR_ALL_ENTRIES ###
+##############################################
+
+### DEFINE MADE UP CLIMATOLOGIES ###
+
+CONTROL = to_dataset(make_fluxes(**STATE))
+
+DICT_CLIM = {
+    "A.r1i1p1f1.gn.piClim-control": CONTROL,
+    "A.r1i1p1f1.gn.piClim-aer": to_dataset(
+        make_fluxes(**(STATE | {"c": STATE["c"] * 0.9}))
+    ),
+    "B.r1i1p1f1.gn.piClim-control": CONTROL,
+    "B.r1i1p1f1.gn.piClim-aer": to_dataset(
+        make_fluxes(**(STATE | {"mu_clr": STATE["mu_clr"] * 0.98}))
+    ),
+}
+
+### TESTS ###
+
+
+def test_results_match_single_entry_compute_aprp_for_all_entries(tmp_path):
+    dict_to_netcdf(DICT_CLIM, str(tmp_path / "clim"))
+    dict_aprp = compute_aprp_for_all_entries(
+        str(tmp_path / "clim"), str(tmp_path / "aprp"), n_workers=2, verbose=False
+    )
+    reference = aprp_single_entry(CONTROL, DICT_CLIM["B.r1i1p1f1.gn.piClim-aer"])
+    assert sorted(dict_aprp.keys()) == ["A.r1i1p1f1.gn", "B.r1i1p1f1.gn"]
+    np.testing.assert_allclose(
+        dict_aprp["B.r1i1p1f1.gn"]["noncld_abs"], reference["noncld_abs"]
+    )
+
+
+def test_results_are_reused_compute_aprp_for_all_entries(tmp_path):
+    dict_to_netcdf(DICT_CLIM, str(tmp_path / "clim"))
+    compute_aprp_for_all_entries(
+        str(tmp_path / "clim"), str(tmp_path / "aprp"), n_workers=1, verbose=False
+    )
+    table = read_key_paths_table(str(tmp_path / "aprp"))
+    mtimes = [os.path.getmtime(path) for path in table["path"]]
+    compute_aprp_for_all_entries(
+        str(tmp_path / "clim"), str(tmp_path / "aprp"), n_workers=1, verbose=False
+    )
+    assert [os.path.getmtime(path) for path in table["path"]] == mtimes
+
+
+def test_changed_inputs_are_recomputed_compute_aprp_for_all_entries(tmp_path):
+    dict_to_netcdf(DICT_CLIM, str(tmp_path / "clim"))
+    compute_aprp_for_all_entries(
+        str(tmp_path / "clim"), str(tmp_path / "aprp"), n_workers=1, verbose=False
+    )
+    first_table = read_key_paths_table(str(tmp_path / "aprp"))
+    changed = DICT_CLIM | {
+        "A.r1i1p1f1.gn.piClim-aer": DICT_CLIM["B.r1i1p1f1.gn.piClim-aer"]
+    }
+    dict_to_netcdf(changed, str(tmp_path / "clim"))
+    compute_aprp_for_all_entries(
+        str(tmp_path / "clim"), str(tmp_path / "aprp"), n_workers=1, verbose=False
+    )
+    second_table = read_key_paths_table(str(tmp_path / "aprp"))
+    assert first_table["input_hash"][0] != second_table["input_hash"][0]
+    assert first_table["input_hash"][1] == second_table["input_hash"][1]
+    assert not os.path.exists(first_table["path"][0])
+
+
+def test_unknown_entry_most_expensive_estimate_aprp_costs(tmp_path):
+    dict_to_netcdf(DICT_CLIM, str(tmp_path / "clim"))
+    dict_costs = estimate_aprp_costs(
+        str(tmp_path / "clim"),
+        [("A.r1i1p1f1.gn", "piClim-aer"), ("C.r1i1p1f1.gn", "piClim-aer")],
+        {},
+    )
+    assert dict_costs["C.r1i1p1f1.gn"] == dict_costs["A.r1i1p1f1.gn"] > 0
+
+
+##################################################
+### TESTS FOR COMPUTE_APRP_FOR_ALL_EXPERIMENTS ###
+##################################################
+
+
+def test_experiments_are_saved_apart_compute_aprp_for_all_experiments(tmp_path):
+    dict_clim = DICT_CLIM | {
+        "A.r1i1p1f1.gn.piClim-BC": DICT_CLIM["B.r1i1p1f1.gn.piClim-aer"]
+    }
+    dict_to_netcdf(dict_clim, str(tmp_path / "clim"))
+    dict_aprp_per_experiment = compute_aprp_for_all_experiments(
+        str(tmp_path / "clim"),
+        str(tmp_path / "aprp"),
+        ["piClim-aer", "piClim-BC"],
+        n_workers=2,
+        verbose=False,
+    )
+    table = read_key_paths_table(str(tmp_path / "aprp" / "piClim-BC"))
+    assert list(table["key"]) == ["A.r1i1p1f1.gn"]
+    assert sorted(dict_aprp_per_experiment["piClim-aer"].keys()) == [
+        "A.r1i1p1f1.gn",
+        "B.r1i1p1f1.gn",
+    ]
+    np.testing.assert_allclose(
+        dict_aprp_per_experiment["piClim-BC"]["A.r1i1p1f1.gn"]["noncld_abs"],
+        dict_aprp_per_experiment["piClim-aer"]["B.r1i1p1f1.gn"]["noncld_abs"],
+    )
+
+
+##########################################
+### TESTS FOR THE SHARDS OF THE DRIVER ###
+##########################################
+
+
+def run_aprp_shard(parent_path_clim, parent_path_for_save, shard_index, shard_count):
+    return sorted(
+        run_aprp_driver(
+            parent_path_clim=parent_path_clim,
+            dict_save_paths={"piClim-aer": parent_path_for_save},
+            n_workers=1,
+            verbose=False,
+            shard_index=shard_index,
+            shard_count=shard_count,
+        )["piClim-aer"].keys()
+    )
+
+
+def test_merged_shards_match_run_aprp_driver(tmp_path):
+    dict_to_netcdf(DICT_CLIM, str(tmp_path / "clim"))
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        list_shard_keys = list(
+            pool.map(
+                run_aprp_shard,
+                [str(tmp_path / "clim")] * 2,
+                [str(tmp_path / "aprp")] * 2,
+                range(2),
+                [2] * 2,
+            )
+        )
+    assert sorted(sum(list_shard_keys, [])) == ["A.r1i1p1f1.gn", "B.r1i1p1f1.gn"]
+    merge_shard_manifests(str(tmp_path / "aprp"), 2)
+    dict_merged = netcdf_to_dict(str(tmp_path / "aprp"))
+    dict_aprp = compute_aprp_for_all_entries(
+        str(tmp_path / "clim"), str(tmp_path / "unsharded"), n_workers=1, verbose=False
+    )
+    for key, dataset in dict_aprp.items():
+        np.testing.assert_allclose(
+            dict_merged[key]["noncld_abs"], dataset["noncld_abs"]
+        )
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+"""
+Test library for aprp_pipeline.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.tools_for_analysis.aprp_computation.aprp_pipeline import (
+    mask_varies_in_time,  # does the mask of the fields vary in time ?
+    plan_aprp_pipeline,  # order of the stages of the pipeline
+    run_aprp_pipeline,  # APRP then reduction of the outputs
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import os  # to check that the grid catalog is saved
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+    dict_to_netcdf,  # to save the made up climatologies with their grid catalog
+)
+
+from utilities.tests.aprp_computation.test_aprp_vectorized import (
+    make_fluxes,  # forward single-layer model
+    STATE,  # made up control state
+)
+
+### TEST MODULE ###
+
+import pytest
+
+####################################
+### TESTS FOR PLAN_APRP_PIPELINE ###
+####################################
+
+
+def test_time_mean_before_regrid_plan_aprp_pipeline():
+    assert plan_aprp_pipeline("annual") == [
+        "aprp",
+        "time_mean",
+        "regrid",
+        "region_average",
+    ]
+
+
+def test_mask_varying_keeps_order_plan_aprp_pipeline():
+    stages = plan_aprp_pipeline("annual", mask_varies=True)
+    assert stages.index("regrid") < stages.index("time_mean")
+
+
+def test_monthly_path_plan_aprp_pipeline():
+    assert "time_mean" not in plan_aprp_pipeline("monthly")
+
+
+def test_unknown_product_plan_aprp_pipeline():
+    with pytest.raises(ValueError):
+        plan_aprp_pipeline("daily")
+
+
+#####################################
+### TESTS FOR MASK_VARIES_IN_TIME ###
+#####################################
+
+### DEFINE TEST DATASETS ###
+
+FIELD = np.ones((12, 2, 2))
+
+FIELD_NAN = FIELD.copy()
+
+FIELD_NAN[3, 0, 0] = np.nan
+
+### TESTS ###
+
+
+def test_constant_mask_mask_varies_in_time():
+    dataset = xr.Dataset({"cld": (("time", "lat", "lon"), FIELD)})
+    assert not mask_varies_in_time({"A": dataset}, ["cld"])
+
+
+def test_varying_mask_mask_varies_in_time():
+    dataset = xr.Dataset({"cld": (("time", "lat", "lon"), FIELD_NAN)})
+    assert mask_varies_in_time({"A": dataset}, ["cld"])
+
+
+###################################
+### TESTS FOR RUN_APRP_PIPELINE ###
+###################################
+
+### DEFINE A SMALL SAVED TREE ###
+
+TIME = xr.date_range(
+    "0001-01-01", periods=12, freq="MS", calendar="noleap", use_cftime=True
+)
+
+
+def to_monthly_dataset(fields: dict) -> xr.Dataset:
+    """Put the 3 points of every field on the 12 months of a (lat, lon) grid of 12 cells"""
+
+    return xr.Dataset(
+        {
+            var: (
+                ("time", "lat", "lon"),
+                np.tile(np.resize(value, 12).reshape(1, 3, 4), (12, 1, 1)),
+            )
+            for var, value in fields.items()
+        },
+        coords={
+            "time": TIME,
+            "lat": [65.0, 75.0, 85.0],
+            "lon": [45.0, 135.0, 225.0, 315.0],
+        },
+    )
+
+
+### TESTS ###
+
+
+def test_grid_catalog_run_aprp_pipeline(tmp_path):
+    control = to_monthly_dataset(make_fluxes(**STATE))
+    perturbed = to_monthly_dataset(make_fluxes(**(STATE | {"c": STATE["c"] * 0.9})))
+    dict_to_netcdf(
+        {
+            "A.r1i1p1f1.gn.piClim-control": control,
+            "A.r1i1p1f1.gn.piClim-aer": perturbed,
+        },
+        str(tmp_path / "clim"),
+    )
+    assert os.path.exists(str(tmp_path / "clim" / "table" / "grid_catalog.pkl"))
+    dict_maps, dict_region_avg = run_aprp_pipeline(
+        str(tmp_path / "clim"), str(tmp_path / "aprp"), n_workers=1, verbose=False
+    )
+    assert list(dict_maps.keys()) == ["A.r1i1p1f1.gn"]
+    assert list(dict_region_avg.keys()) == ["A.r1i1p1f1.gn"]
+    assert all(
+        np.all(np.isfinite(value))
+        for value in dict_region_avg["A.r1i1p1f1.gn"].values()
+    )
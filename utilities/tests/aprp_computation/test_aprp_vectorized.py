@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+"""
+Test library for aprp_vectorized.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.tools_for_analysis.aprp_computation.aprp_vectorized import (
+    single_layer_albedo,  # planetary albedo of the single-layer model
+    compute_single_layer_parameters,  # parameters of one climate state
+    aprp_from_parameters,  # APRP decomposition from two sets of parameters
+    aprp_ensemble,  # APRP for the whole ensemble at once
+    aprp_ensemble_multi_experiments,  # APRP for several experiments sharing a control
+    aprp_single_entry,  # APRP for one couple of datasets
+    APRP_OUTPUT_FIELDS,  # fields produced by the method
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### TEST MODULE ###
+
+import pytest
+
+###################################################
+### BUILD FLUXES FROM KNOWN SINGLE-LAYER STATES ###
+###################################################
+
+
+def make_fluxes(c, mu_clr, gamma_clr, mu_cld, gamma_cld, alpha_clr, alpha_oc, rsdt):
+    """Forward single-layer model producing the APRP input fluxes"""
+
+    mu_oc = mu_clr * mu_cld
+
+    gamma_oc = 1 - (1 - gamma_clr) * (1 - gamma_cld)
+
+    rsutcs = rsdt * single_layer_albedo(mu_clr, gamma_clr, alpha_clr)
+
+    rsdscs = rsdt * mu_clr * (1 - gamma_clr) / (1 - alpha_clr * gamma_clr)
+
+    rsut_oc = rsdt * single_layer_albedo(mu_oc, gamma_oc, alpha_oc)
+
+    rsds_oc = rsdt * mu_oc * (1 - gamma_oc) / (1 - alpha_oc * gamma_oc)
+
+    return {
+        "clt": c,
+        "rsdt": rsdt,
+        "rsutcs": rsutcs,
+        "rsdscs": rsdscs,
+        "rsuscs": alpha_clr * rsdscs,
+        "rsut": (1 - c) * rsutcs + c * rsut_oc,
+        "rsds": (1 - c) * rsdscs + c * rsds_oc,
+        "rsus": (1 - c) * alpha_clr * rsdscs + c * alpha_oc * rsds_oc,
+    }
+
+
+STATE = dict(
+    c=np.array([0.6, 0.3, 0.9]),
+    mu_clr=np.array([0.85, 0.8, 0.9]),
+    gamma_clr=np.array([0.1, 0.05, 0.2]),
+    mu_cld=np.array([0.95, 0.9, 0.97]),
+    gamma_cld=np.array([0.4, 0.3, 0.6]),
+    alpha_clr=np.array([0.2, 0.7, 0.1]),
+    alpha_oc=np.array([0.25, 0.75, 0.15]),
+    rsdt=np.array([300.0, 150.0, 400.0]),
+)
+
+
+def to_dataset(fields: dict) -> xr.Dataset:
+    """Put the 3 points on a (time, lat, lon) grid"""
+
+    return xr.Dataset(
+        {
+            var: (("time", "lat", "lon"), value.reshape(1, 1, 3))
+            for var, value in fields.items()
+        },
+        coords={"time": [0], "lat": [70.0], "lon": [0.0, 10.0, 20.0]},
+    )
+
+
+#################################################
+### TESTS FOR COMPUTE_SINGLE_LAYER_PARAMETERS ###
+#################################################
+
+
+def test_parameters_are_retrieved_compute_single_layer_parameters():
+    parameters = compute_single_layer_parameters(make_fluxes(**STATE))
+    for name in ["mu_clr", "gamma_clr", "mu_cld", "gamma_cld", "alpha_clr", "alpha_oc"]:
+        np.testing.assert_allclose(parameters[name], STATE[name], rtol=1e-10)
+
+
+def test_no_cloud_is_transparent_compute_single_layer_parameters():
+    fluxes = make_fluxes(**(STATE | {"c": np.zeros(3)}))
+    parameters = compute_single_layer_parameters(fluxes)
+    assert np.all(parameters["mu_cld"] == 1.0) and np.all(
+        parameters["gamma_cld"] == 0.0
+    )
+
+
+def test_no_sunlight_gives_finite_values_compute_single_layer_parameters():
+    fluxes = {var: np.zeros(3) for var in make_fluxes(**STATE)}
+    parameters = compute_single_layer_parameters(fluxes)
+    assert all(np.all(np.isfinite(value)) for value in parameters.values())
+
+
+######################################
+### TESTS FOR APRP_FROM_PARAMETERS ###
+######################################
+
+
+def test_identical_states_give_zero_aprp_from_parameters():
+    parameters = compute_single_layer_parameters(make_fluxes(**STATE))
+    output = aprp_from_parameters(parameters, parameters)
+    assert all(np.all(output[field] == 0.0) for field in APRP_OUTPUT_FIELDS)
+
+
+def test_surface_albedo_change_only_aprp_from_parameters():
+    parameters_1 = compute_single_layer_parameters(make_fluxes(**STATE))
+    state_2 = STATE | {
+        "alpha_clr": STATE["alpha_clr"] - 0.05,
+        "alpha_oc": STATE["alpha_oc"] - 0.05,
+    }
+    parameters_2 = compute_single_layer_parameters(make_fluxes(**state_2))
+    output = aprp_from_parameters(parameters_1, parameters_2)
+    assert np.all(output["sfc_alb"] > 0.0)
+    for field in ["cld_amt", "cld_scat", "cld_abs", "noncld_scat", "noncld_abs"]:
+        np.testing.assert_allclose(output[field], 0.0, atol=1e-10)
+
+
+def test_sum_close_to_total_change_aprp_from_parameters():
+    fluxes_1 = make_fluxes(**STATE)
+    state_2 = STATE | {
+        "c": STATE["c"] + 0.05,
+        "gamma_cld": STATE["gamma_cld"] + 0.05,
+        "mu_clr": STATE["mu_clr"] - 0.02,
+    }
+    fluxes_2 = make_fluxes(**state_2)
+    output = aprp_from_parameters(
+        compute_single_layer_parameters(fluxes_1),
+        compute_single_layer_parameters(fluxes_2),
+    )
+    total = -(fluxes_2["rsut"] - fluxes_1["rsut"])
+    np.testing.assert_allclose(
+        output["cld"] + output["noncld"] + output["sfc_alb"], total, atol=0.5
+    )
+
+
+def test_no_sunlight_gives_zero_aprp_from_parameters():
+    parameters_1 = compute_single_layer_parameters(
+        make_fluxes(**(STATE | {"rsdt": np.zeros(3)}))
+    )
+    parameters_2 = compute_single_layer_parameters(
+        make_fluxes(**(STATE | {"rsdt": np.zeros(3), "c": STATE["c"] / 2}))
+    )
+    output = aprp_from_parameters(parameters_1, parameters_2)
+    assert all(np.all(output[field] == 0.0) for field in APRP_OUTPUT_FIELDS)
+
+
+###############################
+### TESTS FOR APRP_ENSEMBLE ###
+###############################
+
+
+def test_ensemble_matches_single_entries_aprp_ensemble():
+    control = to_dataset(make_fluxes(**STATE))
+    perturbed_a = to_dataset(make_fluxes(**(STATE | {"c": STATE["c"] * 0.9})))
+    perturbed_b = to_dataset(
+        make_fluxes(**(STATE | {"gamma_cld": STATE["gamma_cld"] * 1.1}))
+    )
+    dict_clim = {
+        "A.r1i1p1f1.gn.piClim-control": control,
+        "A.r1i1p1f1.gn.piClim-aer": perturbed_a,
+        "B.r1i1p1f1.gr.piClim-control": control.isel(lon=slice(0, 2)),
+        "B.r1i1p1f1.gr.piClim-aer": perturbed_b.isel(lon=slice(0, 2)),
+    }
+    dict_aprp = aprp_ensemble(dict_clim, ["A.r1i1p1f1.gn", "B.r1i1p1f1.gr"])
+    single_b = aprp_single_entry(
+        control.isel(lon=slice(0, 2)), perturbed_b.isel(lon=slice(0, 2))
+    )
+    assert dict_aprp["B.r1i1p1f1.gr"]["cld"].shape == (1, 1, 2)
+    xr.testing.assert_allclose(dict_aprp["B.r1i1p1f1.gr"], single_b)
+
+
+#################################################
+### TESTS FOR APRP_ENSEMBLE_MULTI_EXPERIMENTS ###
+#################################################
+
+
+def test_experiments_match_aprp_ensemble_aprp_ensemble_multi_experiments():
+    control = to_dataset(make_fluxes(**STATE))
+    dict_clim = {
+        "A.r1i1p1f1.gn.piClim-control": control,
+        "A.r1i1p1f1.gn.piClim-aer": to_dataset(
+            make_fluxes(**(STATE | {"c": STATE["c"] * 0.9}))
+        ),
+        "A.r1i1p1f1.gn.piClim-BC": to_dataset(
+            make_fluxes(**(STATE | {"mu_clr": STATE["mu_clr"] * 0.98}))
+        ),
+        "B.r1i1p1f1.gr.piClim-control": control.isel(lon=slice(0, 2)),
+        "B.r1i1p1f1.gr.piClim-aer": to_dataset(
+            make_fluxes(**(STATE | {"gamma_cld": STATE["gamma_cld"] * 1.1}))
+        ).isel(lon=slice(0, 2)),
+    }
+    dict_aprp_per_experiment = aprp_ensemble_multi_experiments(
+        dict_clim,
+        {
+            "piClim-aer": ["A.r1i1p1f1.gn", "B.r1i1p1f1.gr"],
+            "piClim-BC": ["A.r1i1p1f1.gn"],
+        },
+    )
+    for experiment, entries in [
+        ("piClim-aer", ["A.r1i1p1f1.gn", "B.r1i1p1f1.gr"]),
+        ("piClim-BC", ["A.r1i1p1f1.gn"]),
+    ]:
+        reference = aprp_ensemble(dict_clim, entries, perturbed_experiment=experiment)
+        assert list(dict_aprp_per_experiment[experiment].keys()) == entries
+        for entry in entries:
+            xr.testing.assert_allclose(
+                dict_aprp_per_experiment[experiment][entry], reference[entry]
+            )
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+"""
+Test library for cache_manager.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.folders_handle.cache_manager import (
+    enforce_cache_budget,  # to remove the least recently used raw files
+    get_climatology_key,  # key of the climatology of a raw file
+    list_cached_files,  # the raw files of the cache
+    read_access_log,  # to read the access log
+    record_access,  # to date the use of some files
+)
+
+### FILE MANAGEMENT ###
+
+import os
+
+### TEST MODULE ###
+
+import pytest
+
+#############################
+### MADE UP DRS RAW CACHE ###
+#############################
+
+DRS_PATH = "CMIP6/RFMIP/INST/{}/piClim-aer/r1i1p1f1/{}/{}/gn/v20190101/{}_{}.nc"
+
+
+def make_raw_file(downloading_path, source_id, table_id="Amon", variable_id="rsdt"):
+    """Raw file of 1000 bytes in the DRS tree of the cache"""
+
+    path = os.path.join(
+        downloading_path,
+        DRS_PATH.format(source_id, table_id, variable_id, variable_id, source_id),
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(b"0" * 1000)
+    return path
+
+
+def make_climatology(tmp_path, source_id, mtime):
+    """Saved climatology of a source_id, modified at mtime"""
+
+    path = str(tmp_path / "clim" / (source_id + ".nc"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(b"0")
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+########################################
+### TESTS FOR THE FILES OF THE CACHE ###
+########################################
+
+
+def test_drs_path_get_climatology_key():
+    assert (
+        get_climatology_key(DRS_PATH.format("MODEL", "Amon", "rsdt", "rsdt", "1850"))
+        == "MODEL.r1i1p1f1.gn.piClim-aer"
+    )
+    # areacella and files outside the DRS tree are never protected
+    assert (
+        get_climatology_key(DRS_PATH.format("MODEL", "fx", "areacella", "a", "b"))
+        is None
+    )
+    assert get_climatology_key("file.nc") is None
+
+
+def test_access_log_order_list_cached_files(tmp_path):
+    downloading_path = str(tmp_path / "cache")
+    paths = [make_raw_file(downloading_path, source_id) for source_id in "ABC"]
+    (tmp_path / "cache" / "partial.nc.part").write_bytes(b"0" * 10)
+    record_access(downloading_path, [paths[0]], access_time=3.0)
+    record_access(downloading_path, [paths[1]], access_time=1.0)
+    os.utime(paths[2], (2.0, 2.0))
+    cached_files = list_cached_files(downloading_path)
+    # the file out of the log is dated by its modification time
+    assert list(cached_files["path"]) == [paths[1], paths[2], paths[0]]
+    assert list(cached_files["n_bytes"]) == [1000] * 3
+    assert not cached_files["is_protected"].any()
+
+
+def test_missing_or_stale_protected_list_cached_files(tmp_path):
+    downloading_path = str(tmp_path / "cache")
+    for source_id in "ABC":
+        os.utime(make_raw_file(downloading_path, source_id), (100.0, 100.0))
+    dict_climatology_paths = {
+        "A.r1i1p1f1.gn.piClim-aer": make_climatology(tmp_path, "A", 200.0),
+        "B.r1i1p1f1.gn.piClim-aer": make_climatology(tmp_path, "B", 50.0),
+    }
+    cached_files = list_cached_files(downloading_path, dict_climatology_paths)
+    dict_protected = dict(
+        zip(cached_files["climatology_key"], cached_files["is_protected"])
+    )
+    assert dict_protected == {
+        "A.r1i1p1f1.gn.piClim-aer": False,  # up to date
+        "B.r1i1p1f1.gn.piClim-aer": True,  # stale
+        "C.r1i1p1f1.gn.piClim-aer": True,  # missing
+    }
+
+
+######################################
+### TESTS FOR ENFORCE_CACHE_BUDGET ###
+######################################
+
+
+def test_least_recently_used_evicted_enforce_cache_budget(tmp_path):
+    downloading_path = str(tmp_path / "cache")
+    paths = [make_raw_file(downloading_path, source_id) for source_id in "ABC"]
+    for access_time, path in zip([3.0, 1.0, 2.0], paths):
+        record_access(downloading_path, [path], access_time=access_time)
+    evicted_paths = enforce_cache_budget(downloading_path, byte_budget=2000)
+    assert evicted_paths == [paths[1]]
+    assert os.path.exists(paths[0]) and os.path.exists(paths[2])
+    assert os.path.relpath(evicted_paths[0], downloading_path) not in read_access_log(
+        downloading_path
+    )
+    assert enforce_cache_budget(downloading_path, byte_budget=2000) == []
+
+
+def test_protected_kept_enforce_cache_budget(tmp_path):
+    downloading_path = str(tmp_path / "cache")
+    paths = [make_raw_file(downloading_path, source_id) for source_id in "AB"]
+    record_access(downloading_path, [paths[0]], access_time=1.0)
+    record_access(downloading_path, [paths[1]], access_time=2.0)
+    dict_climatology_paths = {
+        "B.r1i1p1f1.gn.piClim-aer": make_climatology(tmp_path, "B", 1e10)
+    }
+    # the oldest file has no climatology yet : the cache stays over budget
+    evicted_paths = enforce_cache_budget(
+        downloading_path, byte_budget=0, dict_climatology_paths=dict_climatology_paths
+    )
+    assert evicted_paths == [paths[1]]
+    assert os.path.exists(paths[0])
+    with pytest.raises(ValueError):
+        enforce_cache_budget(downloading_path, byte_budget=-1)
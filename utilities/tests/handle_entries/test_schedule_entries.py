@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""
+Test library for schedule_entries.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### MODULE TO BE TESTED ###
+
+from utilities.tools_for_analysis.handle_entries.schedule_entries import (
+    get_costs_from_grid_catalog,  # cost of every entry from its grid
+    get_makespan,  # estimated makespan of a schedule
+    order_longest_first,  # most expensive items first
+    report_makespan,  # achieved makespan
+    schedule_longest_first,  # longest-processing-time-first batches
+    split_batch_seconds,  # duration of every item of a batch
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd  # to make up the catalogs
+
+### TEST MODULE ###
+
+import pytest
+
+#################################
+### TESTS FOR THE ENTRY COSTS ###
+#################################
+
+
+def test_summed_over_experiments_get_costs_from_grid_catalog():
+    grid_catalog = pd.DataFrame(
+        {
+            "key": [
+                "NorESM2-MM.r1i1p1f1.gn.piClim-control",
+                "NorESM2-MM.r1i1p1f1.gn.piClim-aer",
+                "CanESM5.r1i1p2f1.gn.piClim-control",
+            ],
+            "n_lat": [192, 192, 64],
+            "n_lon": [288, 288, 128],
+        }
+    )
+    assert get_costs_from_grid_catalog(grid_catalog) == {
+        "NorESM2-MM.r1i1p1f1.gn": 2 * 192 * 288 * 12.0,
+        "CanESM5.r1i1p2f1.gn": 64 * 128 * 12.0,
+    }
+
+
+##############################
+### TESTS FOR THE SCHEDULE ###
+##############################
+
+
+def test_unknown_cost_first_order_longest_first():
+    assert order_longest_first(["a", "b", "c", "d"], {"a": 1, "b": 5, "c": 3}) == [
+        "b",
+        "d",
+        "c",
+        "a",
+    ]
+
+
+def test_balanced_schedule_longest_first():
+    dict_costs = {"A": 10, "B": 7, "C": 5, "D": 3, "E": 3, "F": 2}
+    items = sorted(dict_costs)[::-1]
+    batches = schedule_longest_first(items, dict_costs, n_workers=3)
+    assert sorted(item for batch in batches for item in batch) == sorted(dict_costs)
+    # the catalog order would give 3 + 10 to the last worker
+    assert get_makespan(batches, dict_costs) == 10
+    assert get_makespan([items[0::3], items[1::3], items[2::3]], dict_costs) > 10
+
+
+def test_more_workers_than_items_schedule_longest_first():
+    assert schedule_longest_first(["a", "b"], {"a": 1, "b": 2}, n_workers=4) == [
+        ["b"],
+        ["a"],
+    ]
+    with pytest.raises(ValueError):
+        schedule_longest_first(["a"], {}, n_workers=0)
+
+
+def test_idle_workers_report_makespan():
+    report = report_makespan(
+        task_seconds=[4.0, 3.0, 3.0, 2.0], n_workers=2, makespan=8.0, verbose=False
+    )
+    assert report == {"makespan": 8.0, "lower_bound": 6.0, "busy_fraction": 0.75}
+    report = report_makespan(
+        task_seconds=[9.0, 1.0], n_workers=4, makespan=9.0, verbose=False
+    )
+    assert report["lower_bound"] == 9.0
+
+
+def test_shared_by_cost_split_batch_seconds():
+    assert split_batch_seconds(
+        [["a", "b"], ["c"]], {"a": 3.0, "b": 1.0}, [8.0, 2.0]
+    ) == [6.0, 2.0, 2.0]
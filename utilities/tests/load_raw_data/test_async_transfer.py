@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+
+"""
+Test library for async_transfer.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.load_raw_data.async_transfer import (
+    download_files,  # to download many files at the same time
+    download_replicas,  # to download files checked against their checksum
+    fetch_file_sizes,  # sizes of the files without downloading them
+    get_local_path,  # path of a file in the download folder
+    get_throughput,  # throughput of a data node
+    PART_SUFFIX,  # suffix of the files being downloaded
+)
+
+### LOCAL HTTP SERVER ###
+
+import threading
+
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+### FILE MANAGEMENT ###
+
+import os
+
+import hashlib
+
+### TEST MODULE ###
+
+import pytest
+
+###############################################
+### LOCAL DATA NODE SERVING A FAKE DRS TREE ###
+###############################################
+
+DRS_PATH = "thredds/fileServer/esg_cmip6/CMIP6/RFMIP/MODEL/piClim-aer/r1i1p1f1/Amon/{}/gn/v20190101/{}_{}.nc"
+
+
+def make_handler(root, counters):
+    """Request handler with keep-alive connections and range requests, counting the connections and the simultaneous requests"""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with counters["lock"]:
+                counters["n_connections"] += 1
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with counters["lock"]:
+                counters["n_active"] += 1
+                counters["max_active"] = max(
+                    counters["max_active"], counters["n_active"]
+                )
+                counters["ranges"].append(self.headers.get("Range"))
+            try:
+                self.send_file()
+            finally:
+                with counters["lock"]:
+                    counters["n_active"] -= 1
+
+        def do_HEAD(self):
+            path = os.path.join(root, self.path.lstrip("/"))
+            self.send_response(200 if os.path.isfile(path) else 404)
+            self.send_header(
+                "Content-Length",
+                str(os.path.getsize(path)) if os.path.isfile(path) else "0",
+            )
+            self.end_headers()
+
+        def send_file(self):
+            # a file moved to another url, a redirection loop
+            if self.path.startswith(("/redirect/", "/loop/")):
+                self.send_response(302)
+                self.send_header(
+                    "Location",
+                    (
+                        self.path[len("/redirect") :]
+                        if self.path.startswith("/redirect/")
+                        else self.path
+                    ),
+                )
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            path = os.path.join(root, self.path.lstrip("/"))
+            if not os.path.isfile(path):
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            with open(path, "rb") as file:
+                content = file.read()
+            start = 0
+            if self.headers.get("Range"):
+                start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+                # a data node answering another range than the one asked
+                if counters["range_start"] is not None:
+                    start = counters["range_start"]
+                if start >= len(content):
+                    self.send_response(416)
+                    self.send_header("Content-Range", "bytes */{}".format(len(content)))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range",
+                    "bytes {}-{}/{}".format(start, len(content) - 1, len(content)),
+                )
+            else:
+                self.send_response(200)
+            body = content[start:]
+            if counters["chunked"]:
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for ii in range(0, len(body), 7_000):
+                    piece = body[ii : ii + 7_000]
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            time.sleep(counters["delay"])
+            # cut the first transfers halfway to simulate a failing data node
+            with counters["lock"]:
+                cut = counters["n_cuts"] > 0
+                counters["n_cuts"] -= int(cut)
+            if cut:
+                self.wfile.write(body[: len(body) // 2])
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+
+    return Handler
+
+
+@pytest.fixture
+def data_node(tmp_path):
+    root = tmp_path / "node"
+    files = {}
+    for variable in ["rsdt", "rsut", "clt"]:
+        for years in ["1850-1879", "1880-1909"]:
+            relative_path = DRS_PATH.format(variable, variable, years)
+            content = os.urandom(50_000)
+            os.makedirs(os.path.dirname(root / relative_path), exist_ok=True)
+            (root / relative_path).write_bytes(content)
+            files[relative_path] = content
+    counters = {
+        "lock": threading.Lock(),
+        "n_connections": 0,
+        "n_active": 0,
+        "max_active": 0,
+        "n_cuts": 0,
+        "delay": 0.0,
+        "chunked": False,
+        "range_start": None,
+        "ranges": [],
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(str(root), counters))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = "http://127.0.0.1:{}/".format(server.server_address[1])
+    yield base_url, files, counters
+    server.shutdown()
+    server.server_close()
+
+
+################################
+### TESTS FOR GET_LOCAL_PATH ###
+################################
+
+
+def test_drs_path_kept_get_local_path():
+    url = "https://node.org/" + DRS_PATH.format("clt", "clt", "1850-1879")
+    assert get_local_path(url, "/cache") == os.path.join(
+        "/cache", DRS_PATH.format("clt", "clt", "1850-1879").split("esg_cmip6/")[1]
+    )
+
+
+def test_no_drs_path_get_local_path():
+    assert get_local_path("http://node.org/a/b/file.nc", "/cache") == os.path.join(
+        "/cache", "file.nc"
+    )
+
+
+################################
+### TESTS FOR DOWNLOAD_FILES ###
+################################
+
+
+def test_files_downloaded_download_files(data_node, tmp_path):
+    base_url, files, counters = data_node
+    dict_url_paths = {
+        base_url + relative_path: str(tmp_path / "cache" / relative_path)
+        for relative_path in files
+    }
+    dict_statistics = download_files(dict_url_paths, max_connections_per_host=2)
+    for url, local_path in dict_url_paths.items():
+        with open(local_path, "rb") as file:
+            assert file.read() == files[url[len(base_url) :]]
+    (host_statistics,) = dict_statistics.values()
+    assert host_statistics["n_files"] == len(files)
+    assert host_statistics["n_bytes"] == sum(map(len, files.values()))
+    assert get_throughput(host_statistics) > 0.0
+
+
+def test_connections_reused_download_files(data_node, tmp_path):
+    base_url, files, counters = data_node
+    download_files(
+        {
+            base_url + relative_path: str(tmp_path / "cache" / relative_path)
+            for relative_path in files
+        },
+        max_connections_per_host=2,
+    )
+    # keep-alive : fewer connections than files
+    assert counters["n_connections"] <= 2 < len(files)
+
+
+def test_concurrency_limited_download_files(data_node, tmp_path):
+    base_url, files, counters = data_node
+    counters["delay"] = 0.05
+    download_files(
+        {
+            base_url + relative_path: str(tmp_path / "cache" / relative_path)
+            for relative_path in files
+        },
+        max_connections_per_host=3,
+    )
+    assert 1 < counters["max_active"] <= 3
+
+
+def test_resumed_download_files(data_node, tmp_path):
+    base_url, files, counters = data_node
+    relative_path = next(iter(files))
+    local_path = tmp_path / "cache" / "file.nc"
+    os.makedirs(tmp_path / "cache")
+    (tmp_path / "cache" / ("file.nc" + PART_SUFFIX)).write_bytes(
+        files[relative_path][:1000]
+    )
+    dict_statistics = download_files({base_url + relative_path: str(local_path)})
+    assert local_path.read_bytes() == files[relative_path]
+    assert counters["ranges"] == ["bytes=1000-"]
+    assert (
+        list(dict_statistics.values())[0]["n_bytes"] == len(files[relative_path]) - 1000
+    )
+
+
+@pytest.mark.parametrize("range_start", [0, 500])
+def test_other_range_restarted_download_files(data_node, tmp_path, range_start):
+    base_url, files, counters = data_node
+    counters["range_start"] = range_start
+    relative_path = next(iter(files))
+    local_path = tmp_path / "file.nc"
+    (tmp_path / ("file.nc" + PART_SUFFIX)).write_bytes(files[relative_path][:1000])
+    download_files({base_url + relative_path: str(local_path)})
+    assert local_path.read_bytes() == files[relative_path]
+    # a range from the first byte is written at once, another one is asked again
+    assert counters["ranges"] == (
+        ["bytes=1000-"] if range_start == 0 else ["bytes=1000-", None]
+    )
+
+
+def test_interrupted_transfer_resumed_download_files(data_node, tmp_path):
+    base_url, files, counters = data_node
+    counters["n_cuts"] = 1
+    relative_path = next(iter(files))
+    local_path = tmp_path / "file.nc"
+    dict_statistics = download_files({base_url + relative_path: str(local_path)})
+    assert local_path.read_bytes() == files[relative_path]
+    assert counters["ranges"][1] == "bytes={}-".format(len(files[relative_path]) // 2)
+    assert list(dict_statistics.values())[0]["n_errors"] == 1
+
+
+def test_chunked_body_download_files(data_node, tmp_path):
+    base_url, files, counters = data_node
+    counters["chunked"] = True
+    dict_url_paths = {
+        base_url + relative_path: str(tmp_path / "cache" / relative_path)
+        for relative_path in files
+    }
+    dict_statistics = download_files(dict_url_paths, max_connections_per_host=1)
+    for url, local_path in dict_url_paths.items():
+        with open(local_path, "rb") as file:
+            assert file.read() == files[url[len(base_url) :]]
+    assert list(dict_statistics.values())[0]["n_bytes"] == sum(map(len, files.values()))
+    # the end of a chunked body is known : the connection is kept alive
+    assert counters["n_connections"] == 1
+
+
+def test_redirection_followed_download_files(data_node, tmp_path):
+    base_url, files, counters = data_node
+    relative_path = next(iter(files))
+    local_path = tmp_path / "file.nc"
+    download_files({base_url + "redirect/" + relative_path: str(local_path)})
+    assert local_path.read_bytes() == files[relative_path]
+
+
+def test_redirection_loop_raised_download_files(data_node, tmp_path):
+    base_url, files, counters = data_node
+    with pytest.raises(ConnectionError):
+        download_files({base_url + "loop/file.nc": str(tmp_path / "file.nc")})
+    assert not os.path.exists(tmp_path / "file.nc")
+
+
+def test_missing_file_raised_download_files(data_node, tmp_path):
+    base_url, files, counters = data_node
+    with pytest.raises(ConnectionError):
+        download_files(
+            {base_url + "missing.nc": str(tmp_path / "missing.nc")}, n_retries=0
+        )
+    assert not os.path.exists(tmp_path / "missing.nc")
+
+
+##################################
+### TESTS FOR FETCH_FILE_SIZES ###
+##################################
+
+
+def test_sizes_without_download_fetch_file_sizes(data_node, tmp_path):
+    base_url, files, counters = data_node
+    dict_sizes = fetch_file_sizes([base_url + relative_path for relative_path in files])
+    assert dict_sizes == {
+        base_url + relative_path: len(content)
+        for relative_path, content in files.items()
+    }
+    # HEAD requests only
+    assert counters["ranges"] == []
+
+
+def test_missing_file_left_fetch_file_sizes(data_node, tmp_path):
+    base_url, files, counters = data_node
+    urls = [base_url + relative_path for relative_path in files]
+    dict_sizes = fetch_file_sizes(urls + [base_url + "missing.nc"], n_retries=0)
+    assert sorted(dict_sizes) == sorted(urls)
+
+
+####################################################
+### TESTS FOR THE CHECKSUMS OF DOWNLOAD_REPLICAS ###
+####################################################
+
+
+def test_checksum_checked_download_replicas(data_node, tmp_path):
+    base_url, files, counters = data_node
+    relative_path, content = next(iter(files.items()))
+    local_path = str(tmp_path / "file.nc")
+    with pytest.raises(ConnectionError):
+        download_replicas(
+            {local_path: [base_url + relative_path]},
+            n_retries=1,
+            dict_checksums={local_path: ("SHA256", "0" * 64)},
+        )
+    # a corrupted file never gets its final name and is not resumed
+    assert not os.path.exists(local_path)
+    assert not os.path.exists(local_path + PART_SUFFIX)
+    assert counters["ranges"] == [None, None]
+    download_replicas(
+        {local_path: [base_url + relative_path]},
+        dict_checksums={local_path: ("SHA256", hashlib.sha256(content).hexdigest())},
+    )
+    with open(local_path, "rb") as file:
+        assert file.read() == content
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+"""
+Test library for cell_output.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.load_raw_data.cell_output import (
+    clear_cell_output,  # clears the cell only in a notebook
+    is_running_in_notebook,  # do we run in a Jupyter kernel ?
+)
+
+######################################
+### TESTS OUTSIDE OF THE NOTEBOOKS ###
+######################################
+
+
+def test_headless_clear_cell_output(capsys):
+    """Outside of a notebook the output is kept untouched"""
+
+    print("entry 1")
+
+    clear_cell_output()
+
+    assert not is_running_in_notebook()
+
+    assert capsys.readouterr().out == "entry 1\n"
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""
+Test library for dry_run.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.load_raw_data.dry_run import (
+    get_number_of_months,  # time length given by the name of a file
+    record_benchmark,  # to save the duration of a stage
+    read_benchmark_history,  # to read the saved benchmarks
+    estimate_stage_throughput,  # throughput of a stage
+    build_file_table,  # the files of a case
+    build_plan_table,  # what every entry and variable needs
+    summarize_plan,  # totals of the plan
+    check_quotas,  # to fail before running anything
+    QuotaExceeded,  # raised when a quota would be exceeded
+    BYTES_PER_VALUE,  # bytes of a value in the files
+    COMPRESSION_FACTOR,  # largest compression ratio of the raw files
+    N_MONTHS,  # length of a monthly climatology
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np
+
+import pandas as pd
+
+import xarray as xr
+
+### FILE MANAGEMENT ###
+
+import os
+
+### TEST MODULE ###
+
+import pytest
+
+############################
+### MADE UP CASE TO PLAN ###
+############################
+
+DRS = "CMIP6/RFMIP/IPSL/MODEL/piClim-aer/r1i1p1f1/Amon/{0}/gr/v20190101/{0}_Amon_MODEL_piClim-aer_r1i1p1f1_gr_{1}.nc"
+
+N_CELLS = 96 * 144
+
+
+def make_links(node):
+    return {
+        "MODEL.r1i1p1f1.gr.piClim-aer."
+        + variable: [
+            node + DRS.format(variable, years)
+            for years in ["185001-187912", "188001-190912"]
+        ]
+        for variable in ["rsdt", "clt"]
+    }
+
+
+DICT_HTTP_LINKS = {
+    key: urls + make_links("http://b.org/thredds/fileServer/")[key]
+    for key, urls in make_links("http://a.org/thredds/fileServer/").items()
+}
+
+DICT_SIZES = {
+    url: 360 * N_CELLS * BYTES_PER_VALUE
+    for url in make_links("http://a.org/thredds/fileServer/")[
+        "MODEL.r1i1p1f1.gr.piClim-aer.rsdt"
+    ]
+    + make_links("http://b.org/thredds/fileServer/")["MODEL.r1i1p1f1.gr.piClim-aer.clt"]
+}
+
+######################################
+### TESTS FOR GET_NUMBER_OF_MONTHS ###
+######################################
+
+
+def test_months_from_name_get_number_of_months():
+    assert (
+        get_number_of_months("rsdt_Amon_MODEL_piClim-aer_r1i1p1f1_gr_185001-187912.nc")
+        == 360
+    )
+    assert (
+        get_number_of_months("http://a.org/x/clt_Amon_M_e_r_gn_185007-185106.nc") == 12
+    )
+
+
+def test_no_time_range_get_number_of_months():
+    assert get_number_of_months("areacella_fx_MODEL_piClim-aer_r1i1p1f1_gr.nc") == 0
+
+
+################################
+### TESTS FOR THE BENCHMARKS ###
+################################
+
+
+def test_median_throughput_record_benchmark(tmp_path):
+    benchmark_path = str(tmp_path / "benchmarks.json")
+    assert np.isnan(
+        estimate_stage_throughput(read_benchmark_history(benchmark_path), "download")
+    )
+    for n_bytes, seconds in [(100, 1.0), (300, 1.0), (1000, 2.0)]:
+        record_benchmark(benchmark_path, "download", n_bytes, seconds)
+    record_benchmark(benchmark_path, "climatology", 10, 1.0)
+    benchmark_history = read_benchmark_history(benchmark_path)
+    assert len(benchmark_history) == 4
+    assert estimate_stage_throughput(benchmark_history, "download") == 300.0
+    with pytest.raises(ValueError):
+        record_benchmark(benchmark_path, "regridding", 10, 1.0)
+
+
+##########################
+### TESTS FOR THE PLAN ###
+##########################
+
+
+def test_replicas_counted_once_build_file_table(tmp_path):
+    file_table = build_file_table(DICT_HTTP_LINKS, DICT_SIZES, str(tmp_path))
+    assert len(file_table) == 4
+    assert (file_table["n_bytes"] == 360 * N_CELLS * BYTES_PER_VALUE).all()
+    assert (file_table["n_months"] == 360).all()
+    assert not file_table["is_cached"].any()
+
+
+def test_unknown_size_left_build_file_table(tmp_path):
+    dict_sizes = dict(list(DICT_SIZES.items())[1:])
+    file_table = build_file_table(DICT_HTTP_LINKS, dict_sizes, str(tmp_path))
+    assert len(file_table) == 3
+    assert (file_table["n_bytes"] == 360 * N_CELLS * BYTES_PER_VALUE).all()
+
+
+def test_cached_files_not_downloaded_build_plan_table(tmp_path):
+    file_table = build_file_table(DICT_HTTP_LINKS, DICT_SIZES, str(tmp_path))
+    cached_path = file_table["local_path"].iloc[0]
+    os.makedirs(os.path.dirname(cached_path))
+    open(cached_path, "w").close()
+    plan_table = build_plan_table(
+        build_file_table(DICT_HTTP_LINKS, DICT_SIZES, str(tmp_path))
+    )
+    plan_table = plan_table.set_index("variable_id")
+    assert plan_table.loc["rsdt", "n_files"] == 2
+    assert plan_table.loc["rsdt", "download_bytes"] == 360 * N_CELLS * BYTES_PER_VALUE
+    assert plan_table.loc["clt", "download_bytes"] == 720 * N_CELLS * BYTES_PER_VALUE
+    # grid estimated from the size of the files, as if they were compressed
+    assert (plan_table["n_cells"] == COMPRESSION_FACTOR * N_CELLS).all()
+    # no benchmark : no runtime
+    assert plan_table["download_seconds"].isna().all()
+
+
+def test_grid_of_cached_file_build_plan_table(tmp_path):
+    file_table = build_file_table(DICT_HTTP_LINKS, DICT_SIZES, str(tmp_path))
+    cached_path = file_table["local_path"].iloc[0]
+    os.makedirs(os.path.dirname(cached_path))
+    xr.Dataset(
+        {"rsdt": (("time", "lat", "lon"), np.zeros((2, 9, 16), np.float32))}
+    ).to_netcdf(cached_path)
+    plan_table = build_plan_table(
+        build_file_table(DICT_HTTP_LINKS, DICT_SIZES, str(tmp_path))
+    ).set_index("variable_id")
+    assert plan_table.loc["rsdt", "n_cells"] == 9 * 16
+    assert plan_table.loc["clt", "n_cells"] == COMPRESSION_FACTOR * N_CELLS
+    # one file of 360 months at a time
+    assert plan_table.loc["rsdt", "load_memory_bytes"] == 360 * 9 * 16 * BYTES_PER_VALUE
+
+
+def test_grid_catalog_and_benchmarks_build_plan_table(tmp_path):
+    grid_catalog = pd.DataFrame(
+        {"key": ["MODEL.r1i1p1f1.gr.piClim-control"], "n_lat": [10], "n_lon": [20]}
+    )
+    plan_table = build_plan_table(
+        build_file_table(DICT_HTTP_LINKS, DICT_SIZES, str(tmp_path)),
+        grid_catalog=grid_catalog,
+        benchmark_history=[
+            {"stage": "download", "n_bytes": 1e6, "seconds": 1.0},
+            {"stage": "climatology", "n_bytes": 1e5, "seconds": 1.0},
+        ],
+    )
+    assert (plan_table["n_cells"] == 200).all()
+    assert (plan_table["field_bytes"] == 720 * 200 * BYTES_PER_VALUE).all()
+    np.testing.assert_allclose(
+        plan_table["download_seconds"], plan_table["download_bytes"] / 1e6
+    )
+    np.testing.assert_allclose(
+        plan_table["climatology_seconds"], plan_table["field_bytes"] / 1e5
+    )
+
+
+###########################################
+### TESTS FOR SUMMARIZE_PLAN AND QUOTAS ###
+###########################################
+
+
+def test_quotas_check_quotas(tmp_path):
+    summary = summarize_plan(
+        build_plan_table(build_file_table(DICT_HTTP_LINKS, DICT_SIZES, str(tmp_path)))
+    )
+    assert summary["download_bytes"] == 4 * 360 * N_CELLS * BYTES_PER_VALUE
+    assert summary["disk_bytes"] > summary["download_bytes"]
+    check_quotas(summary, disk_quota=1e12, memory_quota=1e12)
+    with pytest.raises(QuotaExceeded, match="disk"):
+        check_quotas(summary, disk_quota=1e6)
+    with pytest.raises(QuotaExceeded, match="memory"):
+        check_quotas(summary, memory_quota=1e6)
+
+
+def test_peak_memory_of_stages_summarize_plan(tmp_path):
+    plan_table = build_plan_table(
+        build_file_table(DICT_HTTP_LINKS, DICT_SIZES, str(tmp_path))
+    )
+    summary = summarize_plan(plan_table)
+    stages = ["load", "climatology", "aprp", "regrid"]
+    assert summary["peak_memory_bytes"] == max(
+        summary["{}_memory_bytes".format(stage)] for stage in stages
+    )
+    # the variables of an entry are held together by the APRP and the regridding
+    assert summary["aprp_memory_bytes"] == plan_table["aprp_memory_bytes"].sum()
+    assert summary["regrid_memory_bytes"] == 2 * plan_table["regrid_memory_bytes"].max()
+    assert (
+        plan_table["regrid_memory_bytes"]
+        > N_MONTHS * plan_table["n_cells"] * BYTES_PER_VALUE
+    ).all()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""
+Test library for filter_entries.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.load_raw_data.filter_entries import (
+    make_filtering_function,  # to remove the incomplete entries of a case
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd  # to make up the groups of a search
+
+### PARALLEL CALLS ###
+
+from concurrent.futures import ThreadPoolExecutor
+
+########################
+### MADE UP SEARCHES ###
+########################
+
+
+def make_group(source_id, member_id, n_files):
+    """Sub dataframe of the search for one (source_id, member_id, grid_label) group"""
+
+    return pd.DataFrame(
+        {
+            "source_id": [source_id] * n_files,
+            "member_id": [member_id] * n_files,
+            "grid_label": ["gn"] * n_files,
+        }
+    )
+
+
+SW_CRITERIAS = {
+    "expected_number_of_files": 2,
+    "filtering_by_name": False,
+    "keep_only_dataframe": None,
+}
+
+ZELINKA_CRITERIAS = {
+    "expected_number_of_files": 3,
+    "filtering_by_name": True,
+    "keep_only_dataframe": pd.DataFrame(
+        {"source_id": ["CanESM5", "MIROC6"], "member_id": ["r1i1p2f1", "r1i1p1f1"]}
+    ),
+}
+
+
+def make_experiments_group(number_of_files_per_experiment):
+    """Sub dataframe of the search for one group with the given number of files per experiment"""
+
+    experiment_id = [
+        experiment
+        for experiment, n_files in number_of_files_per_experiment.items()
+        for _ in range(n_files)
+    ]
+
+    group = make_group("CanESM5", "r1i1p2f1", len(experiment_id))
+
+    group["experiment_id"] = experiment_id
+
+    return group
+
+
+COMPONENTS_CRITERIAS = {
+    "expected_number_of_files": 2,
+    "filtering_by_name": False,
+    "keep_only_dataframe": None,
+    "required_experiments": ["piClim-control", "piClim-aer"],
+}
+
+#########################################
+### TESTS FOR MAKE_FILTERING_FUNCTION ###
+#########################################
+
+
+def test_incomplete_removed_make_filtering_function():
+    filtering_function = make_filtering_function(SW_CRITERIAS)
+    assert filtering_function(make_group("CanESM5", "r1i1p2f1", 2))
+    assert not filtering_function(make_group("CanESM5", "r1i1p2f1", 1))
+
+
+def test_only_listed_couples_kept_make_filtering_function():
+    filtering_function = make_filtering_function(ZELINKA_CRITERIAS)
+    assert filtering_function(make_group("CanESM5", "r1i1p2f1", 3))
+    assert not filtering_function(make_group("CanESM5", "r1i1p1f1", 3))
+    assert not filtering_function(make_group("MIROC6", "r1i1p1f1", 2))
+
+
+def test_cases_independent_make_filtering_function():
+    groups = [make_group("CanESM5", "r1i1p1f1", n_files) for n_files in [2, 3] * 50]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        sw_results = pool.map(make_filtering_function(SW_CRITERIAS), groups)
+        zelinka_results = pool.map(make_filtering_function(ZELINKA_CRITERIAS), groups)
+        # building a filter does not change the ones already built
+        assert list(sw_results) == [True, False] * 50
+        assert list(zelinka_results) == [False, False] * 50
+
+
+def test_optional_experiments_make_filtering_function():
+    filtering_function = make_filtering_function(COMPONENTS_CRITERIAS)
+    # the entries without the optional experiments are kept
+    assert filtering_function(
+        make_experiments_group({"piClim-control": 2, "piClim-aer": 2})
+    )
+    assert filtering_function(
+        make_experiments_group({"piClim-control": 2, "piClim-aer": 2, "piClim-BC": 2})
+    )
+    # a required experiment missing or an experiment incomplete removes the entry
+    assert not filtering_function(
+        make_experiments_group({"piClim-control": 2, "piClim-BC": 2})
+    )
+    assert not filtering_function(
+        make_experiments_group({"piClim-control": 2, "piClim-aer": 2, "piClim-BC": 1})
+    )
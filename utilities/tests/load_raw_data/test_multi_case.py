@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+"""
+Test library for multi_case.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.load_raw_data.multi_case import (
+    build_union_entries,  # every entry once with what the cases need
+    merge_search_facets,  # facets of the union search
+    select_case_entries,  # entries of a case in the union search
+    select_case_rows,  # datasets of a case in the union search
+    split_case_views,  # one dictionary per case
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd  # to make up the search
+
+############################
+### MADE UP UNION SEARCH ###
+############################
+
+SW_FACETS = {
+    "experiment_id": ["piClim-control", "piClim-aer"],
+    "variable_id": ["rsdt", "rsut"],
+    "table_id": "Amon",
+}
+
+LW_FACETS = {
+    "experiment_id": ["piClim-control", "piClim-aer"],
+    "variable_id": ["rlut"],
+    "table_id": "Amon",
+}
+
+DICT_CASE_CRITERIAS = {
+    "SW": {
+        "search_facets": SW_FACETS,
+        "expected_number_of_files": 4,
+        "filtering_by_name": False,
+        "keep_only_dataframe": None,
+    },
+    "ZELINKA-SW": {
+        "search_facets": SW_FACETS,
+        "expected_number_of_files": 4,
+        "filtering_by_name": True,
+        "keep_only_dataframe": pd.DataFrame(
+            {"source_id": ["CanESM5"], "member_id": ["r1i1p2f1"]}
+        ),
+    },
+    "LW": {
+        "search_facets": LW_FACETS,
+        "expected_number_of_files": 2,
+        "filtering_by_name": False,
+        "keep_only_dataframe": None,
+    },
+}
+
+
+def make_search_dataframe():
+    """Datasets found by the union search : MIROC6 misses rsut in piClim-aer"""
+
+    rows = [
+        (source_id, member_id, "gn", experiment_id, variable_id, "Amon")
+        for source_id, member_id in [
+            ("CanESM5", "r1i1p2f1"),
+            ("CanESM5", "r2i1p2f1"),
+            ("MIROC6", "r1i1p1f1"),
+        ]
+        for experiment_id in ["piClim-control", "piClim-aer"]
+        for variable_id in ["rsdt", "rsut", "rlut"]
+        if (source_id, experiment_id, variable_id) != ("MIROC6", "piClim-aer", "rsut")
+    ]
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "source_id",
+            "member_id",
+            "grid_label",
+            "experiment_id",
+            "variable_id",
+            "table_id",
+        ],
+    )
+
+
+############################
+### TESTS FOR THE SEARCH ###
+############################
+
+
+def test_union_merge_search_facets():
+    assert merge_search_facets([SW_FACETS, LW_FACETS]) == {
+        "experiment_id": ["piClim-control", "piClim-aer"],
+        "variable_id": ["rsdt", "rsut", "rlut"],
+        "table_id": "Amon",
+    }
+
+
+def test_missing_facet_wildcard_merge_search_facets():
+    list_search_facets = [
+        {"experiment_id": ["a"], "variable_id": ["rsut"]},
+        {"experiment_id": ["a"], "variable_id": ["rsut"], "source_id": ["CanESM5"]},
+    ]
+    # the first case searches every model
+    assert merge_search_facets(list_search_facets) == {
+        "experiment_id": "a",
+        "variable_id": "rsut",
+    }
+    search_dataframe = pd.DataFrame(
+        {
+            "source_id": ["CanESM5", "MIROC6", "MIROC6"],
+            "experiment_id": ["a", "a", "b"],
+            "variable_id": ["rsut"] * 3,
+        }
+    )
+    assert list(
+        select_case_rows(search_dataframe, list_search_facets[0])["source_id"]
+    ) == ["CanESM5", "MIROC6"]
+    assert list(
+        select_case_rows(search_dataframe, list_search_facets[1])["source_id"]
+    ) == ["CanESM5"]
+
+
+def test_same_as_single_search_select_case_entries():
+    search_dataframe = make_search_dataframe()
+    entries = {
+        case: [
+            ".".join(entry)
+            for entry in select_case_entries(
+                search_dataframe, search_criterias
+            ).itertuples(index=False)
+        ]
+        for case, search_criterias in DICT_CASE_CRITERIAS.items()
+    }
+    assert entries == {
+        "SW": ["CanESM5.r1i1p2f1.gn", "CanESM5.r2i1p2f1.gn"],
+        "ZELINKA-SW": ["CanESM5.r1i1p2f1.gn"],
+        "LW": ["CanESM5.r1i1p2f1.gn", "CanESM5.r2i1p2f1.gn", "MIROC6.r1i1p1f1.gn"],
+    }
+
+
+def test_first_variant_kept_select_case_entries():
+    search_dataframe = make_search_dataframe()
+    case_entries = select_case_entries(
+        search_dataframe, DICT_CASE_CRITERIAS["LW"], remove_ensembles=True
+    )
+    assert list(case_entries["member_id"]) == ["r1i1p2f1", "r1i1p1f1"]
+
+
+def test_numerical_variant_order_select_case_entries():
+    search_dataframe = pd.DataFrame(
+        [
+            ("IPSL-CM6A-LR", member_id, grid_label, experiment_id, "rlut", "Amon")
+            for member_id, grid_label in [
+                ("r10i1p1f1", "gn"),
+                ("r1i1p1f1", "gn"),
+                ("r2i1p1f1", "gr"),
+            ]
+            for experiment_id in ["piClim-control", "piClim-aer"]
+        ],
+        columns=[
+            "source_id",
+            "member_id",
+            "grid_label",
+            "experiment_id",
+            "variable_id",
+            "table_id",
+        ],
+    )
+    case_entries = select_case_entries(
+        search_dataframe, DICT_CASE_CRITERIAS["LW"], remove_ensembles=True
+    )
+    # r1 before r10, one variant per grid
+    assert [".".join(entry) for entry in case_entries.itertuples(index=False)] == [
+        "IPSL-CM6A-LR.r1i1p1f1.gn",
+        "IPSL-CM6A-LR.r2i1p1f1.gr",
+    ]
+
+
+###########################
+### TESTS FOR THE UNION ###
+###########################
+
+
+def test_each_entry_once_build_union_entries():
+    search_dataframe = make_search_dataframe()
+    dict_case_entries = {
+        case: select_case_entries(search_dataframe, search_criterias)
+        for case, search_criterias in DICT_CASE_CRITERIAS.items()
+    }
+    union_entries = build_union_entries(
+        dict_case_entries,
+        {
+            case: criterias["search_facets"]
+            for case, criterias in DICT_CASE_CRITERIAS.items()
+        },
+    )
+    assert len(union_entries) == 3
+    first = union_entries.iloc[0]
+    assert (first.source_id, first.member_id) == ("CanESM5", "r1i1p2f1")
+    assert first.variable_id == ["rsdt", "rsut", "rlut"]
+    assert first.cases == ["SW", "ZELINKA-SW", "LW"]
+    assert union_entries.iloc[2].variable_id == ["rlut"]
+
+
+def test_shared_datasets_split_case_views():
+    search_dataframe = make_search_dataframe()
+    dict_case_entries = {
+        case: select_case_entries(search_dataframe, search_criterias)
+        for case, search_criterias in DICT_CASE_CRITERIAS.items()
+    }
+    full_cmip6_dict = {
+        ".".join(row[:5]): object() for row in search_dataframe.itertuples(index=False)
+    }
+    dict_case_views = split_case_views(
+        full_cmip6_dict,
+        dict_case_entries,
+        {
+            case: criterias["search_facets"]
+            for case, criterias in DICT_CASE_CRITERIAS.items()
+        },
+    )
+    assert len(dict_case_views["SW"]) == 8
+    assert len(dict_case_views["ZELINKA-SW"]) == 4
+    assert len(dict_case_views["LW"]) == 6
+    key = "CanESM5.r1i1p2f1.gn.piClim-aer.rsdt"
+    assert dict_case_views["SW"][key] is dict_case_views["ZELINKA-SW"][key]
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+"""
+Test library for open_datasets.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.load_raw_data.open_datasets import (
+    get_catalog_http_links,  # urls of the files from the file records of the catalog
+    get_catalog_keys,  # keys of the datasets of a search
+    open_single_model_dictionary,  # to download and open the datasets of a single model search
+)
+
+from utilities.get_cmip6_data.folders_handle.cache_manager import (
+    read_access_log,  # files dated by the loading
+)
+
+### LOCAL HTTP SERVER ###
+
+import functools
+
+import threading
+
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+### FILE MANAGEMENT ###
+
+import os
+
+import hashlib
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np
+
+import pandas as pd
+
+import xarray as xr
+
+### TEST MODULE ###
+
+import pytest
+
+#####################################################
+### A FAKE CATALOG OF FILES SERVED BY A DATA NODE ###
+#####################################################
+
+DATASET_ID = "CMIP6.RFMIP.INST.MODEL.piClim-aer.r1i1p1f1.Amon.{}.gn.v20190101"
+
+DRS_PATH = "thredds/fileServer/CMIP6/RFMIP/INST/MODEL/piClim-aer/r1i1p1f1/Amon/{}/gn/v20190101/{}_{}.nc"
+
+VARIABLES = ["rsdt", "rsut"]
+
+YEARS = [1850, 1851]
+
+
+class FakeIndex:
+    """Index giving the file records of the datasets, as the indexes of intake-esgf"""
+
+    def __init__(self, file_infos):
+        self.file_infos = file_infos
+
+    def get_file_info(self, dataset_ids):
+        return [
+            file_info
+            for file_info in self.file_infos
+            if file_info["dataset_id"] in dataset_ids
+        ]
+
+
+class FakeCatalog:
+    """Search of a single model without to_dataset_dict nor to_path_dict"""
+
+    def __init__(self, file_infos):
+        self.df = pd.DataFrame(
+            {
+                "project": ["CMIP6"] * len(VARIABLES),
+                "source_id": ["MODEL"] * len(VARIABLES),
+                "experiment_id": ["piClim-aer"] * len(VARIABLES),
+                "member_id": ["r1i1p1f1"] * len(VARIABLES),
+                "table_id": ["Amon"] * len(VARIABLES),
+                "variable_id": VARIABLES,
+                "grid_label": ["gn"] * len(VARIABLES),
+                "id": [
+                    [DATASET_ID.format(variable) + "|node"] for variable in VARIABLES
+                ],
+            }
+        )
+        self.indices = [FakeIndex(file_infos)]
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def data_node(tmp_path):
+    root = tmp_path / "node"
+    file_infos = []
+    for ii, variable in enumerate(VARIABLES):
+        for year in YEARS:
+            relative_path = DRS_PATH.format(variable, variable, year)
+            os.makedirs(os.path.dirname(root / relative_path), exist_ok=True)
+            xr.Dataset(
+                {variable: (("time", "lat"), np.full((12, 2), ii + year, float))},
+                coords={
+                    "time": pd.date_range(str(year), periods=12, freq="MS"),
+                    "lat": [60.0, 70.0],
+                },
+            ).to_netcdf(root / relative_path)
+            file_infos.append(
+                {
+                    "dataset_id": DATASET_ID.format(variable) + "|node",
+                    "checksum_type": "SHA256",
+                    "checksum": hashlib.sha256(
+                        (root / relative_path).read_bytes()
+                    ).hexdigest(),
+                    "size": (root / relative_path).stat().st_size,
+                    "path": relative_path,
+                    "relative_path": relative_path,
+                }
+            )
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        functools.partial(QuietHandler, directory=str(root)),
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = "http://127.0.0.1:{}/".format(server.server_address[1])
+    for file_info in file_infos:
+        file_info["HTTPServer"] = [base_url + file_info.pop("relative_path")]
+    yield file_infos
+    server.shutdown()
+    server.server_close()
+
+
+##################################
+### TESTS FOR GET_CATALOG_KEYS ###
+##################################
+
+
+def test_varying_facets_get_catalog_keys():
+    assert get_catalog_keys(FakeCatalog([]).df) == ["rsdt", "rsut"]
+    assert get_catalog_keys(FakeCatalog([]).df.iloc[:1]) == [
+        "MODEL.piClim-aer.r1i1p1f1.Amon.rsdt"
+    ]
+
+
+########################################
+### TESTS FOR GET_CATALOG_HTTP_LINKS ###
+########################################
+
+
+def test_missing_dataset_get_catalog_http_links(data_node):
+    with pytest.raises(ValueError):
+        get_catalog_http_links(FakeCatalog(data_node[:2]))
+
+
+def test_sizes_of_records_get_catalog_http_links(data_node):
+    dict_http_links, dict_checksums, dict_sizes = get_catalog_http_links(
+        FakeCatalog(data_node)
+    )
+    assert dict_sizes == {
+        file_info["HTTPServer"][0]: file_info["size"] for file_info in data_node
+    }
+
+
+##############################################
+### TESTS FOR OPEN_SINGLE_MODEL_DICTIONARY ###
+##############################################
+
+
+def test_async_transfer_open_single_model_dictionary(data_node, tmp_path):
+    transfer_path = str(tmp_path / "cache")
+    single_model_dictionary = open_single_model_dictionary(
+        FakeCatalog(data_node), transfer_path=transfer_path
+    )
+    assert sorted(single_model_dictionary) == VARIABLES
+    for ii, variable in enumerate(VARIABLES):
+        values = single_model_dictionary[variable][variable].isel(lat=0).values
+        np.testing.assert_array_equal(
+            values, np.repeat([ii + year for year in YEARS], 12)
+        )
+    # the files are laid out as the DRS and dated for the eviction
+    assert sorted(read_access_log(transfer_path)) == sorted(
+        file_info["path"].split("fileServer/")[1] for file_info in data_node
+    )
+
+
+def test_wrong_checksum_open_single_model_dictionary(data_node, tmp_path):
+    data_node[0]["checksum"] = "0" * 64
+    with pytest.raises(ConnectionError):
+        open_single_model_dictionary(
+            FakeCatalog(data_node), transfer_path=str(tmp_path / "cache")
+        )
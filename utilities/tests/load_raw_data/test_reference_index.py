@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+"""
+Test library for reference_index.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.load_raw_data.reference_index import (
+    build_reference_index,  # index of a time series
+    open_with_reference_index,  # open a time series through its saved index
+)
+
+### FILE MANAGEMENT ###
+
+import os  # to check the modification times of the indexes
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### TEST MODULE ###
+
+import pytest
+
+###############################
+### MADE UP RAW TIME SERIES ###
+###############################
+
+TIME = xr.date_range(
+    "1850-01-01", periods=36, freq="MS", calendar="noleap", use_cftime=True
+)
+
+FULL = xr.Dataset(
+    {"rsut": (("time", "lat", "lon"), np.arange(36 * 6.0).reshape(36, 2, 3))},
+    coords={"time": TIME, "lat": [-30.0, 30.0], "lon": [60.0, 180.0, 300.0]},
+)
+
+
+def write_files(tmp_path):
+    """Split FULL into yearly files given in a shuffled order"""
+
+    paths = []
+
+    for start in [24, 0, 12]:
+        path = str(tmp_path / "rsut_{}.nc".format(start))
+        FULL.isel(time=slice(start, start + 12)).to_netcdf(path)
+        paths.append(path)
+
+    return paths
+
+
+#######################################
+### TESTS FOR BUILD_REFERENCE_INDEX ###
+#######################################
+
+
+def test_files_are_sorted_build_reference_index(tmp_path):
+    paths = write_files(tmp_path)
+    reference_index = build_reference_index(paths, use_kerchunk=False)
+    assert reference_index["format"] == "file_list"
+    assert [os.path.basename(path) for path in reference_index["paths"]] == [
+        "rsut_0.nc",
+        "rsut_12.nc",
+        "rsut_24.nc",
+    ]
+
+
+def test_time_coordinate_is_saved_build_reference_index(tmp_path):
+    paths = []
+    for start in [12, 0]:
+        path = str(tmp_path / "rsut_{}.nc".format(start))
+        year_dataset = FULL.isel(time=slice(start, start + 12))
+        year_dataset["time_bnds"] = (
+            ("time", "bnds"),
+            np.stack([year_dataset["time"].values] * 2, axis=1),
+        )
+        year_dataset["time"].attrs["bounds"] = "time_bnds"
+        units = "days since {}-01-01".format(1850 + start // 12)
+        year_dataset.to_netcdf(
+            path, encoding={"time": {"units": units, "calendar": "noleap"}}
+        )
+        paths.append(path)
+    reference_index = build_reference_index(paths, use_kerchunk=False)
+    assert reference_index["time"]["units"] == "days since 1850-01-01"
+    assert len(reference_index["time"]["values"]) == 24
+    dataset = open_with_reference_index(paths, str(tmp_path / "index"), "A.rsut")
+    assert list(dataset["time"].values) == list(TIME[:24])
+    assert list(dataset["time_bnds"].values[:, 0]) == list(TIME[:24])
+
+
+def test_kerchunk_build_reference_index(tmp_path):
+    pytest.importorskip("kerchunk")
+    paths = write_files(tmp_path)
+    reference_index = build_reference_index(paths, use_kerchunk=True)
+    assert reference_index["format"] == "kerchunk"
+    dataset = open_with_reference_index(paths, str(tmp_path / "index"), "A.rsut")
+    np.testing.assert_allclose(dataset["rsut"].values, FULL["rsut"].values)
+    assert list(dataset["time"].values) == list(TIME)
+
+
+###########################################
+### TESTS FOR OPEN_WITH_REFERENCE_INDEX ###
+###########################################
+
+
+def test_same_time_series_open_with_reference_index(tmp_path):
+    paths = write_files(tmp_path)
+    dataset = open_with_reference_index(paths, str(tmp_path / "index"), "A.rsut")
+    np.testing.assert_allclose(dataset["rsut"].values, FULL["rsut"].values)
+    assert list(dataset["time"].values) == list(TIME)
+
+
+def test_index_is_reused_then_rebuilt_open_with_reference_index(tmp_path):
+    paths = write_files(tmp_path)
+    index_path = str(tmp_path / "index" / "A.rsut.json")
+    open_with_reference_index(paths, str(tmp_path / "index"), "A.rsut").close()
+    first_time = os.stat(index_path).st_mtime_ns
+    open_with_reference_index(paths, str(tmp_path / "index"), "A.rsut").close()
+    assert os.stat(index_path).st_mtime_ns == first_time
+    FULL.isel(time=slice(24, 36)).to_netcdf(str(tmp_path / "rsut_36.nc"))
+    dataset = open_with_reference_index(
+        paths + [str(tmp_path / "rsut_36.nc")], str(tmp_path / "index"), "A.rsut"
+    )
+    assert dataset["time"].size == 48
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+
+"""
+Test library for replica_selection.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.load_raw_data.replica_selection import (
+    download_http_links,  # to download the files of the datasets of an entry
+    fetch_replica_sizes,  # sizes of the files, from the next replica if one does not answer
+    group_replicas,  # urls of the replicas of every file
+    merge_host_statistics,  # to add the counters of a run to the previous ones
+    rank_replicas,  # replicas from the best data node to the worst
+    read_host_statistics,  # to read the saved statistics
+    write_host_statistics,  # to save the statistics
+    HOST_STATISTICS_FILE_NAME,  # file of the statistics in the download folder
+)
+
+from utilities.get_cmip6_data.load_raw_data.open_datasets import (
+    get_catalog_http_links,  # urls of the files from the file records of the catalog
+)
+
+from utilities.get_cmip6_data.load_raw_data.async_transfer import (
+    download_replicas,  # to download files from their replicas
+    get_host_key,  # data node of an url
+    init_host_statistics,  # counters of a data node
+)
+
+### LOCAL HTTP SERVERS ###
+
+import threading
+
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+### FILE MANAGEMENT ###
+
+import os
+
+import hashlib
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd
+
+### TEST MODULE ###
+
+import pytest
+
+#################################################
+### LOCAL DATA NODES WITH A LIMITED BANDWIDTH ###
+#################################################
+
+DRS_PATH = "thredds/fileServer/CMIP6/RFMIP/MODEL/piClim-aer/r1i1p1f1/Amon/rsdt/gn/v20190101/rsdt_{}.nc"
+
+FILES = {DRS_PATH.format(years): os.urandom(200_000) for years in ["1850", "1880"]}
+
+
+def make_handler(bytes_per_second, head_delay, ranges):
+    """Request handler sending FILES at a limited rate, with range requests"""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(FILES[self.path.lstrip("/")])))
+            self.end_headers()
+
+        def do_GET(self):
+            ranges.append(self.headers.get("Range"))
+            content = FILES[self.path.lstrip("/")]
+            start, end = 0, len(content) - 1
+            if self.headers.get("Range"):
+                first, _, last = self.headers["Range"].split("=")[1].partition("-")
+                start, end = int(first), int(last) if last else len(content) - 1
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range", "bytes {}-{}/{}".format(start, end, len(content))
+                )
+            else:
+                self.send_response(200)
+            body = content[start : end + 1]
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            time.sleep(head_delay)
+            chunk_size = 10_000
+            try:
+                for ii in range(0, len(body), chunk_size):
+                    self.wfile.write(body[ii : ii + chunk_size])
+                    time.sleep(chunk_size / bytes_per_second)
+            except OSError:
+                # the client left this replica
+                self.close_connection = True
+
+    return Handler
+
+
+@pytest.fixture
+def data_nodes():
+    """A slow data node and a fast one"""
+    servers, nodes = [], []
+    for bytes_per_second, head_delay in [(50_000, 0.0), (5_000_000, 0.0)]:
+        ranges = []
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), make_handler(bytes_per_second, head_delay, ranges)
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        nodes.append(("http://127.0.0.1:{}/".format(server.server_address[1]), ranges))
+    yield nodes
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+##################################################
+### TESTS FOR THE STATISTICS OF THE DATA NODES ###
+##################################################
+
+
+def test_round_trip_write_host_statistics(tmp_path):
+    assert read_host_statistics(str(tmp_path / "missing.json")) == {}
+    dict_statistics = {"node:80": init_host_statistics() | {"n_bytes": 10}}
+    write_host_statistics(dict_statistics, str(tmp_path / "statistics.json"))
+    assert read_host_statistics(str(tmp_path / "statistics.json")) == dict_statistics
+
+
+def test_history_weighted_merge_host_statistics():
+    history = {"a:80": init_host_statistics() | {"n_bytes": 100, "n_files": 2}}
+    new = {
+        "a:80": init_host_statistics() | {"n_bytes": 10, "n_files": 1},
+        "b:80": init_host_statistics() | {"n_bytes": 5},
+    }
+    merged = merge_host_statistics(history, new, history_weight=0.5)
+    assert merged["a:80"]["n_bytes"] == 60
+    assert merged["a:80"]["n_files"] == 2
+    assert merged["b:80"]["n_bytes"] == 5
+    with pytest.raises(ValueError):
+        merge_host_statistics(history, new, history_weight=2.0)
+
+
+###############################
+### TESTS FOR RANK_REPLICAS ###
+###############################
+
+
+def test_fast_node_first_rank_replicas():
+    dict_statistics = {
+        "slow:80": init_host_statistics()
+        | {"n_bytes": 100, "transfer_seconds": 10.0, "n_files": 1},
+        "fast:80": init_host_statistics()
+        | {"n_bytes": 100, "transfer_seconds": 1.0, "n_files": 1},
+        "medium:80": init_host_statistics()
+        | {"n_bytes": 100, "transfer_seconds": 2.0, "n_files": 1},
+        "failing:80": init_host_statistics()
+        | {"n_bytes": 100, "transfer_seconds": 1.0, "n_files": 1, "n_errors": 99},
+        "unused:80": init_host_statistics(),
+    }
+    for host_statistics in dict_statistics.values():
+        host_statistics["n_requests"] = host_statistics["n_files"]
+    urls = [
+        "http://unused/f.nc",
+        "http://slow/f.nc",
+        "http://medium/f.nc",
+        "http://new/f.nc",
+        "http://failing/f.nc",
+        "http://fast/f.nc",
+    ]
+    assert rank_replicas(urls, dict_statistics) == [
+        "http://fast/f.nc",
+        "http://medium/f.nc",
+        "http://unused/f.nc",  # median score of the known nodes
+        "http://new/f.nc",
+        "http://slow/f.nc",
+        "http://failing/f.nc",
+    ]
+
+
+def test_order_kept_without_statistics_rank_replicas():
+    urls = ["http://a/f.nc", "http://b/f.nc"]
+    assert rank_replicas(urls, {}) == urls
+
+
+def test_same_drs_path_group_replicas():
+    urls = ["http://a/" + path for path in FILES] + [
+        "http://b/" + path for path in FILES
+    ]
+    dict_path_urls = group_replicas(urls, "/cache")
+    assert len(dict_path_urls) == len(FILES)
+    for replica_urls in dict_path_urls.values():
+        assert [get_host_key(url) for url in replica_urls] == ["a:80", "b:80"]
+
+
+#####################################
+### TESTS FOR FETCH_REPLICA_SIZES ###
+#####################################
+
+
+def test_next_replica_fetch_replica_sizes(data_nodes, tmp_path):
+    (node_url, _), _ = data_nodes
+    down_url = "http://127.0.0.1:1/"
+    lost_path = DRS_PATH.format("1910")
+    dict_http_links = {
+        "MODEL.rsdt": [down_url + path for path in FILES]
+        + [node_url + path for path in FILES]
+        + [down_url + lost_path]
+    }
+    known_url = down_url + DRS_PATH.format("1850")
+    dict_sizes = fetch_replica_sizes(dict_http_links, str(tmp_path), {known_url: 1})
+    # the record size is kept, the other file is asked to its second replica
+    assert dict_sizes == {
+        known_url: 1,
+        node_url + DRS_PATH.format("1880"): len(FILES[DRS_PATH.format("1880")]),
+    }
+
+
+###########################################
+### TESTS FOR THE FALLBACK AND THE RACE ###
+###########################################
+
+
+def test_slow_replica_left_download_replicas(data_nodes, tmp_path):
+    (slow_url, slow_ranges), (fast_url, fast_ranges) = data_nodes
+    path = next(iter(FILES))
+    local_path = tmp_path / "file.nc"
+    dict_statistics = download_replicas(
+        {str(local_path): [slow_url + path, fast_url + path]},
+        min_throughput=500_000,
+        grace_seconds=0.3,
+    )
+    assert local_path.read_bytes() == FILES[path]
+    assert dict_statistics[get_host_key(slow_url)]["n_slow"] == 1
+    # the fast node resumed the transfer where the slow one stopped
+    assert fast_ranges[0] is not None and fast_ranges[0] != "bytes=0-"
+
+
+def test_last_replica_never_left_download_replicas(data_nodes, tmp_path):
+    (slow_url, slow_ranges), _ = data_nodes
+    path = next(iter(FILES))
+    local_path = tmp_path / "file.nc"
+    dict_statistics = download_replicas(
+        {str(local_path): [slow_url + path]}, min_throughput=500_000, grace_seconds=0.3
+    )
+    assert local_path.read_bytes() == FILES[path]
+    assert dict_statistics[get_host_key(slow_url)]["n_slow"] == 0
+
+
+def test_fast_replica_raced_download_replicas(data_nodes, tmp_path):
+    (slow_url, slow_ranges), (fast_url, fast_ranges) = data_nodes
+    path = next(iter(FILES))
+    local_path = tmp_path / "file.nc"
+    download_replicas({str(local_path): [slow_url + path, fast_url + path]}, race=True)
+    assert local_path.read_bytes() == FILES[path]
+    # only the probe was asked to the slow node
+    assert len(slow_ranges) == 1 and slow_ranges[0].startswith("bytes=0-")
+
+
+#####################################
+### TESTS FOR DOWNLOAD_HTTP_LINKS ###
+#####################################
+
+
+def test_statistics_used_and_kept_download_http_links(data_nodes, tmp_path):
+    (slow_url, slow_ranges), (fast_url, fast_ranges) = data_nodes
+    statistics_path = str(tmp_path / HOST_STATISTICS_FILE_NAME)
+    write_host_statistics(
+        {
+            get_host_key(slow_url): init_host_statistics()
+            | {"n_requests": 1, "n_files": 1, "n_bytes": 1e5, "transfer_seconds": 2.0},
+            get_host_key(fast_url): init_host_statistics()
+            | {"n_requests": 1, "n_files": 1, "n_bytes": 1e5, "transfer_seconds": 0.1},
+        },
+        statistics_path,
+    )
+    dict_http_links = {
+        "piClim-aer.rsdt": [slow_url + path for path in FILES]
+        + [fast_url + path for path in FILES]
+    }
+    dict_paths = download_http_links(dict_http_links, str(tmp_path))
+    (paths,) = dict_paths.values()
+    assert len(paths) == len(FILES)
+    for path in paths:
+        assert path.startswith(str(tmp_path / "CMIP6"))
+        assert os.path.isfile(path)
+    # the saved statistics sent every file to the fast node
+    assert slow_ranges == []
+    history = read_host_statistics(statistics_path)
+    assert history[get_host_key(fast_url)]["n_files"] == 0.5 + len(FILES)
+
+
+def test_catalog_to_ranked_replicas_download_http_links(data_nodes, tmp_path):
+    (slow_url, slow_ranges), (fast_url, fast_ranges) = data_nodes
+    dataset_id = "CMIP6.RFMIP.INST.MODEL.piClim-aer.r1i1p1f1.Amon.rsdt.gn.v20190101"
+
+    class FakeIndex:
+        def __init__(self, base_url):
+            self.base_url = base_url
+
+        def get_file_info(self, dataset_ids):
+            assert dataset_ids == [dataset_id + "|slow", dataset_id + "|fast"]
+            return [
+                {
+                    "dataset_id": dataset_id + "|node",
+                    "checksum_type": "SHA256",
+                    "checksum": hashlib.sha256(content).hexdigest(),
+                    "HTTPServer": [self.base_url + path],
+                }
+                for path, content in FILES.items()
+            ]
+
+    class DownIndex:
+        def get_file_info(self, dataset_ids):
+            raise ConnectionError("index down")
+
+    class FakeCatalog:
+        df = pd.DataFrame(
+            {
+                "source_id": ["MODEL"],
+                "experiment_id": ["piClim-aer"],
+                "member_id": ["r1i1p1f1"],
+                "table_id": ["Amon"],
+                "variable_id": ["rsdt"],
+                "grid_label": ["gn"],
+                "id": [[dataset_id + "|slow", dataset_id + "|fast"]],
+            }
+        )
+        indices = [DownIndex(), FakeIndex(slow_url), FakeIndex(fast_url)]
+
+    dict_http_links, dict_checksums, _ = get_catalog_http_links(FakeCatalog())
+    assert list(dict_http_links) == ["MODEL.piClim-aer.r1i1p1f1.Amon.rsdt"]
+    assert len(dict_checksums) == 2 * len(FILES)
+    # the fast node was the best one of the previous runs
+    statistics_path = str(tmp_path / HOST_STATISTICS_FILE_NAME)
+    write_host_statistics(
+        {
+            get_host_key(slow_url): init_host_statistics()
+            | {"n_requests": 1, "n_files": 1, "n_bytes": 1e5, "transfer_seconds": 2.0},
+            get_host_key(fast_url): init_host_statistics()
+            | {"n_requests": 1, "n_files": 1, "n_bytes": 1e5, "transfer_seconds": 0.1},
+        },
+        statistics_path,
+    )
+    (paths,) = download_http_links(
+        dict_http_links, str(tmp_path), dict_checksums=dict_checksums
+    ).values()
+    assert slow_ranges == []
+    assert len(fast_ranges) == len(FILES)
+    for path in paths:
+        with open(path, "rb") as file:
+            assert (
+                file.read()
+                == FILES["thredds/fileServer/" + os.path.relpath(path, tmp_path)]
+            )
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""
+Test library for subset_raw_data.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.load_raw_data.subset_raw_data import (
+    select_year_range,  # to keep a range of years
+    subset_raw_dictionary,  # to restrict the raw data
+    align_areacella_to_dataset,  # areacella on the kept cells
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### TEST MODULE ###
+
+import pytest
+
+########################
+### MADE UP RAW DATA ###
+########################
+
+LAT = np.linspace(-85.0, 85.0, 18)
+
+LON = np.arange(5.0, 360.0, 10.0)
+
+TIME = xr.date_range("1850-01-01", periods=36, freq="MS", use_cftime=True)
+
+RAW = xr.Dataset(
+    {"rsdt": (("time", "lat", "lon"), np.ones((36, LAT.size, LON.size)))},
+    coords={"time": TIME, "lat": LAT, "lon": LON},
+)
+
+AREACELLA = xr.Dataset(
+    {"areacella": (("lat", "lon"), np.outer(np.arange(LAT.size), np.ones(LON.size)))},
+    coords={"lat": LAT, "lon": LON},
+)
+
+###################################
+### TESTS FOR SELECT_YEAR_RANGE ###
+###################################
+
+
+def test_years_are_selected_select_year_range():
+    selected = select_year_range(RAW, (1851, 1852))
+    assert selected["time"].size == 24
+    assert set(selected["time"].dt.year.values) == {1851, 1852}
+
+
+def test_wrong_range_select_year_range():
+    with pytest.raises(ValueError):
+        select_year_range(RAW, (1852, 1851))
+
+
+#######################################
+### TESTS FOR SUBSET_RAW_DICTIONARY ###
+#######################################
+
+
+def test_domain_and_years_subset_raw_dictionary():
+    dict_subset = subset_raw_dictionary(
+        {"A.r1i1p1f1.gn.piClim-control.rsdt": RAW},
+        lat_domain=(60.0, 90.0),
+        year_range=(1850, 1850),
+    )
+    subset = dict_subset["A.r1i1p1f1.gn.piClim-control.rsdt"]
+    assert subset["rsdt"].shape == (12, 3, LON.size)
+    assert subset["lat"].values.min() > 60.0
+
+
+############################################
+### TESTS FOR ALIGN_AREACELLA_TO_DATASET ###
+############################################
+
+
+def test_same_cells_align_areacella_to_dataset():
+    subset = subset_raw_dictionary({"key": RAW}, lat_domain=(60.0, 90.0))["key"]
+    areacella = align_areacella_to_dataset(AREACELLA, subset)
+    assert areacella.shape == (3, LON.size)
+    np.testing.assert_allclose(areacella.values[:, 0], [15, 16, 17])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+"""
+Test library for normalize_units.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.prepare_data.normalize_units import (
+    get_scale_factor,  # scale factor of a variable
+    normalize_variable_units,  # lazy normalization of a variable
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import dask.array as da  # to build lazy data
+
+### TEST MODULE ###
+
+import pytest
+
+#########################
+### MADE UP VARIABLES ###
+#########################
+
+
+def make_dataset(values, units=None):
+    """Dataset holding a clt variable with the given units"""
+
+    dataset = xr.Dataset({"clt": (("time", "lat", "lon"), values)})
+
+    if units is not None:
+        dataset["clt"].attrs["units"] = units
+
+    return dataset
+
+
+CLT_PERCENT = np.full((3, 4, 5), 60.0)
+
+##################################
+### TESTS FOR GET_SCALE_FACTOR ###
+##################################
+
+
+def test_units_attribute_get_scale_factor():
+    assert get_scale_factor(make_dataset(CLT_PERCENT, "%")["clt"], "clt") == 0.01
+    assert get_scale_factor(make_dataset(CLT_PERCENT / 100, "1")["clt"], "clt") == 1.0
+
+
+def test_sampled_fallback_get_scale_factor():
+    assert get_scale_factor(make_dataset(CLT_PERCENT)["clt"], "clt") == 0.01
+    assert get_scale_factor(make_dataset(CLT_PERCENT / 100)["clt"], "clt") == 1.0
+
+
+def test_unknown_variable_get_scale_factor():
+    with pytest.raises(ValueError):
+        get_scale_factor(make_dataset(CLT_PERCENT)["clt"], "tas")
+
+
+##########################################
+### TESTS FOR NORMALIZE_VARIABLE_UNITS ###
+##########################################
+
+
+def test_lazy_normalize_variable_units():
+    dataset = make_dataset(da.from_array(CLT_PERCENT, chunks=(1, 4, 5)), "%")
+    normalized = normalize_variable_units(dataset, "clt")
+    assert isinstance(normalized["clt"].data, da.Array)
+    assert normalized["clt"].attrs["units"] == "1"
+    np.testing.assert_allclose(normalized["clt"].values, 0.6)
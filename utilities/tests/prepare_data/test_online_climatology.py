@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+"""
+Test library for online_climatology.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.prepare_data.online_climatology import (
+    accumulate_file,  # read a file chunk by chunk
+    merge_climatology_accumulators,  # merge partial results
+    finalize_climatology_accumulator,  # climatology of an accumulator
+    streaming_climatology,  # climatology of some files with a saved state
+    get_processed_files,  # files read by an accumulator
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.tools_for_analysis.statistical_tools.temporal_average import (
+    monthly_climatology,  # reference climatology
+)
+
+### TEST MODULE ###
+
+import pytest
+
+#########################
+### MADE UP RAW FILES ###
+#########################
+
+RNG = np.random.default_rng(0)
+
+TIME = xr.date_range(
+    "1850-01-01", periods=48, freq="MS", calendar="standard", use_cftime=True
+)
+
+FULL = xr.Dataset(
+    {"rsut": (("time", "lat", "lon"), RNG.normal(size=(48, 3, 4)))},
+    coords={
+        "time": TIME,
+        "lat": [-45.0, 15.0, 75.0],
+        "lon": [45.0, 135.0, 225.0, 315.0],
+    },
+)
+
+FULL["rsut"][5, 0, 0] = np.nan
+
+
+def write_files(tmp_path, n_years_per_file=2):
+    """Split FULL into yearly files"""
+
+    paths = []
+
+    for start in range(0, 48, 12 * n_years_per_file):
+        path = str(tmp_path / "rsut_{}.nc".format(start))
+        FULL.isel(time=slice(start, start + 12 * n_years_per_file)).to_netcdf(path)
+        paths.append(path)
+
+    return paths
+
+
+###########################################
+### TESTS FOR THE STREAMING CLIMATOLOGY ###
+###########################################
+
+
+def test_same_as_monthly_climatology_streaming_climatology(tmp_path):
+    climatology = streaming_climatology(write_files(tmp_path), "rsut", time_chunk=5)
+    np.testing.assert_allclose(
+        climatology["rsut"].values, monthly_climatology(FULL, "rsut")["rsut"].values
+    )
+
+
+def test_no_file_raised_streaming_climatology(tmp_path):
+    with pytest.raises(ValueError, match="rsut"):
+        streaming_climatology([], "rsut")
+
+
+def test_merged_workers_merge_climatology_accumulators(tmp_path):
+    paths = write_files(tmp_path, n_years_per_file=1)
+    accumulator_a = accumulate_file(None, paths[0], "rsut")
+    accumulator_a = accumulate_file(accumulator_a, paths[1], "rsut")
+    accumulator_b = accumulate_file(None, paths[2], "rsut")
+    accumulator_b = accumulate_file(accumulator_b, paths[3], "rsut")
+    merged = merge_climatology_accumulators([accumulator_a, accumulator_b])
+    assert len(get_processed_files(merged)) == 4
+    np.testing.assert_allclose(
+        finalize_climatology_accumulator(merged)["rsut"].values,
+        monthly_climatology(FULL, "rsut")["rsut"].values,
+    )
+    with pytest.raises(ValueError):
+        merge_climatology_accumulators([accumulator_a, accumulator_a])
+
+
+def test_new_years_are_added_streaming_climatology(tmp_path):
+    paths = write_files(tmp_path, n_years_per_file=1)
+    accumulator_path = str(tmp_path / "state.nc")
+    streaming_climatology(paths[:2], "rsut", accumulator_path=accumulator_path)
+    for path in paths[:2]:
+        xr.Dataset().to_netcdf(path)  # the old files are not read anymore
+    climatology = streaming_climatology(
+        paths, "rsut", accumulator_path=accumulator_path
+    )
+    np.testing.assert_allclose(
+        climatology["rsut"].values, monthly_climatology(FULL, "rsut")["rsut"].values
+    )
+
+
+def test_domain_and_years_accumulate_file(tmp_path):
+    paths = write_files(tmp_path, n_years_per_file=4)
+    accumulator = accumulate_file(
+        None, paths[0], "rsut", lat_domain=(60.0, 90.0), year_range=(1851, 1852)
+    )
+    climatology = finalize_climatology_accumulator(accumulator)
+    reference = monthly_climatology(FULL.isel(time=slice(12, 36), lat=[2]), "rsut")
+    np.testing.assert_allclose(climatology["rsut"].values, reference["rsut"].values)
+
+
+def test_same_name_other_folder_accumulate_file(tmp_path):
+    (tmp_path / "first").mkdir()
+    (tmp_path / "second").mkdir()
+    path_first = str(tmp_path / "first" / "rsut.nc")
+    path_second = str(tmp_path / "second" / "rsut.nc")
+    FULL.isel(time=slice(0, 24)).to_netcdf(path_first)
+    FULL.isel(time=slice(24, 48)).to_netcdf(path_second)
+    accumulator = accumulate_file(None, path_first, "rsut")
+    accumulator = accumulate_file(accumulator, path_second, "rsut")
+    assert get_processed_files(accumulator) == [path_first, path_second]
+    with pytest.raises(ValueError):
+        accumulate_file(accumulator, path_second, "rsut", year_range=(1850, 1850))
+
+
+def test_other_parameters_are_computed_again_streaming_climatology(tmp_path):
+    paths = write_files(tmp_path, n_years_per_file=1)
+    accumulator_path = str(tmp_path / "state.nc")
+    streaming_climatology(
+        paths, "rsut", accumulator_path=accumulator_path, year_range=(1850, 1850)
+    )
+    climatology = streaming_climatology(
+        paths, "rsut", accumulator_path=accumulator_path
+    )
+    np.testing.assert_allclose(
+        climatology["rsut"].values, monthly_climatology(FULL, "rsut")["rsut"].values
+    )
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""
+Test library for producer_consumer.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.prepare_data.producer_consumer import (
+    run_producer_consumer,  # runs the two stages at the same time
+    report_overlap,  # time saved by the overlap
+)
+
+### THREADS ###
+
+import threading
+
+### TEST MODULE ###
+
+import pytest
+
+#######################################
+### TESTS FOR RUN_PRODUCER_CONSUMER ###
+#######################################
+
+
+def test_results_in_order_run_producer_consumer():
+    results = run_producer_consumer(
+        items=range(10),
+        produce=lambda item: item**2,
+        consume=lambda item, produced: (item, produced),
+        max_queued_items=3,
+    )
+    assert results == [(item, item**2) for item in range(10)]
+
+
+def test_queue_bounded_run_producer_consumer():
+    produced_items = []
+    lag = []
+
+    def produce(item):
+        produced_items.append(item)
+        return item
+
+    def consume(item, produced):
+        # let the producer fill the queue before measuring how far ahead it is
+        threading.Event().wait(0.05)
+        lag.append(len(produced_items) - 1 - item)
+        return produced
+
+    run_producer_consumer(range(8), produce, consume, max_queued_items=2)
+
+    # the queued products plus the one being produced
+    assert max(lag) <= 3
+
+
+def test_producer_error_raised_run_producer_consumer():
+    def produce(item):
+        if item == 2:
+            raise RuntimeError("download failed")
+        return item
+
+    with pytest.raises(RuntimeError, match="download failed"):
+        run_producer_consumer(range(5), produce, lambda item, produced: produced)
+
+
+def test_consumer_error_stops_producer_run_producer_consumer():
+    produced_items = []
+
+    def consume(item, produced):
+        raise RuntimeError("computation failed")
+
+    with pytest.raises(RuntimeError, match="computation failed"):
+        run_producer_consumer(
+            range(100), lambda item: produced_items.append(item), consume
+        )
+
+    assert len(produced_items) < 100
+
+
+def test_empty_queue_run_producer_consumer():
+    with pytest.raises(ValueError):
+        run_producer_consumer(
+            range(3), lambda item: item, lambda item, produced: produced, 0
+        )
+
+
+################################
+### TESTS FOR REPORT_OVERLAP ###
+################################
+
+
+def test_saved_time_report_overlap():
+    report = report_overlap(
+        {"download": 6.0, "climatology": 4.0}, elapsed=7.0, verbose=False
+    )
+    assert report == {
+        "elapsed": 7.0,
+        "serial": 10.0,
+        "lower_bound": 6.0,
+        "saved_fraction": 0.3,
+    }
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""
+Test library for domain.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.tools_for_analysis.regridding.domain import (
+    add_missing_coordinate_bounds,  # to add the spatial bounds
+    subset_to_domain,  # to keep only the cells overlapping the domain
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.tools_for_analysis.regridding.separable_conservative import (
+    regrid_fields_separable,  # conservative regridding with separable weights
+)
+
+from utilities.tests.regridding.test_separable_conservative import (
+    make_grid,  # regular global grid with its bounds
+    SOURCE,  # made up source dataset
+)
+
+###############################################
+### TESTS FOR ADD_MISSING_COORDINATE_BOUNDS ###
+###############################################
+
+
+def test_bounds_are_kept_add_missing_coordinate_bounds():
+    dataset = add_missing_coordinate_bounds(SOURCE.drop_vars(["lat_bnds"]))
+    np.testing.assert_allclose(dataset["lat_bnds"], SOURCE["lat_bnds"])
+    xr.testing.assert_identical(dataset["lon_bnds"], SOURCE["lon_bnds"])
+
+
+##################################
+### TESTS FOR SUBSET_TO_DOMAIN ###
+##################################
+
+
+def test_overlapping_cells_subset_to_domain():
+    subset = subset_to_domain(SOURCE, lat_domain=(60.0, 90.0))
+    np.testing.assert_allclose(subset.lat, [60.0, 80.0])
+    assert subset["cld"].shape == (2, 2, 16)
+
+
+def test_periodic_longitudes_subset_to_domain():
+    subset = subset_to_domain(SOURCE, lon_domain=(-30.0, 30.0))
+    np.testing.assert_allclose(subset.lon, [11.25, 33.75, 326.25, 348.75])
+
+
+def test_regional_regridding_matches_global_subset_to_domain():
+    arctic_grid = make_grid(18, 10).sel(lat=slice(60, 90))
+    regridded_global = regrid_fields_separable(
+        SOURCE.drop_vars(["lat_bnds", "lon_bnds"]), ["cld"], arctic_grid
+    )
+    regridded_subset = regrid_fields_separable(
+        subset_to_domain(
+            SOURCE.drop_vars(["lat_bnds", "lon_bnds"]), lat_domain=(60.0, 90.0)
+        ),
+        ["cld"],
+        arctic_grid,
+    )
+    np.testing.assert_allclose(regridded_subset["cld"], regridded_global["cld"])
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+"""
+Test library for polar_equal_area.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.tools_for_analysis.regridding.polar_equal_area import (
+    polar_lambert_forward,  # projection on the polar plane
+    polar_lambert_inverse,  # back to latitudes and longitudes
+    generate_polar_equal_area_grid,  # equal-area polar grid
+    regrid_fields_to_polar_grid,  # regridding with saved weights
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import os  # to check the saved weights
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.tests.regridding.test_separable_conservative import (
+    make_grid,  # regular global grid with its bounds
+)
+
+######################################
+### TESTS FOR THE POLAR PROJECTION ###
+######################################
+
+
+def test_round_trip_polar_lambert_inverse():
+    lat, lon = np.array([60.0, 75.0, 89.0]), np.array([10.0, 200.0, 359.0])
+    lat_back, lon_back = polar_lambert_inverse(*polar_lambert_forward(lat, lon))
+    np.testing.assert_allclose(lat_back, lat)
+    np.testing.assert_allclose(lon_back, lon)
+
+
+def test_cap_area_generate_polar_equal_area_grid():
+    grid = generate_polar_equal_area_grid(resolution_km=50.0, lat_min=60.0)
+    cap_area = 2 * np.pi * (6371.0e3) ** 2 * (1 - np.sin(np.deg2rad(60.0)))
+    area = float(grid["areacella"].where(grid["mask"]).sum())
+    np.testing.assert_allclose(area, cap_area, rtol=1e-2)
+
+
+#############################################
+### TESTS FOR REGRID_FIELDS_TO_POLAR_GRID ###
+#############################################
+
+### MADE UP SOURCE DATASET ###
+
+SOURCE = make_grid(36, 72)
+
+SOURCE["cld"] = (
+    ("time", "lat", "lon"),
+    np.broadcast_to(np.cos(np.deg2rad(SOURCE.lon.values)), (2, 36, 72)).copy(),
+)
+
+POLAR_GRID = generate_polar_equal_area_grid(resolution_km=250.0, lat_min=60.0)
+
+### TESTS ###
+
+
+def test_constant_field_regrid_fields_to_polar_grid(tmp_path):
+    source = SOURCE.copy()
+    source["cld"] = source["cld"] * 0.0 + 2.0
+    regridded = regrid_fields_to_polar_grid(
+        source, ["cld"], POLAR_GRID, str(tmp_path / "weights")
+    )
+    assert regridded["cld"].dims == ("time", "y", "x")
+    np.testing.assert_allclose(regridded["cld"].where(POLAR_GRID["mask"]).max(), 2.0)
+    np.testing.assert_allclose(regridded["cld"].where(POLAR_GRID["mask"]).min(), 2.0)
+    assert np.all(np.isnan(regridded["cld"].values[:, ~POLAR_GRID["mask"].values]))
+
+
+def test_weights_are_saved_and_reused_regrid_fields_to_polar_grid(tmp_path):
+    first = regrid_fields_to_polar_grid(
+        SOURCE, ["cld"], POLAR_GRID, str(tmp_path / "weights")
+    )
+    assert len(os.listdir(tmp_path / "weights")) == 1
+    second = regrid_fields_to_polar_grid(
+        SOURCE, ["cld"], POLAR_GRID, str(tmp_path / "weights")
+    )
+    np.testing.assert_array_equal(first["cld"].values, second["cld"].values)
+
+
+def test_field_follows_longitude_regrid_fields_to_polar_grid(tmp_path):
+    regridded = regrid_fields_to_polar_grid(
+        SOURCE, ["cld"], POLAR_GRID, str(tmp_path / "weights")
+    )
+    expected = np.cos(np.deg2rad(POLAR_GRID.lon.values))
+    in_cap = POLAR_GRID["mask"].values & (POLAR_GRID.lat.values < 85.0)
+    np.testing.assert_allclose(
+        regridded["cld"].values[0][in_cap], expected[in_cap], atol=0.1
+    )
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""
+Test library for regridding_methods.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.tools_for_analysis.regridding.regridding_methods import (
+    regrid_field,  # to regrid a given field
+    generate_the_common_coarse_grid,  # to create the common coarse grid
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.tests.regridding.test_separable_conservative import (
+    make_grid,  # regular global grid with its bounds
+    SOURCE,  # made up source dataset
+    TARGET,  # made up target grid
+)
+
+### TEST MODULE ###
+
+import pytest
+
+##############################
+### TESTS FOR REGRID_FIELD ###
+##############################
+
+
+def test_separable_matches_regrid2_regrid_field():
+    source = SOURCE.copy()
+    source["cld"][:, 2, 3] = np.nan
+    for target in [TARGET, make_grid(5, 7, lon_start=-180.0)]:
+        regrid2 = regrid_field(source, "cld", target, tool="regrid2")
+        separable = regrid_field(source, "cld", target, tool="separable")
+        np.testing.assert_allclose(
+            separable["cld"].values, regrid2["cld"].values, rtol=1e-12, atol=1e-12
+        )
+
+
+def test_unknown_tool_regrid_field():
+    with pytest.raises(ValueError):
+        regrid_field(SOURCE, "cld", TARGET, tool="bilinear")
+
+
+#################################################
+### TESTS FOR GENERATE_THE_COMMON_COARSE_GRID ###
+#################################################
+
+
+def test_arctic_domain_generate_the_common_coarse_grid():
+    grid = generate_the_common_coarse_grid({"A": SOURCE}, lat_domain=(60.0, 90.0))
+    assert grid.lat.values.min() > 60.0
+    np.testing.assert_allclose(grid["lat_bnds"].values[[0, -1], [0, 1]], [60.0, 90.0])
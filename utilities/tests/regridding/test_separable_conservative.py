@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+"""
+Test library for separable_conservative.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.tools_for_analysis.regridding.separable_conservative import (
+    get_coordinate_bounds,  # bounds of the lat and lon coordinates
+    regrid_fields_separable,  # conservative regridding with separable weights
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### TEST MODULE ###
+
+import pytest
+
+###########################
+### BUILD REGULAR GRIDS ###
+###########################
+
+
+def make_grid(n_lat, n_lon, lon_start=0.0):
+    """Regular global grid with its bounds"""
+
+    lat_edges = np.linspace(-90.0, 90.0, n_lat + 1)
+
+    lon_edges = np.linspace(lon_start, lon_start + 360.0, n_lon + 1)
+
+    return xr.Dataset(
+        {
+            "lat_bnds": (("lat", "bnds"), np.stack([lat_edges[:-1], lat_edges[1:]], 1)),
+            "lon_bnds": (("lon", "bnds"), np.stack([lon_edges[:-1], lon_edges[1:]], 1)),
+        },
+        coords={
+            "lat": 0.5 * (lat_edges[:-1] + lat_edges[1:]),
+            "lon": 0.5 * (lon_edges[:-1] + lon_edges[1:]),
+        },
+    )
+
+
+def cell_areas(grid):
+    """Area of the cells of a grid on the unit sphere"""
+
+    lat_bnds = np.deg2rad(grid["lat_bnds"].values)
+
+    lon_bnds = np.deg2rad(grid["lon_bnds"].values)
+
+    return np.outer(
+        np.abs(np.sin(lat_bnds[:, 1]) - np.sin(lat_bnds[:, 0])),
+        np.abs(lon_bnds[:, 1] - lon_bnds[:, 0]),
+    )
+
+
+def area_weighted_mean_reference(source, field, target):
+    """Area-weighted mean of the valid source cells overlapping every target cell, cell by cell"""
+
+    sin_source = np.sin(np.deg2rad(source["lat_bnds"].values))
+
+    sin_target = np.sin(np.deg2rad(target["lat_bnds"].values))
+
+    lon_source = source["lon_bnds"].values
+
+    lon_target = target["lon_bnds"].values
+
+    values = source[field].values
+
+    reference = np.full(values.shape[:-2] + (target.lat.size, target.lon.size), np.nan)
+
+    for jj in range(target.lat.size):
+
+        for ii in range(target.lon.size):
+
+            numerator = np.zeros(values.shape[:-2])
+
+            denominator = np.zeros(values.shape[:-2])
+
+            for ll in range(source.lat.size):
+
+                dlat = min(sin_source[ll, 1], sin_target[jj, 1]) - max(
+                    sin_source[ll, 0], sin_target[jj, 0]
+                )
+
+                for kk in range(source.lon.size):
+
+                    dlon = min(lon_source[kk, 1], lon_target[ii, 1]) - max(
+                        lon_source[kk, 0], lon_target[ii, 0]
+                    )
+
+                    if dlat <= 0 or dlon <= 0:
+
+                        continue
+
+                    cell = values[..., ll, kk]
+
+                    valid = ~np.isnan(cell)
+
+                    numerator += np.where(valid, cell, 0.0) * dlat * dlon
+
+                    denominator += valid * dlat * dlon
+
+            reference[..., jj, ii] = np.where(
+                denominator > 0,
+                numerator / np.where(denominator > 0, denominator, 1),
+                np.nan,
+            )
+
+    return reference
+
+
+### MADE UP SOURCE DATASET ###
+
+SOURCE = make_grid(9, 16)
+
+RNG = np.random.default_rng(0)
+
+SOURCE["cld"] = (("time", "lat", "lon"), RNG.normal(size=(2, 9, 16)))
+
+TARGET = make_grid(4, 6)
+
+#######################################
+### TESTS FOR GET_COORDINATE_BOUNDS ###
+#######################################
+
+
+def test_bounds_from_middle_points_get_coordinate_bounds():
+    dataset = xr.Dataset(coords={"lat": [-60.0, 0.0, 60.0]})
+    np.testing.assert_allclose(
+        get_coordinate_bounds(dataset, "lat"),
+        [[-90.0, -30.0], [-30.0, 30.0], [30.0, 90.0]],
+    )
+
+
+#########################################
+### TESTS FOR REGRID_FIELDS_SEPARABLE ###
+#########################################
+
+
+def test_constant_field_regrid_fields_separable():
+    source = SOURCE.copy()
+    source["cld"] = source["cld"] * 0.0 + 3.0
+    np.testing.assert_allclose(
+        regrid_fields_separable(source, ["cld"], TARGET)["cld"], 3.0
+    )
+
+
+def test_global_integral_is_conserved_regrid_fields_separable():
+    regridded = regrid_fields_separable(SOURCE, ["cld"], TARGET)
+    np.testing.assert_allclose(
+        np.sum(regridded["cld"].values * cell_areas(TARGET), axis=(1, 2)),
+        np.sum(SOURCE["cld"].values * cell_areas(SOURCE), axis=(1, 2)),
+    )
+
+
+def test_longitude_convention_regrid_fields_separable():
+    target_shifted = make_grid(4, 6, lon_start=-180.0)
+    regridded = regrid_fields_separable(SOURCE, ["cld"], TARGET)
+    regridded_shifted = regrid_fields_separable(SOURCE, ["cld"], target_shifted)
+    np.testing.assert_allclose(
+        regridded_shifted["cld"].values,
+        np.roll(regridded["cld"].values, 3, axis=2),
+    )
+
+
+def test_missing_values_are_renormalized_regrid_fields_separable():
+    source = SOURCE.copy()
+    source["cld"] = source["cld"] * 0.0 + 1.0
+    source["cld"][:, 0, :] = np.nan
+    regridded = regrid_fields_separable(source, ["cld"], TARGET)
+    np.testing.assert_allclose(regridded["cld"], 1.0)
+    source["cld"][:, :3, :] = np.nan
+    assert np.all(
+        np.isnan(regrid_fields_separable(source, ["cld"], TARGET)["cld"][:, 0])
+    )
+
+
+def test_matches_area_weighted_mean_regrid_fields_separable():
+    source = SOURCE.copy()
+    source["cld"][:, 2, 3] = np.nan
+    for target in [TARGET, make_grid(5, 7)]:
+        np.testing.assert_allclose(
+            regrid_fields_separable(source, ["cld"], target)["cld"].values,
+            area_weighted_mean_reference(source, "cld", target),
+            rtol=1e-12,
+            atol=1e-12,
+        )
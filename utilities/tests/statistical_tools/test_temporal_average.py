@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+Test library for temporal_average.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.tools_for_analysis.statistical_tools.temporal_average import (
+    is_leap_year,  # leap years of every calendar
+    get_days_per_month,  # days of the months of a time axis
+    monthly_climatology,  # monthly climatology weighted by the days
+    weighted_annual_mean,  # annual mean weighted by the days
+    weighted_annual_mean_ensemble,  # annual mean of the whole ensemble
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### TEST MODULE ###
+
+import pytest
+
+#####################################################
+### TESTS FOR IS_LEAP_YEAR AND GET_DAYS_PER_MONTH ###
+#####################################################
+
+
+@pytest.mark.parametrize(
+    "calendar, expected",
+    [
+        ("noleap", [False, False, False]),
+        ("all_leap", [False, False, False]),
+        ("julian", [True, True, True]),
+        ("proleptic_gregorian", [True, False, True]),
+        ("standard", [True, True, True]),
+    ],
+)
+def test_centuries_is_leap_year(calendar, expected):
+    assert list(is_leap_year(np.array([1200, 1500, 2000]), calendar)) == expected
+
+
+@pytest.mark.parametrize(
+    "calendar, expected",
+    [("noleap", 28), ("360_day", 30), ("all_leap", 29), ("standard", 29)],
+)
+def test_february_2000_get_days_per_month(calendar, expected):
+    time = xr.DataArray(
+        xr.date_range(
+            "2000-01-01", periods=12, freq="MS", calendar=calendar, use_cftime=True
+        ),
+        dims="time",
+    )
+    assert get_days_per_month(time)[1] == expected
+
+
+#####################################
+### TESTS FOR MONTHLY_CLIMATOLOGY ###
+#####################################
+
+### DEFINE A MADE UP TIME SERIES OVER 3 YEARS ###
+
+TIME = xr.date_range(
+    "2000-01-01", periods=36, freq="MS", calendar="standard", use_cftime=True
+)
+
+SERIES = xr.Dataset(
+    {
+        "rsdt": (("time", "lat", "lon"), np.arange(36.0).reshape(36, 1, 1)),
+        "lat_bnds": (("lat", "bnds"), [[-90.0, 90.0]]),
+    },
+    coords={"time": TIME, "lat": [0.0], "lon": [0.0]},
+)
+
+### TESTS ###
+
+
+def test_february_weighted_by_leap_year_monthly_climatology():
+    clim = monthly_climatology(SERIES, "rsdt")
+    expected = (1 * 29 + 13 * 28 + 25 * 28) / (29 + 28 + 28)
+    assert clim["rsdt"].shape == (12, 1, 1)
+    assert "lat_bnds" in clim
+    np.testing.assert_allclose(clim["rsdt"].values[1, 0, 0], expected)
+
+
+def test_missing_values_are_ignored_monthly_climatology():
+    series = SERIES.copy(deep=True)
+    series["rsdt"][0] = np.nan
+    clim = monthly_climatology(series, "rsdt")
+    np.testing.assert_allclose(clim["rsdt"].values[0, 0, 0], 18.0)
+
+
+def test_time_axis_of_year_one_monthly_climatology():
+    clim = monthly_climatology(SERIES, "rsdt")
+    assert list(clim.time.dt.year.values) == [1] * 12
+    assert list(clim.time.dt.month.values) == list(range(1, 13))
+
+
+###########################################
+### TESTS FOR THE WEIGHTED ANNUAL MEANS ###
+###########################################
+
+
+def test_constant_field_weighted_annual_mean():
+    clim = monthly_climatology(SERIES, "rsdt")
+    clim["rsdt"] = clim["rsdt"] * 0.0 + 2.0
+    np.testing.assert_allclose(weighted_annual_mean(clim)["rsdt"], 2.0)
+
+
+def test_ensemble_matches_single_entries_weighted_annual_mean_ensemble():
+    clim_standard = monthly_climatology(SERIES, "rsdt")
+    clim_360_day = clim_standard.assign_coords(
+        time=xr.date_range(
+            "0001-01-01", periods=12, freq="MS", calendar="360_day", use_cftime=True
+        )
+    )
+    clim_wide = clim_standard.reindex(lon=[0.0, 1.0], fill_value=np.nan)
+    dict_clim = {"A": clim_standard, "B": clim_360_day, "C": clim_wide}
+    dict_mean = weighted_annual_mean_ensemble(dict_clim, ["rsdt"])
+    for key in ["A", "B"]:
+        xr.testing.assert_allclose(
+            dict_mean[key]["rsdt"], weighted_annual_mean(dict_clim[key])["rsdt"]
+        )
+    np.testing.assert_allclose(
+        dict_mean["C"]["rsdt"].values, [[dict_mean["A"]["rsdt"].item(), np.nan]]
+    )
+    assert dict_mean["A"]["rsdt"].item() != dict_mean["B"]["rsdt"].item()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+"""
+Test library for artifact_cache.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.store_data.artifact_cache import (
+    collect_garbage,  # to remove the unused entries
+    compute_artifact_key,  # key of an output
+    get_artifact_path,  # folder of an entry
+    get_or_compute,  # to reload or compute an output
+    get_package_source_files,  # source files used by a stage
+    hash_dataset,  # hash of the content of a dataset
+    list_artifacts,  # entries of the cache
+    LAST_USED_FILE_NAME,  # date of use of an entry
+)
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the entries
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### TEST MODULE ###
+
+import pytest
+
+##########################
+### MADE UP STAGE DATA ###
+##########################
+
+
+def make_dataset(value=1.0):
+    """Monthly field on a small grid"""
+
+    return xr.Dataset(
+        {"cld": (("month", "lat", "lon"), np.full((12, 3, 4), value))},
+        coords={
+            "month": np.arange(1, 13),
+            "lat": np.linspace(60, 80, 3),
+            "lon": np.arange(4) * 90.0,
+        },
+    )
+
+
+def scale_stage(dict_datasets, factor):
+    """Made up stage counting its calls"""
+
+    scale_stage.n_calls += 1
+
+    return {key: dataset * factor for key, dataset in dict_datasets.items()}
+
+
+scale_stage.n_calls = 0
+
+##########################
+### TESTS FOR THE KEYS ###
+##########################
+
+
+def test_content_hash_dataset():
+    """The hash depends on the content of the dataset only"""
+
+    assert hash_dataset(make_dataset(1.0)) == hash_dataset(make_dataset(1.0).copy())
+
+    assert hash_dataset(make_dataset(1.0)) != hash_dataset(make_dataset(2.0))
+
+
+def test_lazy_file_hash_dataset(tmp_path):
+    """A dataset lazily opened from a file is hashed from the signature of the file, without reading its data"""
+
+    path = str(tmp_path / "clim.nc")
+
+    make_dataset(1.0).to_netcdf(path)
+
+    with xr.open_dataset(path) as dataset:
+
+        first_hash = hash_dataset(dataset)
+
+        assert not dataset["cld"].variable._in_memory
+
+    with xr.open_dataset(path) as dataset:
+
+        assert hash_dataset(dataset) == first_hash
+
+    make_dataset(2.0).to_netcdf(path)
+
+    os.utime(path, ns=(0, 10**9))
+
+    with xr.open_dataset(path) as dataset:
+
+        assert hash_dataset(dataset) != first_hash
+
+
+def test_helpers_get_package_source_files():
+    """The source files of the modules used by a stage are part of its code version"""
+
+    source_names = [
+        os.path.basename(path) for path in get_package_source_files(get_or_compute)
+    ]
+
+    assert "artifact_cache.py" in source_names
+
+    assert "dict_netcdf_transform.py" in source_names
+
+    assert "grid_catalog.py" in source_names
+
+
+def test_parameters_compute_artifact_key():
+    """The key changes with the parameters, the input datasets and the code"""
+
+    parameters = {"dict_datasets": {"A": make_dataset()}, "fields": ["cld"]}
+
+    key = compute_artifact_key("mean", parameters, "v1")
+
+    assert key == compute_artifact_key(
+        "mean", {"fields": ["cld"], "dict_datasets": {"A": make_dataset()}}, "v1"
+    )
+
+    assert key != compute_artifact_key("mean", parameters, "v2")
+
+    assert key != compute_artifact_key(
+        "mean", parameters | {"dict_datasets": {"A": make_dataset(2.0)}}, "v1"
+    )
+
+    assert key != compute_artifact_key(
+        "mean", parameters | {"fields": ["sfc_alb"]}, "v1"
+    )
+
+
+############################
+### TESTS FOR THE LOOKUP ###
+############################
+
+
+def test_reload_get_or_compute(tmp_path):
+    """The second call reloads the stored output without computing it"""
+
+    cache_root = str(tmp_path / "cache")
+
+    parameters = {"dict_datasets": {"A.r1i1p1f1.gn": make_dataset()}, "factor": 2.0}
+
+    scale_stage.n_calls = 0
+
+    computed, key = get_or_compute(cache_root, "scale", scale_stage, parameters)
+
+    reloaded, same_key = get_or_compute(cache_root, "scale", scale_stage, parameters)
+
+    assert scale_stage.n_calls == 1
+
+    assert same_key == key
+
+    xr.testing.assert_allclose(
+        reloaded["A.r1i1p1f1.gn"].load(), computed["A.r1i1p1f1.gn"]
+    )
+
+    ## No temporary folder is left ##
+
+    assert os.listdir(os.path.join(cache_root, "scale")) == [key]
+
+    ## Other parameters give another entry ##
+
+    get_or_compute(cache_root, "scale", scale_stage, parameters | {"factor": 3.0})
+
+    assert scale_stage.n_calls == 2
+
+
+def test_without_grid_get_or_compute(tmp_path):
+    """A product without lat and lon (ex: a global time series) is cached as well"""
+
+    parameters = {
+        "dict_datasets": {
+            "A": xr.Dataset(
+                {"erf": (("month",), np.arange(12.0))},
+                coords={"month": np.arange(1, 13)},
+            )
+        },
+        "factor": 2.0,
+    }
+
+    scale_stage.n_calls = 0
+
+    get_or_compute(str(tmp_path / "cache"), "scale", scale_stage, parameters)
+
+    reloaded, _ = get_or_compute(
+        str(tmp_path / "cache"), "scale", scale_stage, parameters
+    )
+
+    assert scale_stage.n_calls == 1
+
+    assert float(reloaded["A"]["erf"].max()) == 22.0
+
+
+def test_relocated_get_or_compute(tmp_path):
+    """An entry can be reloaded after the cache is moved (ex: mounted elsewhere for another user)"""
+
+    parameters = {"dict_datasets": {"A": make_dataset()}, "factor": 2.0}
+
+    _, key = get_or_compute(str(tmp_path / "cache"), "scale", scale_stage, parameters)
+
+    os.rename(tmp_path / "cache", tmp_path / "moved")
+
+    scale_stage.n_calls = 0
+
+    reloaded, _ = get_or_compute(
+        str(tmp_path / "moved"), "scale", scale_stage, parameters
+    )
+
+    assert scale_stage.n_calls == 0
+
+    assert float(reloaded["A"]["cld"].max()) == 2.0
+
+
+def test_chained_stages_get_or_compute(tmp_path):
+    """A stage fed by the output of another one keeps the same key from the first run on"""
+
+    cache_root = str(tmp_path / "cache")
+
+    scale_stage.n_calls = 0
+
+    list_keys = []
+
+    for _ in range(3):
+
+        dict_a, key_a = get_or_compute(
+            cache_root,
+            "scale_a",
+            scale_stage,
+            {"dict_datasets": {"A": make_dataset()}, "factor": 2.0},
+        )
+
+        _, key_b = get_or_compute(
+            cache_root, "scale_b", scale_stage, {"dict_datasets": dict_a, "factor": 3.0}
+        )
+
+        list_keys.append((key_a, key_b))
+
+    assert list_keys == [list_keys[0]] * 3
+
+    assert scale_stage.n_calls == 2
+
+
+########################################
+### TESTS FOR THE GARBAGE COLLECTION ###
+########################################
+
+
+def test_unused_collect_garbage(tmp_path):
+    """The entries unused for too long are removed first, then the least recently used ones until the budget is met"""
+
+    cache_root = str(tmp_path / "cache")
+
+    keys = [
+        get_or_compute(
+            cache_root,
+            "scale",
+            scale_stage,
+            {"dict_datasets": {"A": make_dataset()}, "factor": factor},
+        )[1]
+        for factor in [1.0, 2.0, 3.0]
+    ]
+
+    ## Last uses 30, 10 and 1 days ago ##
+
+    now = 1e9
+
+    for key, days in zip(keys, [30, 10, 1]):
+
+        last_used_path = os.path.join(
+            get_artifact_path(cache_root, "scale", key), LAST_USED_FILE_NAME
+        )
+
+        os.utime(last_used_path, (now - days * 86400, now - days * 86400))
+
+    removed = collect_garbage(cache_root, max_unused_days=20, now=now)
+
+    assert removed == [get_artifact_path(cache_root, "scale", keys[0])]
+
+    ## The budget keeps only the most recently used entry ##
+
+    n_bytes = list_artifacts(cache_root)["n_bytes"].iloc[-1]
+
+    removed = collect_garbage(cache_root, byte_budget=n_bytes, now=now)
+
+    assert removed == [get_artifact_path(cache_root, "scale", keys[1])]
+
+    assert list_artifacts(cache_root)["key"].to_list() == [keys[2]]
+
+    with pytest.raises(ValueError):
+
+        collect_garbage(cache_root, byte_budget=-1)
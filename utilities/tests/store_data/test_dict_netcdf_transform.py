@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+"""
+Test library for dict_netcdf_transform.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+    append_variables_to_netcdf,  # to add the new variables to a saved file
+    dict_to_netcdf,  # to save the made up climatologies
+    get_missing_variables,  # variables not saved yet for every entry
+    netcdf_to_dict,  # to reload the saved climatologies
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### TEST MODULE ###
+
+import pytest
+
+#############################
+### MADE UP CLIMATOLOGIES ###
+#############################
+
+
+def make_climatology(variables, value=1.0, n_lat=3):
+    """Climatology of some variables on a small grid"""
+
+    return xr.Dataset(
+        {
+            variable: (("month", "lat", "lon"), np.full((12, n_lat, 4), value))
+            for variable in variables
+        }
+        | {"areacella": (("lat", "lon"), np.ones((n_lat, 4)))},
+        coords={
+            "month": np.arange(1, 13),
+            "lat": np.linspace(60, 80, n_lat),
+            "lon": np.arange(4) * 90.0,
+        },
+        attrs={"source": "saved"},
+    )
+
+
+DICT_CLIM = {
+    "A.r1i1p1f1.gn.piClim-control": make_climatology(["rsdt", "rsut"]),
+    "A.r1i1p1f1.gn.piClim-aer": make_climatology(["rsdt"]),
+}
+
+###################################
+### TESTS FOR THE NEW VARIABLES ###
+###################################
+
+
+def test_missing_per_key_get_missing_variables(tmp_path):
+    dict_to_netcdf(DICT_CLIM, str(tmp_path))
+    assert get_missing_variables(str(tmp_path), ["rsdt", "rsut", "rlut"]) == {
+        "A.r1i1p1f1.gn.piClim-control": ["rlut"],
+        "A.r1i1p1f1.gn.piClim-aer": ["rsut", "rlut"],
+    }
+
+
+def test_saved_variables_kept_append_variables_to_netcdf(tmp_path):
+    dict_to_netcdf(DICT_CLIM, str(tmp_path))
+    path = str(tmp_path / "A_r1i1p1f1_gn_piClim-aer" / "A_r1i1p1f1_gn_piClim-aer.nc")
+    appended_variables = append_variables_to_netcdf(
+        make_climatology(["rsdt", "rsut"], value=2.0).assign_attrs(source="new"), path
+    )
+    assert appended_variables == ["rsut"]
+    dataset = netcdf_to_dict(str(tmp_path))["A.r1i1p1f1.gn.piClim-aer"]
+    # the saved variable and attributes are not written again
+    assert float(dataset["rsdt"].max()) == 1.0
+    assert float(dataset["rsut"].min()) == 2.0
+    assert dataset.attrs["source"] == "saved"
+    assert append_variables_to_netcdf(make_climatology(["rsut"]), path) == []
+
+
+def test_other_grid_raised_append_variables_to_netcdf(tmp_path):
+    dict_to_netcdf(DICT_CLIM, str(tmp_path))
+    path = str(tmp_path / "A_r1i1p1f1_gn_piClim-aer" / "A_r1i1p1f1_gn_piClim-aer.nc")
+    with pytest.raises(ValueError):
+        append_variables_to_netcdf(make_climatology(["rlut"], n_lat=5), path)
+    with pytest.raises(ValueError):
+        append_variables_to_netcdf(
+            make_climatology(["rlut"]).assign_coords(lat=[61.0, 70.0, 80.0]), path
+        )
+
+
+##################################
+### TESTS FOR THE SAVED TABLES ###
+##################################
+
+
+def test_without_grid_dict_to_netcdf(tmp_path):
+    """The datasets without lat and lon (ex: a global time series) are saved without grid catalog"""
+
+    dict_series = {
+        "A.r1i1p1f1.gn.piClim-aer": xr.Dataset(
+            {"erf": (("month",), np.arange(12.0))},
+            coords={"month": np.arange(1, 13)},
+        )
+    }
+
+    dict_to_netcdf(dict_series, str(tmp_path / "series"))
+
+    xr.testing.assert_allclose(
+        netcdf_to_dict(str(tmp_path / "series"))["A.r1i1p1f1.gn.piClim-aer"].load(),
+        dict_series["A.r1i1p1f1.gn.piClim-aer"],
+    )
+
+    assert not (tmp_path / "series" / "table" / "grid_catalog.pkl").exists()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""
+Test library for grid_catalog.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.store_data.grid_catalog import (
+    compute_grid_hash,  # hash of a grid
+    write_grid_catalog,  # to save the catalog
+    read_grid_catalog,  # to load the catalog
+    get_unique_grids,  # light datasets of the distinct grids
+    group_keys_by_grid,  # keys of the entries of every grid
+    keep_only_grid,  # the grid of a dataset without its data
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### TEST MODULE ###
+
+import pytest
+
+##########################
+### MADE UP DICTIONARY ###
+##########################
+
+
+def make_entry(n_lat, n_lon):
+    """Dataset with a cld field on a regular global grid"""
+
+    return xr.Dataset(
+        {"cld": (("time", "lat", "lon"), np.ones((2, n_lat, n_lon)))},
+        coords={
+            "lat": np.linspace(-90.0, 90.0, 2 * n_lat + 1)[1::2],
+            "lon": np.linspace(0.0, 360.0, 2 * n_lon + 1)[1::2],
+        },
+    )
+
+
+DICT_ENTRIES = {
+    "MODEL-A.r1i1p1f1.gn": make_entry(6, 12),
+    "MODEL-A.r2i1p1f1.gn": make_entry(6, 12),
+    "MODEL-B.r1i1p1f1.gn": make_entry(4, 8),
+}
+
+###################################
+### TESTS FOR COMPUTE_GRID_HASH ###
+###################################
+
+
+def test_same_grid_same_hash_compute_grid_hash():
+    assert compute_grid_hash(DICT_ENTRIES["MODEL-A.r1i1p1f1.gn"]) == compute_grid_hash(
+        DICT_ENTRIES["MODEL-A.r2i1p1f1.gn"]
+    )
+    assert compute_grid_hash(DICT_ENTRIES["MODEL-A.r1i1p1f1.gn"]) != compute_grid_hash(
+        DICT_ENTRIES["MODEL-B.r1i1p1f1.gn"]
+    )
+
+
+##########################################################
+### TESTS FOR WRITE_GRID_CATALOG AND READ_GRID_CATALOG ###
+##########################################################
+
+
+def test_round_trip_write_grid_catalog(tmp_path):
+    write_grid_catalog(DICT_ENTRIES, str(tmp_path))
+    grid_catalog = read_grid_catalog(str(tmp_path))
+    assert list(grid_catalog["key"]) == list(DICT_ENTRIES.keys())
+    assert list(grid_catalog["n_lat"]) == [6, 6, 4]
+    np.testing.assert_allclose(grid_catalog["lat_bnds"][2][0], [-90.0, -45.0])
+
+
+#########################################################
+### TESTS FOR GET_UNIQUE_GRIDS AND GROUP_KEYS_BY_GRID ###
+#########################################################
+
+
+def test_entries_grouped_group_keys_by_grid(tmp_path):
+    write_grid_catalog(DICT_ENTRIES, str(tmp_path))
+    grid_catalog = read_grid_catalog(str(tmp_path))
+    dict_keys_per_grid = group_keys_by_grid(grid_catalog)
+    assert sorted(len(keys) for keys in dict_keys_per_grid.values()) == [1, 2]
+    dict_grids = get_unique_grids(grid_catalog)
+    assert set(dict_grids.keys()) == set(dict_keys_per_grid.keys())
+    for grid_hash, grid in dict_grids.items():
+        assert compute_grid_hash(grid) == grid_hash
+
+
+################################
+### TESTS FOR KEEP_ONLY_GRID ###
+################################
+
+
+def test_data_dropped_keep_only_grid():
+    grid = keep_only_grid(DICT_ENTRIES["MODEL-B.r1i1p1f1.gn"])
+    assert len(grid.data_vars) == 0
+    assert compute_grid_hash(grid) == compute_grid_hash(
+        DICT_ENTRIES["MODEL-B.r1i1p1f1.gn"]
+    )
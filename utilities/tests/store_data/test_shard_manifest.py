@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+"""
+Test library for shard_manifest.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.get_cmip6_data.store_data.shard_manifest import (
+    get_shard_path,  # save folder of a shard
+    merge_shard_manifests,  # to combine the tables of the shards
+    read_shard_manifest,  # manifest of a shard
+    remove_shard_manifest,  # to tell that a shard restarted
+    select_shard_entries,  # entries of a shard
+    write_shard_manifest,  # to tell that a shard finished
+)
+
+### FILE MANAGEMENT ###
+
+import os  # to handle the paths of the shards
+
+### PARALLELIZATION ###
+
+from concurrent.futures import ProcessPoolExecutor  # to run the shards as processes
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import pandas as pd  # to alter the table of a shard
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+    dict_to_netcdf,  # to save the climatologies of a shard
+    netcdf_to_dict,  # to reload the merged climatologies
+)
+
+from utilities.get_cmip6_data.store_data.grid_catalog import (
+    read_grid_catalog,  # to read the merged grid catalog
+)
+
+### TEST MODULE ###
+
+import pytest
+
+#####################################
+### MADE UP CLIMATOLOGIES TO SAVE ###
+#####################################
+
+ENTRIES = ["{}.r1i1p1f1.gn".format(model) for model in "ABCDEFG"]
+
+EXPERIMENTS = ["piClim-control", "piClim-aer"]
+
+
+def make_climatology(value):
+    """Monthly field on a small grid"""
+
+    return xr.Dataset(
+        {"rsdt": (("month", "lat", "lon"), np.full((12, 2, 3), value))},
+        coords={
+            "month": np.arange(1, 13),
+            "lat": [60.0, 70.0],
+            "lon": [0.0, 120.0, 240.0],
+        },
+    )
+
+
+DICT_CLIM = {
+    "{}.{}".format(entry, experiment): make_climatology(float(index))
+    for index, (entry, experiment) in enumerate(
+        (entry, experiment) for entry in ENTRIES for experiment in EXPERIMENTS
+    )
+}
+
+
+def run_shard(parent_path_for_save, shard_index, shard_count):
+    """Saves the climatologies of the entries of a shard, as a task of a job array would"""
+
+    shard_entries = select_shard_entries(ENTRIES, shard_index, shard_count)
+
+    dict_to_netcdf(
+        {
+            key: dataset
+            for key, dataset in DICT_CLIM.items()
+            if key.rsplit(".", 1)[0] in shard_entries
+        },
+        get_shard_path(parent_path_for_save, shard_index, shard_count),
+    )
+
+    return write_shard_manifest(parent_path_for_save, shard_index, shard_count)
+
+
+##########################################
+### TESTS FOR THE PARTITION OF ENTRIES ###
+##########################################
+
+
+def test_partition_select_shard_entries():
+    """Every entry is given to a single shard, whatever the order of the search"""
+
+    list_shards = [select_shard_entries(ENTRIES, index, 3) for index in range(3)]
+
+    assert sorted(sum(list_shards, [])) == ENTRIES
+
+    assert [
+        sorted(select_shard_entries(ENTRIES[::-1], index, 3)) for index in range(3)
+    ] == [sorted(shard) for shard in list_shards]
+
+    assert select_shard_entries(ENTRIES, 0, 1) == ENTRIES
+
+    with pytest.raises(ValueError):
+
+        select_shard_entries(ENTRIES, 3, 3)
+
+
+################################
+### TESTS FOR THE MERGE STEP ###
+################################
+
+
+def test_processes_merge_shard_manifests(tmp_path):
+    """Shards run as local processes are merged into the table read by netcdf_to_dict"""
+
+    parent_path_for_save = str(tmp_path / "climatologies")
+
+    with ProcessPoolExecutor(max_workers=3) as pool:
+
+        list(pool.map(run_shard, [parent_path_for_save] * 3, range(3), [3] * 3))
+
+    merged_table = merge_shard_manifests(parent_path_for_save, 3)
+
+    assert sorted(merged_table["key"]) == sorted(DICT_CLIM.keys())
+
+    assert not any(os.path.isabs(path) for path in merged_table["path"])
+
+    ## The merged climatologies are the saved ones ##
+
+    dict_merged = netcdf_to_dict(parent_path_for_save)
+
+    assert sorted(dict_merged.keys()) == sorted(DICT_CLIM.keys())
+
+    for key, dataset in DICT_CLIM.items():
+
+        xr.testing.assert_allclose(dict_merged[key].load(), dataset)
+
+    assert len(read_grid_catalog(parent_path_for_save)) == len(DICT_CLIM)
+
+    ## The manifest records the entries and keys of its shard ##
+
+    manifest = read_shard_manifest(get_shard_path(parent_path_for_save, 1, 3))
+
+    assert manifest["entries"] == sorted(select_shard_entries(ENTRIES, 1, 3))
+
+    assert len(manifest["keys"]) == len(EXPERIMENTS) * len(manifest["entries"])
+
+
+def test_unfinished_shard_merge_shard_manifests(tmp_path):
+    """The merge fails while a shard has not written its manifest"""
+
+    parent_path_for_save = str(tmp_path / "climatologies")
+
+    run_shard(parent_path_for_save, 0, 2)
+
+    with pytest.raises(ValueError):
+
+        merge_shard_manifests(parent_path_for_save, 2)
+
+    run_shard(parent_path_for_save, 1, 2)
+
+    assert len(merge_shard_manifests(parent_path_for_save, 2)) == len(DICT_CLIM)
+
+
+def test_restarted_shard_merge_shard_manifests(tmp_path):
+    """The manifest of a previous run does not stand for a restarted shard"""
+
+    parent_path_for_save = str(tmp_path / "climatologies")
+
+    for shard_index in range(2):
+
+        run_shard(parent_path_for_save, shard_index, 2)
+
+    remove_shard_manifest(parent_path_for_save, 1, 2)
+
+    with pytest.raises(ValueError):
+
+        merge_shard_manifests(parent_path_for_save, 2)
+
+
+def test_altered_table_merge_shard_manifests(tmp_path):
+    """The merge fails when the table of a shard is not the one of its manifest"""
+
+    parent_path_for_save = str(tmp_path / "climatologies")
+
+    for shard_index in range(2):
+
+        run_shard(parent_path_for_save, shard_index, 2)
+
+    table_path = os.path.join(
+        get_shard_path(parent_path_for_save, 1, 2), "table", "key_paths_table.pkl"
+    )
+
+    pd.read_pickle(table_path).iloc[1:].to_pickle(table_path)
+
+    with pytest.raises(ValueError):
+
+        merge_shard_manifests(parent_path_for_save, 2)
+
+
+def test_stale_grid_catalog_merge_shard_manifests(tmp_path):
+    """The merged grid catalog of a previous merge is removed when no shard has one"""
+
+    parent_path_for_save = str(tmp_path / "climatologies")
+
+    for shard_index in range(2):
+
+        run_shard(parent_path_for_save, shard_index, 2)
+
+    merge_shard_manifests(parent_path_for_save, 2)
+
+    ## Only one shard with a grid catalog : the merged one holds its grids ##
+
+    os.remove(
+        os.path.join(
+            get_shard_path(parent_path_for_save, 0, 2), "table", "grid_catalog.pkl"
+        )
+    )
+
+    merge_shard_manifests(parent_path_for_save, 2)
+
+    assert sorted(read_grid_catalog(parent_path_for_save)["key"]) == sorted(
+        read_shard_manifest(get_shard_path(parent_path_for_save, 1, 2))["keys"]
+    )
+
+    ## No shard with a grid catalog ##
+
+    os.remove(
+        os.path.join(
+            get_shard_path(parent_path_for_save, 1, 2), "table", "grid_catalog.pkl"
+        )
+    )
+
+    merge_shard_manifests(parent_path_for_save, 2)
+
+    assert not os.path.exists(
+        os.path.join(parent_path_for_save, "table", "grid_catalog.pkl")
+    )
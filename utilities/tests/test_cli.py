@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+"""
+Test library for cli.py
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+### MODULE TO BE TESTED ###
+
+from utilities.cli import (
+    build_parser,  # options of the command line
+    get_climatology_status,  # are the climatologies up to date ?
+    get_product_paths,  # folders of the products
+    get_run_parameters,  # parameters the climatologies depend on
+    run_merge,  # to merge the outputs of the shards
+    main,  # to run the pipeline
+    get_shard_from_environment,  # shard of a SLURM array task
+    select_shard_stages,  # stages of a shard or of the merging job
+    select_stages,  # stages to run in order
+    write_run_parameters,  # to save the parameters next to the climatologies
+    CLIMATOLOGY_MISSING,
+    CLIMATOLOGY_OUTDATED,
+    CLIMATOLOGY_PARTIAL,
+    CLIMATOLOGY_UP_TO_DATE,
+)
+
+from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+    dict_to_netcdf,  # to save the made up climatologies
+)
+
+from utilities.get_cmip6_data.store_data.shard_manifest import (
+    get_shard_path,  # save folder of a shard
+    write_shard_manifest,  # to tell that a shard finished
+)
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import xarray as xr  # to manage the data
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+### TEST MODULE ###
+
+import pytest
+
+#############################
+### TESTS FOR THE OPTIONS ###
+#############################
+
+
+def test_order_select_stages():
+    """The stages run in the order of the pipeline whatever the requested order"""
+
+    assert select_stages(["tables", "climatology"]) == ["climatology", "tables"]
+
+    assert select_stages(["all"]) == [
+        "load",
+        "climatology",
+        "aprp",
+        "merge",
+        "regrid",
+        "tables",
+    ]
+
+    with pytest.raises(ValueError):
+
+        select_stages(["plots"])
+
+
+def test_options_build_parser(tmp_path):
+    """The options of a batch run are read and the products are laid out as in the notebooks"""
+
+    arguments = build_parser().parse_args(
+        [
+            "--stages",
+            "aprp",
+            "regrid",
+            "--aprp-workers",
+            "8",
+            "--lat-domain",
+            "60",
+            "90",
+            "--data-path",
+            str(tmp_path),
+        ]
+    )
+
+    assert arguments.stages == ["aprp", "regrid"]
+
+    assert arguments.aprp_workers == 8
+
+    assert arguments.lat_domain == [60.0, 90.0]
+
+    dict_paths = get_product_paths(arguments)
+
+    assert dict_paths["climatologies"] == str(tmp_path / "CMIP6-DATA" / "climatologies")
+
+    assert dict_paths["artifact_cache"] == str(tmp_path / "artifact_cache")
+
+    with pytest.raises(SystemExit):
+
+        build_parser().parse_args(["--stages", "plots"])
+
+
+def test_slurm_get_shard_from_environment(monkeypatch):
+    """The shard is the rank of the task in the SLURM job array"""
+
+    monkeypatch.delenv("SLURM_ARRAY_TASK_ID", raising=False)
+
+    assert get_shard_from_environment() == (None, 1)
+
+    monkeypatch.setenv("SLURM_ARRAY_TASK_ID", "5")
+
+    monkeypatch.setenv("SLURM_ARRAY_TASK_MIN", "4")
+
+    monkeypatch.setenv("SLURM_ARRAY_TASK_COUNT", "3")
+
+    assert get_shard_from_environment() == (1, 3)
+
+    arguments = build_parser().parse_args([])
+
+    assert (arguments.shard_index, arguments.shard_count) == (1, 3)
+
+
+def test_not_contiguous_get_shard_from_environment(monkeypatch):
+    """The task ids of a stepped or sparse job array are not the ranks of the tasks"""
+
+    monkeypatch.setenv("SLURM_ARRAY_TASK_ID", "4")
+
+    monkeypatch.setenv("SLURM_ARRAY_TASK_MIN", "0")
+
+    monkeypatch.setenv("SLURM_ARRAY_TASK_MAX", "6")
+
+    monkeypatch.setenv("SLURM_ARRAY_TASK_COUNT", "4")
+
+    monkeypatch.setenv("SLURM_ARRAY_TASK_STEP", "2")
+
+    with pytest.raises(ValueError):
+
+        get_shard_from_environment()
+
+    ## Sparse array : --array=0,4,6 ##
+
+    monkeypatch.delenv("SLURM_ARRAY_TASK_STEP")
+
+    monkeypatch.setenv("SLURM_ARRAY_TASK_COUNT", "3")
+
+    with pytest.raises(ValueError):
+
+        get_shard_from_environment()
+
+    ## The shard is then given explicitly ##
+
+    with pytest.raises(SystemExit):
+
+        main(["--stages", "climatology"])
+
+    arguments = build_parser().parse_args(["--shard-index", "1", "--shard-count", "3"])
+
+    assert (arguments.shard_index, arguments.shard_count) == (1, 3)
+
+
+def test_shards_select_shard_stages():
+    """The shards run the stages of their entries and the merging job the following ones"""
+
+    stages = select_stages(["all"])
+
+    assert select_shard_stages(stages, 2, 4) == ["load", "climatology", "aprp"]
+
+    assert select_shard_stages(stages, None, 4) == ["merge", "regrid", "tables"]
+
+    assert "merge" not in select_shard_stages(stages, None, 1)
+
+
+##########################################
+### TESTS FOR THE STATUS OF THE STAGES ###
+##########################################
+
+
+def test_status_get_climatology_status(tmp_path):
+    """The climatologies are missing, partial or up to date given the variables of the case"""
+
+    parent_path_clim = str(tmp_path / "climatologies")
+
+    assert get_climatology_status(parent_path_clim, ["rsdt"]) == CLIMATOLOGY_MISSING
+
+    dict_to_netcdf(
+        {
+            "A.r1i1p1f1.gn.piClim-control": xr.Dataset(
+                {"rsdt": (("month", "lat", "lon"), np.ones((12, 2, 3)))},
+                coords={
+                    "month": np.arange(1, 13),
+                    "lat": [60.0, 70.0],
+                    "lon": [0.0, 120.0, 240.0],
+                },
+            )
+        },
+        parent_path_clim,
+    )
+
+    assert get_climatology_status(parent_path_clim, ["rsdt"]) == CLIMATOLOGY_UP_TO_DATE
+
+    assert (
+        get_climatology_status(parent_path_clim, ["rsdt", "rsut"])
+        == CLIMATOLOGY_PARTIAL
+    )
+
+
+def test_run_parameters_get_climatology_status(tmp_path):
+    """The climatologies saved with other run parameters are outdated"""
+
+    parent_path_clim = str(tmp_path / "climatologies")
+
+    dict_to_netcdf(
+        {
+            "A.r1i1p1f1.gn.piClim-control": xr.Dataset(
+                {"rsdt": (("month", "lat", "lon"), np.ones((12, 2, 3)))},
+                coords={
+                    "month": np.arange(1, 13),
+                    "lat": [60.0, 70.0],
+                    "lon": [0.0, 120.0, 240.0],
+                },
+            )
+        },
+        parent_path_clim,
+    )
+
+    run_parameters = get_run_parameters(
+        build_parser().parse_args(["--lat-domain", "60", "90"])
+    )
+
+    ## Saved without parameters ##
+
+    assert (
+        get_climatology_status(parent_path_clim, ["rsdt"], run_parameters)
+        == CLIMATOLOGY_OUTDATED
+    )
+
+    write_run_parameters(parent_path_clim, run_parameters)
+
+    assert (
+        get_climatology_status(parent_path_clim, ["rsdt"], run_parameters)
+        == CLIMATOLOGY_UP_TO_DATE
+    )
+
+    ## Another domain ##
+
+    assert (
+        get_climatology_status(
+            parent_path_clim,
+            ["rsdt"],
+            get_run_parameters(build_parser().parse_args(["--lat-domain", "70", "90"])),
+        )
+        == CLIMATOLOGY_OUTDATED
+    )
+
+
+def test_merged_shards_get_climatology_status(tmp_path):
+    """The climatologies merged from the shards are up to date for a run without shards"""
+
+    parent_path_clim = str(tmp_path / "climatologies")
+
+    run_parameters = get_run_parameters(
+        build_parser().parse_args(["--lat-domain", "60", "90"])
+    )
+
+    ## Every shard saves its climatologies and its parameters ##
+
+    for shard_index, model in enumerate(["A", "B"]):
+
+        shard_path = get_shard_path(parent_path_clim, shard_index, 2)
+
+        dict_to_netcdf(
+            {
+                "{}.r1i1p1f1.gn.piClim-control".format(model): xr.Dataset(
+                    {"rsdt": (("month", "lat", "lon"), np.ones((12, 2, 3)))},
+                    coords={
+                        "month": np.arange(1, 13),
+                        "lat": [60.0, 70.0],
+                        "lon": [0.0, 120.0, 240.0],
+                    },
+                )
+            },
+            shard_path,
+        )
+
+        write_shard_manifest(parent_path_clim, shard_index, 2)
+
+        write_run_parameters(shard_path, run_parameters)
+
+    run_merge(
+        build_parser().parse_args(["--shard-count", "2"]),
+        {"climatologies": parent_path_clim, "aprp": str(tmp_path / "aprp")},
+    )
+
+    assert (
+        get_climatology_status(parent_path_clim, ["rsdt"], run_parameters)
+        == CLIMATOLOGY_UP_TO_DATE
+    )
@@ -0,0 +1,757 @@
+#!/usr/bin/env python3
+
+"""
+This submodule drives the APRP computation for the whole ensemble of climatologies saved on disk. The entries are distributed across a pool of processes
+and every worker applies the vectorized APRP method to its batch of entries.
+
+The result of every entry is saved through the same storage layer as the climatologies. It is associated to a hash of the two input climatology files
+so that a new call (ex: after a restart of the notebook) reuses the results whose inputs did not change instead of recomputing them.
+
+Several perturbed experiments can be computed against the same control experiment : the control climatology of an entry is then opened
+and treated once by the worker in charge of this entry.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### LOAD AND NAVIGATE THROUGH THE DATA ###
+
+import os  # to check the existence of the saved files and count the cpus
+
+import shutil  # to remove the outdated outputs
+
+import time  # to measure the makespan of the pool
+
+### PARALLEL COMPUTATION ###
+
+from concurrent.futures import ProcessPoolExecutor  # pool of processes
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd  # to handle the table of the saved entries
+
+import xarray as xr  # to manage the data
+
+### HOMEMADE LIBRARIES ###
+
+## Storage layer ##
+
+from utilities.get_cmip6_data.store_data.dict_netcdf_transform import (
+    save_one_entry_to_netcdf,  # to save the APRP output of one entry
+    read_key_paths_table,  # to read the tables of the saved entries
+    write_key_paths_table,  # to write the table of the saved APRP entries
+)
+
+from utilities.get_cmip6_data.store_data.grid_catalog import (
+    read_grid_catalog,  # to know the size of the grid of every entry
+)
+
+from utilities.get_cmip6_data.store_data.hash_files import (
+    hash_files,  # to identify the input climatologies
+)
+
+from utilities.get_cmip6_data.store_data.shard_manifest import (
+    select_shard_entries,  # entries of a shard
+    get_shard_path,  # save folder of a shard
+    remove_shard_manifest,  # to tell that a shard restarted
+    write_shard_manifest,  # to tell that a shard finished
+)
+
+## Handle the climatology dictionary ##
+
+from utilities.tools_for_analysis.handle_entries.extract_entries_names import (
+    get_entries_only_from_clim_dict,  # to extract the entries' names
+)
+
+## Schedule the entries between the workers ##
+
+from utilities.tools_for_analysis.handle_entries.schedule_entries import (
+    get_costs_from_grid_catalog,  # cost of every entry from its grid
+    schedule_longest_first,  # longest-processing-time-first batches
+    run_timed,  # to measure the duration of every batch
+    split_batch_seconds,  # duration of every entry of a batch
+    report_makespan,  # to report the achieved makespan
+)
+
+## APRP method ##
+
+from utilities.tools_for_analysis.aprp_computation.aprp_vectorized import (
+    aprp_ensemble_multi_experiments,  # APRP for a batch of entries and experiments at once
+)
+
+###########################################################
+### FIND THE ENTRIES AND THE PATHS OF THEIR EXPERIMENTS ###
+###########################################################
+
+
+def get_entries_input_paths(
+    parent_path_clim: str,
+    control_experiment: str = "piClim-control",
+    perturbed_experiments: list[str] | None = None,
+) -> dict[str, dict[str, str]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the table of the saved climatologies and associates every entry holding the control experiment
+    to the paths of its control and perturbed climatology files. Only the perturbed experiments available for the entry are kept.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory where the climatologies were saved
+
+    CONTROL_EXPERIMENT : STR | the experiment used as the control state : default is piClim-control
+
+    PERTURBED_EXPERIMENTS : LIST[STR] | the experiments used as perturbed states : default is none ([piClim-aer])
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_INPUT_PATHS : DICT OF DICT OF STR | the paths of the climatology files of every experiment of every entry
+
+    ---
+
+    """
+
+    if perturbed_experiments is None:
+
+        perturbed_experiments = ["piClim-aer"]
+
+    ### READ THE TABLE OF THE CLIMATOLOGIES ###
+
+    key_paths_table = read_key_paths_table(parent_path_clim)
+
+    dict_key_path = dict(zip(key_paths_table["key"], key_paths_table["path"]))
+
+    ### GENERATE THE UNIQUE LIST OF ENTRIES ###
+
+    entries = sorted(
+        set(get_entries_only_from_clim_dict(key) for key in dict_key_path.keys())
+    )
+
+    ### KEEP THE EXPERIMENTS AVAILABLE FOR THE ENTRIES HOLDING THE CONTROL ###
+
+    dict_input_paths = {
+        entry: {
+            experiment: dict_key_path[entry + "." + experiment]
+            for experiment in [control_experiment] + perturbed_experiments
+            if entry + "." + experiment in dict_key_path
+        }
+        for entry in entries
+        if entry + "." + control_experiment in dict_key_path
+    }
+
+    return dict_input_paths
+
+
+########################################
+### ESTIMATE THE COST OF EVERY ENTRY ###
+########################################
+
+
+def estimate_aprp_costs(
+    parent_path_clim: str,
+    tasks_to_compute: list[tuple[str, str]],
+    dict_input_paths: dict[str, dict[str, str]],
+    control_experiment: str = "piClim-control",
+) -> dict[str, float]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function estimates the cost of the APRP computation of every entry : the number of cells of its grid, taken from the grid catalog
+    of the climatologies, times the number of months times the number of climatologies opened (the control and the perturbed experiments to compute).
+    Without grid catalog, the size of the input files is used instead. An entry missing from the grid catalog is assumed as expensive
+    as the most expensive known one, as in order_longest_first, so that it is not left as a straggler.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory where the climatologies were saved
+
+    TASKS_TO_COMPUTE : LIST OF TUPLES[STR, STR] | the (entry, experiment) couples to compute
+
+    DICT_INPUT_PATHS : DICT OF DICT OF STR | the paths of the climatology files of every experiment of every entry
+
+    CONTROL_EXPERIMENT : STR | the experiment used as the control state : default is piClim-control
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_COSTS : DICT | the estimated cost of every entry to compute
+
+    ---
+
+    """
+
+    ### NUMBER OF CLIMATOLOGIES OPENED FOR EVERY ENTRY ###
+
+    dict_n_experiments = {}
+
+    for entry, _ in tasks_to_compute:
+
+        dict_n_experiments[entry] = dict_n_experiments.get(entry, 1) + 1
+
+    ### COST OF ONE CLIMATOLOGY ###
+
+    if os.path.lexists(parent_path_clim + "/table/grid_catalog.pkl"):
+
+        grid_catalog = read_grid_catalog(parent_path_clim)
+
+        dict_unit_costs = get_costs_from_grid_catalog(
+            grid_catalog[grid_catalog["key"].str.endswith("." + control_experiment)]
+        )
+
+    else:
+
+        dict_unit_costs = {
+            entry: float(os.path.getsize(dict_input_paths[entry][control_experiment]))
+            for entry in dict_n_experiments
+        }
+
+    default_cost = max(dict_unit_costs.values(), default=0.0)
+
+    dict_costs = {
+        entry: dict_unit_costs.get(entry, default_cost) * n_experiments
+        for entry, n_experiments in dict_n_experiments.items()
+    }
+
+    return dict_costs
+
+
+###########################################
+### COMPUTE AND SAVE A BATCH OF ENTRIES ###
+###########################################
+
+
+def compute_and_save_aprp_batch(
+    batch: list[tuple[str, str, str, str, str]],
+    dict_save_paths: dict[str, str],
+) -> list[tuple[str, str, str, str]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function is run by every worker of the pool. It opens the climatologies of a batch of entries, applies the vectorized APRP method
+    to the whole batch and saves the output of every entry in a folder suffixed by the hash of its inputs. The control climatology of an entry
+    is opened and treated once whatever the number of perturbed experiments computed for this entry.
+
+    ---
+
+    ### INPUTS ###
+
+    BATCH : LIST OF TUPLES[STR, STR, STR, STR, STR] | the (entry, control path, perturbed experiment, perturbed path, input hash) of every task of the batch
+
+    DICT_SAVE_PATHS : DICT OF STR | the directory where the APRP outputs of every perturbed experiment are saved
+
+    ---
+
+    ### OUTPUTS ###
+
+    LIST_SAVED : LIST OF TUPLES[STR, STR, STR, STR] | the (perturbed experiment, entry, saved path, input hash) of every task of the batch
+
+    ---
+
+    """
+
+    ### OPEN THE CLIMATOLOGIES OF THE BATCH ###
+
+    dict_clim = {}
+
+    dict_entries = {}
+
+    for entry, path_control, experiment, path_perturbed, _ in batch:
+
+        ## The control is opened once per entry ##
+
+        if entry + ".control" not in dict_clim:
+
+            dict_clim[entry + ".control"] = xr.open_dataset(path_control).load()
+
+        ## Perturbed experiment ##
+
+        dict_clim[entry + "." + experiment] = xr.open_dataset(path_perturbed).load()
+
+        dict_entries.setdefault(experiment, []).append(entry)
+
+    ### APPLY THE APRP METHOD TO THE WHOLE BATCH ###
+
+    dict_aprp_per_experiment = aprp_ensemble_multi_experiments(
+        dict_clim=dict_clim,
+        dict_entries=dict_entries,
+        control_experiment="control",
+    )
+
+    ### SAVE EVERY ENTRY ###
+
+    list_saved = [
+        (
+            experiment,
+            entry,
+            save_one_entry_to_netcdf(
+                dataset=dict_aprp_per_experiment[experiment][entry],
+                key=entry,
+                parent_path_for_save=dict_save_paths[experiment],
+                folder_suffix="_" + input_hash[:16],
+            ),
+            input_hash,
+        )
+        for entry, _, experiment, _, input_hash in batch
+    ]
+
+    return list_saved
+
+
+#################################################
+### LOAD THE TABLE OF THE PREVIOUS APRP CALLS ###
+#################################################
+
+
+def read_previous_aprp_table(parent_path_for_save: str) -> pd.DataFrame:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function loads the table of the APRP outputs saved at parent_path_for_save by a previous call. An empty table is returned if there is none.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory where the APRP outputs are saved
+
+    ---
+
+    ### OUTPUTS ###
+
+    PREVIOUS_TABLE : PANDAS DATAFRAME | the table with the "key", "path" and "input_hash" columns
+
+    ---
+
+    """
+
+    if os.path.lexists(parent_path_for_save + "/table/key_paths_table.pkl"):
+
+        previous_table = read_key_paths_table(parent_path_for_save)
+
+    else:
+
+        previous_table = pd.DataFrame({"key": [], "path": [], "input_hash": []})
+
+    return previous_table
+
+
+######################################################
+### DRIVE THE APRP COMPUTATION OF SOME EXPERIMENTS ###
+######################################################
+
+
+def run_aprp_driver(
+    parent_path_clim: str,
+    dict_save_paths: dict[str, str],
+    n_workers: int | None = None,
+    control_experiment: str = "piClim-control",
+    verbose: bool = True,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> dict[str, dict[str, xr.Dataset]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the APRP method for every entry of the climatologies saved at parent_path_clim and every perturbed experiment
+    given as a key of dict_save_paths. The results of every experiment are saved at the associated path. The (entry, experiment) couples
+    whose input climatologies did not change since the last call are not computed again : their saved output is reused.
+    The other ones are grouped by entry and split into batches computed in parallel by a pool of processes. The entries are given to the batches
+    from the most expensive (grid size x experiments) with the longest-processing-time-first rule, and the achieved makespan is reported.
+    With several shards, only the entries of the shard are computed and saved in its own folders (see shard_manifest.py).
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory where the climatologies were saved
+
+    DICT_SAVE_PATHS : DICT OF STR | the directory where the APRP outputs of every perturbed experiment are saved
+
+    N_WORKERS : INT | number of processes of the pool : default is the number of cpus
+
+    CONTROL_EXPERIMENT : STR | the experiment used as the control state : default is piClim-control
+
+    VERBOSE : BOOL | do we display the number of computed and reused entries ? : default is True
+
+    SHARD_INDEX : INT | the index of the shard run by this process (ex: the SLURM array task id) : default is 0
+
+    SHARD_COUNT : INT | the number of shards : default is 1 (no sharding)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_APRP_PER_EXPERIMENT : DICT OF DICT OF XR DATASETS | the APRP fields of every entry (of the shard) for every experiment, lazily opened from the saved files
+
+    ---
+
+    """
+
+    ### INITIALIZATION ###
+
+    ## Number of workers ##
+
+    if n_workers is None:
+
+        n_workers = os.cpu_count()
+
+    ## Retrieve the input paths of every entry ##
+
+    perturbed_experiments = list(dict_save_paths.keys())
+
+    dict_input_paths = get_entries_input_paths(
+        parent_path_clim=parent_path_clim,
+        control_experiment=control_experiment,
+        perturbed_experiments=perturbed_experiments,
+    )
+
+    ## Keep the entries of the shard, saved in its own folders ##
+
+    shard_entries = select_shard_entries(
+        list(dict_input_paths.keys()), shard_index, shard_count
+    )
+
+    dict_input_paths = {entry: dict_input_paths[entry] for entry in shard_entries}
+
+    dict_merged_save_paths = dict_save_paths
+
+    dict_save_paths = {
+        experiment: get_shard_path(save_path, shard_index, shard_count)
+        for experiment, save_path in dict_merged_save_paths.items()
+    }
+
+    ## The manifests of a previous run must not be merged with this one ##
+
+    if shard_count > 1:
+
+        for save_path in dict_merged_save_paths.values():
+
+            remove_shard_manifest(save_path, shard_index, shard_count)
+
+    ## Hash the inputs of every (entry, experiment) couple ##
+
+    dict_input_hash = {
+        (entry, experiment): hash_files(
+            [paths[control_experiment], paths[experiment]],
+            extra_strings=[control_experiment, experiment],
+        )
+        for entry, paths in dict_input_paths.items()
+        for experiment in perturbed_experiments
+        if experiment in paths
+    }
+
+    ### LOOK FOR THE COUPLES ALREADY COMPUTED ###
+
+    ## Load the tables of the previous calls ##
+
+    dict_previous_tables = {
+        experiment: read_previous_aprp_table(dict_save_paths[experiment])
+        for experiment in perturbed_experiments
+    }
+
+    ## Keep the rows whose inputs did not change and whose file still exists ##
+
+    dict_cached = {
+        (row.key, experiment): (row.path, row.input_hash)
+        for experiment, previous_table in dict_previous_tables.items()
+        for row in previous_table.itertuples()
+        if dict_input_hash.get((row.key, experiment)) == row.input_hash
+        and os.path.exists(row.path)
+    }
+
+    ## Couples left to compute ##
+
+    tasks_to_compute = [
+        task for task in dict_input_hash.keys() if task not in dict_cached
+    ]
+
+    if verbose:
+
+        print(
+            "{} entries reused from the cache, {} entries to compute...\n".format(
+                len(dict_cached), len(tasks_to_compute)
+            )
+        )
+
+    ### COMPUTE THE MISSING COUPLES ###
+
+    ## Set of the couples left to compute, for the lookups of the batches ##
+
+    set_tasks_to_compute = set(tasks_to_compute)
+
+    ## Split the entries into one batch per worker, longest first : the experiments of an entry stay together ##
+
+    entries_to_compute = list(dict.fromkeys(entry for entry, _ in tasks_to_compute))
+
+    dict_costs = estimate_aprp_costs(
+        parent_path_clim=parent_path_clim,
+        tasks_to_compute=tasks_to_compute,
+        dict_input_paths=dict_input_paths,
+        control_experiment=control_experiment,
+    )
+
+    entries_batches = schedule_longest_first(
+        entries_to_compute, dict_costs, n_workers=max(n_workers, 1)
+    )
+
+    batches = [
+        [
+            (
+                entry,
+                dict_input_paths[entry][control_experiment],
+                experiment,
+                dict_input_paths[entry][experiment],
+                dict_input_hash[(entry, experiment)],
+            )
+            for entry in entries_batch
+            for experiment in perturbed_experiments
+            if (entry, experiment) in set_tasks_to_compute
+        ]
+        for entries_batch in entries_batches
+    ]
+
+    ## Run the batches ##
+
+    start_time = time.perf_counter()
+
+    if n_workers == 1 or len(batches) <= 1:
+
+        timed_results = [
+            run_timed(compute_and_save_aprp_batch, batch, dict_save_paths)
+            for batch in batches
+        ]
+
+    else:
+
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+
+            timed_results = list(
+                pool.map(
+                    run_timed,
+                    [compute_and_save_aprp_batch] * len(batches),
+                    batches,
+                    [dict_save_paths] * len(batches),
+                )
+            )
+
+    results = [result for result, _ in timed_results]
+
+    if verbose and batches:
+
+        report_makespan(
+            task_seconds=split_batch_seconds(
+                entries_batches, dict_costs, [seconds for _, seconds in timed_results]
+            ),
+            n_workers=1 if n_workers == 1 or len(batches) <= 1 else n_workers,
+            makespan=time.perf_counter() - start_time,
+        )
+
+    dict_computed = {
+        (entry, experiment): (path, input_hash)
+        for batch_result in results
+        for experiment, entry, path, input_hash in batch_result
+    }
+
+    dict_saved = dict_cached | dict_computed
+
+    ### UPDATE THE OUTPUTS OF EVERY EXPERIMENT ###
+
+    dict_aprp_per_experiment = {}
+
+    ## Paths of the outputs kept, shared by every experiment ##
+
+    saved_paths = {path for path, _ in dict_saved.values()}
+
+    for experiment, previous_table in dict_previous_tables.items():
+
+        ## Remove the outdated outputs of the recomputed entries ##
+
+        for row in previous_table.itertuples():
+
+            if row.path not in saved_paths and os.path.exists(row.path):
+
+                shutil.rmtree(os.path.dirname(row.path))
+
+        ## Save the table of the APRP outputs ##
+
+        list_keys = sorted(key for key, exp in dict_saved.keys() if exp == experiment)
+
+        key_paths_table = pd.DataFrame(
+            {
+                "key": list_keys,
+                "path": [dict_saved[(key, experiment)][0] for key in list_keys],
+                "input_hash": [dict_saved[(key, experiment)][1] for key in list_keys],
+            }
+        )
+
+        write_key_paths_table(
+            key_paths_table=key_paths_table,
+            parent_path_for_save=dict_save_paths[experiment],
+            do_we_clear=False,
+        )
+
+        ## Load the output dictionary ##
+
+        dict_aprp_per_experiment[experiment] = {
+            key: xr.open_dataset(dict_saved[(key, experiment)][0]) for key in list_keys
+        }
+
+    ### THE SHARD TELLS IT FINISHED ###
+
+    if shard_count > 1:
+
+        for save_path in dict_merged_save_paths.values():
+
+            write_shard_manifest(save_path, shard_index, shard_count, shard_entries)
+
+    return dict_aprp_per_experiment
+
+
+######################################
+### APRP FOR ALL THE SAVED ENTRIES ###
+######################################
+
+
+def compute_aprp_for_all_entries(
+    parent_path_clim: str,
+    parent_path_for_save: str,
+    n_workers: int | None = None,
+    control_experiment: str = "piClim-control",
+    perturbed_experiment: str = "piClim-aer",
+    verbose: bool = True,
+) -> dict[str, xr.Dataset]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the APRP method for every entry of the climatologies saved at parent_path_clim and saves the results at
+    parent_path_for_save. The entries whose input climatologies did not change since the last call are not computed again : their
+    saved output is reused. The other entries are split into batches computed in parallel by a pool of processes.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory where the climatologies were saved
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory where the APRP outputs are saved
+
+    N_WORKERS : INT | number of processes of the pool : default is the number of cpus
+
+    CONTROL_EXPERIMENT : STR | the experiment used as the control state : default is piClim-control
+
+    PERTURBED_EXPERIMENT : STR | the experiment used as the perturbed state : default is piClim-aer
+
+    VERBOSE : BOOL | do we display the number of computed and reused entries ? : default is True
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_APRP : DICT OF XR DATASETS | the APRP fields of every entry, lazily opened from the saved files
+
+    ---
+
+    """
+
+    dict_aprp = run_aprp_driver(
+        parent_path_clim=parent_path_clim,
+        dict_save_paths={perturbed_experiment: parent_path_for_save},
+        n_workers=n_workers,
+        control_experiment=control_experiment,
+        verbose=verbose,
+    )[perturbed_experiment]
+
+    return dict_aprp
+
+
+######################################################
+### APRP FOR ALL THE SAVED ENTRIES AND EXPERIMENTS ###
+######################################################
+
+
+def compute_aprp_for_all_experiments(
+    parent_path_clim: str,
+    parent_path_for_save: str,
+    perturbed_experiments: list[str],
+    n_workers: int | None = None,
+    control_experiment: str = "piClim-control",
+    verbose: bool = True,
+) -> dict[str, dict[str, xr.Dataset]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the APRP method of several perturbed experiments (ex: piClim-aer, piClim-BC, piClim-SO2, piClim-OC) against the same
+    control experiment for every entry of the climatologies saved at parent_path_clim. The outputs of every experiment are saved in the
+    sub-folder of parent_path_for_save named after the experiment. The control side of the computation is done once per entry.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory where the climatologies were saved
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory where the APRP outputs are saved
+
+    PERTURBED_EXPERIMENTS : LIST[STR] | the experiments used as perturbed states
+
+    N_WORKERS : INT | number of processes of the pool : default is the number of cpus
+
+    CONTROL_EXPERIMENT : STR | the experiment used as the control state : default is piClim-control
+
+    VERBOSE : BOOL | do we display the number of computed and reused entries ? : default is True
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_APRP_PER_EXPERIMENT : DICT OF DICT OF XR DATASETS | the APRP fields of every entry for every perturbed experiment
+
+    ---
+
+    """
+
+    dict_aprp_per_experiment = run_aprp_driver(
+        parent_path_clim=parent_path_clim,
+        dict_save_paths={
+            experiment: parent_path_for_save + "/" + experiment
+            for experiment in perturbed_experiments
+        },
+        n_workers=n_workers,
+        control_experiment=control_experiment,
+        verbose=verbose,
+    )
+
+    return dict_aprp_per_experiment
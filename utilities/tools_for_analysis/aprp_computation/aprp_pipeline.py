@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+
+"""
+This submodule chains the different stages of the analysis of the APRP outputs : the APRP computation, the time average, the regridding on the common grid
+and the average over a region. The time average and the conservative regridding are both linear : averaging before regridding gives the same maps while
+regridding 12 times less fields. A planner sets the order of the stages given the requested product and only keeps the monthly path when it is needed
+(ex: seasonal cycles) or when the masked points of a field change along the year.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### FILE MANAGEMENT ###
+
+import os  # to check if the grid catalog exists
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+### HOMEMADE LIBRARIES ###
+
+## APRP method ##
+
+from utilities.tools_for_analysis.aprp_computation.aprp_driver import (
+    compute_aprp_for_all_entries,  # APRP for all the saved entries with a cache
+)
+
+from utilities.tools_for_analysis.aprp_computation.aprp_vectorized import (
+    APRP_OUTPUT_FIELDS,  # fields produced by the method
+)
+
+## Regridding ##
+
+from utilities.tools_for_analysis.regridding.regridding_methods import (
+    generate_the_common_coarse_grid,  # to create the common coarse grid
+    generate_the_common_coarse_grid_from_catalog,  # to create it from the grid catalog only
+    regridding_a_dictionary,  # to regrid the aprp dictionary
+)
+
+from utilities.tools_for_analysis.regridding.polar_equal_area import (
+    generate_polar_equal_area_grid,  # to create the equal-area polar grid
+    regridding_a_dictionary_to_polar_grid,  # to regrid the aprp dictionary on the polar grid
+)
+
+## Grids of the saved entries ##
+
+from utilities.get_cmip6_data.store_data.grid_catalog import (
+    read_grid_catalog,  # grids recorded with the climatologies
+)
+
+## Statistical tools ##
+
+from utilities.tools_for_analysis.statistical_tools.temporal_average import (
+    weighted_annual_mean_ensemble,  # annual mean of the whole ensemble
+)
+
+from utilities.tools_for_analysis.statistical_tools.spatial_average import (
+    region_average_given_field,  # average over a latitude band
+)
+
+########################################
+### PRODUCTS HANDLED BY THE PIPELINE ###
+########################################
+
+TEMPORAL_PRODUCTS = [
+    "annual",  # one map per entry averaged over the year
+    "monthly",  # the 12 monthly maps per entry (ex: for seasonal cycles)
+]
+
+################################################
+### DOES THE MASK OF THE FIELDS VARY IN TIME ###
+################################################
+
+
+def mask_varies_in_time(
+    dict_datasets: dict[str, xr.Dataset], fields: list[str]
+) -> bool:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function checks if the missing values of a field are located at different points from one month to another for at least one entry.
+    In this case the regridding, which renormalizes by the valid area, is no longer linear in time and can not be swapped with the time average.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_DATASETS : DICT OF XR DATASETS | the monthly datasets
+
+    FIELDS : LIST[STR] | the fields to check
+
+    ---
+
+    ### OUTPUTS ###
+
+    MASK_VARIES : BOOL | True if the mask of one field changes along the time axis
+
+    ---
+
+    """
+
+    for dataset in dict_datasets.values():
+
+        for field in fields:
+
+            valid = np.isfinite(dataset[field].transpose("time", ...).values)
+
+            if np.any(valid != valid[0]):
+
+                return True
+
+    return False
+
+
+#######################################
+### PLAN THE STAGES OF THE PIPELINE ###
+#######################################
+
+
+def plan_aprp_pipeline(
+    temporal_product: str = "annual", mask_varies: bool = False
+) -> list[str]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function sets the order of the stages of the APRP pipeline. For an annual product the time average is moved before the regridding
+    since both are linear, unless the mask of the fields varies in time. For a monthly product there is no time average.
+
+    ---
+
+    ### INPUTS ###
+
+    TEMPORAL_PRODUCT : STR | the requested product, one of TEMPORAL_PRODUCTS : default is annual
+
+    MASK_VARIES : BOOL | does the mask of the fields vary in time ? : default is False
+
+    ---
+
+    ### OUTPUTS ###
+
+    STAGES : LIST[STR] | the ordered stages among "aprp", "time_mean", "regrid" and "region_average"
+
+    ---
+
+    """
+
+    ### CHECK THE REQUESTED PRODUCT ###
+
+    if temporal_product not in TEMPORAL_PRODUCTS:
+
+        raise ValueError(
+            "{} -> The temporal product must be one of {}".format(
+                temporal_product, TEMPORAL_PRODUCTS
+            )
+        )
+
+    ### ORDER THE STAGES ###
+
+    ## Monthly path ##
+
+    if temporal_product == "monthly":
+
+        stages = ["aprp", "regrid", "region_average"]
+
+    ## Annual path with a mask varying in time : the time average can not be moved ##
+
+    elif mask_varies:
+
+        stages = ["aprp", "regrid", "time_mean", "region_average"]
+
+    ## Annual path : average first, regrid 12 times less fields ##
+
+    else:
+
+        stages = ["aprp", "time_mean", "regrid", "region_average"]
+
+    return stages
+
+
+##################################
+### RUN THE FULL APRP PIPELINE ###
+##################################
+
+
+def run_aprp_pipeline(
+    parent_path_clim: str,
+    parent_path_for_save: str,
+    fields: list[str] | None = None,
+    temporal_product: str = "annual",
+    lat_min: float = 60.0,
+    lat_max: float = 90.0,
+    regridding_tool: str = "separable",
+    regrid_only_region: bool = True,
+    polar_resolution_km: float | None = None,
+    n_workers: int | None = None,
+    control_experiment: str = "piClim-control",
+    perturbed_experiment: str = "piClim-aer",
+    verbose: bool = True,
+) -> tuple[dict[str, xr.Dataset], dict[str, dict[str, np.ndarray]]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function runs the APRP method for every saved entry, then reduces the outputs into maps on the common coarse grid and into averages over
+    a latitude band. The order of the linear stages is given by plan_aprp_pipeline. If the climatologies were saved with their grid catalog,
+    the common coarse grid is computed from it before any data is opened.
+
+    ---
+
+    ### INPUTS ###
+
+    PARENT_PATH_CLIM : STR | path of the directory where the climatologies were saved
+
+    PARENT_PATH_FOR_SAVE : STR | path of the directory where the APRP outputs are saved
+
+    FIELDS : LIST[STR] | the APRP fields to reduce : default is none (all of them)
+
+    TEMPORAL_PRODUCT : STR | the requested product, one of TEMPORAL_PRODUCTS : default is annual
+
+    LAT_MIN : FLOAT | southern limit of the averaging region : default is 60.0
+
+    LAT_MAX : FLOAT | northern limit of the averaging region : default is 90.0
+
+    REGRIDDING_TOOL : STR | the regridding backend, one of REGRIDDING_TOOLS : default is separable
+
+    REGRID_ONLY_REGION : BOOL | do we restrict the common grid and the regridding to the latitude band ? : default is True
+
+    POLAR_RESOLUTION_KM : FLOAT | if given, the maps are produced on the equal-area polar grid of this resolution covering the cap north of lat_min
+    (lat_max is then 90) instead of the common coarse grid : default is none
+
+    N_WORKERS : INT | number of processes of the APRP pool : default is the number of cpus
+
+    CONTROL_EXPERIMENT : STR | the experiment used as the control state : default is piClim-control
+
+    PERTURBED_EXPERIMENT : STR | the experiment used as the perturbed state : default is piClim-aer
+
+    VERBOSE : BOOL | do we display the planned stages ? : default is True
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_MAPS : DICT OF XR DATASETS | the regridded maps of every entry (annual or monthly)
+
+    DICT_REGION_AVG : DICT OF DICT OF NUMPY ARRAYS | the average of every field over the region for every entry
+
+    ---
+
+    """
+
+    if fields is None:
+
+        fields = list(APRP_OUTPUT_FIELDS)
+
+    ### THE COMMON GRID ONLY DEPENDS ON THE NATIVE GRIDS AND THE DOMAIN ###
+
+    lat_domain = (lat_min, lat_max) if regrid_only_region else None
+
+    path_grid_catalog = parent_path_clim + "/table/grid_catalog.pkl"
+
+    if polar_resolution_km is None and os.path.exists(path_grid_catalog):
+
+        common_coarse_grid = generate_the_common_coarse_grid_from_catalog(
+            read_grid_catalog(parent_path_clim),
+            lat_domain=lat_domain or (-90.0, 90.0),
+        )
+
+    ### APRP STAGE ###
+
+    dict_aprp = compute_aprp_for_all_entries(
+        parent_path_clim=parent_path_clim,
+        parent_path_for_save=parent_path_for_save,
+        n_workers=n_workers,
+        control_experiment=control_experiment,
+        perturbed_experiment=perturbed_experiment,
+        verbose=verbose,
+    )
+
+    ### PLAN THE NEXT STAGES ###
+
+    stages = plan_aprp_pipeline(
+        temporal_product=temporal_product,
+        mask_varies=(temporal_product == "annual")
+        and mask_varies_in_time(dict_aprp, fields),
+    )
+
+    if verbose:
+
+        print("Planned stages : {}\n".format(" -> ".join(stages)))
+
+    ## Without catalog the common grid is read from the APRP outputs ##
+
+    if polar_resolution_km is None and not os.path.exists(path_grid_catalog):
+
+        common_coarse_grid = generate_the_common_coarse_grid(
+            dict_aprp, lat_domain=lat_domain or (-90.0, 90.0)
+        )
+
+    ## Or the equal-area polar grid ##
+
+    elif polar_resolution_km is not None:
+
+        polar_grid = generate_polar_equal_area_grid(
+            resolution_km=polar_resolution_km, lat_min=lat_min
+        )
+
+    ### RUN THE STAGES ###
+
+    dict_current = dict_aprp
+
+    for stage in stages[1:]:
+
+        ## Weighted annual mean ##
+
+        if stage == "time_mean":
+
+            dict_current = weighted_annual_mean_ensemble(dict_current, fields)
+
+        ## Regridding on the common grid ##
+
+        elif stage == "regrid" and polar_resolution_km is None:
+
+            dict_current = regridding_a_dictionary(
+                dictionary_to_be_regridded=dict_current,
+                fields_to_be_regridded=fields,
+                output_grid=common_coarse_grid,
+                tool=regridding_tool,
+                lat_domain=lat_domain,
+            )
+
+        ## Regridding on the polar grid with the weights saved next to the APRP outputs ##
+
+        elif stage == "regrid":
+
+            dict_current = regridding_a_dictionary_to_polar_grid(
+                dictionary_to_be_regridded=dict_current,
+                fields_to_be_regridded=fields,
+                polar_grid=polar_grid,
+                weights_path=parent_path_for_save + "/polar_weights",
+            )
+
+        ## Average over the region ##
+
+        elif stage == "region_average":
+
+            dict_region_avg = {
+                key: {
+                    field: region_average_given_field(
+                        field=field,
+                        dataset=dataset,
+                        lat_min=lat_min,
+                        lat_max=lat_max,
+                    )
+                    for field in fields
+                }
+                for key, dataset in dict_current.items()
+            }
+
+    dict_maps = dict_current
+
+    return dict_maps, dict_region_avg
@@ -0,0 +1,1002 @@
+#!/usr/bin/env python3
+
+"""
+This submodule holds a vectorized implementation of the APRP method (approximate partial radiative perturbation) devised by Taylor and al. (2007).
+The single-layer model is evaluated on numpy arrays of any shape so that the whole ensemble can be processed in one set of ufunc calls :
+the fields of every entry (entry x month x lat x lon) are flattened and concatenated before the computation and split back afterwards.
+
+The clear-sky / overcast special cases (no sunlight, no cloud) are handled with masks and np.where instead of python branching.
+
+References :
+
+Taylor, K. E. et al. (2007), Estimating shortwave radiative forcing and response in climate models, J. Clim., 20(11), 2530-2543, doi:10.1175/JCLI4143.1.
+
+Zelinka, M. D., Smith, C. J., Qin, Y., and Taylor, K. E.: Comparison of methods to estimate aerosol effective radiative forcings in climate models,
+Atmos. Chem. Phys., 23, 8879–8898, https://doi.org/10.5194/acp-23-8879-2023, 2023.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+### TYPE HINTS FOR FUNCTIONS ###
+
+from numpy.typing import NDArray  # type hints for numpy
+
+##########################################
+### DEFINE THE VARIABLES OF THE METHOD ###
+##########################################
+
+### SHORT-WAVE VARIABLES NEEDED BY THE APRP METHOD ###
+
+APRP_INPUT_VARIABLES = [
+    "clt",
+    "rsdt",
+    "rsut",
+    "rsutcs",
+    "rsds",
+    "rsus",
+    "rsdscs",
+    "rsuscs",
+]
+
+### FIELDS PRODUCED BY THE APRP METHOD ###
+
+APRP_OUTPUT_FIELDS = [
+    "cld",
+    "sfc_alb",
+    "sfc_alb_clr",
+    "sfc_alb_oc",
+    "noncld",
+    "noncld_scat",
+    "noncld_abs",
+    "cld_amt",
+    "cld_scat",
+    "cld_abs",
+]
+
+### THRESHOLDS ###
+
+## Below this incoming flux (W m-2) there is no sunlight : the forcing is set to 0 ##
+
+RSDT_MIN = 0.1
+
+## Below this cloud fraction the overcast quantities are not defined : the cloud is considered as transparent ##
+
+CLT_MIN = 1e-3
+
+## Below this value a denominator is considered null ##
+
+EPSILON = 1e-10
+
+##############################################
+### DIVISION PROTECTED AGAINST NULL VALUES ###
+##############################################
+
+
+def safe_divide(
+    numerator: NDArray[np.float64],
+    denominator: NDArray[np.float64],
+    fill_value: float = 0.0,
+) -> NDArray[np.float64]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function divides two arrays element-wise and sets fill_value where the denominator is too close to zero.
+    It avoids the division warnings and the python level branching on the null values.
+
+    ---
+
+    ### INPUTS ###
+
+    NUMERATOR : NUMPY ARRAY OF FLOAT 64 | the numerator
+
+    DENOMINATOR : NUMPY ARRAY OF FLOAT 64 | the denominator
+
+    FILL_VALUE : FLOAT | value used where the denominator is null : default is 0
+
+    ---
+
+    ### OUTPUTS ###
+
+    RATIO : NUMPY ARRAY OF FLOAT 64 | the element-wise ratio
+
+    ---
+
+    """
+
+    ### BROADCAST THE INPUTS TOGETHER ###
+
+    numerator, denominator = np.broadcast_arrays(
+        np.asarray(numerator, dtype=np.float64),
+        np.asarray(denominator, dtype=np.float64),
+    )
+
+    ### DIVIDE ONLY WHERE IT IS DEFINED ###
+
+    ratio = np.full(numerator.shape, fill_value, dtype=np.float64)
+
+    np.divide(numerator, denominator, out=ratio, where=np.abs(denominator) > EPSILON)
+
+    return ratio
+
+
+########################################
+### ALBEDO OF THE SINGLE-LAYER MODEL ###
+########################################
+
+
+def single_layer_albedo(
+    mu: NDArray[np.float64], gamma: NDArray[np.float64], alpha: NDArray[np.float64]
+) -> NDArray[np.float64]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the planetary albedo of the single-layer model of Taylor and al. (2007) (equation 7) :
+
+    A = mu * gamma + mu * alpha * (1 - gamma)^2 / (1 - alpha * gamma)
+
+    ---
+
+    ### INPUTS ###
+
+    MU : NUMPY ARRAY OF FLOAT 64 | the fraction of the incoming flux that is not absorbed by the atmosphere
+
+    GAMMA : NUMPY ARRAY OF FLOAT 64 | the scattering coefficient of the atmosphere
+
+    ALPHA : NUMPY ARRAY OF FLOAT 64 | the surface albedo
+
+    ---
+
+    ### OUTPUTS ###
+
+    ALBEDO : NUMPY ARRAY OF FLOAT 64 | the planetary albedo
+
+    ---
+
+    """
+
+    albedo = mu * gamma + safe_divide(mu * alpha * (1 - gamma) ** 2, 1 - alpha * gamma)
+
+    return albedo
+
+
+###############################################################
+### RETRIEVE THE ATMOSPHERIC PARAMETERS OF THE SINGLE LAYER ###
+###############################################################
+
+
+def get_mu_gamma(
+    planetary_albedo: NDArray[np.float64],
+    surface_downwelling: NDArray[np.float64],
+    surface_albedo: NDArray[np.float64],
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function inverts the single-layer model to retrieve the atmospheric parameters (equations 9 and 10 of Taylor and al. (2007)) :
+
+    mu = A + Q * (1 - alpha) | gamma = (mu - Q) / (mu - alpha * Q)
+
+    ---
+
+    ### INPUTS ###
+
+    PLANETARY_ALBEDO : NUMPY ARRAY OF FLOAT 64 | the planetary albedo A (rsut / rsdt)
+
+    SURFACE_DOWNWELLING : NUMPY ARRAY OF FLOAT 64 | the normalized surface downwelling flux Q (rsds / rsdt)
+
+    SURFACE_ALBEDO : NUMPY ARRAY OF FLOAT 64 | the surface albedo alpha (rsus / rsds)
+
+    ---
+
+    ### OUTPUTS ###
+
+    (MU, GAMMA) : TUPLE OF NUMPY ARRAYS OF FLOAT 64 | the atmospheric transmissivity and scattering parameters
+
+    ---
+
+    """
+
+    mu = planetary_albedo + surface_downwelling * (1 - surface_albedo)
+
+    gamma = safe_divide(
+        mu - surface_downwelling, mu - surface_albedo * surface_downwelling
+    )
+
+    return mu, gamma
+
+
+###################################################
+### COMPUTE THE PARAMETERS OF ONE CLIMATE STATE ###
+###################################################
+
+
+def compute_single_layer_parameters(
+    fields: dict[str, NDArray[np.float64]],
+) -> dict[str, NDArray[np.float64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the parameters of the single-layer model for one climate state : the cloud fraction, the clear-sky and overcast
+    surface albedos and the clear-sky and cloud transmissivity / scattering parameters. The overcast fluxes are deduced from the all-sky and
+    clear-sky fluxes weighted by the cloud fraction. Where there is almost no cloud, the cloud is considered transparent (mu_cld = 1, gamma_cld = 0)
+    and the overcast surface albedo is the clear-sky one.
+
+    The arrays can have any shape as long as they are broadcastable together.
+
+    ---
+
+    ### INPUTS ###
+
+    FIELDS : DICT OF NUMPY ARRAYS OF FLOAT 64 | the APRP_INPUT_VARIABLES of the climate state (clt expressed as a fraction)
+
+    ---
+
+    ### OUTPUTS ###
+
+    PARAMETERS : DICT OF NUMPY ARRAYS OF FLOAT 64 | the parameters c, mu_clr, gamma_clr, mu_cld, gamma_cld, alpha_clr, alpha_oc and rsdt
+    as well as the clear-sky and overcast parts of the planetary albedo of the state (clear_part and overcast_part)
+
+    ---
+
+    """
+
+    ### INITIALIZATION ###
+
+    ## Cloud fraction ##
+
+    c = np.asarray(fields["clt"], dtype=np.float64)
+
+    ## Incoming flux at the top of the atmosphere ##
+
+    rsdt = np.asarray(fields["rsdt"], dtype=np.float64)
+
+    ## Where do we have a cloud ? ##
+
+    is_cloudy = c >= CLT_MIN
+
+    ### CLEAR-SKY PARAMETERS ###
+
+    ## Planetary albedo, normalized surface downwelling flux and surface albedo ##
+
+    a_clr = safe_divide(fields["rsutcs"], rsdt)
+
+    q_clr = safe_divide(fields["rsdscs"], rsdt)
+
+    alpha_clr = safe_divide(fields["rsuscs"], fields["rsdscs"])
+
+    ## Atmospheric parameters ##
+
+    mu_clr, gamma_clr = get_mu_gamma(a_clr, q_clr, alpha_clr)
+
+    ### OVERCAST PARAMETERS ###
+
+    ## Overcast fluxes deduced from the all-sky and clear-sky ones ##
+
+    c_safe = np.where(is_cloudy, c, 1.0)  # avoids the division by zero
+
+    rsut_oc = (fields["rsut"] - (1 - c) * fields["rsutcs"]) / c_safe
+
+    rsds_oc = (fields["rsds"] - (1 - c) * fields["rsdscs"]) / c_safe
+
+    rsus_oc = (fields["rsus"] - (1 - c) * fields["rsuscs"]) / c_safe
+
+    ## Planetary albedo, normalized surface downwelling flux and surface albedo ##
+
+    a_oc = safe_divide(rsut_oc, rsdt)
+
+    q_oc = safe_divide(rsds_oc, rsdt)
+
+    alpha_oc = np.where(is_cloudy, safe_divide(rsus_oc, rsds_oc), alpha_clr)
+
+    ## Atmospheric parameters ##
+
+    mu_oc, gamma_oc = get_mu_gamma(a_oc, q_oc, alpha_oc)
+
+    ### CLOUD PARAMETERS ###
+
+    ## mu_oc = mu_clr * mu_cld and (1 - gamma_oc) = (1 - gamma_clr) * (1 - gamma_cld) ##
+
+    mu_cld = np.where(is_cloudy, safe_divide(mu_oc, mu_clr, fill_value=1.0), 1.0)
+
+    gamma_cld = np.where(
+        is_cloudy, 1 - safe_divide(1 - gamma_oc, 1 - gamma_clr, fill_value=1.0), 0.0
+    )
+
+    parameters = {
+        "c": c,
+        "mu_clr": mu_clr,
+        "gamma_clr": gamma_clr,
+        "mu_cld": mu_cld,
+        "gamma_cld": gamma_cld,
+        "alpha_clr": alpha_clr,
+        "alpha_oc": alpha_oc,
+        "rsdt": rsdt,
+    }
+
+    ### ALBEDO OF THE STATE ###
+
+    ## It is kept so that it is not recomputed for every perturbation applied to this state ##
+
+    parameters["clear_part"], parameters["overcast_part"] = all_sky_albedo(parameters)
+
+    return parameters
+
+
+################################################
+### ALL-SKY ALBEDO OF THE SINGLE-LAYER MODEL ###
+################################################
+
+
+def all_sky_albedo(
+    parameters: dict[str, NDArray[np.float64]],
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the clear-sky and overcast contributions to the planetary albedo of the single-layer model
+    for a given set of parameters. Their sum is the all-sky planetary albedo.
+
+    ---
+
+    ### INPUTS ###
+
+    PARAMETERS : DICT OF NUMPY ARRAYS OF FLOAT 64 | parameters such as produced by compute_single_layer_parameters
+
+    ---
+
+    ### OUTPUTS ###
+
+    (CLEAR_PART, OVERCAST_PART) : TUPLE OF NUMPY ARRAYS OF FLOAT 64 | (1 - c) * A_clr and c * A_oc
+
+    ---
+
+    """
+
+    ### CLEAR-SKY PART ###
+
+    albedo_clr = single_layer_albedo(
+        parameters["mu_clr"], parameters["gamma_clr"], parameters["alpha_clr"]
+    )
+
+    ### OVERCAST PART ###
+
+    mu_oc = parameters["mu_clr"] * parameters["mu_cld"]
+
+    gamma_oc = 1 - (1 - parameters["gamma_clr"]) * (1 - parameters["gamma_cld"])
+
+    albedo_oc = single_layer_albedo(mu_oc, gamma_oc, parameters["alpha_oc"])
+
+    return (1 - parameters["c"]) * albedo_clr, parameters["c"] * albedo_oc
+
+
+############################################################
+### CENTERED PARTIAL PERTURBATION OF A SET OF PARAMETERS ###
+############################################################
+
+
+def partial_albedo_change(
+    parameters_1: dict[str, NDArray[np.float64]],
+    parameters_2: dict[str, NDArray[np.float64]],
+    perturbed: list[str],
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the change of the planetary albedo induced by the change of the perturbed parameters only.
+    As in Taylor and al. (2007), the forward (from state 1) and backward (from state 2) perturbations are averaged :
+
+    dA = 0.5 * [A(x2, y1) - A(x1, y1)] + 0.5 * [A(x2, y2) - A(x1, y2)]
+
+    ---
+
+    ### INPUTS ###
+
+    PARAMETERS_1 : DICT OF NUMPY ARRAYS OF FLOAT 64 | parameters of the control state
+
+    PARAMETERS_2 : DICT OF NUMPY ARRAYS OF FLOAT 64 | parameters of the perturbed state
+
+    PERTURBED : LIST[STR] | names of the parameters (x) that are swapped between the two states
+
+    ---
+
+    ### OUTPUTS ###
+
+    (DA_CLR, DA_OC) : TUPLE OF NUMPY ARRAYS OF FLOAT 64 | the clear-sky and overcast parts of the planetary albedo change
+
+    ---
+
+    """
+
+    ### STATE 1 WITH THE PERTURBED PARAMETERS OF STATE 2 ###
+
+    forward = parameters_1 | {name: parameters_2[name] for name in perturbed}
+
+    ### STATE 2 WITH THE PERTURBED PARAMETERS OF STATE 1 ###
+
+    backward = parameters_2 | {name: parameters_1[name] for name in perturbed}
+
+    ### COMPUTE THE ALBEDOS ###
+
+    ## The albedos of both states are known from compute_single_layer_parameters ##
+
+    clr_1, oc_1 = parameters_1["clear_part"], parameters_1["overcast_part"]
+
+    clr_2, oc_2 = parameters_2["clear_part"], parameters_2["overcast_part"]
+
+    ## Albedos of the swapped states ##
+
+    clr_forward, oc_forward = all_sky_albedo(forward)
+
+    clr_backward, oc_backward = all_sky_albedo(backward)
+
+    ### AVERAGE THE FORWARD AND BACKWARD DIFFERENCES ###
+
+    da_clr = 0.5 * ((clr_forward - clr_1) + (clr_2 - clr_backward))
+
+    da_oc = 0.5 * ((oc_forward - oc_1) + (oc_2 - oc_backward))
+
+    return da_clr, da_oc
+
+
+##################################################
+### APRP DECOMPOSITION FROM THE TWO PARAMETERS ###
+##################################################
+
+
+def aprp_from_parameters(
+    parameters_1: dict[str, NDArray[np.float64]],
+    parameters_2: dict[str, NDArray[np.float64]],
+) -> dict[str, NDArray[np.float64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function performs the APRP decomposition of the short-wave radiative change between two climate states described by their
+    single-layer parameters. The albedo changes are turned into fluxes (W m-2) with the mean incoming flux : a positive value means that
+    more energy is absorbed by the earth system in the perturbed state. Where there is no sunlight the fields are set to 0.
+
+    ---
+
+    ### INPUTS ###
+
+    PARAMETERS_1 : DICT OF NUMPY ARRAYS OF FLOAT 64 | parameters of the control state
+
+    PARAMETERS_2 : DICT OF NUMPY ARRAYS OF FLOAT 64 | parameters of the perturbed state
+
+    ---
+
+    ### OUTPUTS ###
+
+    APRP_FIELDS : DICT OF NUMPY ARRAYS OF FLOAT 64 | the APRP_OUTPUT_FIELDS of the decomposition
+
+    ---
+
+    """
+
+    ### INITIALIZATION ###
+
+    ## Mean incoming flux ##
+
+    rsdt = 0.5 * (parameters_1["rsdt"] + parameters_2["rsdt"])
+
+    ## Where is there sunlight ? ##
+
+    is_lit = (parameters_1["rsdt"] >= RSDT_MIN) & (parameters_2["rsdt"] >= RSDT_MIN)
+
+    ## Conversion from an albedo change to a flux ##
+
+    to_flux = np.where(is_lit, -rsdt, 0.0)
+
+    ### SURFACE ALBEDO ###
+
+    da_clr, da_oc = partial_albedo_change(
+        parameters_1, parameters_2, ["alpha_clr", "alpha_oc"]
+    )
+
+    sfc_alb_clr = to_flux * da_clr
+
+    sfc_alb_oc = to_flux * da_oc
+
+    ### CLOUD AMOUNT ###
+
+    da_clr, da_oc = partial_albedo_change(parameters_1, parameters_2, ["c"])
+
+    cld_amt = to_flux * (da_clr + da_oc)
+
+    ### CLOUD SCATTERING AND ABSORPTION ###
+
+    ## Only the overcast part depends on the cloud properties ##
+
+    _, da_oc = partial_albedo_change(parameters_1, parameters_2, ["gamma_cld"])
+
+    cld_scat = to_flux * da_oc
+
+    _, da_oc = partial_albedo_change(parameters_1, parameters_2, ["mu_cld"])
+
+    cld_abs = to_flux * da_oc
+
+    ### NON-CLOUD SCATTERING AND ABSORPTION ###
+
+    da_clr, da_oc = partial_albedo_change(parameters_1, parameters_2, ["gamma_clr"])
+
+    noncld_scat = to_flux * (da_clr + da_oc)
+
+    da_clr, da_oc = partial_albedo_change(parameters_1, parameters_2, ["mu_clr"])
+
+    noncld_abs = to_flux * (da_clr + da_oc)
+
+    return {
+        "cld": cld_amt + cld_scat + cld_abs,
+        "sfc_alb": sfc_alb_clr + sfc_alb_oc,
+        "sfc_alb_clr": sfc_alb_clr,
+        "sfc_alb_oc": sfc_alb_oc,
+        "noncld": noncld_scat + noncld_abs,
+        "noncld_scat": noncld_scat,
+        "noncld_abs": noncld_abs,
+        "cld_amt": cld_amt,
+        "cld_scat": cld_scat,
+        "cld_abs": cld_abs,
+    }
+
+
+#############################################################
+### PACK THE FIELDS OF SEVERAL ENTRIES INTO SINGLE ARRAYS ###
+#############################################################
+
+
+def pack_entries(
+    list_datasets: list[xr.Dataset], variables: list[str]
+) -> tuple[dict[str, NDArray[np.float64]], NDArray[np.int64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function stacks the fields of several datasets into one array per variable. Since the entries do not share the same grid,
+    every (month x lat x lon) field is flattened and the entries are concatenated one after the other.
+    The offsets allow to split the arrays back with unpack_entries.
+
+    ---
+
+    ### INPUTS ###
+
+    LIST_DATASETS : LIST OF XR DATASETS | the datasets of the entries
+
+    VARIABLES : LIST[STR] | the variables to stack
+
+    ---
+
+    ### OUTPUTS ###
+
+    PACKED_FIELDS : DICT OF NUMPY ARRAYS OF FLOAT 64 | one flat array per variable holding every entry
+
+    OFFSETS : NUMPY ARRAY OF INT 64 | the index of the first element of every entry (plus the total size at the end)
+
+    ---
+
+    """
+
+    ### SIZE OF EVERY ENTRY ###
+
+    sizes = [dataset[variables[0]].size for dataset in list_datasets]
+
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+
+    ### CONCATENATE THE FLATTENED FIELDS ###
+
+    packed_fields = {
+        var: np.concatenate(
+            [
+                np.asarray(dataset[var].values, dtype=np.float64).ravel()
+                for dataset in list_datasets
+            ]
+        )
+        for var in variables
+    }
+
+    return packed_fields, offsets
+
+
+###########################################################
+### UNPACK THE SINGLE ARRAYS INTO ONE DATASET PER ENTRY ###
+###########################################################
+
+
+def unpack_entries(
+    packed_fields: dict[str, NDArray[np.float64]],
+    offsets: NDArray[np.int64],
+    list_templates: list[xr.DataArray],
+) -> list[xr.Dataset]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function is the inverse of pack_entries : it splits the flat arrays with the offsets and reshapes every part
+    on the coordinates of the template data array of the corresponding entry.
+
+    ---
+
+    ### INPUTS ###
+
+    PACKED_FIELDS : DICT OF NUMPY ARRAYS OF FLOAT 64 | one flat array per variable holding every entry
+
+    OFFSETS : NUMPY ARRAY OF INT 64 | the offsets produced by pack_entries
+
+    LIST_TEMPLATES : LIST OF XR DATA ARRAYS | one data array per entry giving the dimensions and coordinates
+
+    ---
+
+    ### OUTPUTS ###
+
+    LIST_DATASETS : LIST OF XR DATASETS | one dataset per entry holding every unpacked variable
+
+    ---
+
+    """
+
+    list_datasets = []
+
+    for ii, template in enumerate(list_templates):
+
+        ## Slice of the entry ##
+
+        entry_slice = slice(offsets[ii], offsets[ii + 1])
+
+        ## Rebuild the dataset on the template's coordinates ##
+
+        list_datasets.append(
+            xr.Dataset(
+                {
+                    var: (
+                        template.dims,
+                        packed_fields[var][entry_slice].reshape(template.shape),
+                    )
+                    for var in packed_fields.keys()
+                },
+                coords=template.coords,
+            )
+        )
+
+    return list_datasets
+
+
+#####################################################
+### ADD THE BOUNDS OF THE GRID TO AN APRP DATASET ###
+#####################################################
+
+
+def copy_spatial_bounds(dataset: xr.Dataset, reference: xr.Dataset) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function copies the latitude and longitude bounds of the reference dataset into the dataset, if they exist.
+    They are needed by the regridding and spatial averaging tools of xcdat.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset to complete
+
+    REFERENCE : XR DATASET | the dataset holding the bounds
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET : XR DATASET | the dataset with the bounds
+
+    ---
+
+    """
+
+    for bounds_name in ["lat_bnds", "lon_bnds"]:
+
+        if bounds_name in reference.variables:
+
+            dataset[bounds_name] = reference[bounds_name]
+
+    return dataset
+
+
+################################################
+### SELECT SOME ENTRIES OF THE PACKED ARRAYS ###
+################################################
+
+
+def select_packed_entries(
+    packed_fields: dict[str, NDArray[np.float64]],
+    offsets: NDArray[np.int64],
+    indexes: list[int],
+) -> tuple[dict[str, NDArray[np.float64]], NDArray[np.int64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function extracts the entries of given indexes from packed arrays such as produced by pack_entries.
+    It allows to reuse the packed control parameters for a perturbed experiment available for only a part of the entries.
+
+    ---
+
+    ### INPUTS ###
+
+    PACKED_FIELDS : DICT OF NUMPY ARRAYS OF FLOAT 64 | one flat array per variable holding every entry
+
+    OFFSETS : NUMPY ARRAY OF INT 64 | the offsets produced by pack_entries
+
+    INDEXES : LIST[INT] | the indexes of the entries to keep
+
+    ---
+
+    ### OUTPUTS ###
+
+    SELECTED_FIELDS : DICT OF NUMPY ARRAYS OF FLOAT 64 | one flat array per variable holding the selected entries
+
+    SELECTED_OFFSETS : NUMPY ARRAY OF INT 64 | the offsets of the selected entries
+
+    ---
+
+    """
+
+    ### NOTHING TO DO IF EVERY ENTRY IS KEPT ###
+
+    if list(indexes) == list(range(len(offsets) - 1)):
+
+        return packed_fields, offsets
+
+    ### GATHER THE ELEMENTS OF THE SELECTED ENTRIES ###
+
+    gather = np.concatenate(
+        [np.arange(offsets[ii], offsets[ii + 1]) for ii in indexes]
+        + [np.empty(0, dtype=np.int64)]
+    )
+
+    selected_fields = {var: packed_fields[var][gather] for var in packed_fields.keys()}
+
+    selected_offsets = np.concatenate(
+        [[0], np.cumsum([offsets[ii + 1] - offsets[ii] for ii in indexes])]
+    ).astype(np.int64)
+
+    return selected_fields, selected_offsets
+
+
+##################################################################
+### APRP FOR SEVERAL PERTURBED EXPERIMENTS AGAINST ONE CONTROL ###
+##################################################################
+
+
+def aprp_ensemble_multi_experiments(
+    dict_clim: dict[str, xr.Dataset],
+    dict_entries: dict[str, list[str]],
+    control_experiment: str = "piClim-control",
+) -> dict[str, dict[str, xr.Dataset]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function performs the APRP method for several perturbed experiments (ex: piClim-aer, piClim-BC, piClim-SO2, piClim-OC) against
+    the same control experiment. The single-layer parameters of the control state are computed once for every entry and reused for every
+    perturbed experiment : adding an experiment only costs its own side of the computation.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_CLIM : DICT OF XR DATASETS | the climatology dictionary with keys under the form (source_id.member_id.grid_label.experiment_id)
+
+    DICT_ENTRIES : DICT OF LIST[STR] | the entries (source_id.member_id.grid_label) to compute for every perturbed experiment
+
+    CONTROL_EXPERIMENT : STR | the experiment used as the control state : default is piClim-control
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_APRP_PER_EXPERIMENT : DICT OF DICT OF XR DATASETS | the APRP fields of every entry for every perturbed experiment
+
+    ---
+
+    """
+
+    ### GENERATE THE LIST OF ALL THE ENTRIES NEEDED ###
+
+    entries = list(
+        dict.fromkeys(
+            entry for list_entries in dict_entries.values() for entry in list_entries
+        )
+    )
+
+    ### CONTROL SIDE : COMPUTED ONCE FOR EVERY ENTRY ###
+
+    list_control = [dict_clim[entry + "." + control_experiment] for entry in entries]
+
+    dict_entry_index = {entry: ii for ii, entry in enumerate(entries)}
+
+    packed_control, offsets = pack_entries(list_control, APRP_INPUT_VARIABLES)
+
+    parameters_control = compute_single_layer_parameters(packed_control)
+
+    ### PERTURBED SIDE : COMPUTED FOR EVERY EXPERIMENT ###
+
+    dict_aprp_per_experiment = {}
+
+    for experiment, list_entries in dict_entries.items():
+
+        ## Indexes of the entries of this experiment ##
+
+        indexes = [dict_entry_index[entry] for entry in list_entries]
+
+        ## Control parameters of these entries ##
+
+        parameters_control_given_exp, offsets_given_exp = select_packed_entries(
+            parameters_control, offsets, indexes
+        )
+
+        ## Parameters of the perturbed state ##
+
+        list_perturbed = [dict_clim[entry + "." + experiment] for entry in list_entries]
+
+        packed_perturbed, _ = pack_entries(list_perturbed, APRP_INPUT_VARIABLES)
+
+        parameters_perturbed = compute_single_layer_parameters(packed_perturbed)
+
+        ## APRP decomposition ##
+
+        packed_aprp = aprp_from_parameters(
+            parameters_control_given_exp, parameters_perturbed
+        )
+
+        ## Unpack into one dataset per entry ##
+
+        list_aprp = unpack_entries(
+            packed_aprp,
+            offsets_given_exp,
+            [list_control[ii]["rsdt"] for ii in indexes],
+        )
+
+        dict_aprp_per_experiment[experiment] = {
+            entry: copy_spatial_bounds(list_aprp[jj], list_control[indexes[jj]])
+            for jj, entry in enumerate(list_entries)
+        }
+
+    return dict_aprp_per_experiment
+
+
+##################################################
+### APRP FOR A WHOLE ENSEMBLE OF CLIMATOLOGIES ###
+##################################################
+
+
+def aprp_ensemble(
+    dict_clim: dict[str, xr.Dataset],
+    entries: list[str],
+    control_experiment: str = "piClim-control",
+    perturbed_experiment: str = "piClim-aer",
+) -> dict[str, xr.Dataset]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function performs the APRP method for every entry of the climatology dictionary at once. The fields of all the entries are packed
+    into single arrays so that the single-layer model is evaluated in one set of numpy calls for the whole ensemble.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_CLIM : DICT OF XR DATASETS | the climatology dictionary with keys under the form (source_id.member_id.grid_label.experiment_id)
+
+    ENTRIES : LIST[STR] | the entries (source_id.member_id.grid_label) for which the APRP is computed
+
+    CONTROL_EXPERIMENT : STR | the experiment used as the control state : default is piClim-control
+
+    PERTURBED_EXPERIMENT : STR | the experiment used as the perturbed state : default is piClim-aer
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_APRP : DICT OF XR DATASETS | the APRP fields of every entry
+
+    ---
+
+    """
+
+    dict_aprp = aprp_ensemble_multi_experiments(
+        dict_clim=dict_clim,
+        dict_entries={perturbed_experiment: entries},
+        control_experiment=control_experiment,
+    )[perturbed_experiment]
+
+    return dict_aprp
+
+
+############################################
+### APRP FOR A SINGLE COUPLE OF DATASETS ###
+############################################
+
+
+def aprp_single_entry(
+    dataset_control: xr.Dataset, dataset_perturbed: xr.Dataset
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function performs the APRP method between the control and perturbed climatologies of a single entry.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET_CONTROL : XR DATASET | climatology of the control experiment
+
+    DATASET_PERTURBED : XR DATASET | climatology of the perturbed experiment
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET_APRP : XR DATASET | the APRP fields of the entry
+
+    ---
+
+    """
+
+    dict_aprp = aprp_ensemble(
+        dict_clim={
+            "entry.control": dataset_control,
+            "entry.perturbed": dataset_perturbed,
+        },
+        entries=["entry"],
+        control_experiment="control",
+        perturbed_experiment="perturbed",
+    )
+
+    return dict_aprp["entry"]
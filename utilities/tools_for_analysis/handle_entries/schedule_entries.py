@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+
+"""
+This submodule is made to schedule the entries of the ensemble for the parallel stages. The cost of an entry is estimated as its number of grid cells
+times its number of time steps times its number of variables, taken from the grid catalog of the saved climatologies.
+The entries are then given to the workers with the longest-processing-time-first rule : the most expensive entry goes to the least loaded worker,
+so that the long entries do not finish last while the other workers are idle.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### SCHEDULING ###
+
+import heapq  # to find the least loaded worker
+
+import time  # to measure the duration of the tasks
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import pandas as pd  # to handle the grid catalog
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.tools_for_analysis.handle_entries.extract_entries_names import (
+    get_entries_only_from_clim_dict,  # to extract the entries' names
+)
+
+###############################
+### PARAMETERS OF THE COSTS ###
+###############################
+
+N_MONTHS = 12  # time steps of a climatology
+
+####################################
+### ESTIMATE THE COST OF ENTRIES ###
+####################################
+
+
+def estimate_entry_cost(n_cells: int, n_time_steps: int, n_variables: int) -> float:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function estimates the cost of an entry as the number of values it holds.
+
+    ---
+
+    ### INPUTS ###
+
+    N_CELLS : INT | the number of cells of the grid
+
+    N_TIME_STEPS : INT | the number of time steps
+
+    N_VARIABLES : INT | the number of variables (or experiments) treated
+
+    ---
+
+    ### OUTPUTS ###
+
+    COST : FLOAT | the estimated cost
+
+    ---
+
+    """
+
+    cost = float(n_cells) * float(n_time_steps) * float(n_variables)
+
+    return cost
+
+
+def get_costs_from_grid_catalog(
+    grid_catalog: pd.DataFrame,
+    n_time_steps: int = N_MONTHS,
+    n_variables: int = 1,
+) -> dict[str, float]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function estimates the cost of every entry (source_id.member_id.grid_label) of a grid catalog (see grid_catalog.py), summed over its experiments.
+
+    ---
+
+    ### INPUTS ###
+
+    GRID_CATALOG : PANDAS DATAFRAME | the grid catalog of the saved climatologies
+
+    N_TIME_STEPS : INT | the number of time steps of every experiment : default is N_MONTHS
+
+    N_VARIABLES : INT | the number of variables of every experiment : default is 1
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_COSTS : DICT | the estimated cost of every entry
+
+    ---
+
+    """
+
+    dict_costs = {}
+
+    for row in grid_catalog.itertuples():
+
+        entry = get_entries_only_from_clim_dict(row.key)
+
+        dict_costs[entry] = dict_costs.get(entry, 0.0) + estimate_entry_cost(
+            row.n_lat * row.n_lon, n_time_steps, n_variables
+        )
+
+    return dict_costs
+
+
+##############################
+### LONGEST FIRST SCHEDULE ###
+##############################
+
+
+def order_longest_first(items: list, dict_costs: dict) -> list:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function sorts items from the most expensive to the cheapest. An item of unknown cost is assumed as expensive as the most expensive known one :
+    it is started early rather than left as a straggler. Equal costs keep their original order.
+
+    ---
+
+    ### INPUTS ###
+
+    ITEMS : LIST | the items to schedule
+
+    DICT_COSTS : DICT | the estimated cost of the items
+
+    ---
+
+    ### OUTPUTS ###
+
+    SORTED_ITEMS : LIST | the items from the most expensive to the cheapest
+
+    ---
+
+    """
+
+    default_cost = max(dict_costs.values(), default=0.0)
+
+    sorted_items = sorted(items, key=lambda item: -dict_costs.get(item, default_cost))
+
+    return sorted_items
+
+
+def schedule_longest_first(items: list, dict_costs: dict, n_workers: int) -> list[list]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function splits items between workers with the longest-processing-time-first rule : the items are taken from the most expensive
+    and every one is given to the worker with the lowest load so far. The makespan is at most 4/3 of the optimal one.
+
+    ---
+
+    ### INPUTS ###
+
+    ITEMS : LIST | the items to schedule
+
+    DICT_COSTS : DICT | the estimated cost of the items
+
+    N_WORKERS : INT | the number of workers
+
+    ---
+
+    ### OUTPUTS ###
+
+    BATCHES : LIST[LIST] | the items of every worker, from the most expensive, without the empty ones
+
+    ---
+
+    """
+
+    ### CHECK THE NUMBER OF WORKERS ###
+
+    if n_workers < 1:
+
+        raise ValueError("{} -> There must be at least one worker".format(n_workers))
+
+    ### GIVE EVERY ITEM TO THE LEAST LOADED WORKER ###
+
+    default_cost = max(dict_costs.values(), default=0.0)
+
+    batches = [[] for _ in range(n_workers)]
+
+    ## Heap of the (load, worker) couples ##
+
+    heap_loads = [(0.0, ii) for ii in range(n_workers)]
+
+    for item in order_longest_first(items, dict_costs):
+
+        load, ii = heapq.heappop(heap_loads)
+
+        batches[ii].append(item)
+
+        heapq.heappush(heap_loads, (load + dict_costs.get(item, default_cost), ii))
+
+    batches = [batch for batch in batches if batch]
+
+    return batches
+
+
+def get_makespan(batches: list[list], dict_costs: dict) -> float:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives the estimated makespan of a schedule : the load of the most loaded worker.
+
+    ---
+
+    ### INPUTS ###
+
+    BATCHES : LIST[LIST] | the items of every worker
+
+    DICT_COSTS : DICT | the estimated cost of the items
+
+    ---
+
+    ### OUTPUTS ###
+
+    MAKESPAN : FLOAT | the estimated makespan, in the unit of the costs
+
+    ---
+
+    """
+
+    makespan = max(
+        (sum(dict_costs.get(item, 0.0) for item in batch) for batch in batches),
+        default=0.0,
+    )
+
+    return makespan
+
+
+############################
+### MEASURE THE SCHEDULE ###
+############################
+
+
+def run_timed(function, *args) -> tuple:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function runs a task and measures its duration. It can be given to a pool of processes.
+
+    ---
+
+    ### INPUTS ###
+
+    FUNCTION : CALLABLE | the task
+
+    ARGS : | the arguments of the task
+
+    ---
+
+    ### OUTPUTS ###
+
+    RESULT : | what the task returned
+
+    SECONDS : FLOAT | the duration of the task
+
+    ---
+
+    """
+
+    start_time = time.perf_counter()
+
+    result = function(*args)
+
+    return (result, time.perf_counter() - start_time)
+
+
+def split_batch_seconds(
+    batches: list[list], dict_costs: dict, batch_seconds: list[float]
+) -> list[float]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function estimates the duration of every item of batches computed together (ex: the vectorized APRP of several entries) :
+    the measured duration of a batch is shared between its items in proportion to their estimated cost (evenly if the costs are unknown).
+
+    ---
+
+    ### INPUTS ###
+
+    BATCHES : LIST[LIST] | the items of every batch
+
+    DICT_COSTS : DICT | the estimated cost of the items
+
+    BATCH_SECONDS : LIST[FLOAT] | the measured duration of every batch
+
+    ---
+
+    ### OUTPUTS ###
+
+    TASK_SECONDS : LIST[FLOAT] | the estimated duration of every item, batch after batch
+
+    ---
+
+    """
+
+    task_seconds = []
+
+    for batch, seconds in zip(batches, batch_seconds):
+
+        costs = [dict_costs.get(item, 0.0) for item in batch]
+
+        if sum(costs) <= 0:
+
+            costs = [1.0] * len(batch)
+
+        task_seconds += [seconds * cost / sum(costs) for cost in costs]
+
+    return task_seconds
+
+
+def report_makespan(
+    task_seconds: list[float], n_workers: int, makespan: float, verbose: bool = True
+) -> dict:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reports the makespan achieved by a parallel stage. No schedule of these tasks on these workers can be shorter than
+    the lower bound, the longest task or the total work shared equally between the workers : the closer the makespan to it, the better the schedule.
+
+    ---
+
+    ### INPUTS ###
+
+    TASK_SECONDS : LIST[FLOAT] | the duration of every task
+
+    N_WORKERS : INT | the number of workers of the stage
+
+    MAKESPAN : FLOAT | the measured duration of the whole stage
+
+    VERBOSE : BOOL | do we print the report ? : default is True
+
+    ---
+
+    ### OUTPUTS ###
+
+    REPORT : DICT | the "makespan", the "lower_bound" and the "busy_fraction" of the workers
+
+    ---
+
+    """
+
+    n_workers = max(n_workers, 1)
+
+    total_seconds = sum(task_seconds)
+
+    lower_bound = max(max(task_seconds, default=0.0), total_seconds / n_workers)
+
+    busy_fraction = total_seconds / (n_workers * makespan) if makespan > 0 else 1.0
+
+    report = {
+        "makespan": makespan,
+        "lower_bound": lower_bound,
+        "busy_fraction": busy_fraction,
+    }
+
+    if verbose:
+
+        print(
+            "Makespan of {:.1f} s for a lower bound of {:.1f} s, the {} workers were busy {:.0%} of the time\n".format(
+                makespan, lower_bound, n_workers, busy_fraction
+            )
+        )
+
+    return report
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""
+This script is used to restrict the models' outputs to a latitude / longitude domain (ex: the Arctic cap) before any regridding. Only the source cells
+overlapping the domain are kept, so that the weights and the regridded fields are computed on a small part of the globe.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.tools_for_analysis.regridding.separable_conservative import (
+    get_coordinate_bounds,  # bounds of the lat and lon coordinates
+    LON_SHIFTS,  # shifts catching the overlaps across the periodic boundary
+)
+
+######################################
+### ADD THE MISSING SPATIAL BOUNDS ###
+######################################
+
+
+def add_missing_coordinate_bounds(dataset: xr.Dataset) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function adds the lat_bnds and lon_bnds variables to a dataset if they are missing. It must be done before subsetting the dataset :
+    afterwards the bounds of the cells at the edges of the subset could no longer be deduced from their neighbours.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset with or without the spatial bounds
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET : XR DATASET | the dataset with the spatial bounds
+
+    ---
+
+    """
+
+    for coordinate in ["lat", "lon"]:
+
+        bounds_name = dataset[coordinate].attrs.get("bounds", coordinate + "_bnds")
+
+        if bounds_name not in dataset.variables:
+
+            dataset = dataset.assign(
+                {
+                    coordinate
+                    + "_bnds": (
+                        (coordinate, "bnds"),
+                        get_coordinate_bounds(dataset, coordinate),
+                    )
+                }
+            )
+
+            dataset[coordinate].attrs["bounds"] = coordinate + "_bnds"
+
+    return dataset
+
+
+##########################################
+### SUBSET A DATASET TO A GIVEN DOMAIN ###
+##########################################
+
+
+def subset_to_domain(
+    dataset: xr.Dataset,
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function keeps only the cells of a dataset overlapping a latitude / longitude domain. A cell is kept as soon as its bounds overlap the domain
+    so that a conservative regridding on a grid covering the domain gives the same values as with the full dataset. The longitudes are periodic.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset to subset
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain : default is none (every longitude)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET_SUBSET : XR DATASET | the dataset restricted to the cells overlapping the domain
+
+    ---
+
+    """
+
+    ### NOTHING TO DO WITHOUT DOMAIN ###
+
+    if lat_domain is None and lon_domain is None:
+
+        return dataset
+
+    ### MAKE SURE THE BOUNDS ARE KEPT ###
+
+    dataset = add_missing_coordinate_bounds(dataset)
+
+    ### SELECT THE CELLS OVERLAPPING THE DOMAIN ###
+
+    indexers = {}
+
+    ## Latitude ##
+
+    if lat_domain is not None:
+
+        lat_low, lat_high = np.sort(get_coordinate_bounds(dataset, "lat"), axis=1).T
+
+        indexers["lat"] = np.flatnonzero(
+            (lat_high > lat_domain[0]) & (lat_low < lat_domain[1])
+        )
+
+    ## Longitude ##
+
+    if lon_domain is not None:
+
+        lon_low, lon_high = np.sort(get_coordinate_bounds(dataset, "lon"), axis=1).T
+
+        indexers["lon"] = np.flatnonzero(
+            np.any(
+                (lon_high[:, None] + LON_SHIFTS > lon_domain[0])
+                & (lon_low[:, None] + LON_SHIFTS < lon_domain[1]),
+                axis=1,
+            )
+        )
+
+    dataset_subset = dataset.isel(indexers)
+
+    return dataset_subset
@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+
+"""
+This script provides an equal-area target grid for the Arctic products. The grid is a regular grid of square cells in the north polar Lambert azimuthal
+equal-area projection (as the EASE-Grid 2.0 North) : all its cells have the same area, unlike the cells of a regular latitude / longitude grid that shrink
+towards the pole.
+
+The weights from a model grid to the polar grid are computed by sampling every target cell with points of equal area and are saved on disk. As many entries
+share the same model grid, the weights of a grid are computed once and then read back.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### LOAD AND NAVIGATE THROUGH THE DATA ###
+
+import os  # to handle the paths of the saved weights
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+### TYPE HINTS FOR FUNCTIONS ###
+
+from numpy.typing import NDArray  # type hints for numpy
+
+### HOMEMADE LIBRARIES ###
+
+from utilities.tools_for_analysis.regridding.separable_conservative import (
+    get_coordinate_bounds,  # bounds of the lat and lon coordinates
+)
+
+from utilities.get_cmip6_data.store_data.hash_files import (
+    hash_files,  # to identify a couple of grids
+)
+
+from utilities.get_cmip6_data.folders_handle.create import (
+    create_dir,  # to create the folder of the weights
+)
+
+###################################
+### CONSTANTS OF THE POLAR GRID ###
+###################################
+
+R_EARTH = 6371.0 * 10**3  # in m
+
+N_SAMPLES_PER_SIDE = 8  # every target cell is sampled by 8 x 8 points of equal area
+
+#####################################################
+### LAMBERT AZIMUTHAL EQUAL-AREA NORTH PROJECTION ###
+#####################################################
+
+
+def polar_lambert_forward(
+    lat: NDArray[np.float64], lon: NDArray[np.float64]
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function projects latitudes and longitudes onto the plane of the north polar Lambert azimuthal equal-area projection.
+
+    ---
+
+    ### INPUTS ###
+
+    LAT : NUMPY ARRAY OF FLOAT 64 | latitudes in degrees
+
+    LON : NUMPY ARRAY OF FLOAT 64 | longitudes in degrees
+
+    ---
+
+    ### OUTPUTS ###
+
+    (X, Y) : TUPLE OF NUMPY ARRAYS OF FLOAT 64 | the projected coordinates in m
+
+    ---
+
+    """
+
+    rho = 2.0 * R_EARTH * np.sin(np.deg2rad(90.0 - np.asarray(lat)) / 2.0)
+
+    x = rho * np.sin(np.deg2rad(lon))
+
+    y = -rho * np.cos(np.deg2rad(lon))
+
+    return x, y
+
+
+def polar_lambert_inverse(
+    x: NDArray[np.float64], y: NDArray[np.float64]
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function gives back the latitudes and longitudes of points of the plane of the north polar Lambert azimuthal equal-area projection.
+
+    ---
+
+    ### INPUTS ###
+
+    X : NUMPY ARRAY OF FLOAT 64 | projected x coordinates in m
+
+    Y : NUMPY ARRAY OF FLOAT 64 | projected y coordinates in m
+
+    ---
+
+    ### OUTPUTS ###
+
+    (LAT, LON) : TUPLE OF NUMPY ARRAYS OF FLOAT 64 | latitudes and longitudes in degrees (longitudes in [0, 360[)
+
+    ---
+
+    """
+
+    rho = np.hypot(x, y)
+
+    lat = 90.0 - 2.0 * np.rad2deg(np.arcsin(np.clip(rho / (2.0 * R_EARTH), 0.0, 1.0)))
+
+    lon = np.mod(np.rad2deg(np.arctan2(x, -y)), 360.0)
+
+    return lat, lon
+
+
+###############################
+### GENERATE THE POLAR GRID ###
+###############################
+
+
+def generate_polar_equal_area_grid(
+    resolution_km: float = 100.0, lat_min: float = 60.0
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function generates a grid of square cells of the north polar Lambert azimuthal equal-area projection covering the cap north of lat_min.
+    The cells whose center is south of lat_min are masked. The latitudes and longitudes of the centers and the (constant) areacella are given.
+
+    ---
+
+    ### INPUTS ###
+
+    RESOLUTION_KM : FLOAT | the side of the cells in km : default is 100.0
+
+    LAT_MIN : FLOAT | the southern limit of the cap : default is 60.0
+
+    ---
+
+    ### OUTPUTS ###
+
+    POLAR_GRID : XR DATASET | the grid with the x / y coordinates, the lat / lon of the centers, the mask and areacella
+
+    ---
+
+    """
+
+    ### BUILD THE PROJECTED AXES ###
+
+    resolution = resolution_km * 10**3
+
+    rho_max = 2.0 * R_EARTH * np.sin(np.deg2rad(90.0 - lat_min) / 2.0)
+
+    n_half = int(np.ceil(rho_max / resolution))
+
+    axis = (np.arange(-n_half, n_half) + 0.5) * resolution
+
+    x, y = np.meshgrid(axis, axis)
+
+    ### LATITUDES AND LONGITUDES OF THE CENTERS ###
+
+    lat, lon = polar_lambert_inverse(x, y)
+
+    ### BUILD THE GRID ###
+
+    polar_grid = xr.Dataset(
+        {
+            "mask": (("y", "x"), lat >= lat_min),
+            "areacella": (("y", "x"), np.full(x.shape, resolution**2)),
+        },
+        coords={
+            "x": axis,
+            "y": axis,
+            "lat": (("y", "x"), lat),
+            "lon": (("y", "x"), lon),
+        },
+        attrs={
+            "projection": "north polar Lambert azimuthal equal-area",
+            "resolution_km": resolution_km,
+            "lat_min": lat_min,
+        },
+    )
+
+    return polar_grid
+
+
+###############################################################
+### COMPUTE THE WEIGHTS FROM A MODEL GRID TO THE POLAR GRID ###
+###############################################################
+
+
+def compute_polar_weights(
+    dataset: xr.Dataset, polar_grid: xr.Dataset
+) -> dict[str, NDArray]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the sparse weights from the rectilinear grid of a dataset to the polar grid. Every unmasked target cell is sampled
+    by N_SAMPLES_PER_SIDE x N_SAMPLES_PER_SIDE points of equal area (the projection is equal-area) and every point gives the same weight to
+    the source cell it falls in. The weights of a target cell are then the fractions of its area covered by every source cell.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | a dataset on the model grid
+
+    POLAR_GRID : XR DATASET | the grid generated by generate_polar_equal_area_grid
+
+    ---
+
+    ### OUTPUTS ###
+
+    WEIGHTS : DICT OF NUMPY ARRAYS | the "target", "source" (flat indexes) and "weight" arrays of the sparse weights, sorted by target
+
+    ---
+
+    """
+
+    ### SAMPLE THE UNMASKED TARGET CELLS ###
+
+    resolution = polar_grid.attrs["resolution_km"] * 10**3
+
+    offsets = (np.arange(N_SAMPLES_PER_SIDE) + 0.5) / N_SAMPLES_PER_SIDE - 0.5
+
+    offsets_x, offsets_y = [
+        offset.ravel() * resolution for offset in np.meshgrid(offsets, offsets)
+    ]
+
+    x_centers, y_centers = np.meshgrid(polar_grid.x.values, polar_grid.y.values)
+
+    target_cells = np.flatnonzero(polar_grid["mask"].values.ravel())
+
+    samples_x = x_centers.ravel()[target_cells, None] + offsets_x[None, :]
+
+    samples_y = y_centers.ravel()[target_cells, None] + offsets_y[None, :]
+
+    samples_lat, samples_lon = polar_lambert_inverse(samples_x, samples_y)
+
+    ### LOCATE THE SOURCE CELL OF EVERY SAMPLE ###
+
+    ## Latitude : edges of the rectilinear grid in increasing order ##
+
+    lat_bounds = get_coordinate_bounds(dataset, "lat")
+
+    lat_increasing = lat_bounds[-1, 1] > lat_bounds[0, 0]
+
+    lat_edges = np.concatenate([lat_bounds[:, 0], lat_bounds[-1:, 1]])
+
+    if not lat_increasing:
+
+        lat_edges = lat_edges[::-1]
+
+    index_lat = np.searchsorted(lat_edges, samples_lat, side="right") - 1
+
+    index_lat = np.where(
+        samples_lat == lat_edges[-1], len(lat_edges) - 2, index_lat
+    )  # the pole belongs to the last band
+
+    if not lat_increasing:
+
+        index_lat = len(lat_edges) - 2 - index_lat
+
+    ## Longitude : periodic ##
+
+    lon_bounds = get_coordinate_bounds(dataset, "lon")
+
+    lon_edges = np.concatenate([lon_bounds[:, 0], lon_bounds[-1:, 1]])
+
+    index_lon = (
+        np.searchsorted(
+            lon_edges,
+            lon_edges[0] + np.mod(samples_lon - lon_edges[0], 360.0),
+            side="right",
+        )
+        - 1
+    )
+
+    ## Keep the samples falling in the source grid ##
+
+    n_lat, n_lon = len(lat_bounds), len(lon_bounds)
+
+    inside = (index_lat >= 0) & (index_lat < n_lat) & (index_lon < n_lon)
+
+    ### ACCUMULATE THE WEIGHTS OF EVERY (TARGET, SOURCE) COUPLE ###
+
+    target_of_samples = np.broadcast_to(target_cells[:, None], samples_lat.shape)[
+        inside
+    ]
+
+    source_of_samples = index_lat[inside] * n_lon + index_lon[inside]
+
+    couples, counts = np.unique(
+        np.stack([target_of_samples, source_of_samples]), axis=1, return_counts=True
+    )
+
+    weights = {
+        "target": couples[0],
+        "source": couples[1],
+        "weight": counts / N_SAMPLES_PER_SIDE**2,
+    }
+
+    return weights
+
+
+#############################################
+### LOAD OR COMPUTE THE WEIGHTS OF A GRID ###
+#############################################
+
+
+def get_polar_weights(
+    dataset: xr.Dataset, polar_grid: xr.Dataset, weights_path: str
+) -> dict[str, NDArray]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function returns the weights from the grid of a dataset to the polar grid. They are identified by a hash of the bounds of the model grid
+    and of the parameters of the polar grid : if they were already saved in weights_path they are read back, otherwise they are computed and saved.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | a dataset on the model grid
+
+    POLAR_GRID : XR DATASET | the grid generated by generate_polar_equal_area_grid
+
+    WEIGHTS_PATH : STR | path of the directory where the weights are saved
+
+    ---
+
+    ### OUTPUTS ###
+
+    WEIGHTS : DICT OF NUMPY ARRAYS | the "target", "source" and "weight" arrays of the sparse weights
+
+    ---
+
+    """
+
+    ### IDENTIFY THE COUPLE OF GRIDS ###
+
+    grid_hash = hash_files(
+        [],
+        extra_strings=[
+            get_coordinate_bounds(dataset, "lat").tobytes().hex(),
+            get_coordinate_bounds(dataset, "lon").tobytes().hex(),
+            str(polar_grid.attrs["resolution_km"]),
+            str(polar_grid.attrs["lat_min"]),
+            str(N_SAMPLES_PER_SIDE),
+        ],
+    )
+
+    path_weights = weights_path + "/polar_weights_" + grid_hash[:16] + ".npz"
+
+    ### READ THE SAVED WEIGHTS ###
+
+    if os.path.exists(path_weights):
+
+        with np.load(path_weights) as saved:
+
+            weights = {name: saved[name] for name in saved.files}
+
+    ### OTHERWISE COMPUTE AND SAVE THEM ###
+
+    else:
+
+        weights = compute_polar_weights(dataset, polar_grid)
+
+        create_dir(weights_path, "", clear=False)
+
+        np.savez(path_weights, **weights)
+
+    return weights
+
+
+#######################################
+### REGRID FIELDS ON THE POLAR GRID ###
+#######################################
+
+
+def regrid_fields_to_polar_grid(
+    dataset: xr.Dataset,
+    fields: list[str],
+    polar_grid: xr.Dataset,
+    weights_path: str,
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function regrids some fields of a dataset on the polar equal-area grid with the saved (or newly computed) weights of its model grid.
+    The missing values are ignored by renormalizing with the weights of the valid source cells. The masked target cells are set to NaN.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset holding the fields to be regridded
+
+    FIELDS : LIST[STR] | the names of the fields to be regridded
+
+    POLAR_GRID : XR DATASET | the grid generated by generate_polar_equal_area_grid
+
+    WEIGHTS_PATH : STR | path of the directory where the weights are saved
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET_REGRIDDED : XR DATASET | the regridded fields on the (y, x) dimensions with the lat / lon coordinates and areacella
+
+    ---
+
+    """
+
+    ### GET THE WEIGHTS ###
+
+    weights = get_polar_weights(dataset, polar_grid, weights_path)
+
+    ## Start of every target cell in the weights sorted by target ##
+
+    targets, starts = np.unique(weights["target"], return_index=True)
+
+    n_target = polar_grid["mask"].size
+
+    ### PREPARE THE OUTPUT DATASET ###
+
+    dataset_regridded = polar_grid[["areacella"]].copy()
+
+    ### REGRID EVERY FIELD ###
+
+    for field in fields:
+
+        variable = dataset[field].transpose(..., "lat", "lon")
+
+        leading_shape = variable.shape[:-2]
+
+        values = variable.values.reshape(-1, variable.shape[-2] * variable.shape[-1])
+
+        ## Contribution of every weight for the field and for its mask ##
+
+        values_of_weights = values[:, weights["source"]]
+
+        valid = np.isfinite(values_of_weights)
+
+        numerator = np.add.reduceat(
+            np.where(valid, values_of_weights, 0.0) * weights["weight"], starts, axis=1
+        )
+
+        denominator = np.add.reduceat(valid * weights["weight"], starts, axis=1)
+
+        ## Fill the target cells ##
+
+        regridded = np.full((values.shape[0], n_target), np.nan)
+
+        regridded[:, targets] = np.where(
+            denominator > 0,
+            numerator / np.where(denominator > 0, denominator, 1.0),
+            np.nan,
+        )
+
+        dataset_regridded[field] = xr.DataArray(
+            regridded.reshape(leading_shape + polar_grid["mask"].shape),
+            dims=variable.dims[:-2] + ("y", "x"),
+            coords={
+                dim: variable[dim]
+                for dim in variable.dims[:-2]
+                if dim in variable.coords
+            },
+            attrs=variable.attrs,
+        )
+
+    return dataset_regridded
+
+
+#############################################
+### REGRID A DICTIONARY ON THE POLAR GRID ###
+#############################################
+
+
+def regridding_a_dictionary_to_polar_grid(
+    dictionary_to_be_regridded: dict[str, xr.Dataset],
+    fields_to_be_regridded: list[str],
+    polar_grid: xr.Dataset,
+    weights_path: str,
+) -> dict[str, xr.Dataset]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function regrids a list of fields for every dataset of a dictionary on the polar equal-area grid. The entries sharing the same model grid
+    share the same saved weights.
+
+    ---
+
+    ### INPUTS ###
+
+    DICTIONARY_TO_BE_REGRIDDED : DICT OF XR DATASETS | the dictionary holding the models' outputs
+
+    FIELDS_TO_BE_REGRIDDED : LIST[STR] | the fields to be regridded
+
+    POLAR_GRID : XR DATASET | the grid generated by generate_polar_equal_area_grid
+
+    WEIGHTS_PATH : STR | path of the directory where the weights are saved
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_REGRIDDED : DICT OF XR DATASETS | the dictionary holding the regridded fields and areacella
+
+    ---
+
+    """
+
+    dict_regridded = {
+        key: regrid_fields_to_polar_grid(
+            dataset=dataset,
+            fields=fields_to_be_regridded,
+            polar_grid=polar_grid,
+            weights_path=weights_path,
+        )
+        for key, dataset in dictionary_to_be_regridded.items()
+    }
+
+    return dict_regridded
@@ -18,6 +18,8 @@ import numpy as np  # to handle numpy arrays and the associated tools
 
 import xarray as xr  # to manage the data
 
+import pandas as pd  # to handle the grid catalog
+
 import xcdat as xc  # to handle climate model outputs with xarray
 
 ### MATHEMATIC FUNCTIONS ###
@@ -34,12 +36,41 @@ from numpy.typing import NDArray  # type hints for numpy
 
 ### HOMEMADE LIBRARIES ###
 
+## Restrict the outputs to a domain ##
+
+from utilities.tools_for_analysis.regridding.domain import (
+    subset_to_domain,  # to keep only the cells overlapping the domain
+)
+
+## Separable conservative regridding ##
+
+from utilities.tools_for_analysis.regridding.separable_conservative import (
+    compute_separable_weights,  # weights between a source grid and the output grid
+    regrid_fields_separable,  # to regrid several fields with the same separable weights
+)
+
+## Grids of the saved entries ##
+
+from utilities.get_cmip6_data.store_data.grid_catalog import (
+    compute_grid_hash,  # to identify the entries sharing the same grid
+    get_unique_grids,  # the distinct grids recorded in a catalog
+)
+
 ## Handle the climatology dictionary ##
 
 from utilities.get_cmip6_data.prepare_data.extract_climatologies import (
     add_one_variable_to_dataset,  # to add one variable to the full dataset
 )
 
+########################
+### REGRIDDING TOOLS ###
+########################
+
+REGRIDDING_TOOLS = [
+    "regrid2",  # xcdat regrid2 called for every field
+    "separable",  # our separable engine computing the weights once per entry
+]
+
 #############################################
 ### GENERATE THE STEPS OF THE COORDINATES ###
 #############################################
@@ -130,6 +161,8 @@ def make_a_regular_grid_step(not_regular_step: float, domain_extent: float) -> f
 
 def get_coarsest_regular_steps(
     dict_outputs: dict[str, xr.Dataset],
+    lat_domain: tuple[float, float] = (-90.0, 90.0),
+    lon_domain: tuple[float, float] = (0.0, 360.0),
 ) -> tuple[float, float]:
     """
 
@@ -147,6 +180,10 @@ def get_coarsest_regular_steps(
 
     DICT_OUTPUTS : DICTIONARY OF XR DATASETS | the dictionary holding the models' outputs
 
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the grid : default is (-90, 90)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the grid : default is (0, 360)
+
     ---
 
     ### OUTPUTS ###
@@ -186,13 +223,13 @@ def get_coarsest_regular_steps(
     ## Longitude ##
 
     regular_coarse_step_lon = make_a_regular_grid_step(
-        not_regular_step=max_step_lon, domain_extent=360
+        not_regular_step=max_step_lon, domain_extent=lon_domain[1] - lon_domain[0]
     )
 
     ## Latitude ##
 
     regular_coarse_step_lat = make_a_regular_grid_step(
-        not_regular_step=max_step_lat, domain_extent=180
+        not_regular_step=max_step_lat, domain_extent=lat_domain[1] - lat_domain[0]
     )
 
     return (regular_coarse_step_lon, regular_coarse_step_lat)
@@ -203,7 +240,11 @@ def get_coarsest_regular_steps(
 #########################################
 
 
-def generate_the_common_coarse_grid(dict_outputs: dict[str, xr.Dataset]) -> xr.Dataset:
+def generate_the_common_coarse_grid(
+    dict_outputs: dict[str, xr.Dataset],
+    lat_domain: tuple[float, float] = (-90.0, 90.0),
+    lon_domain: tuple[float, float] = (0.0, 360.0),
+) -> xr.Dataset:
     """
 
     ---
@@ -211,7 +252,7 @@ def generate_the_common_coarse_grid(dict_outputs: dict[str, xr.Dataset]) -> xr.D
     ### DEFINITION ###
 
     This function gets a dictionary of CMIP6 outputs and generate what is the coarsest common grid on which we can project
-    the whole ensemble to loose the least information.
+    the whole ensemble to loose the least information. The grid can be restricted to a domain (ex: the Arctic cap with lat_domain = (60, 90)).
 
     ---
 
@@ -219,6 +260,10 @@ def generate_the_common_coarse_grid(dict_outputs: dict[str, xr.Dataset]) -> xr.D
 
     DICT_OUTPUTS : DICTIONARY OF XR DATASETS | the dictionary holding the models' outputs
 
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the grid : default is (-90, 90)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the grid : default is (0, 360)
+
     ---
 
     ### OUTPUTS ###
@@ -232,25 +277,28 @@ def generate_the_common_coarse_grid(dict_outputs: dict[str, xr.Dataset]) -> xr.D
     ### GENERATE THE STEPS OF THE GRID ###
 
     regular_coarse_step_lon, regular_coarse_step_lat = get_coarsest_regular_steps(
-        dict_outputs
+        dict_outputs, lat_domain=lat_domain, lon_domain=lon_domain
     )
 
     ### GENERATE THE AXIS ###
 
     ## Longitude ##
 
-    lon_axis = xc.create_axis("lon", np.arange(0, 360, regular_coarse_step_lon))
+    lon_axis = xc.create_axis(
+        "lon",
+        np.arange(lon_domain[0], lon_domain[1], regular_coarse_step_lon),
+    )
 
     ## Latitude ##
 
     # since we have picked the step such that the latitude range is divded into an integer number
-    # of intervals we may center its bounds on -90 / 90.
+    # of intervals we may center its bounds on the limits of the domain (-90 / 90 for the globe).
 
     lat_axis = xc.create_axis(
         "lat",
         np.arange(
-            -90 + regular_coarse_step_lat / 2,
-            90 + regular_coarse_step_lat / 2,
+            lat_domain[0] + regular_coarse_step_lat / 2,
+            lat_domain[1] + regular_coarse_step_lat / 2,
             regular_coarse_step_lat,
         ),
     )
@@ -262,6 +310,47 @@ def generate_the_common_coarse_grid(dict_outputs: dict[str, xr.Dataset]) -> xr.D
     return common_coarse_grid
 
 
+def generate_the_common_coarse_grid_from_catalog(
+    grid_catalog: pd.DataFrame,
+    lat_domain: tuple[float, float] = (-90.0, 90.0),
+    lon_domain: tuple[float, float] = (0.0, 360.0),
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function generates the common coarse grid from the grid catalog written with the climatologies (see store_data/grid_catalog.py).
+    No data is opened and every distinct grid is only considered once.
+
+    ---
+
+    ### INPUTS ###
+
+    GRID_CATALOG : PANDAS DATAFRAME | the grid catalog of the ensemble
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the grid : default is (-90, 90)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the grid : default is (0, 360)
+
+    ---
+
+    ### OUTPUTS ###
+
+    COMMON_COARSE_GRID : XARRAY DATASET | the common regular grid on which to project
+
+    ---
+
+    """
+
+    common_coarse_grid = generate_the_common_coarse_grid(
+        get_unique_grids(grid_catalog), lat_domain=lat_domain, lon_domain=lon_domain
+    )
+
+    return common_coarse_grid
+
+
 #######################################################
 ### COMPUTE THE AREACELLA VARIABLE FOR A GIVEN GRID ###
 #######################################################
@@ -356,7 +445,7 @@ def compute_grid_areacella(
 
 
 def regrid_field(
-    dataset: xr.Dataset, field: str, output_grid: xr.Dataset
+    dataset: xr.Dataset, field: str, output_grid: xr.Dataset, tool: str = "regrid2"
 ) -> xr.Dataset:
     """
 
@@ -371,6 +460,8 @@ def regrid_field(
     If performing conservative regridding from a high/medium resolution lat/lon grid to a coarse lat/lon target, Regrid2 may provide better results as it assumes grid cells with constant latitudes
     and longitudes while xESMF assumes the cells are connected by Great Circles (source : https://xcdat.readthedocs.io/en/latest/generated/xarray.Dataset.regridder.horizontal.html)
 
+    The "separable" tool makes the same assumption but factors the overlaps into a latitude and a longitude matrix (see separable_conservative.py).
+
     ---
 
     ### INPUTS ###
@@ -381,6 +472,8 @@ def regrid_field(
 
     OUTPUT_GRID : XR DATASET | the grid on which the regridding will be performed
 
+    TOOL : STR | the regridding backend, one of REGRIDDING_TOOLS : default is regrid2
+
     ---
 
     ### OUTPUTS ###
@@ -390,7 +483,29 @@ def regrid_field(
 
     """
 
-    field_regridded = dataset.regridder.horizontal(field, output_grid, tool="regrid2")
+    ### CHECK THE REGRIDDING TOOL ###
+
+    if tool not in REGRIDDING_TOOLS:
+
+        raise ValueError(
+            "{} -> The regridding tool must be one of {}".format(tool, REGRIDDING_TOOLS)
+        )
+
+    ### REGRID THE FIELD ###
+
+    ## Separable weights of our own engine ##
+
+    if tool == "separable":
+
+        field_regridded = regrid_fields_separable(dataset, [field], output_grid)
+
+    ## xcdat regrid2 ##
+
+    else:
+
+        field_regridded = dataset.regridder.horizontal(
+            field, output_grid, tool="regrid2"
+        )
 
     return field_regridded
 
@@ -436,15 +551,16 @@ def add_areacella_to_dataset(dataset: xr.Dataset, areacella: xr.Dataset) -> xr.D
     return dataset
 
 
-################################################################
-### REGRID A LIST OF FIELDS AND GENERATE A REGRIDDED DATASET ###
-################################################################
+#####################################################
+### REGRID A DICTIONARY ONE FIELD AFTER THE OTHER ###
+#####################################################
 
 
-def regridding_a_dictionary(
+def regridding_a_dictionary_field_by_field(
     dictionary_to_be_regridded: dict[str, xr.Dataset],
     fields_to_be_regridded: list[str],
     output_grid: xr.Dataset,
+    tool: str = "regrid2",
 ) -> dict[str, xr.Dataset]:
     """
 
@@ -452,20 +568,25 @@ def regridding_a_dictionary(
 
     ### DEFINITION ###
 
-    This function takes as an input a 2D grid and generates the area for every grid cell. The result will be
-    a map holding the area for every grid point.
+    This function regrids a list of fields for every dataset of a dictionary onto the output grid, one field after the other.
 
     ---
 
     ### INPUTS ###
 
-    GRID : XR DATASET | the dictionary holding the models' outputs
+    DICTIONARY_TO_BE_REGRIDDED : DICT OF XR DATASETS | the dictionary holding the models' outputs
+
+    FIELDS_TO_BE_REGRIDDED : LIST[STR] | the fields to be regridded
+
+    OUTPUT_GRID : XR DATASET | the grid on which the regridding will be performed
+
+    TOOL : STR | the regridding backend, one of REGRIDDING_TOOLS : default is regrid2
 
     ---
 
     ### OUTPUTS ###
 
-    AREACELLA : NDArray[np.float64] | the areacella variable on the 2D grid given as an input
+    DICT_REGRIDDED : DICT OF XR DATASETS | the dictionary holding the regridded fields
     ---
 
     """
@@ -489,6 +610,7 @@ def regridding_a_dictionary(
             dataset=dictionary_to_be_regridded[key],
             field=field,
             output_grid=output_grid,
+            tool=tool,
         )
         for key in keys_dict
     }
@@ -520,6 +642,7 @@ def regridding_a_dictionary(
                 dataset=dictionary_to_be_regridded[key],
                 field=field,
                 output_grid=output_grid,
+                tool=tool,
             )
             for key in keys_dict
         }
@@ -536,6 +659,110 @@ def regridding_a_dictionary(
             for key in keys_dict
         }
 
+    return dict_regridded
+
+
+################################################################
+### REGRID A LIST OF FIELDS AND GENERATE A REGRIDDED DATASET ###
+################################################################
+
+
+def regridding_a_dictionary(
+    dictionary_to_be_regridded: dict[str, xr.Dataset],
+    fields_to_be_regridded: list[str],
+    output_grid: xr.Dataset,
+    tool: str = "regrid2",
+    lat_domain: tuple[float, float] | None = None,
+    lon_domain: tuple[float, float] | None = None,
+) -> dict[str, xr.Dataset]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function regrids a list of fields for every dataset of a dictionary onto the output grid and adds the areacella variable of the output grid.
+    With the separable tool, the weights are computed once per distinct grid and all the fields of an entry are regridded together.
+    If a domain is given (ex: the one of a regional output grid), the datasets are first restricted to the cells overlapping it.
+
+    ---
+
+    ### INPUTS ###
+
+    DICTIONARY_TO_BE_REGRIDDED : DICT OF XR DATASETS | the dictionary holding the models' outputs
+
+    FIELDS_TO_BE_REGRIDDED : LIST[STR] | the fields to be regridded
+
+    OUTPUT_GRID : XR DATASET | the grid on which the regridding will be performed
+
+    TOOL : STR | the regridding backend, one of REGRIDDING_TOOLS : default is regrid2
+
+    LAT_DOMAIN : TUPLE[FLOAT, FLOAT] | the (south, north) limits of the domain : default is none (every latitude)
+
+    LON_DOMAIN : TUPLE[FLOAT, FLOAT] | the (west, east) limits of the domain : default is none (every longitude)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_REGRIDDED : DICT OF XR DATASETS | the dictionary holding the regridded fields and areacella
+    ---
+
+    """
+
+    ### GET THE DICTIONARY KEYS ###
+
+    keys_dict = list(dictionary_to_be_regridded.keys())
+
+    ### RESTRICT THE DATASETS TO THE DOMAIN BEFORE ANY WEIGHT IS COMPUTED ###
+
+    dictionary_to_be_regridded = {
+        key: subset_to_domain(
+            dictionary_to_be_regridded[key],
+            lat_domain=lat_domain,
+            lon_domain=lon_domain,
+        )
+        for key in keys_dict
+    }
+
+    ### SEPARABLE TOOL : ALL THE FIELDS OF AN ENTRY AT ONCE ###
+
+    if tool == "separable":
+
+        ## The weights are shared by the entries on the same grid ##
+
+        dict_weights = {}
+
+        dict_regridded = {}
+
+        for key in tqdm(keys_dict, desc="Regridding all the variables..."):
+
+            grid_hash = compute_grid_hash(dictionary_to_be_regridded[key])
+
+            if grid_hash not in dict_weights:
+
+                dict_weights[grid_hash] = compute_separable_weights(
+                    dictionary_to_be_regridded[key], output_grid
+                )
+
+            dict_regridded[key] = regrid_fields_separable(
+                dataset=dictionary_to_be_regridded[key],
+                fields=fields_to_be_regridded,
+                output_grid=output_grid,
+                weights=dict_weights[grid_hash],
+            )
+
+    ### OTHER TOOLS : ONE FIELD AFTER THE OTHER ###
+
+    else:
+
+        dict_regridded = regridding_a_dictionary_field_by_field(
+            dictionary_to_be_regridded=dictionary_to_be_regridded,
+            fields_to_be_regridded=fields_to_be_regridded,
+            output_grid=output_grid,
+            tool=tool,
+        )
+
     ### ADD THE AREACELLA VARIABLE TO EVERY REGRIDDED DATASET ###
 
     ## Generate the areacella variable for the output grid ##
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+
+"""
+This script is a conservative regridding engine for rectilinear latitude / longitude grids. On such grids the area of the overlap between a source cell and a target cell
+is the product of a latitude overlap (in sin(latitude)) and a longitude overlap (in degrees). The regridding is then factored into a latitude matrix and a longitude matrix
+so that every field only costs two small matrix products. The missing values are handled by renormalizing with the regridded mask, as regrid2 does.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+##################################
+### IMPORTATION OF THE MODULES ###
+##################################
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+### TYPE HINTS FOR FUNCTIONS ###
+
+from numpy.typing import NDArray  # type hints for numpy
+
+######################################
+### SHIFTS USED FOR THE LONGITUDES ###
+######################################
+
+LON_SHIFTS = np.array(
+    [-720.0, -360.0, 0.0, 360.0, 720.0]
+)  # to catch the overlaps across the periodic boundary
+
+######################################
+### GET THE BOUNDS OF A COORDINATE ###
+######################################
+
+
+def get_coordinate_bounds(dataset: xr.Dataset, coordinate: str) -> NDArray[np.float64]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function retrieves the bounds of the lat or lon coordinate of a dataset. They are read from the variable named in the "bounds" attribute of
+    the coordinate or from the {coordinate}_bnds variable. If there is none they are built from the middle points between the coordinates, the latitudes
+    being clipped at the poles (a single cell covers the whole extent).
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset holding the coordinate
+
+    COORDINATE : STR | the name of the coordinate (lat or lon)
+
+    ---
+
+    ### OUTPUTS ###
+
+    BOUNDS : NUMPY ARRAY OF FLOAT 64 | the (n, 2) array of the bounds of every cell
+
+    ---
+
+    """
+
+    ### LOOK FOR THE BOUNDS IN THE DATASET ###
+
+    for name in [
+        dataset[coordinate].attrs.get("bounds"),
+        coordinate + "_bnds",
+        coordinate + "_bounds",
+    ]:
+
+        if name is not None and name in dataset.variables:
+
+            bounds = dataset[name].values
+
+            ## Remove a possible time dimension ##
+
+            return bounds.reshape(-1, dataset[coordinate].size, 2)[0].astype(np.float64)
+
+    ### BUILD THEM FROM THE MIDDLE POINTS ###
+
+    values = dataset[coordinate].values.astype(np.float64)
+
+    ## A single cell covers the whole extent ##
+
+    if values.size == 1:
+
+        half_extent = 90.0 if coordinate == "lat" else 180.0
+
+        center = 0.0 if coordinate == "lat" else values[0]
+
+        return np.array([[center - half_extent, center + half_extent]])
+
+    middles = 0.5 * (values[1:] + values[:-1])
+
+    edges = np.concatenate(
+        [
+            [values[0] - (middles[0] - values[0])],
+            middles,
+            [values[-1] + (values[-1] - middles[-1])],
+        ]
+    )
+
+    if coordinate == "lat":
+
+        edges = np.clip(edges, -90.0, 90.0)
+
+    bounds = np.stack([edges[:-1], edges[1:]], axis=1)
+
+    return bounds
+
+
+######################################
+### LATITUDE AND LONGITUDE WEIGHTS ###
+######################################
+
+
+def latitude_overlap_matrix(
+    source_bounds: NDArray[np.float64], target_bounds: NDArray[np.float64]
+) -> NDArray[np.float64]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the overlap between every source and target latitude band, measured in sin(latitude) so that it is proportional to the area.
+
+    ---
+
+    ### INPUTS ###
+
+    SOURCE_BOUNDS : NUMPY ARRAY OF FLOAT 64 | the (n_source, 2) latitude bounds in degrees
+
+    TARGET_BOUNDS : NUMPY ARRAY OF FLOAT 64 | the (n_target, 2) latitude bounds in degrees
+
+    ---
+
+    ### OUTPUTS ###
+
+    WEIGHTS : NUMPY ARRAY OF FLOAT 64 | the (n_target, n_source) overlap matrix
+
+    ---
+
+    """
+
+    ### SORT THE BOUNDS OF EVERY CELL ###
+
+    source_low, source_high = np.sort(source_bounds, axis=1).T
+
+    target_low, target_high = np.sort(target_bounds, axis=1).T
+
+    ### OVERLAP OF EVERY COUPLE ###
+
+    low = np.maximum(target_low[:, None], source_low[None, :])
+
+    high = np.minimum(target_high[:, None], source_high[None, :])
+
+    weights = np.where(
+        high > low, np.sin(np.deg2rad(high)) - np.sin(np.deg2rad(low)), 0.0
+    )
+
+    return weights
+
+
+def longitude_overlap_matrix(
+    source_bounds: NDArray[np.float64], target_bounds: NDArray[np.float64]
+) -> NDArray[np.float64]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the overlap in degrees between every source and target longitude band. The longitudes are periodic : the source bands
+    are shifted by multiples of 360° so that grids defined on [-180, 180] and [0, 360] can be mixed.
+
+    ---
+
+    ### INPUTS ###
+
+    SOURCE_BOUNDS : NUMPY ARRAY OF FLOAT 64 | the (n_source, 2) longitude bounds in degrees
+
+    TARGET_BOUNDS : NUMPY ARRAY OF FLOAT 64 | the (n_target, 2) longitude bounds in degrees
+
+    ---
+
+    ### OUTPUTS ###
+
+    WEIGHTS : NUMPY ARRAY OF FLOAT 64 | the (n_target, n_source) overlap matrix
+
+    ---
+
+    """
+
+    ### SORT THE BOUNDS OF EVERY CELL ###
+
+    source_low, source_high = np.sort(source_bounds, axis=1).T
+
+    target_low, target_high = np.sort(target_bounds, axis=1).T
+
+    ### OVERLAP OF EVERY COUPLE FOR EVERY SHIFT ###
+
+    low = np.maximum(target_low[:, None, None], source_low[None, :, None] + LON_SHIFTS)
+
+    high = np.minimum(
+        target_high[:, None, None], source_high[None, :, None] + LON_SHIFTS
+    )
+
+    weights = np.sum(np.clip(high - low, 0.0, None), axis=2)
+
+    return weights
+
+
+############################################
+### WEIGHTS BETWEEN A DATASET AND A GRID ###
+############################################
+
+
+def compute_separable_weights(
+    dataset: xr.Dataset, output_grid: xr.Dataset
+) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the latitude and longitude overlap matrices between the grid of a dataset and an output grid.
+    They only depend on the two grids and can be shared by all the entries defined on the same grid.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset on the source grid
+
+    OUTPUT_GRID : XR DATASET | the grid on which the regridding will be performed
+
+    ---
+
+    ### OUTPUTS ###
+
+    (WEIGHTS_LAT, WEIGHTS_LON) : TUPLE OF NUMPY ARRAYS OF FLOAT 64 | the (n_target, n_source) latitude and longitude overlap matrices
+
+    ---
+
+    """
+
+    weights_lat = latitude_overlap_matrix(
+        get_coordinate_bounds(dataset, "lat"), get_coordinate_bounds(output_grid, "lat")
+    )
+
+    weights_lon = longitude_overlap_matrix(
+        get_coordinate_bounds(dataset, "lon"), get_coordinate_bounds(output_grid, "lon")
+    )
+
+    return (weights_lat, weights_lon)
+
+
+#################################################
+### REGRID SOME FIELDS WITH SEPARABLE WEIGHTS ###
+#################################################
+
+
+def regrid_fields_separable(
+    dataset: xr.Dataset,
+    fields: list[str],
+    output_grid: xr.Dataset,
+    weights: tuple[NDArray[np.float64], NDArray[np.float64]] | None = None,
+) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function regrids conservatively some fields of a dataset defined on a rectilinear grid onto another rectilinear grid. The weights are computed
+    once for all the fields. The missing values are ignored and the result is renormalized by the regridded valid area : the target cells without any
+    valid source cell are set to NaN.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | the dataset holding the fields to be regridded
+
+    FIELDS : LIST[STR] | the names of the fields to be regridded
+
+    OUTPUT_GRID : XR DATASET | the grid on which the regridding will be performed
+
+    WEIGHTS : TUPLE OF NUMPY ARRAYS | the weights given by compute_separable_weights if already known : default is none (computed here)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET_REGRIDDED : XR DATASET | the regridded fields with the bounds of the output grid
+
+    ---
+
+    """
+
+    ### COMPUTE THE WEIGHTS ONCE ###
+
+    if weights is None:
+
+        weights = compute_separable_weights(dataset, output_grid)
+
+    weights_lat, weights_lon = weights
+
+    ### PREPARE THE OUTPUT DATASET WITH THE BOUNDS OF THE OUTPUT GRID ###
+
+    dataset_regridded = output_grid[
+        [
+            var
+            for var in output_grid.data_vars
+            if set(output_grid[var].dims) <= {"lat", "lon", "bnds", "nbnd"}
+        ]
+    ]
+
+    ### REGRID EVERY FIELD ###
+
+    for field in fields:
+
+        ## Put the horizontal dimensions at the end ##
+
+        variable = dataset[field].transpose(..., "lat", "lon")
+
+        values = variable.values.astype(np.float64)
+
+        ## Two matrix products for the field and for its mask ##
+
+        valid = np.isfinite(values)
+
+        numerator = weights_lat @ np.where(valid, values, 0.0) @ weights_lon.T
+
+        denominator = weights_lat @ valid.astype(np.float64) @ weights_lon.T
+
+        regridded = np.where(
+            denominator > 0,
+            numerator / np.where(denominator > 0, denominator, 1.0),
+            np.nan,
+        )
+
+        ## Build the regridded data array ##
+
+        dataset_regridded[field] = xr.DataArray(
+            regridded,
+            dims=variable.dims,
+            coords={
+                dim: variable[dim]
+                for dim in variable.dims
+                if dim not in ["lat", "lon"] and dim in variable.coords
+            }
+            | {"lat": output_grid["lat"], "lon": output_grid["lon"]},
+            attrs=variable.attrs,
+        )
+
+    return dataset_regridded
@@ -165,3 +165,59 @@ def spatial_average_given_field(field: str, dataset: xr.Dataset) -> NDArray[np.f
         )
 
         raise KeyError
+
+
+#####################################################
+### AVERAGE OF A GIVEN FIELD OVER A LATITUDE BAND ###
+#####################################################
+
+
+def region_average_given_field(
+    field: str, dataset: xr.Dataset, lat_min: float = 60.0, lat_max: float = 90.0
+) -> NDArray[np.float64]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the average of a provided input field over a latitude band (ex: the Arctic above 60°N) weighted by the areacella variable
+    of the dataset. It does not need the bounds used by xcdat : the datasets produced by regridding_a_dictionary or regridding_a_dictionary_to_polar_grid
+    can be used directly.
+
+    ---
+
+    ### INPUTS ###
+
+    FIELD : STR | field to be averaged
+
+    DATASET : XR DATASET | dataset holding the variable to average and the areacella variable
+
+    LAT_MIN : FLOAT | southern limit of the latitude band : default is 60.0
+
+    LAT_MAX : FLOAT | northern limit of the latitude band : default is 90.0
+
+    ---
+
+    ### OUTPUTS ###
+
+    REGION_AVG : NUMPY ARRAY OF FLOAT 64 | the average of the field over the band. Its dimensions depends of the time dimension of the dataset.
+
+    ---
+    """
+
+    ### SELECT THE LATITUDE BAND ###
+
+    in_band = (dataset.lat >= lat_min) & (dataset.lat <= lat_max)
+
+    ### AREA WEIGHTED AVERAGE ###
+
+    region_avg = (
+        dataset[field]
+        .where(in_band)
+        .weighted(dataset["areacella"].where(in_band, 0.0).fillna(0.0))
+        .mean(dataset["areacella"].dims)  # (lat, lon) or (y, x) for the polar grid
+        .values
+    )
+
+    return region_avg
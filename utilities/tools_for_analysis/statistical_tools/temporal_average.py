@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+
+"""
+This submodule holds the routines that allow to realize temporal averages of the dictionary data. The months are weighted by their number of days
+which is read from a precomputed table covering every calendar used by the CMIP6 models (noleap, 360_day, gregorian, ...).
+The same table is used to build the monthly climatologies and to reduce them into annual means.
+
+Author : GIBONI Lucas
+
+Feel free to copy, adapt and modify it under the provided license on github.
+"""
+
+###################################
+### IMPORTATIONS OF THE MODULES ###
+###################################
+
+### DATA OBJECTS AND ASSOCIATED COMPUTATION ###
+
+import numpy as np  # to handle numpy arrays and the associated tools
+
+import xarray as xr  # to manage the data
+
+### TYPE HINTS FOR FUNCTIONS ###
+
+from numpy.typing import NDArray  # type hints for numpy
+
+####################################
+### DAYS PER MONTH OF EVERY YEAR ###
+####################################
+
+## Common years and leap years ##
+
+DAYS_COMMON_YEAR = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+DAYS_LEAP_YEAR = np.array([31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+DAYS_360_DAY_YEAR = np.full(12, 30)
+
+## Table of the calendars : first row for the common years, second row for the leap years ##
+
+DAYS_PER_MONTH_TABLE = {
+    "noleap": np.stack([DAYS_COMMON_YEAR, DAYS_COMMON_YEAR]),
+    "365_day": np.stack([DAYS_COMMON_YEAR, DAYS_COMMON_YEAR]),
+    "all_leap": np.stack([DAYS_LEAP_YEAR, DAYS_LEAP_YEAR]),
+    "366_day": np.stack([DAYS_LEAP_YEAR, DAYS_LEAP_YEAR]),
+    "360_day": np.stack([DAYS_360_DAY_YEAR, DAYS_360_DAY_YEAR]),
+    "standard": np.stack([DAYS_COMMON_YEAR, DAYS_LEAP_YEAR]),
+    "gregorian": np.stack([DAYS_COMMON_YEAR, DAYS_LEAP_YEAR]),
+    "proleptic_gregorian": np.stack([DAYS_COMMON_YEAR, DAYS_LEAP_YEAR]),
+    "julian": np.stack([DAYS_COMMON_YEAR, DAYS_LEAP_YEAR]),
+}
+
+## First year of the gregorian rule for the standard calendar ##
+
+FIRST_GREGORIAN_YEAR = 1583
+
+###########################
+### FIND THE LEAP YEARS ###
+###########################
+
+
+def is_leap_year(years: NDArray[np.int64], calendar: str) -> NDArray[np.bool_]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function tells for every year if it is a leap year in the given calendar. The standard (or gregorian) calendar follows
+    the julian rule before 1583 and the gregorian rule after.
+
+    ---
+
+    ### INPUTS ###
+
+    YEARS : NUMPY ARRAY OF INT 64 | the years to test
+
+    CALENDAR : STR | the calendar of the years (one of the keys of DAYS_PER_MONTH_TABLE)
+
+    ---
+
+    ### OUTPUTS ###
+
+    IS_LEAP : NUMPY ARRAY OF BOOL | True where the year is a leap year
+
+    ---
+
+    """
+
+    years = np.asarray(years)
+
+    ### JULIAN AND GREGORIAN RULES ###
+
+    julian_rule = years % 4 == 0
+
+    gregorian_rule = julian_rule & ((years % 100 != 0) | (years % 400 == 0))
+
+    ### SELECT THE RULE OF THE CALENDAR ###
+
+    if calendar == "julian":
+
+        is_leap = julian_rule
+
+    elif calendar == "proleptic_gregorian":
+
+        is_leap = gregorian_rule
+
+    elif calendar in ["standard", "gregorian"]:
+
+        is_leap = np.where(years < FIRST_GREGORIAN_YEAR, julian_rule, gregorian_rule)
+
+    ## The other calendars use the same row of the table for every year ##
+
+    else:
+
+        is_leap = np.zeros(years.shape, dtype=bool)
+
+    return is_leap
+
+
+#########################################
+### DAYS IN THE MONTHS OF A TIME AXIS ###
+#########################################
+
+
+def get_days_per_month(time: xr.DataArray) -> NDArray[np.int64]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function reads the number of days of every month of a monthly time axis in the precomputed table of its calendar.
+
+    ---
+
+    ### INPUTS ###
+
+    TIME : XR DATA ARRAY | the monthly time axis (datetime64 or cftime)
+
+    ---
+
+    ### OUTPUTS ###
+
+    DAYS_PER_MONTH : NUMPY ARRAY OF INT 64 | number of days of every month of the time axis
+
+    ---
+
+    """
+
+    ### RETRIEVE THE CALENDAR, THE YEARS AND THE MONTHS ###
+
+    calendar = time.dt.calendar
+
+    years = time.dt.year.values
+
+    months = time.dt.month.values
+
+    ### READ THE TABLE ###
+
+    days_per_month = DAYS_PER_MONTH_TABLE[calendar][
+        is_leap_year(years, calendar).astype(int), months - 1
+    ]
+
+    return days_per_month
+
+
+################################################
+### MONTHLY CLIMATOLOGY WEIGHTED BY THE DAYS ###
+################################################
+
+
+def monthly_climatology(dataset: xr.Dataset, variable_name: str) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the monthly climatology of a variable. Every month of every year is weighted by its number of days
+    read from the precomputed table of the calendar. The time axis of the output holds the 12 months of the year 1 of the same calendar.
+    The variables without a time dimension (ex: lat_bnds, lon_bnds) are kept.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | dataset holding the monthly time series of the variable
+
+    VARIABLE_NAME : STR | variable of which the climatology is computed
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET_CLIM : XR DATASET | dataset holding the monthly climatology of the variable
+
+    ---
+
+    """
+
+    ### WEIGHTS OF EVERY MONTH ###
+
+    weights = xr.DataArray(get_days_per_month(dataset.time), dims="time").assign_coords(
+        time=dataset.time
+    )
+
+    ### WEIGHTED MEAN OF EVERY MONTH OVER THE YEARS ###
+
+    variable = dataset[variable_name]
+
+    ## Missing values do not contribute to the weights ##
+
+    weights_valid = weights.where(variable.notnull(), 0.0)
+
+    climatology = (variable.fillna(0.0) * weights_valid).groupby("time.month").sum(
+        "time"
+    ) / weights_valid.groupby("time.month").sum("time")
+
+    ### PUT THE MONTHS BACK ON A TIME AXIS ###
+
+    climatology = (
+        climatology.rename({"month": "time"})
+        .assign_coords(
+            time=xr.date_range(
+                "0001-01-01",
+                periods=12,
+                freq="MS",
+                calendar=dataset.time.dt.calendar,
+                use_cftime=True,
+            )[climatology["month"].values - 1]
+        )
+        .transpose(*variable.dims)
+    )
+
+    climatology.attrs = variable.attrs
+
+    ### BUILD THE OUTPUT DATASET ###
+
+    dataset_clim = dataset[
+        [var for var in dataset.data_vars if "time" not in dataset[var].dims]
+    ].drop_dims("time", errors="ignore")
+
+    dataset_clim[variable_name] = climatology
+
+    return dataset_clim
+
+
+#####################################################
+### WEIGHTED ANNUAL MEAN OF A MONTHLY CLIMATOLOGY ###
+#####################################################
+
+
+def weighted_annual_mean(dataset: xr.Dataset) -> xr.Dataset:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function averages every variable of a monthly dataset over its time axis. Every month is weighted by its number of days
+    read from the precomputed table of the calendar.
+
+    ---
+
+    ### INPUTS ###
+
+    DATASET : XR DATASET | dataset holding monthly variables
+
+    ---
+
+    ### OUTPUTS ###
+
+    DATASET_MEAN : XR DATASET | dataset averaged over the time axis
+
+    ---
+
+    """
+
+    weights = xr.DataArray(get_days_per_month(dataset.time), dims="time")
+
+    dataset_mean = dataset.weighted(weights).mean("time", keep_attrs=True)
+
+    return dataset_mean
+
+
+##################################################
+### WEIGHTED ANNUAL MEAN OF THE WHOLE ENSEMBLE ###
+##################################################
+
+
+def weighted_annual_mean_ensemble(
+    dict_datasets: dict[str, xr.Dataset], fields: list[str]
+) -> dict[str, xr.Dataset]:
+    """
+
+    ---
+
+    ### DEFINITION ###
+
+    This function computes the weighted annual mean of some fields for every entry of a dictionary of monthly datasets at once.
+    The entries sharing the same calendar are flattened and concatenated so that their mean is a single product with the months weights
+    of this calendar, whatever the grid of every entry. The missing values are ignored and the variables without a time dimension are kept.
+
+    ---
+
+    ### INPUTS ###
+
+    DICT_DATASETS : DICT OF XR DATASETS | the monthly datasets (ex: the APRP outputs or the climatologies)
+
+    FIELDS : LIST[STR] | the fields to average
+
+    ---
+
+    ### OUTPUTS ###
+
+    DICT_MEAN : DICT OF XR DATASETS | the annual mean of the fields for every entry
+
+    ---
+
+    """
+
+    ### GROUP THE ENTRIES SHARING THE SAME MONTHS ###
+
+    dict_groups = {}
+
+    for key, dataset in dict_datasets.items():
+
+        days_per_month = get_days_per_month(dataset.time)
+
+        dict_groups.setdefault(tuple(days_per_month), []).append(key)
+
+    ### MEAN OF EVERY GROUP ###
+
+    dict_mean = {key: {} for key in dict_datasets.keys()}
+
+    for days_per_month, keys in dict_groups.items():
+
+        weights = np.array(days_per_month, dtype=np.float64)
+
+        for field in fields:
+
+            ## Flatten and concatenate the entries of the group ##
+
+            list_fields = [
+                dict_datasets[key][field].transpose("time", ...).values for key in keys
+            ]
+
+            sizes = [values[0].size for values in list_fields]
+
+            packed = np.concatenate(
+                [values.reshape(len(weights), -1) for values in list_fields], axis=1
+            )
+
+            ## One product for the whole group ##
+
+            valid = np.isfinite(packed)
+
+            sum_weights = weights @ valid
+
+            packed_mean = (weights @ np.where(valid, packed, 0.0)) / np.where(
+                sum_weights > 0, sum_weights, np.nan
+            )
+
+            ## Unpack every entry ##
+
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+            for ii, key in enumerate(keys):
+
+                template = dict_datasets[key][field].isel(time=0, drop=True)
+
+                dict_mean[key][field] = template.copy(
+                    data=packed_mean[offsets[ii] : offsets[ii + 1]].reshape(
+                        template.shape
+                    )
+                )
+
+    ### BUILD THE OUTPUT DATASETS : THE VARIABLES WITHOUT TIME (EX: BOUNDS) ARE KEPT ###
+
+    dict_mean = {
+        key: dict_datasets[key].drop_dims("time").assign(dict_mean[key])
+        for key in dict_datasets.keys()
+    }
+
+    return dict_mean